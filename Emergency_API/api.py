@@ -25,31 +25,40 @@ st.set_page_config(
 query_params = st.query_params
 token = query_params.get("token", None)
 
+# Prebuilt response (Emergency_Payloads), kept current by database triggers on every edit;
+# skipped while a fresh clinic-local replica can answer the scan without MySQL
+prebuilt = db.get_emergency_payload(token) if token else None
+response = None
+
 if not token:
     # Return error JSON
     response = {
         "error": "No emergency access token provided",
         "success": False
     }
+elif prebuilt:
+    patient_id, payload = prebuilt
+    db.log_emergency_access(patient_id, token)
 else:
     try:
-        # Fetch patient data
-        patient_data = db.get_patient_by_emergency_token(token)
+        # Fetch patient data (patient row and sections in one query)
+        record = db.get_patient_record(emergency_token=token)
         
-        if not patient_data:
+        if not record:
             response = {
                 "error": "Invalid or expired emergency access token",
                 "success": False
             }
         else:
+            patient_data = record.patient
+            
             # Log the access
             db.log_emergency_access(patient_data['patient_id'], token)
             
-            # Get additional data
-            allergies = db.get_allergies(patient_data['patient_id'])
-            medications = db.get_medications(patient_data['patient_id'])
-            conditions = db.get_conditions(patient_data['patient_id'])
-            contacts = db.get_emergency_contacts(patient_data['patient_id'])
+            allergies = record.allergies
+            medications = record.medications
+            conditions = record.conditions
+            contacts = record.contacts
             
             # Convert DataFrames to list of dicts
             allergies_list = allergies.to_dict('records') if not allergies.empty else []
@@ -80,8 +89,11 @@ else:
             "success": False
         }
 
-# Return JSON response
-st.write(json.dumps(response, indent=2, default=str))
+# Return JSON response (a prebuilt payload is already serialized)
+if response is None:
+    st.write(payload.decode('utf-8'))
+else:
+    st.write(json.dumps(response, indent=2, default=str))
 
 # Hide Streamlit UI elements
 st.markdown("""
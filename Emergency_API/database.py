@@ -4,38 +4,252 @@ License to Live: MIAS - Python/Streamlit Version
 Handles all database operations for the MIAS system
 """
 
+import atexit
+import base64
+import functools
+import hashlib
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
 import pymysql
 import pandas as pd
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 import streamlit as st
 
-# Database configuration
+# Database configuration (MIAS_DB_* environment variables point the app at another server,
+# e.g. a local MySQL loaded by synthetic_data.py for benchmarking)
 DB_CONFIG = {
-    'host': 'mias-db.chwakwqqclzv.us-east-2.rds.amazonaws.com',
-    'port': 3306,
-    'user': 'admin',
-    'password': 'License2Live',
-    'database': 'mias_db',
+    'host': os.environ.get('MIAS_DB_HOST', 'mias-db.chwakwqqclzv.us-east-2.rds.amazonaws.com'),
+    'port': int(os.environ.get('MIAS_DB_PORT', 3306)),
+    'user': os.environ.get('MIAS_DB_USER', 'admin'),
+    'password': os.environ.get('MIAS_DB_PASSWORD', 'License2Live'),
+    'database': os.environ.get('MIAS_DB_NAME', 'mias_db'),
     'charset': 'utf8mb4',
     'cursorclass': pymysql.cursors.DictCursor
 }
 
 
-@st.cache_resource
-def get_connection():
-    """Get database connection (cached by Streamlit)"""
-    try:
-        connection = pymysql.connect(**DB_CONFIG)
+# ==================== WORKLOAD CLASSES ====================
+# Each kind of work gets its own connections, so a slow dashboard aggregate or AI-generated
+# query cannot hold the connection a paramedic's scan is waiting for. Statements are admitted
+# by priority (lowest number first) while at most MAX_ACTIVE_STATEMENTS run at once; emergency
+# reads may always use their own connections on top of that limit.
+
+WORKLOAD_CLASSES = {
+    # name: (priority, connections, statement time limit ms, max queued callers, max wait seconds)
+    'emergency': (0, 2, 3000, None, 10),
+    'clinical': (1, 2, 10000, None, 20),
+    'analytics': (2, 1, 30000, 8, 30),
+    'adhoc': (3, 1, 5000, 2, 5),
+    # Whole-database reads (FHIR export): one at a time, admitted after everything else
+    'export': (4, 1, 60000, 1, 60),
+}
+
+DEFAULT_WORKLOAD = 'clinical'
+
+# Statements running at once across the non-emergency classes
+MAX_ACTIVE_STATEMENTS = int(os.environ.get('MIAS_DB_MAX_ACTIVE', 3))
+
+
+class WorkloadBusy(Exception):
+    """A workload class's queue is full or its caller waited too long for a connection"""
+
+
+class WorkloadGate:
+    """
+    Priority admission and per-class connection pools
+
+    Callers wait on one condition variable; whenever a connection is returned
+    every waiter re-checks, and only the highest-priority eligible waiter
+    (oldest first within a class) is admitted.
+    """
+
+    def __init__(self, classes: Dict[str, Tuple], max_active: int):
+        self.classes = classes
+        self.max_active = max_active
+        self._condition = threading.Condition()
+        self._waiting: List[Tuple[int, int, str]] = []
+        self._sequence = 0
+        self._idle = {name: [] for name in classes}
+        self._active = {name: 0 for name in classes}
+        self._stats = {name: {'admitted': 0, 'rejected': 0, 'wait_ms_total': 0.0, 'wait_ms_max': 0.0}
+                       for name in classes}
+
+    def _eligible(self, name: str) -> bool:
+        if self._active[name] >= self.classes[name][1]:
+            return False
+        if name == 'emergency':
+            return True
+        return sum(n for c, n in self._active.items() if c != 'emergency') < self.max_active
+
+    def _next_admitted(self) -> Optional[Tuple[int, int, str]]:
+        return next((waiter for waiter in sorted(self._waiting) if self._eligible(waiter[2])), None)
+
+    def acquire(self, name: str):
+        """Wait for a connection of class `name`; raises WorkloadBusy when throttled"""
+        priority, _, timeout_ms, max_queued, max_wait = self.classes[name]
+        started = time.monotonic()
+        with self._condition:
+            queued = sum(1 for waiter in self._waiting if waiter[2] == name)
+            if max_queued is not None and queued >= max_queued and not self._eligible(name):
+                self._stats[name]['rejected'] += 1
+                raise WorkloadBusy(f"The database is busy with other {name} queries, please try again shortly")
+
+            self._sequence += 1
+            ticket = (priority, self._sequence, name)
+            self._waiting.append(ticket)
+            try:
+                while self._next_admitted() != ticket:
+                    remaining = max_wait - (time.monotonic() - started)
+                    if remaining <= 0:
+                        self._stats[name]['rejected'] += 1
+                        raise WorkloadBusy(f"Timed out waiting for a database connection ({name})")
+                    self._condition.wait(remaining)
+            finally:
+                self._waiting.remove(ticket)
+                # Someone else may be eligible now that this ticket is gone
+                self._condition.notify_all()
+
+            self._active[name] += 1
+            waited_ms = (time.monotonic() - started) * 1000
+            stats = self._stats[name]
+            stats['admitted'] += 1
+            stats['wait_ms_total'] += waited_ms
+            stats['wait_ms_max'] = max(stats['wait_ms_max'], waited_ms)
+            idle = self._idle[name]
+            connection = idle.pop() if idle else None
+
+        if connection is None:
+            try:
+                # Applies to every SELECT on this connection (MySQL 5.7.8+); as the init
+                # command it is re-applied when ping(reconnect=True) replaces the session
+                connection = pymysql.connect(**DB_CONFIG,
+                                             init_command=f"SET SESSION max_execution_time = {int(timeout_ms)}")
+            except Exception:
+                self.release(name, None)
+                raise
         return connection
+
+    def release(self, name: str, connection, broken: bool = False):
+        """Return a connection (closing it if it is broken) and admit the next waiter"""
+        if connection is not None and broken:
+            try:
+                connection.close()
+            except Exception:
+                pass
+            connection = None
+        with self._condition:
+            self._active[name] -= 1
+            if connection is not None:
+                self._idle[name].append(connection)
+            self._condition.notify_all()
+
+    def stats(self) -> List[Dict]:
+        """Per-class counters: active, queued, admitted, rejected, average and max wait"""
+        with self._condition:
+            rows = []
+            for name, (priority, connections, timeout_ms, _, _) in self.classes.items():
+                stats = self._stats[name]
+                rows.append({
+                    'workload': name,
+                    'priority': priority,
+                    'connections': connections,
+                    'timeout_ms': timeout_ms,
+                    'active': self._active[name],
+                    'queued': sum(1 for waiter in self._waiting if waiter[2] == name),
+                    'admitted': stats['admitted'],
+                    'rejected': stats['rejected'],
+                    'avg_wait_ms': round(stats['wait_ms_total'] / stats['admitted'], 2) if stats['admitted'] else 0.0,
+                    'max_wait_ms': round(stats['wait_ms_max'], 2),
+                })
+            return rows
+
+
+# Module-level so every session, worker thread and non-Streamlit script (load test,
+# benchmarks) in the process shares one set of pools
+workload_gate = WorkloadGate(WORKLOAD_CLASSES, MAX_ACTIVE_STATEMENTS)
+
+
+_workload_state = threading.local()
+
+
+@contextmanager
+def workload(name: Optional[str]):
+    """Run the enclosed database calls as workload class `name` (innermost wins; None keeps the current class)"""
+    previous = getattr(_workload_state, 'name', None)
+    _workload_state.name = name or previous
+    try:
+        yield
+    finally:
+        _workload_state.name = previous
+
+
+def _in_workload(name: str):
+    """Decorator: run a data-layer function as workload class `name`"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with workload(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+@contextmanager
+def _checkout(name: Optional[str] = None):
+    """
+    Borrow a connection of the current (or given) workload class
+
+    A connection that raised a MySQL error is closed instead of being
+    returned to the pool. Raises WorkloadBusy when the class is throttled.
+    """
+    name = name or getattr(_workload_state, 'name', None) or DEFAULT_WORKLOAD
+    gate = workload_gate
+    connection = gate.acquire(name)
+    broken = False
+    try:
+        connection.ping(reconnect=True)
+        yield connection
     except Exception as e:
-        st.error(f"Database connection failed: {str(e)}")
-        return None
+        # Errors raised by the statement itself leave the connection usable
+        broken = not isinstance(e, (pymysql.ProgrammingError, pymysql.IntegrityError, pymysql.DataError))
+        raise
+    finally:
+        gate.release(name, connection, broken)
+
+
+def get_workload_stats() -> List[Dict]:
+    """Per-workload connection use and admission waits (for the admin page and load tests)"""
+    return workload_gate.stats()
+
+
+@contextmanager
+def get_streaming_connection():
+    """
+    Borrow an 'export' workload connection whose cursors are unbuffered (server-side)
+    
+    Rows are streamed from MySQL as they are iterated instead of being
+    buffered client-side, so whole-table exports run in constant memory.
+    Admission goes through the workload gate like every other read, so an
+    export waits behind interactive work; raises WorkloadBusy when throttled.
+    Every cursor must be read to the end or closed before the block exits.
+    """
+    with _checkout('export') as connection:
+        connection.cursorclass = pymysql.cursors.SSDictCursor
+        try:
+            yield connection
+        finally:
+            connection.cursorclass = DB_CONFIG['cursorclass']
 
 
 def execute_query(query: str, params: Optional[Tuple] = None, fetch: bool = True):
     """
     Execute a SQL query with automatic reconnection
     
+    Runs on a connection of the caller's workload class (see workload()).
+    
     Args:
         query: SQL query string
         params: Query parameters (optional)
@@ -44,42 +258,30 @@ def execute_query(query: str, params: Optional[Tuple] = None, fetch: bool = True
     Returns:
         Query results (if fetch=True) or number of affected rows
     """
-    connection = get_connection()
-    if not connection:
-        return None
-    
-    try:
-        # Test if connection is alive
-        connection.ping(reconnect=True)
-        
-        with connection.cursor() as cursor:
-            cursor.execute(query, params or ())
-            
-            if fetch:
-                result = cursor.fetchall()
-                return result
-            else:
-                connection.commit()
-                return cursor.rowcount
-                
-    except pymysql.Error as e:
-        # Clear cache and try to reconnect once
-        st.cache_resource.clear()
+    for attempt in range(2):
         try:
-            connection = pymysql.connect(**DB_CONFIG)
-            with connection.cursor() as cursor:
-                cursor.execute(query, params or ())
-                if fetch:
-                    return cursor.fetchall()
-                else:
-                    connection.commit()
-                    return cursor.rowcount
-        except Exception as retry_error:
-            st.error(f"Query error: {str(retry_error)}")
+            with _checkout() as connection:
+                with connection.cursor() as cursor:
+                    cursor.execute(query, params or ())
+                    
+                    if fetch:
+                        return cursor.fetchall()
+                    else:
+                        connection.commit()
+                        return cursor.rowcount
+                        
+        except pymysql.OperationalError as e:
+            # Lost connection: it was discarded, try once more on a fresh one
+            if attempt == 0 and e.args and e.args[0] in (2006, 2013, 2014, 2055):
+                continue
+            st.error(f"Query error: {str(e)}")
+            return None
+        except WorkloadBusy as e:
+            st.error(f"⏳ {str(e)}")
+            return None
+        except Exception as e:
+            st.error(f"Query error: {str(e)}")
             return None
-    except Exception as e:
-        st.error(f"Query error: {str(e)}")
-        return None
 
 
 def query_to_dataframe(query: str, params: Optional[Tuple] = None) -> pd.DataFrame:
@@ -90,6 +292,115 @@ def query_to_dataframe(query: str, params: Optional[Tuple] = None) -> pd.DataFra
     return pd.DataFrame()
 
 
+def execute_batch(statements: List[Tuple[str, List[Tuple]]],
+                  payload_patients: Optional[Iterable[int]] = None) -> Tuple[bool, int, str]:
+    """
+    Execute multi-row statements inside a single transaction
+    
+    Each statement goes through executemany, which PyMySQL rewrites into
+    multi-row INSERT ... VALUES batches, so a whole batch costs a few round
+    trips and one commit instead of one of each per row.
+    
+    Args:
+        statements: List of (query, rows) pairs, where rows is a list of parameter tuples
+        payload_patients: Patients whose emergency sections the statements change;
+            the per-row payload triggers are skipped and each of these payloads is
+            rebuilt once, in the same transaction
+        
+    Returns:
+        Tuple of (success: bool, affected_rows: int, message: str)
+    """
+    payload_patients = list(payload_patients or [])
+    try:
+        with _checkout() as connection:
+            try:
+                affected_rows = 0
+                with connection.cursor() as cursor:
+                    if payload_patients:
+                        cursor.execute("SET @defer_emergency_payloads = 1")
+                    for query, rows in statements:
+                        if rows:
+                            affected_rows += cursor.executemany(query, rows) or 0
+                    if payload_patients:
+                        _refresh_emergency_payloads(cursor, payload_patients)
+                
+                connection.commit()
+                return True, affected_rows, f"{affected_rows} rows written"
+                
+            except Exception:
+                # Roll back the whole batch so a failed chunk leaves no partial rows
+                try:
+                    connection.rollback()
+                except Exception:
+                    pass
+                raise
+            finally:
+                # User variables outlive the checkout on a pooled connection
+                if payload_patients:
+                    try:
+                        with connection.cursor() as cursor:
+                            cursor.execute("SET @defer_emergency_payloads = NULL")
+                    except Exception:
+                        pass
+    except Exception as e:
+        return False, 0, f"Batch write failed: {str(e)}"
+
+
+def execute_readonly(query: str, params: Optional[Tuple] = None) -> Tuple[bool, Optional[List[Dict]], str]:
+    """
+    Run an untrusted SELECT (AI Database Search) inside a read-only transaction
+    on the 'adhoc' workload class
+
+    Unlike execute_query, the error is returned instead of being shown and a
+    statement killed by its time limit is never retried.
+
+    Returns:
+        Tuple of (success: bool, rows, message: str)
+    """
+    try:
+        with _checkout('adhoc') as connection:
+            with connection.cursor() as cursor:
+                cursor.execute("START TRANSACTION READ ONLY")
+                try:
+                    # No params means no %-substitution, so LIKE '%...%' in generated SQL is safe
+                    cursor.execute(query, params or None)
+                    rows = cursor.fetchall()
+                finally:
+                    connection.rollback()
+        return True, rows, f"{len(rows)} rows"
+    except WorkloadBusy as e:
+        return False, None, str(e)
+    except pymysql.Error as e:
+        code = e.args[0] if e.args else None
+        message = e.args[1] if len(e.args) > 1 else str(e)
+        return False, None, f"MySQL error {code}: {message}"
+
+
+
+def stream_readonly(query: str, params: Optional[Tuple] = None, page_size: int = 100) -> Iterator[List[Dict]]:
+    """
+    Yield the rows of an untrusted SELECT page by page from an unbuffered cursor
+
+    Same read-only transaction and 'adhoc' workload class as execute_readonly,
+    but the first page can be shown while MySQL is still sending the rest.
+    The connection is held until the generator is exhausted or closed;
+    errors (pymysql.Error, WorkloadBusy) are raised to the consumer.
+    """
+    with _checkout('adhoc') as connection:
+        cursor = connection.cursor(pymysql.cursors.SSDictCursor)
+        try:
+            cursor.execute("START TRANSACTION READ ONLY")
+            cursor.execute(query, params or None)
+            while True:
+                rows = cursor.fetchmany(page_size)
+                if not rows:
+                    return
+                yield rows
+        finally:
+            # Closing an unbuffered cursor reads any rows left, so the connection is reusable
+            cursor.close()
+            connection.rollback()
+
 # ==================== PATIENT OPERATIONS ====================
 
 def search_patients(search_term: str = "") -> pd.DataFrame:
@@ -131,8 +442,34 @@ def license_exists(license_number: str) -> bool:
     return result[0]['count'] > 0 if result else False
 
 
+def get_patient_ids_by_license(license_numbers: List[str]) -> Dict[str, int]:
+    """
+    Resolve many license numbers to patient IDs with a single query
+    
+    Args:
+        license_numbers: License numbers to look up
+        
+    Returns:
+        Dictionary mapping license_number to patient_id (unknown licenses are omitted)
+    """
+    license_numbers = list(dict.fromkeys(ln for ln in license_numbers if ln))
+    if not license_numbers:
+        return {}
+    
+    placeholders = ", ".join(["%s"] * len(license_numbers))
+    query = f"""
+        SELECT patient_id, license_number
+        FROM Patients
+        WHERE license_number IN ({placeholders})
+    """
+    results = execute_query(query, tuple(license_numbers))
+    return {row['license_number']: row['patient_id'] for row in results} if results else {}
+
+
 def insert_patient(patient_data: Dict) -> Tuple[bool, str]:
     """Insert new patient into database"""
+    import pin_security
+    
     query = """
         INSERT INTO Patients 
         (license_number, first_name, last_name, date_of_birth, address, 
@@ -152,7 +489,7 @@ def insert_patient(patient_data: Dict) -> Tuple[bool, str]:
         patient_data.get('phone'),
         patient_data.get('email'),
         patient_data.get('blood_type'),
-        patient_data.get('pin')  # Added PIN
+        pin_security.hash_pin(patient_data['pin']) if patient_data.get('pin') else None  # Stored as a salted hash
     )
     
     try:
@@ -187,10 +524,37 @@ def add_condition(patient_id: int, condition_name: str, diagnosis_date: Optional
     try:
         result = execute_query(query, (patient_id, condition_name, diagnosis_date, 
                                       severity, notes), fetch=False)
+        invalidate_patient_record(patient_id, 'conditions')
         return (True, "Condition added successfully") if result else (False, "Failed to add condition")
     except Exception as e:
         return False, f"Error: {str(e)}"
 
+def add_conditions_bulk(patient_id: int, conditions: List[Dict]) -> Tuple[bool, str]:
+    """
+    Add several medical conditions in one transaction and one round trip
+    
+    Args:
+        patient_id: Patient's ID
+        conditions: Dictionaries with condition_name (required), diagnosis_date, severity, notes
+        
+    Returns:
+        Tuple of (success: bool, message: str)
+    """
+    rows = [(patient_id, c['condition_name'], c.get('diagnosis_date') or None,
+             c.get('severity') or None, c.get('notes') or None)
+            for c in conditions if c.get('condition_name')]
+    if not rows:
+        return False, "No conditions to add"
+    
+    query = """
+        INSERT INTO Medical_Conditions 
+        (patient_id, condition_name, diagnosis_date, severity, notes)
+        VALUES (%s, %s, %s, %s, %s)
+    """
+    success, affected_rows, message = execute_batch([(query, rows)], payload_patients=[patient_id])
+    invalidate_patient_record(patient_id, 'conditions')
+    return (True, f"{affected_rows} conditions added successfully") if success else (False, message)
+
 
 # ==================== ALLERGIES ====================
 
@@ -211,10 +575,37 @@ def add_allergy(patient_id: int, allergen: str, allergy_type: Optional[str] = No
     try:
         result = execute_query(query, (patient_id, allergen, allergy_type, 
                                       reaction, severity), fetch=False)
+        invalidate_patient_record(patient_id, 'allergies')
         return (True, "Allergy added successfully") if result else (False, "Failed to add allergy")
     except Exception as e:
         return False, f"Error: {str(e)}"
 
+def add_allergies_bulk(patient_id: int, allergies: List[Dict]) -> Tuple[bool, str]:
+    """
+    Add several allergies in one transaction and one round trip
+    
+    Args:
+        patient_id: Patient's ID
+        allergies: Dictionaries with allergen (required), allergy_type, reaction, severity
+        
+    Returns:
+        Tuple of (success: bool, message: str)
+    """
+    rows = [(patient_id, a['allergen'], a.get('allergy_type') or None,
+             a.get('reaction') or None, a.get('severity') or None)
+            for a in allergies if a.get('allergen')]
+    if not rows:
+        return False, "No allergies to add"
+    
+    query = """
+        INSERT INTO Allergies 
+        (patient_id, allergen, allergy_type, reaction, severity)
+        VALUES (%s, %s, %s, %s, %s)
+    """
+    success, affected_rows, message = execute_batch([(query, rows)], payload_patients=[patient_id])
+    invalidate_patient_record(patient_id, 'allergies')
+    return (True, f"{affected_rows} allergies added successfully") if success else (False, message)
+
 
 # ==================== MEDICATIONS ====================
 
@@ -249,10 +640,43 @@ def add_medication(patient_id: int, medication_name: str, dosage: Optional[str]
         result = execute_query(query, (patient_id, medication_name, dosage, frequency,
                                       start_date, end_date, prescribing_doctor, notes), 
                               fetch=False)
+        invalidate_patient_record(patient_id, 'medications')
         return (True, "Medication added successfully") if result else (False, "Failed to add medication")
     except Exception as e:
         return False, f"Error: {str(e)}"
 
+def add_medications_bulk(patient_id: int, medications: List[Dict]) -> Tuple[bool, str]:
+    """
+    Add a whole medication list in one transaction and one round trip
+    
+    Args:
+        patient_id: Patient's ID
+        medications: Dictionaries with medication_name (required), dosage, frequency,
+            start_date (default today), end_date, prescribing_doctor, notes
+        
+    Returns:
+        Tuple of (success: bool, message: str)
+    """
+    from datetime import datetime
+    
+    today = datetime.now().strftime('%Y-%m-%d')
+    rows = [(patient_id, m['medication_name'], m.get('dosage') or None, m.get('frequency') or None,
+             m.get('start_date') or today, m.get('end_date') or None,
+             m.get('prescribing_doctor') or None, m.get('notes') or None)
+            for m in medications if m.get('medication_name')]
+    if not rows:
+        return False, "No medications to add"
+    
+    query = """
+        INSERT INTO Medications 
+        (patient_id, medication_name, dosage, frequency, start_date, 
+         end_date, prescribing_doctor, notes)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+    """
+    success, affected_rows, message = execute_batch([(query, rows)], payload_patients=[patient_id])
+    invalidate_patient_record(patient_id, 'medications')
+    return (True, f"{affected_rows} medications added successfully") if success else (False, message)
+
 
 # ==================== VACCINATIONS ====================
 
@@ -280,6 +704,7 @@ def add_vaccination(patient_id: int, vaccine_name: str, administration_date: str
         result = execute_query(query, (patient_id, vaccine_name, administration_date,
                                       next_due_date, lot_number, administered_by), 
                               fetch=False)
+        invalidate_patient_record(patient_id, 'vaccinations')
         return (True, "Vaccination added successfully") if result else (False, "Failed to add vaccination")
     except Exception as e:
         return False, f"Error: {str(e)}"
@@ -311,6 +736,7 @@ def add_insurance(patient_id: int, provider_name: str, policy_number: str,
         result = execute_query(query, (patient_id, provider_name, policy_number,
                                       group_number, effective_date, expiration_date,
                                       1 if is_active else 0), fetch=False)
+        invalidate_patient_record(patient_id, 'insurance')
         return (True, "Insurance added successfully") if result else (False, "Failed to add insurance")
     except Exception as e:
         return False, f"Error: {str(e)}"
@@ -342,15 +768,401 @@ def add_emergency_contact(patient_id: int, contact_name: str, relationship: Opti
         result = execute_query(query, (patient_id, contact_name, relationship,
                                       phone_primary, phone_secondary, email,
                                       priority_order), fetch=False)
+        invalidate_patient_record(patient_id, 'contacts')
         return (True, "Emergency contact added successfully") if result else (False, "Failed to add contact")
     except Exception as e:
         return False, f"Error: {str(e)}"
 
+# ==================== PATIENT RECORD ====================
+
+# Patient columns carried by a PatientRecord (never pin or emergency_token)
+PATIENT_RECORD_COLUMNS = [
+    'patient_id', 'license_number', 'first_name', 'last_name', 'date_of_birth',
+    'address', 'city', 'state', 'zip_code', 'phone', 'email', 'blood_type',
+    'created_at', 'updated_at', 'last_login',
+]
+
+# Sections fetched together with the patient row: name -> (table, columns, sort column, descending).
+# The sort matches the ORDER BY of the matching get_* function.
+PATIENT_RECORD_SECTIONS = {
+    'conditions': ('Medical_Conditions',
+                   ['condition_id', 'patient_id', 'condition_name', 'diagnosis_date', 'severity',
+                    'notes', 'created_at', 'updated_at'],
+                   'diagnosis_date', True),
+    'allergies': ('Allergies',
+                  ['allergy_id', 'patient_id', 'allergen', 'allergy_type', 'reaction', 'severity',
+                   'created_at', 'updated_at'],
+                  None, False),
+    'medications': ('Medications',
+                    ['medication_id', 'patient_id', 'medication_name', 'dosage', 'frequency',
+                     'start_date', 'end_date', 'prescribing_doctor', 'notes', 'created_at', 'updated_at'],
+                    'start_date', True),
+    'contacts': ('Emergency_Contacts',
+                 ['contact_id', 'patient_id', 'contact_name', 'relationship', 'phone_primary',
+                  'phone_secondary', 'email', 'priority_order', 'created_at', 'updated_at'],
+                 'priority_order', False),
+}
+
+# Function that loads each section on its own
+PATIENT_RECORD_LOADERS = {
+    'conditions': 'get_conditions',
+    'allergies': 'get_allergies',
+    'medications': 'get_medications',
+    'vaccinations': 'get_vaccinations',
+    'insurance': 'get_insurance',
+    'contacts': 'get_emergency_contacts',
+}
+
+# JSON_OBJECT renders DATE and TIMESTAMP values as strings; these are turned back into
+# date/datetime objects so sections look the same as the get_* DataFrames
+_RECORD_DATE_COLUMNS = {'date_of_birth', 'diagnosis_date', 'start_date', 'end_date'}
+_RECORD_TIMESTAMP_COLUMNS = {'created_at', 'updated_at'}
+
+# Per-rerun memo: session_id -> {'run_marker': ..., 'records': {key: PatientRecord}}
+_record_memo: Dict[str, Dict] = {}
+_record_memo_lock = threading.Lock()
+_RECORD_MEMO_SESSIONS = 200
+
+
+def _section_subquery(name: str) -> str:
+    table, columns, _, _ = PATIENT_RECORD_SECTIONS[name]
+    fields = ', '.join(f"'{column}', s.{column}" for column in columns)
+    return (f"(SELECT JSON_ARRAYAGG(JSON_OBJECT({fields})) "
+            f"FROM {table} s WHERE s.patient_id = p.patient_id) AS {name}_json")
+
+
+def _decode_section(name: str, payload) -> pd.DataFrame:
+    """JSON array from the record query -> DataFrame shaped like the get_* result"""
+    return _section_frame(name, json.loads(payload) if payload else [])
+
+
+def _section_frame(name: str, rows: List[Dict]) -> pd.DataFrame:
+    """Section rows with dates as ISO strings -> DataFrame shaped like the get_* result"""
+    from datetime import date, datetime
+
+    _, columns, sort_column, descending = PATIENT_RECORD_SECTIONS[name]
+    if not rows:
+        return pd.DataFrame()
+
+    for row in rows:
+        for column in _RECORD_DATE_COLUMNS.intersection(row):
+            if row[column]:
+                row[column] = date.fromisoformat(row[column][:10])
+        for column in _RECORD_TIMESTAMP_COLUMNS.intersection(row):
+            if row[column]:
+                row[column] = datetime.fromisoformat(row[column])
+
+    df = pd.DataFrame(rows, columns=columns)
+    if sort_column:
+        # MySQL sorts NULL first ascending and last descending
+        df = df.sort_values(sort_column, ascending=not descending, kind='stable',
+                            na_position='last' if descending else 'first').reset_index(drop=True)
+    return df
+
+
+class PatientRecord:
+    """
+    Everything the patient-facing pages show about one patient
+
+    The patient row and the requested sections (by default conditions,
+    allergies, medications and emergency contacts) come back from a single
+    query, each section as a JSON array. Any other section, such as
+    insurance and vaccinations which only the admin manager shows, is
+    fetched with its get_* function the first time it is read.
+
+    Use get_patient_record() rather than constructing this directly, so a
+    rerun that renders the record in several places loads it once.
+    """
+
+    def __init__(self, patient: Dict, sections: Dict[str, pd.DataFrame], workload_name: Optional[str] = None):
+        self.patient = patient
+        self.patient_id = patient['patient_id']
+        self._sections = dict(sections)
+        # Records opened from an emergency scan keep loading sections as emergency reads
+        self.workload = workload_name
+
+    @classmethod
+    def load(cls, patient_id: Optional[int] = None, emergency_token: Optional[str] = None,
+             sections: Optional[List[str]] = None) -> Optional['PatientRecord']:
+        """
+        Fetch a record by patient_id or emergency token in one round trip
+
+        Args:
+            patient_id: Patient's ID
+            emergency_token: Emergency access token (used when patient_id is None)
+            sections: Sections to fetch with the patient row (default: all of PATIENT_RECORD_SECTIONS)
+
+        Returns:
+            PatientRecord, or None if no patient matches
+        """
+        if patient_id is not None:
+            where, params, workload_name = "p.patient_id = %s", (patient_id,), None
+        elif emergency_token:
+            where, params, workload_name = "p.emergency_token = %s", (emergency_token,), 'emergency'
+        else:
+            return None
+
+        joined = [name for name in (sections if sections is not None else PATIENT_RECORD_SECTIONS)
+                  if name in PATIENT_RECORD_SECTIONS]
+
+        # Token scans are answered from the clinic-local replica while it is fresh
+        replica_age = get_replica_age() if workload_name == 'emergency' else None
+        if replica_age is not None and replica_age <= EMERGENCY_REPLICA_MAX_AGE:
+            loaded = load_replica_record(emergency_token, joined)
+            if loaded:
+                return cls(loaded[0], loaded[1], workload_name)
+
+        columns = ', '.join(f"p.{column}" for column in PATIENT_RECORD_COLUMNS)
+        subqueries = ''.join(f",\n               {_section_subquery(name)}" for name in joined)
+        query = f"""
+            SELECT {columns}{subqueries}
+            FROM Patients p
+            WHERE {where}
+        """
+        with workload(workload_name):
+            results = execute_query(query, params)
+        if results is None and replica_age is not None:
+            # MySQL unreachable: a stale replica is better than no answer
+            loaded = load_replica_record(emergency_token, joined)
+            if loaded:
+                return cls(loaded[0], loaded[1], workload_name)
+        if not results:
+            return None
+
+        row = dict(results[0])
+        loaded = {name: _decode_section(name, row.pop(f"{name}_json")) for name in joined}
+        return cls(row, loaded, workload_name)
+
+    def section(self, name: str) -> pd.DataFrame:
+        """A section's rows, querying its table only if it is not loaded yet"""
+        if name not in self._sections:
+            with workload(self.workload):
+                self._sections[name] = globals()[PATIENT_RECORD_LOADERS[name]](self.patient_id)
+        return self._sections[name]
+
+    def invalidate(self, name: str):
+        """Forget a section so the next read re-queries just that table"""
+        self._sections.pop(name, None)
+
+    @property
+    def conditions(self) -> pd.DataFrame:
+        return self.section('conditions')
+
+    @property
+    def allergies(self) -> pd.DataFrame:
+        return self.section('allergies')
+
+    @property
+    def medications(self) -> pd.DataFrame:
+        return self.section('medications')
+
+    @property
+    def vaccinations(self) -> pd.DataFrame:
+        return self.section('vaccinations')
+
+    @property
+    def insurance(self) -> pd.DataFrame:
+        return self.section('insurance')
+
+    @property
+    def contacts(self) -> pd.DataFrame:
+        return self.section('contacts')
+
+
+def _current_record_memo() -> Optional[Dict]:
+    """
+    PatientRecords loaded during the rerun executing on this thread, or None outside a script run
+
+    Same rerun detection as query_profiler: the ScriptRunContext gets a new
+    `cursors` dict at the start of every run.
+    """
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+    ctx = get_script_run_ctx()
+    if ctx is None:
+        return None
+
+    with _record_memo_lock:
+        memo = _record_memo.get(ctx.session_id)
+        if memo is None or memo['run_marker'] is not ctx.cursors:
+            _record_memo.pop(ctx.session_id, None)
+            memo = {'run_marker': ctx.cursors, 'records': {}}
+            _record_memo[ctx.session_id] = memo
+            while len(_record_memo) > _RECORD_MEMO_SESSIONS:
+                _record_memo.pop(next(iter(_record_memo)))
+        return memo['records']
+
+
+def get_patient_record(patient_id: Optional[int] = None, emergency_token: Optional[str] = None,
+                       sections: Optional[List[str]] = None) -> Optional[PatientRecord]:
+    """
+    Get a patient's record, loading it at most once per rerun
+
+    Args:
+        patient_id: Patient's ID
+        emergency_token: Emergency access token from QR code (used when patient_id is None)
+        sections: Sections to fetch up front (default: all of PATIENT_RECORD_SECTIONS);
+            others are queried on first read
+
+    Returns:
+        PatientRecord or None if the patient does not exist
+    """
+    key = ('id', patient_id) if patient_id is not None else ('token', emergency_token)
+    records = _current_record_memo()
+    if records is not None and key in records:
+        return records[key]
+
+    record = PatientRecord.load(patient_id, emergency_token, sections)
+    if records is not None and record is not None:
+        records[key] = record
+        records[('id', record.patient_id)] = record
+    return record
+
+
+def invalidate_patient_record(patient_id: int, section: Optional[str] = None):
+    """
+    Drop this rerun's memoized data for a patient after a write
+
+    Args:
+        patient_id: Patient's ID
+        section: Section that was written (only its table is re-queried); None drops the whole record
+    """
+    records = _current_record_memo()
+    if not records:
+        return
+    for key, record in list(records.items()):
+        if record.patient_id == patient_id:
+            if section:
+                record.invalidate(section)
+            else:
+                del records[key]
+
+
+# ==================== EMERGENCY REPLICA ====================
+# SQLite copy of the emergency-critical tables kept on the clinic machine by
+# emergency_replica.py, so token scans keep working (and answer locally) when
+# the WAN link to the database is slow or down.
+
+EMERGENCY_REPLICA_PATH = os.environ.get('MIAS_EMERGENCY_REPLICA')
+
+# Seconds since the last completed sync after which the replica is only used if MySQL fails
+EMERGENCY_REPLICA_MAX_AGE = int(os.environ.get('MIAS_EMERGENCY_REPLICA_MAX_AGE', 300))
+
+# Record sections copied to the replica; other sections load from MySQL when read
+EMERGENCY_REPLICA_SECTIONS = ['conditions', 'allergies', 'medications', 'contacts']
+
+# SQLite connections cannot be shared between threads (one per Streamlit session thread)
+_replica_local = threading.local()
+
+
+def _replica_connection():
+    """Read-only connection to the replica for this thread, or None if there is no replica"""
+    import sqlite3
+
+    if not EMERGENCY_REPLICA_PATH:
+        return None
+    connection = getattr(_replica_local, 'connection', None)
+    if connection is None:
+        try:
+            connection = sqlite3.connect(f"file:{EMERGENCY_REPLICA_PATH}?mode=ro", uri=True)
+            connection.row_factory = sqlite3.Row
+        except sqlite3.Error:
+            return None
+        _replica_local.connection = connection
+    return connection
+
+
+def get_replica_age() -> Optional[float]:
+    """Seconds since the emergency replica last finished a sync, or None if there is no usable replica"""
+    import sqlite3
+
+    connection = _replica_connection()
+    if connection is None:
+        return None
+    try:
+        row = connection.execute("SELECT value FROM Replica_State WHERE key = 'synced_at'").fetchone()
+    except sqlite3.Error:
+        return None
+    return time.time() - float(row['value']) if row else None
+
+
+def load_replica_record(emergency_token: str, sections: List[str]) -> Optional[Tuple[Dict, Dict[str, pd.DataFrame]]]:
+    """
+    Patient row and sections for an emergency token, read from the replica
+
+    Returns:
+        (patient, sections) shaped like a PatientRecord loaded from MySQL, or None
+        if the token is not in the replica; sections the replica does not hold
+        are left to load from MySQL
+    """
+    import sqlite3
+    from datetime import date, datetime
+
+    connection = _replica_connection()
+    if connection is None or not emergency_token:
+        return None
+    try:
+        columns = ', '.join(PATIENT_RECORD_COLUMNS)
+        row = connection.execute(f"SELECT {columns} FROM Patients WHERE emergency_token = ?",
+                                 (emergency_token,)).fetchone()
+        if row is None:
+            return None
+        patient = dict(row)
+        loaded = {}
+        for name in sections:
+            if name in EMERGENCY_REPLICA_SECTIONS:
+                table, section_columns, _, _ = PATIENT_RECORD_SECTIONS[name]
+                rows = connection.execute(
+                    f"SELECT {', '.join(section_columns)} FROM {table} WHERE patient_id = ?",
+                    (patient['patient_id'],)
+                ).fetchall()
+                loaded[name] = _section_frame(name, [dict(r) for r in rows])
+    except sqlite3.Error:
+        return None
+
+    if patient.get('date_of_birth'):
+        patient['date_of_birth'] = date.fromisoformat(patient['date_of_birth'][:10])
+    for column in ('created_at', 'updated_at', 'last_login'):
+        if patient.get(column):
+            patient[column] = datetime.fromisoformat(patient[column])
+    return patient, loaded
+
 
 # ==================== ANALYTICS ====================
 
+# Directory of the Parquet analytics snapshot (see analytics_snapshot.py).
+# When set, dashboard aggregates run on the snapshot instead of MySQL.
+ANALYTICS_SNAPSHOT_DIR = os.environ.get('MIAS_ANALYTICS_SNAPSHOT_DIR')
+
+
+@st.cache_resource
+def get_snapshot_analytics():
+    """Get the analytics snapshot backend (cached by Streamlit), or None to use MySQL"""
+    if not ANALYTICS_SNAPSHOT_DIR:
+        return None
+    try:
+        import analytics_snapshot
+        return analytics_snapshot.SnapshotAnalytics(ANALYTICS_SNAPSHOT_DIR)
+    except Exception as e:
+        st.warning(f"Analytics snapshot unavailable, using live database: {str(e)}")
+        return None
+
+
+def get_analytics_source() -> str:
+    """Describe where the analytics figures come from (for dashboard captions)"""
+    snapshot = get_snapshot_analytics()
+    if snapshot:
+        return f"Analytics snapshot, refreshed {snapshot.refreshed_at() or 'never'}"
+    return "Live database"
+
+
+@_in_workload('analytics')
 def get_summary_stats() -> Dict:
     """Get system summary statistics"""
+    snapshot = get_snapshot_analytics()
+    if snapshot:
+        return snapshot.get_summary_stats()
+    
     queries = {
         'total_patients': "SELECT COUNT(*) as count FROM Patients",
         'total_conditions': "SELECT COUNT(*) as count FROM Medical_Conditions",
@@ -373,8 +1185,13 @@ def get_summary_stats() -> Dict:
     return stats
 
 
+@_in_workload('analytics')
 def get_vaccination_data() -> pd.DataFrame:
     """Get vaccination coverage statistics"""
+    snapshot = get_snapshot_analytics()
+    if snapshot:
+        return snapshot.get_vaccination_data()
+    
     query = """
         SELECT 
             vaccine_name,
@@ -389,8 +1206,13 @@ def get_vaccination_data() -> pd.DataFrame:
     return query_to_dataframe(query)
 
 
+@_in_workload('analytics')
 def get_patient_demographics() -> pd.DataFrame:
     """Get patient demographics"""
+    snapshot = get_snapshot_analytics()
+    if snapshot:
+        return snapshot.get_patient_demographics()
+    
     query = """
         SELECT 
             patient_id,
@@ -402,8 +1224,13 @@ def get_patient_demographics() -> pd.DataFrame:
     return query_to_dataframe(query)
 
 
+@_in_workload('analytics')
 def get_medication_stats() -> pd.DataFrame:
     """Get medication statistics"""
+    snapshot = get_snapshot_analytics()
+    if snapshot:
+        return snapshot.get_medication_stats()
+    
     query = """
         SELECT 
             medication_name,
@@ -417,8 +1244,13 @@ def get_medication_stats() -> pd.DataFrame:
     return query_to_dataframe(query)
 
 
+@_in_workload('analytics')
 def get_allergy_stats() -> pd.DataFrame:
     """Get allergy severity distribution"""
+    snapshot = get_snapshot_analytics()
+    if snapshot:
+        return snapshot.get_allergy_stats()
+    
     query = """
         SELECT 
             severity,
@@ -434,8 +1266,13 @@ def get_allergy_stats() -> pd.DataFrame:
     return query_to_dataframe(query)
 
 
+@_in_workload('analytics')
 def get_state_distribution() -> pd.DataFrame:
     """Get geographic distribution"""
+    snapshot = get_snapshot_analytics()
+    if snapshot:
+        return snapshot.get_state_distribution()
+    
     query = """
         SELECT 
             state,
@@ -448,8 +1285,13 @@ def get_state_distribution() -> pd.DataFrame:
     return query_to_dataframe(query)
 
 
+@_in_workload('analytics')
 def get_blood_type_distribution() -> pd.DataFrame:
     """Get blood type distribution"""
+    snapshot = get_snapshot_analytics()
+    if snapshot:
+        return snapshot.get_blood_type_distribution()
+    
     query = """
         SELECT 
             blood_type,
@@ -583,74 +1425,77 @@ def delete_patient(patient_id: int) -> Tuple[bool, str]:
         Tuple of (success: bool, message: str)
     """
     try:
-        connection = get_connection()
-        if not connection:
-            return False, "Database connection failed"
-        
-        with connection.cursor() as cursor:
-            try:
-                # Get patient info for confirmation message
-                cursor.execute("SELECT first_name, last_name, license_number FROM Patients WHERE patient_id = %s", (patient_id,))
-                patient = cursor.fetchone()
-                
-                if not patient:
-                    return False, f"Patient ID {patient_id} not found"
-                
-                patient_name = f"{patient['first_name']} {patient['last_name']}"
-                license_num = patient['license_number']
-                
-                # Temporarily disable foreign key checks to allow deletion
-                cursor.execute("SET FOREIGN_KEY_CHECKS = 0")
-                
-                # Delete related records - wrapped in try/except to handle missing tables gracefully
-                tables_to_clean = [
-                    "Medical_Conditions",
-                    "Allergies", 
-                    "Medications",
-                    "vaccination_history",
-                    "emergency_contacts",
-                    "Insurance",
-                    "Provider_Access",
-                    "Access_Log",
-                    "medical_profiles",
-                    "Vaccinations",
-                    "Healthcare_Providers",
-                    "authorized_providers",
-                    "driver_licenses",
-                    "addresses"
-                ]
-                
-                for table in tables_to_clean:
+        with _checkout() as connection:
+            with connection.cursor() as cursor:
+                try:
+                    # Get patient info for confirmation message
+                    cursor.execute("SELECT first_name, last_name, license_number FROM Patients WHERE patient_id = %s", (patient_id,))
+                    patient = cursor.fetchone()
+                    
+                    if not patient:
+                        return False, f"Patient ID {patient_id} not found"
+                    
+                    patient_name = f"{patient['first_name']} {patient['last_name']}"
+                    license_num = patient['license_number']
+                    
+                    # Temporarily disable foreign key checks to allow deletion, and the
+                    # per-row payload rebuilds (the payload is deleted below)
+                    cursor.execute("SET FOREIGN_KEY_CHECKS = 0, @defer_emergency_payloads = 1")
+                    
+                    # Delete related records - wrapped in try/except to handle missing tables gracefully
+                    tables_to_clean = [
+                        "Medical_Conditions",
+                        "Allergies", 
+                        "Medications",
+                        "vaccination_history",
+                        "emergency_contacts",
+                        "Emergency_Contacts",
+                        "Insurance",
+                        "Provider_Access",
+                        "Access_Log",
+                        "medical_profiles",
+                        "Vaccinations",
+                        "Healthcare_Providers",
+                        "authorized_providers",
+                        "driver_licenses",
+                        "addresses",
+                        # After the sections, in case their delete triggers rebuild it
+                        # (migrations older than the @defer_emergency_payloads check)
+                        "Emergency_Payloads"
+                    ]
+                    
+                    for table in tables_to_clean:
+                        try:
+                            cursor.execute(f"DELETE FROM {table} WHERE patient_id = %s", (patient_id,))
+                        except Exception as table_error:
+                            # Table might not exist or might use different column name
+                            pass
+                    
+                    # Finally, delete the patient record itself
+                    cursor.execute("DELETE FROM Patients WHERE patient_id = %s", (patient_id,))
+                    affected_rows = cursor.rowcount
+                    
+                    # Re-enable foreign key checks and payload triggers
+                    cursor.execute("SET FOREIGN_KEY_CHECKS = 1, @defer_emergency_payloads = NULL")
+                    
+                    # Commit transaction
+                    connection.commit()
+                    invalidate_patient_record(patient_id)
+                    
+                    if affected_rows > 0:
+                        return True, f"Successfully deleted patient: {patient_name} (License: {license_num})"
+                    else:
+                        return False, "Patient record not found or already deleted"
+                    
+                except Exception as e:
+                    # Make sure to re-enable foreign key checks even on error
                     try:
-                        cursor.execute(f"DELETE FROM {table} WHERE patient_id = %s", (patient_id,))
-                    except Exception as table_error:
-                        # Table might not exist or might use different column name
+                        cursor.execute("SET FOREIGN_KEY_CHECKS = 1, @defer_emergency_payloads = NULL")
+                    except:
                         pass
-                
-                # Finally, delete the patient record itself
-                cursor.execute("DELETE FROM Patients WHERE patient_id = %s", (patient_id,))
-                affected_rows = cursor.rowcount
-                
-                # Re-enable foreign key checks
-                cursor.execute("SET FOREIGN_KEY_CHECKS = 1")
-                
-                # Commit transaction
-                connection.commit()
-                
-                if affected_rows > 0:
-                    return True, f"Successfully deleted patient: {patient_name} (License: {license_num})"
-                else:
-                    return False, "Patient record not found or already deleted"
-                
-            except Exception as e:
-                # Make sure to re-enable foreign key checks even on error
-                try:
-                    cursor.execute("SET FOREIGN_KEY_CHECKS = 1")
-                except:
-                    pass
-                # Rollback on error
-                connection.rollback()
-                return False, f"Error during deletion: {str(e)}"
+                    # Rollback on error
+                    connection.rollback()
+                    return False, f"Error during deletion: {str(e)}"
                 
     except Exception as e:
         return False, f"Database error: {str(e)}"
@@ -660,48 +1505,152 @@ def delete_patient(patient_id: int) -> Tuple[bool, str]:
 # PATIENT PORTAL AUTHENTICATION FUNCTIONS
 # ============================================================================
 
-def authenticate_patient(license_number: str, pin: str) -> Tuple[bool, Optional[int], str]:
+def login_patient(license_number: str, pin: str,
+                  client: Optional[str] = None) -> Tuple[bool, Optional[Dict], str]:
     """
-    Authenticate patient using license number and PIN
+    Authenticate a patient and return the profile the portal session carries
+    
+    Attempts are throttled in memory per license number and per client
+    (see pin_security.LoginThrottle), so brute-force attempts are turned
+    away without a database round trip. The last_login update is queued
+    (see record_login) rather than written immediately.
     
     Args:
         license_number: Patient's driver's license number
         pin: Patient's 4-digit PIN
+        client: Client identity for rate limiting (pin_security.client_key())
         
     Returns:
-        Tuple of (success: bool, patient_id: int or None, message: str)
+        Tuple of (success: bool, patient: dict or None, message: str);
+        patient holds patient_id and the session_tokens.PROFILE_FIELDS columns
     """
+    import pin_security
+    
+    allowed, message = pin_security.throttle.check(license_number, client)
+    if not allowed:
+        return False, None, message
+    
     try:
         query = """
-            SELECT patient_id, first_name, last_name, pin
+            SELECT patient_id, license_number, first_name, last_name, date_of_birth,
+                   address, city, state, zip_code, phone, email, blood_type, last_login, pin
             FROM Patients
             WHERE license_number = %s
         """
         results = execute_query(query, (license_number,))
         
         if not results or len(results) == 0:
+            pin_security.throttle.record_failure(license_number)
             return False, None, "License number not found"
         
-        patient = results[0]
+        patient = dict(results[0])
+        stored_pin = patient.pop('pin')
         
-        # Check PIN
-        if patient['pin'] == pin:
-            # Update last login time
-            update_query = """
-                UPDATE Patients 
-                SET last_login = NOW()
-                WHERE patient_id = %s
-            """
-            execute_query(update_query, (patient['patient_id'],), fetch=False)
+        # Check PIN (salted hash, or a legacy plaintext PIN that is upgraded below)
+        matches, needs_rehash = pin_security.verify_pin(pin, stored_pin)
+        if matches:
+            pin_security.throttle.record_success(license_number)
+            
+            # Store the PIN hash if it was plaintext or weak
+            if needs_rehash:
+                update_query = """
+                    UPDATE Patients 
+                    SET pin = %s
+                    WHERE patient_id = %s
+                """
+                execute_query(update_query, (pin_security.hash_pin(pin), patient['patient_id']), fetch=False)
             
-            return True, patient['patient_id'], f"Welcome, {patient['first_name']}!"
+            record_login(patient['patient_id'])
+            return True, patient, f"Welcome, {patient['first_name']}!"
         else:
+            pin_security.throttle.record_failure(license_number)
             return False, None, "Incorrect PIN"
             
     except Exception as e:
         return False, None, f"Authentication error: {str(e)}"
 
 
+def authenticate_patient(license_number: str, pin: str,
+                         client: Optional[str] = None) -> Tuple[bool, Optional[int], str]:
+    """
+    Authenticate patient using license number and PIN
+    
+    Args:
+        license_number: Patient's driver's license number
+        pin: Patient's 4-digit PIN
+        client: Client identity for rate limiting (pin_security.client_key())
+        
+    Returns:
+        Tuple of (success: bool, patient_id: int or None, message: str)
+    """
+    success, patient, message = login_patient(license_number, pin, client)
+    return success, patient['patient_id'] if patient else None, message
+
+
+# Logins are queued in memory and written to Patients.last_login in one statement
+# every LAST_LOGIN_FLUSH_SECONDS, instead of one UPDATE and commit per login
+LAST_LOGIN_FLUSH_SECONDS = 30
+_pending_logins: Dict[int, str] = {}
+_pending_logins_lock = threading.Lock()
+_last_login_timer = None
+
+
+def record_login(patient_id: int):
+    """Queue a last_login update for the next flush"""
+    from datetime import datetime, timezone
+    
+    # UTC here; the flush converts it to the session time zone NOW() uses for every other timestamp
+    logged_in_at = datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+    with _pending_logins_lock:
+        _pending_logins[patient_id] = logged_in_at
+        _schedule_login_flush()
+
+
+def _schedule_login_flush():
+    """Start the flush timer if none is pending (caller holds _pending_logins_lock)"""
+    global _last_login_timer
+    if _last_login_timer is None:
+        _last_login_timer = threading.Timer(LAST_LOGIN_FLUSH_SECONDS, flush_last_logins)
+        _last_login_timer.daemon = True
+        _last_login_timer.start()
+
+
+def flush_last_logins() -> int:
+    """
+    Write all queued last_login values in a single UPDATE
+    
+    Returns:
+        Number of patients written (0 if nothing was queued or the write failed)
+    """
+    global _last_login_timer
+    with _pending_logins_lock:
+        pending = dict(_pending_logins)
+        _pending_logins.clear()
+        _last_login_timer = None
+    if not pending:
+        return 0
+    
+    cases = ' '.join(["WHEN %s THEN CONVERT_TZ(%s, '+00:00', @@session.time_zone)"] * len(pending))
+    placeholders = ', '.join(['%s'] * len(pending))
+    query = f"""
+        UPDATE Patients
+        SET last_login = CASE patient_id {cases} END
+        WHERE patient_id IN ({placeholders})
+    """
+    params = tuple(value for item in pending.items() for value in item) + tuple(pending)
+    if execute_query(query, params, fetch=False) is None:
+        # Put the logins back (newer ones queued meanwhile win) for the next flush
+        with _pending_logins_lock:
+            for patient_id, logged_in_at in pending.items():
+                _pending_logins.setdefault(patient_id, logged_in_at)
+            _schedule_login_flush()
+        return 0
+    return len(pending)
+
+
+atexit.register(flush_last_logins)
+
+
 def reset_patient_pin(patient_id: int, new_pin: str) -> Tuple[bool, str]:
     """
     Reset patient's PIN (admin function)
@@ -713,6 +1662,8 @@ def reset_patient_pin(patient_id: int, new_pin: str) -> Tuple[bool, str]:
     Returns:
         Tuple of (success: bool, message: str)
     """
+    import pin_security
+    
     try:
         # Validate PIN format
         if not new_pin.isdigit() or len(new_pin) != 4:
@@ -723,7 +1674,7 @@ def reset_patient_pin(patient_id: int, new_pin: str) -> Tuple[bool, str]:
             SET pin = %s
             WHERE patient_id = %s
         """
-        result = execute_query(query, (new_pin, patient_id), fetch=False)
+        result = execute_query(query, (pin_security.hash_pin(new_pin), patient_id), fetch=False)
         
         if result and result > 0:
             return True, "PIN reset successfully"
@@ -781,6 +1732,7 @@ def update_patient_medical_info(patient_id: int, field: str, value: str) -> Tupl
             WHERE patient_id = %s
         """
         result = execute_query(query, (value, patient_id), fetch=False)
+        invalidate_patient_record(patient_id)
         
         if result and result > 0:
             return True, f"{field.replace('_', ' ').title()} updated successfully"
@@ -821,6 +1773,7 @@ def save_emergency_token(patient_id: int, emergency_token: str) -> Tuple[bool, s
         return False, f"Error saving emergency token: {str(e)}"
 
 
+@_in_workload('emergency')
 def get_patient_by_emergency_token(emergency_token: str) -> Optional[Dict]:
     """
     Get patient information using emergency access token
@@ -840,6 +1793,7 @@ def get_patient_by_emergency_token(emergency_token: str) -> Optional[Dict]:
     return results[0] if results else None
 
 
+@_in_workload('emergency')
 def log_emergency_access(patient_id: int, emergency_token: str) -> Tuple[bool, str]:
     """
     Log emergency access to patient record
@@ -904,6 +1858,7 @@ def calculate_age(date_of_birth: str) -> int:
         return 0
 
 
+@_in_workload('emergency')
 def get_patient_emergency_summary(patient_id: int) -> Dict:
     """
     Get complete emergency summary for a patient
@@ -954,6 +1909,7 @@ def save_emergency_token(patient_id: int, emergency_token: str) -> Tuple[bool, s
         return False, f"Error saving emergency token: {str(e)}"
 
 
+@_in_workload('emergency')
 def get_patient_by_emergency_token(emergency_token: str) -> Optional[Dict]:
     """
     Get patient information using emergency access token
@@ -973,6 +1929,7 @@ def get_patient_by_emergency_token(emergency_token: str) -> Optional[Dict]:
     return results[0] if results else None
 
 
+@_in_workload('emergency')
 def log_emergency_access(patient_id: int, emergency_token: str) -> Tuple[bool, str]:
     """
     Log emergency access to patient record
@@ -1017,3 +1974,243 @@ def log_emergency_access(patient_id: int, emergency_token: str) -> Tuple[bool, s
         return False, f"Error logging emergency access: {str(e)}"
     
     return summary
+
+
+# ============================================================================
+# MATERIALIZED EMERGENCY PAYLOADS
+# ============================================================================
+# Emergency_Payloads holds each patient's emergency API response as ready-to-send
+# JSON, rebuilt by triggers whenever the data in it changes
+# (see emergency_payload_migration.sql).
+
+# Tables whose rows are part of the payload; batch writes to them rebuild each touched
+# patient's payload once (execute_batch payload_patients) instead of once per row
+EMERGENCY_PAYLOAD_TABLES = ('Patients', 'Medical_Conditions', 'Allergies', 'Medications', 'Emergency_Contacts')
+
+
+def _refresh_emergency_payloads(cursor, patient_ids: Iterable[int]):
+    """
+    Rebuild the Emergency_Payloads row of each patient once (emergency_payload_migration.sql)
+    
+    Used after writes made with @defer_emergency_payloads set, which the row
+    triggers skip. Does nothing on a database without the migration.
+    """
+    for patient_id in sorted(set(patient_ids)):
+        try:
+            cursor.execute("CALL Refresh_Emergency_Payload(%s)", (patient_id,))
+        except pymysql.Error as e:
+            # 1305: no such procedure, so there are no payload triggers either
+            if e.args and e.args[0] == 1305:
+                return
+            raise
+
+
+def emergency_token_digest(emergency_token: str) -> bytes:
+    """Key of a token's Emergency_Payloads row (the triggers store UNHEX(SHA2(token, 256)))"""
+    return hashlib.sha256(emergency_token.encode('utf-8')).digest()
+
+
+def get_emergency_payload(emergency_token: str) -> Optional[Tuple[int, bytes]]:
+    """
+    Prebuilt emergency API response for a token, in one indexed single-row read
+    
+    Args:
+        emergency_token: Emergency access token from QR code
+        
+    Returns:
+        Tuple of (patient_id, UTF-8 JSON bytes), or None if there is no payload
+        for the token, the table cannot be read, or a fresh emergency replica
+        is available; callers then build the response from get_patient_record()
+    """
+    # A fresh clinic-local replica answers locally (PatientRecord.load), without
+    # waiting on a MySQL connection that may be down
+    replica_age = get_replica_age()
+    if replica_age is not None and replica_age <= EMERGENCY_REPLICA_MAX_AGE:
+        return None
+    try:
+        with _checkout('emergency') as connection:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT patient_id, payload FROM Emergency_Payloads WHERE token_digest = %s",
+                    (emergency_token_digest(emergency_token),)
+                )
+                row = cursor.fetchone()
+    except (pymysql.Error, WorkloadBusy):
+        return None
+    return (row['patient_id'], bytes(row['payload'])) if row else None
+
+
+# ============================================================================
+# CHANGE FEED (INCREMENTAL SYNC)
+# ============================================================================
+
+# Tables covered by the change feed: table -> (primary key, change timestamp column)
+CHANGE_FEED_TABLES = {
+    'Patients': ('patient_id', 'updated_at'),
+    'Medical_Conditions': ('condition_id', 'updated_at'),
+    'Allergies': ('allergy_id', 'updated_at'),
+    'Medications': ('medication_id', 'updated_at'),
+    'Vaccinations': ('vaccination_id', 'updated_at'),
+    'Insurance': ('insurance_id', 'updated_at'),
+    'Emergency_Contacts': ('contact_id', 'updated_at'),
+    'Healthcare_Providers': ('provider_id', 'updated_at'),
+    'Provider_Access': ('access_id', 'updated_at'),
+    'Access_Log': ('log_id', 'access_timestamp'),
+}
+
+# Columns never published through the feed
+CHANGE_FEED_EXCLUDED_COLUMNS = {'pin'}
+
+# Rows younger than this are left for the next poll. TIMESTAMP columns have
+# one-second resolution and a transaction can commit after its rows were
+# stamped, so reading right up to NOW() could skip late commits.
+CHANGE_FEED_LAG_SECONDS = 2
+
+CHANGE_FEED_EPOCH = '1970-01-02 00:00:00'
+
+
+def encode_change_cursor(position: Dict) -> str:
+    """Encode a change feed position as an opaque URL-safe string"""
+    payload = json.dumps(position, separators=(',', ':'), sort_keys=True).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip('=')
+
+
+def decode_change_cursor(cursor: Optional[str]) -> Dict:
+    """
+    Decode an opaque change feed cursor
+    
+    Args:
+        cursor: Cursor returned by a previous get_changes() call, or None to start from the beginning
+        
+    Returns:
+        Position dictionary: {'v': 1, 'tables': {table: [timestamp, pk]}, 'tombstone': id}
+    """
+    if not cursor:
+        return {'v': 1, 'tables': {}, 'tombstone': 0}
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        position = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if position.get('v') != 1:
+            raise ValueError("unsupported cursor version")
+        return position
+    except Exception as e:
+        raise ValueError(f"Invalid change feed cursor: {str(e)}")
+
+
+def get_changes(cursor: Optional[str] = None, limit: int = 1000,
+                tables: Optional[List[str]] = None) -> Dict:
+    """
+    Get rows inserted, updated or deleted since a change feed cursor
+    
+    Each table is scanned by its (updated_at, primary key) index from the
+    cursor position, and deletes come from the Change_Tombstones log, so a
+    poll costs O(changes) rather than a full re-read. Pass the returned
+    cursor to the next call; keep polling while has_more is True.
+    
+    Args:
+        cursor: Opaque cursor from the previous call (None for a full initial sync)
+        limit: Maximum rows returned per table (and tombstones) in this call
+        tables: Tables to scan (default: all of CHANGE_FEED_TABLES); positions of
+            other tables are carried over unchanged in the returned cursor
+        
+    Returns:
+        Dictionary with:
+            upserts: {table: [row dicts]} ordered by change time
+            deletes: [{table_name, record_id, patient_id, deleted_at}]
+            cursor: cursor to resume from
+            has_more: True if any table hit the limit
+    """
+    position = decode_change_cursor(cursor)
+    positions = dict(position.get('tables', {}))
+    has_more = False
+    upserts = {}
+    
+    for table, (primary_key, changed_column) in CHANGE_FEED_TABLES.items():
+        if tables is not None and table not in tables:
+            continue
+        since, last_pk = positions.get(table, [CHANGE_FEED_EPOCH, 0])
+        query = f"""
+            SELECT *
+            FROM {table}
+            WHERE ({changed_column} > %s OR ({changed_column} = %s AND {primary_key} > %s))
+              AND {changed_column} < NOW() - INTERVAL %s SECOND
+            ORDER BY {changed_column}, {primary_key}
+            LIMIT %s
+        """
+        rows = execute_query(query, (since, since, last_pk, CHANGE_FEED_LAG_SECONDS, limit)) or []
+        
+        if rows:
+            last = rows[-1]
+            positions[table] = [str(last[changed_column]), last[primary_key]]
+            upserts[table] = [
+                {k: v for k, v in row.items() if k not in CHANGE_FEED_EXCLUDED_COLUMNS}
+                for row in rows
+            ]
+            has_more = has_more or len(rows) >= limit
+    
+    tombstone_query = """
+        SELECT tombstone_id, table_name, record_id, patient_id, deleted_at
+        FROM Change_Tombstones
+        WHERE tombstone_id > %s
+          AND deleted_at < NOW() - INTERVAL %s SECOND
+        ORDER BY tombstone_id
+        LIMIT %s
+    """
+    deletes = execute_query(tombstone_query, (position.get('tombstone', 0),
+                                              CHANGE_FEED_LAG_SECONDS, limit)) or []
+    tombstone = deletes[-1]['tombstone_id'] if deletes else position.get('tombstone', 0)
+    has_more = has_more or len(deletes) >= limit
+    
+    return {
+        'upserts': upserts,
+        'deletes': list(deletes),
+        'cursor': encode_change_cursor({'v': 1, 'tables': positions, 'tombstone': tombstone}),
+        'has_more': has_more
+    }
+
+
+def get_data_version() -> Optional[Dict]:
+    """
+    Stamp that changes whenever any change feed table is written
+    
+    Combines the newest change timestamp across CHANGE_FEED_TABLES with the
+    newest tombstone id (deletes), each read from an index in one round trip.
+    Used to tell whether a cached query result can still be served.
+    
+    Returns:
+        Dictionary with:
+            version: opaque stamp, equal only while no data has changed
+            settled: False if the newest change is younger than
+                CHANGE_FEED_LAG_SECONDS; a write later in the same second would
+                not move the stamp, so results read now should not be cached
+        or None if the database could not be reached
+    """
+    newest = ', '.join(f"COALESCE((SELECT MAX({changed_column}) FROM {table}), '{CHANGE_FEED_EPOCH}')"
+                       for table, (_, changed_column) in CHANGE_FEED_TABLES.items())
+    query = f"""
+        SELECT GREATEST({newest}) AS changed_at,
+               (SELECT COALESCE(MAX(tombstone_id), 0) FROM Change_Tombstones) AS tombstone,
+               NOW() - INTERVAL %s SECOND AS settled_before
+    """
+    rows = execute_query(query, (CHANGE_FEED_LAG_SECONDS,))
+    if not rows:
+        return None
+    row = rows[0]
+    return {
+        'version': f"{row['changed_at']}|{row['tombstone']}",
+        'settled': str(row['changed_at']) < str(row['settled_before'])
+    }
+
+
+# ============================================================================
+# DEVELOPER MODE
+# ============================================================================
+
+# Record every call made during a Streamlit rerun for the query panel (see query_profiler.py)
+if os.environ.get('MIAS_DEV_MODE'):
+    try:
+        import sys
+        import query_profiler
+        query_profiler.install(sys.modules[__name__])
+    except ImportError:
+        pass
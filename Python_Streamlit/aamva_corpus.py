@@ -0,0 +1,304 @@
+"""
+AAMVA Barcode Corpus Generator
+License to Live: MIAS - Python/Streamlit Version
+Deterministically generates valid AAMVA PDF417 payloads for every jurisdiction IIN and
+standard version 01-10, plus the scanner-mangled variants seen from keyboard-wedge scanners
+"""
+
+import random
+import string
+from datetime import date, timedelta
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# Issuer Identification Numbers assigned by AAMVA: jurisdiction -> (IIN, country)
+JURISDICTIONS = {
+    'AL': ('636033', 'USA'), 'AK': ('636059', 'USA'), 'AZ': ('636026', 'USA'), 'AR': ('636021', 'USA'),
+    'CA': ('636014', 'USA'), 'CO': ('636020', 'USA'), 'CT': ('636006', 'USA'), 'DE': ('636011', 'USA'),
+    'DC': ('636043', 'USA'), 'FL': ('636010', 'USA'), 'GA': ('636055', 'USA'), 'HI': ('636047', 'USA'),
+    'ID': ('636050', 'USA'), 'IL': ('636035', 'USA'), 'IN': ('636037', 'USA'), 'IA': ('636018', 'USA'),
+    'KS': ('636022', 'USA'), 'KY': ('636046', 'USA'), 'LA': ('636007', 'USA'), 'ME': ('636041', 'USA'),
+    'MD': ('636003', 'USA'), 'MA': ('636002', 'USA'), 'MI': ('636032', 'USA'), 'MN': ('636038', 'USA'),
+    'MS': ('636051', 'USA'), 'MO': ('636030', 'USA'), 'MT': ('636008', 'USA'), 'NE': ('636054', 'USA'),
+    'NV': ('636049', 'USA'), 'NH': ('636039', 'USA'), 'NJ': ('636036', 'USA'), 'NM': ('636009', 'USA'),
+    'NY': ('636001', 'USA'), 'NC': ('636004', 'USA'), 'ND': ('636034', 'USA'), 'OH': ('636023', 'USA'),
+    'OK': ('636058', 'USA'), 'OR': ('636029', 'USA'), 'PA': ('636025', 'USA'), 'RI': ('636052', 'USA'),
+    'SC': ('636005', 'USA'), 'SD': ('636042', 'USA'), 'TN': ('636053', 'USA'), 'TX': ('636015', 'USA'),
+    'UT': ('636040', 'USA'), 'VT': ('636024', 'USA'), 'VA': ('636000', 'USA'), 'WA': ('636045', 'USA'),
+    'WV': ('636061', 'USA'), 'WI': ('636031', 'USA'), 'WY': ('636060', 'USA'),
+    'PR': ('604431', 'USA'), 'GU': ('636019', 'USA'), 'VI': ('636062', 'USA'), 'AS': ('604427', 'USA'),
+    'AB': ('604432', 'CAN'), 'BC': ('636028', 'CAN'), 'MB': ('636048', 'CAN'), 'NB': ('636017', 'CAN'),
+    'NL': ('636016', 'CAN'), 'NS': ('636013', 'CAN'), 'ON': ('636012', 'CAN'), 'PE': ('604426', 'CAN'),
+    'QC': ('604428', 'CAN'), 'SK': ('636044', 'CAN'), 'NT': ('604430', 'CAN'), 'NU': ('604433', 'CAN'),
+    'YT': ('604429', 'CAN'),
+}
+
+VERSIONS = list(range(1, 11))
+
+# Separators defined by the standard (ANSI/AAMVA DL/ID card design)
+COMPLIANCE = '@'
+DATA_ELEMENT_SEPARATOR = '\n'
+RECORD_SEPARATOR = '\x1e'
+SEGMENT_TERMINATOR = '\r'
+
+# License number shapes for jurisdictions with a well-known format ('A' letter, '9' digit)
+LICENSE_FORMATS = {
+    'CA': 'A9999999', 'TX': '99999999', 'FL': 'A999999999999', 'NY': '999999999',
+    'IL': 'A99999999999', 'WA': 'AAAAAAA999AA', 'PA': '99999999', 'OH': 'AA999999',
+    'MI': 'A999999999999', 'NJ': 'A99999999999999', 'ON': 'A9999999999999',
+}
+
+FIRST_NAMES = ['JAMES', 'MARY', 'ROBERT', 'PATRICIA', 'JOHN', 'JENNIFER', 'MARIA', 'JOSE', 'WEI',
+               'AISHA', 'ANNE-MARIE', 'JEAN LUC', 'DESHAWN', 'PRIYA', 'CHLOE']
+LAST_NAMES = ['SMITH', 'JOHNSON', 'GARCIA', 'NGUYEN', 'PATEL', "O'BRIEN", 'GARCIA-LOPEZ',
+              'VAN DYKE', 'MCDONALD', 'TREMBLAY', 'KOWALSKI', 'LEE', 'DE LA CRUZ']
+STREETS = ['MAIN ST', 'OAK AVE', 'LAKESIDE LN', 'PARK BLVD', 'RUE PRINCIPALE', 'MAPLE DR', 'KING ST W']
+CITIES = ['CARROLLTON', 'SPRINGFIELD', 'RIVERSIDE', 'FRANKLIN', 'GREENVILLE', 'TORONTO', 'SAINT-JEAN']
+EYE_COLORS = ['BLK', 'BLU', 'BRO', 'GRY', 'GRN', 'HAZ']
+HAIR_COLORS = ['BAL', 'BLK', 'BLN', 'BRO', 'GRY', 'RED', 'WHI']
+
+# Scanner-mangled variants, in the proportion used by generate_corpus
+VARIANTS = [
+    ('clean', 20),            # exactly as encoded
+    ('eyoyo', 20),            # '@' + LF, record separator and CR dropped (the scanner this app targets)
+    ('missing_at', 10),       # compliance indicator lost
+    ('stripped_newlines', 8), # keyboard wedge dropped every LF
+    ('crlf', 10),             # LF sent as CR LF
+    ('cr_only', 8),           # LF sent as CR
+    ('mixed_eol', 8),         # random mix of LF / CR LF / CR
+    ('trailing_junk', 8),     # extra keystrokes after the payload
+    ('leading_whitespace', 4),
+    ('truncated', 4),         # scan cut short
+]
+
+REFERENCE_DATE = date(2025, 1, 1)
+
+
+# ==================== PAYLOAD GENERATION ====================
+
+def _license_number(rng: random.Random, jurisdiction: str) -> str:
+    shape = LICENSE_FORMATS.get(jurisdiction, '9' * rng.choice([7, 8, 9]))
+    return ''.join(rng.choice(string.ascii_uppercase) if c == 'A' else rng.choice(string.digits) for c in shape)
+
+
+def _format_date(value: date, version: int, country: str) -> str:
+    """MMDDCCYY for US cards from version 02; CCYYMMDD for version 01 and Canada"""
+    if version == 1 or country == 'CAN':
+        return value.strftime('%Y%m%d')
+    return value.strftime('%m%d%Y')
+
+
+def generate_person(rng: random.Random, jurisdiction: str) -> Dict:
+    """Cardholder identity used to build a payload (and as the expected parse result)"""
+    _, country = JURISDICTIONS[jurisdiction]
+    date_of_birth = REFERENCE_DATE - timedelta(days=rng.randint(16 * 365, 90 * 365))
+    issue_date = REFERENCE_DATE - timedelta(days=rng.randint(0, 8 * 365))
+    zip_code = (f"{rng.choice('ABCEGHJKLMNPRSTVXY')}{rng.randint(0, 9)}{rng.choice(string.ascii_uppercase)}"
+                f"{rng.randint(0, 9)}{rng.choice(string.ascii_uppercase)}{rng.randint(0, 9)}"
+                if country == 'CAN' else f"{rng.randint(10000, 99999)}-{rng.randint(0, 9999):04d}")
+    return {
+        'first_name': rng.choice(FIRST_NAMES),
+        'middle_name': rng.choice(FIRST_NAMES) if rng.random() < 0.6 else None,
+        'last_name': rng.choice(LAST_NAMES),
+        'license_number': _license_number(rng, jurisdiction),
+        'date_of_birth': date_of_birth,
+        'issue_date': issue_date,
+        'expiration_date': issue_date + timedelta(days=rng.choice([4, 5, 8]) * 365),
+        'address_street': f"{rng.randint(1, 9999)} {rng.choice(STREETS)}",
+        'address_city': rng.choice(CITIES),
+        'address_state': jurisdiction,
+        'address_zip': zip_code,
+        'sex': rng.choice(['1', '2']),
+        'height_inches': rng.randint(58, 78),
+        'weight_lbs': rng.randint(100, 280),
+        'eye_color': rng.choice(EYE_COLORS),
+        'hair_color': rng.choice(HAIR_COLORS),
+        'country': country,
+        'document_discriminator': ''.join(rng.choice(string.digits) for _ in range(rng.randint(10, 25))),
+    }
+
+
+def _data_elements(person: Dict, version: int) -> List[Tuple[str, str]]:
+    """Ordered (element ID, value) pairs of the DL subfile for a standard version"""
+    country = person['country']
+    middle = person['middle_name'] or ''
+    date_format = lambda value: _format_date(value, version, country)
+
+    # Real cards lead with the vehicle class/restriction/endorsement elements
+    elements = [('DCA', 'C'), ('DCB', 'NONE'), ('DCD', 'NONE'), ('DBA', date_format(person['expiration_date']))]
+
+    if version == 1:
+        # Version 01: single full-name element
+        elements.append(('DAA', ','.join(filter(None, [person['last_name'], person['first_name'], middle]))))
+    elif version <= 3:
+        # Versions 02-03: family name plus combined given names
+        elements.append(('DCS', person['last_name']))
+        elements.append(('DCT', ' '.join(filter(None, [person['first_name'], middle]))))
+    else:
+        elements.extend([
+            ('DCS', person['last_name']), ('DDE', 'N'),
+            ('DAC', person['first_name']), ('DDF', 'N'),
+            ('DAD', middle or 'NONE'), ('DDG', 'N'),
+        ])
+
+    height = (f"{person['height_inches']:03d} in" if country == 'USA'
+              else f"{round(person['height_inches'] * 2.54):03d} cm")
+    elements.extend([
+        ('DBD', date_format(person['issue_date'])),
+        ('DBB', date_format(person['date_of_birth'])),
+        ('DBC', person['sex']),
+        ('DAY', person['eye_color']),
+        ('DAU', height),
+        ('DAG', person['address_street']),
+        ('DAI', person['address_city']),
+        ('DAJ', person['address_state']),
+        ('DAK', person['address_zip']),
+        ('DAQ', person['license_number']),
+        ('DCF', person['document_discriminator']),
+    ])
+    if version >= 2:
+        elements.append(('DCG', country))
+    if version >= 4:
+        elements.extend([('DAZ', person['hair_color']), ('DAW', str(person['weight_lbs']))])
+    if version >= 5:
+        elements.append(('DDK', '1'))
+    if version >= 8:
+        elements.append(('DDA', 'F'))
+    return elements
+
+
+def encode_payload(person: Dict, version: int, jurisdiction_version: int = 0) -> str:
+    """
+    Encode a cardholder as a standard-conformant AAMVA payload
+
+    The header carries the jurisdiction IIN, the standard version, and
+    (from version 02) the jurisdiction version, followed by one subfile
+    designator whose offset and length match the encoded DL subfile.
+    A jurisdiction-specific Z subfile is appended as real cards do.
+    """
+    jurisdiction = person['address_state']
+    iin, _ = JURISDICTIONS[jurisdiction]
+
+    dl_subfile = 'DL' + DATA_ELEMENT_SEPARATOR.join(code + value for code, value in _data_elements(person, version))
+    dl_subfile += DATA_ELEMENT_SEPARATOR + SEGMENT_TERMINATOR
+    z_code = 'Z' + jurisdiction[0]
+    z_subfile = f"{z_code}{z_code}A{jurisdiction}{DATA_ELEMENT_SEPARATOR}{SEGMENT_TERMINATOR}"
+
+    preamble = f"{COMPLIANCE}{DATA_ELEMENT_SEPARATOR}{RECORD_SEPARATOR}{SEGMENT_TERMINATOR}ANSI {iin}{version:02d}"
+    if version >= 2:
+        preamble += f"{jurisdiction_version:02d}"
+    preamble += "02"  # number of subfiles
+
+    offset = len(preamble) + 2 * 10
+    designators = f"DL{offset:04d}{len(dl_subfile):04d}"
+    designators += f"{z_code}{offset + len(dl_subfile):04d}{len(z_subfile):04d}"
+    return preamble + designators + dl_subfile + z_subfile
+
+
+def expected_fields(person: Dict) -> Dict:
+    """Parse result a correct parser returns for the key database fields"""
+    return {
+        'license_number': person['license_number'],
+        'first_name': person['first_name'],
+        'last_name': person['last_name'],
+        'date_of_birth': person['date_of_birth'].strftime('%Y-%m-%d'),
+        'address_state': person['address_state'],
+        'address_zip': person['address_zip'],
+    }
+
+
+# ==================== SCANNER MANGLING ====================
+
+def mangle(payload: str, variant: str, rng: random.Random) -> str:
+    """Apply one scanner artefact to an encoded payload"""
+    if variant == 'clean':
+        return payload
+    if variant == 'eyoyo':
+        return payload.replace(RECORD_SEPARATOR, '').replace(SEGMENT_TERMINATOR, '')
+    if variant == 'missing_at':
+        return payload[1:]
+    if variant == 'stripped_newlines':
+        return payload.replace('\n', '')
+    if variant == 'crlf':
+        return payload.replace('\n', '\r\n')
+    if variant == 'cr_only':
+        return payload.replace('\n', '\r')
+    if variant == 'mixed_eol':
+        return ''.join(rng.choice(['\n', '\r\n', '\r']) if ch == '\n' else ch for ch in payload)
+    if variant == 'trailing_junk':
+        junk = ''.join(rng.choice(string.printable) for _ in range(rng.randint(1, 40)))
+        return payload + junk
+    if variant == 'leading_whitespace':
+        return rng.choice([' ', '\t', '\n', '\r\n']) * rng.randint(1, 3) + payload
+    if variant == 'truncated':
+        return payload[:rng.randint(len(payload) // 3, len(payload) - 1)]
+    raise ValueError(f"Unknown variant: {variant}")
+
+
+def generate_sample(index: int, seed: int = 0, variant: Optional[str] = None) -> Dict:
+    """
+    Generate corpus sample number `index` (deterministic for a given seed)
+
+    Returns:
+        Dictionary with jurisdiction, version, variant, barcode and expected fields
+    """
+    rng = random.Random(seed * 1_000_003 + index)
+    jurisdiction = rng.choice(list(JURISDICTIONS))
+    version = rng.choice(VERSIONS)
+    if variant is None:
+        variant = rng.choices([v for v, _ in VARIANTS], weights=[w for _, w in VARIANTS])[0]
+
+    person = generate_person(rng, jurisdiction)
+    payload = encode_payload(person, version, rng.randint(0, 3))
+    return {
+        'jurisdiction': jurisdiction,
+        'version': version,
+        'variant': variant,
+        'barcode': mangle(payload, variant, rng),
+        'expected': expected_fields(person),
+    }
+
+
+def generate_corpus(count: int, seed: int = 0, start: int = 0) -> Iterator[Dict]:
+    """Stream `count` samples starting at `start`"""
+    for index in range(start, start + count):
+        yield generate_sample(index, seed)
+
+
+def iter_full_coverage(seed: int = 0) -> Iterator[Dict]:
+    """One clean sample for every jurisdiction x version pair, then every variant of each"""
+    index = 0
+    for jurisdiction in JURISDICTIONS:
+        for version in VERSIONS:
+            for variant, _ in VARIANTS:
+                rng = random.Random(seed * 1_000_003 + index)
+                person = generate_person(rng, jurisdiction)
+                payload = encode_payload(person, version)
+                yield {
+                    'jurisdiction': jurisdiction,
+                    'version': version,
+                    'variant': variant,
+                    'barcode': mangle(payload, variant, rng),
+                    'expected': expected_fields(person),
+                }
+                index += 1
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="Write a synthetic AAMVA barcode corpus as JSON lines")
+    parser.add_argument("output")
+    parser.add_argument("--count", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--full-coverage", action="store_true",
+                        help="Every jurisdiction x version x variant instead of random samples")
+    args = parser.parse_args()
+
+    samples = iter_full_coverage(args.seed) if args.full_coverage else generate_corpus(args.count, args.seed)
+    written = 0
+    with open(args.output, 'w', encoding='utf-8') as handle:
+        for sample in samples:
+            handle.write(json.dumps(sample) + '\n')
+            written += 1
+    print(f"Wrote {written:,} samples to {args.output}")
@@ -0,0 +1,293 @@
+"""
+AI Search Intent Templates
+License to Live: MIAS - Python/Streamlit Version
+Recognizes the common shapes of AI Database Search questions (patients with a condition,
+allergy or medication, blood type and age filters, counts and breakdowns) and answers them
+with vetted, parameterized SQL, so only unrecognized questions are sent to Claude
+
+Matching is deliberately strict: a question is only answered here when the whole question
+fits a template and every slot value is plain (no "and", "or", "not", extra filters...) and
+names no other table ("allergies", "vaccine", "contacts"...). Patients "with" or "who ..."
+something are only answered for the conditions listed in KNOWN_CONDITIONS and CONDITION_ALIASES.
+Anything else returns None and goes to the LLM.
+"""
+
+import re
+from typing import Dict, List, Optional, Tuple
+
+from ai_query_cache import normalize_question
+
+# Rows returned by list templates (the LLM prompt uses the same default)
+LIST_LIMIT = 100
+
+# Columns shown for every patient list; license numbers are masked as the LLM prompt requires
+PATIENT_COLUMNS = """p.patient_id, p.first_name, p.last_name,
+       CONCAT(LEFT(p.license_number, 4), '****') AS license_number,
+       TIMESTAMPDIFF(YEAR, p.date_of_birth, CURDATE()) AS age,
+       p.blood_type, p.state"""
+
+# Medication classes staff ask about -> medication names stored in Medications
+MEDICATION_CLASSES = {
+    'blood pressure': ['Lisinopril', 'Amlodipine', 'Losartan', 'Metoprolol', 'Hydrochlorothiazide'],
+    'diabetes': ['Metformin', 'Insulin', 'Glipizide'],
+    'cholesterol': ['Atorvastatin', 'Simvastatin', 'Rosuvastatin'],
+    'blood thinner': ['Apixaban', 'Warfarin', 'Rivaroxaban', 'Clopidogrel'],
+    'asthma': ['Albuterol', 'Tiotropium', 'Fluticasone'],
+    'thyroid': ['Levothyroxine'],
+    'depression': ['Sertraline', 'Fluoxetine', 'Escitalopram'],
+    'seizure': ['Levetiracetam'],
+}
+
+# Words that mean a slot holds more than one plain value; such questions go to the LLM
+COMPOUND_WORDS = {'and', 'or', 'not', 'but', 'without', 'except', 'over', 'under', 'older', 'younger',
+                  'than', 'born', 'since', 'after', 'before', 'who', 'whose', 'where', 'by', 'per',
+                  'from', 'between', 'each', 'more', 'less', 'at', 'least', 'most', 'no', 'any'}
+
+# Conditions answered after "patients", "patients with" or "patients who" ("which patients
+# have asthma" normalizes to "patients asthma"); other conditions need "diagnosed with ..."
+# or "suffering from ..." to be answered here
+KNOWN_CONDITIONS = {'hypertension', 'hyperlipidemia', 'diabetes', 'diabetes type 1', 'diabetes type 2', 'asthma',
+                    'hypothyroidism', 'depression', 'gerd', 'coronary artery disease', 'atrial fibrillation',
+                    'copd', 'epilepsy', 'cancer', 'heart disease', 'arthritis', 'anxiety'}
+
+# Everyday names -> the wording stored in Medical_Conditions.condition_name
+CONDITION_ALIASES = {'high blood pressure': 'hypertension', 'high cholesterol': 'hyperlipidemia',
+                     'type 1 diabetes': 'diabetes type 1', 'type 2 diabetes': 'diabetes type 2',
+                     'diabetic': 'diabetes', 'afib': 'atrial fibrillation', 'reflux': 'gerd'}
+
+MAX_SLOT_WORDS = 4
+
+# Slot words naming another table; "patients with flu vaccine" is not a condition search
+OTHER_TABLE_WORDS = re.compile(r"allerg|medication|\bmeds?\b|\bdrugs?\b|vaccin|immuni[sz]|contact|blood")
+
+ALLERGY_SEVERITIES = {'mild': 'Mild', 'moderate': 'Moderate', 'severe': 'Severe',
+                      'life-threatening': 'Life-threatening'}
+
+BREAKDOWNS = {
+    # what -> (SELECT/FROM/GROUP BY SQL, description)
+    'blood type': ("""SELECT COALESCE(blood_type, 'Unknown') AS blood_type, COUNT(*) AS patient_count
+FROM Patients
+GROUP BY blood_type
+ORDER BY patient_count DESC""", "patients per blood type"),
+    'state': ("""SELECT COALESCE(state, 'Unknown') AS state, COUNT(*) AS patient_count
+FROM Patients
+GROUP BY state
+ORDER BY patient_count DESC""", "patients per state"),
+    'age group': ("""SELECT CASE
+         WHEN TIMESTAMPDIFF(YEAR, date_of_birth, CURDATE()) < 18 THEN 'Under 18'
+         WHEN TIMESTAMPDIFF(YEAR, date_of_birth, CURDATE()) < 35 THEN '18-34'
+         WHEN TIMESTAMPDIFF(YEAR, date_of_birth, CURDATE()) < 50 THEN '35-49'
+         WHEN TIMESTAMPDIFF(YEAR, date_of_birth, CURDATE()) < 65 THEN '50-64'
+         ELSE '65+'
+       END AS age_group,
+       COUNT(*) AS patient_count
+FROM Patients
+GROUP BY age_group
+ORDER BY MIN(date_of_birth) DESC""", "patients per age group"),
+}
+
+TOP_ITEMS = {
+    # what -> (table, column, description)
+    'conditions': ('Medical_Conditions', 'condition_name', 'medical conditions'),
+    'allergies': ('Allergies', 'allergen', 'allergens'),
+    'medications': ('Medications', 'medication_name', 'medications'),
+    'vaccines': ('Vaccinations', 'vaccine_name', 'vaccines'),
+}
+
+
+# ==================== SLOT HELPERS ====================
+
+def _plain_slot(value: str) -> Optional[str]:
+    """Slot text if it is a short, single value; None if it needs the LLM"""
+    words = value.split()
+    if not words or len(words) > MAX_SLOT_WORDS or COMPOUND_WORDS.intersection(words):
+        return None
+    known = value in KNOWN_CONDITIONS or value in CONDITION_ALIASES or value in MEDICATION_CLASSES
+    if not known and OTHER_TABLE_WORDS.search(value):
+        return None
+    return value
+
+
+def _like(value: str) -> str:
+    return '%' + value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+
+
+def _blood_type(group: str, rh: str) -> str:
+    return group.upper() + ('+' if rh in ('+', 'positive', 'pos') else '-')
+
+
+def _singular(word: str) -> str:
+    return {'allergens': 'allergies', 'vaccinations': 'vaccines', 'meds': 'medications',
+            'drugs': 'medications', 'diseases': 'conditions', 'diagnoses': 'conditions'}.get(word, word)
+
+
+# ==================== PATIENT FILTERS ====================
+# Each filter pattern is matched against the normalized question with any count prefix
+# removed, and returns (joins + WHERE SQL, params, extra columns, description)
+
+def _condition_filter(m) -> Optional[Tuple]:
+    condition = _plain_slot(m['condition'])
+    if not condition:
+        return None
+    condition = CONDITION_ALIASES.get(condition, condition)
+    return ("JOIN Medical_Conditions mc ON mc.patient_id = p.patient_id\nWHERE mc.condition_name LIKE %s",
+            [_like(condition)], ", mc.condition_name, mc.severity",
+            f"patients with a condition matching '{condition}'")
+
+
+def _allergy_severity_filter(m) -> Optional[Tuple]:
+    severity = ALLERGY_SEVERITIES[m['severity']]
+    return ("JOIN Allergies a ON a.patient_id = p.patient_id\nWHERE a.severity = %s",
+            [severity], ", a.allergen, a.reaction, a.severity",
+            f"patients with {severity.lower()} allergies")
+
+
+def _allergen_filter(m) -> Optional[Tuple]:
+    allergen = _plain_slot(m['allergen'])
+    if not allergen:
+        return None
+    return ("JOIN Allergies a ON a.patient_id = p.patient_id\nWHERE a.allergen LIKE %s",
+            [_like(allergen)], ", a.allergen, a.reaction, a.severity",
+            f"patients allergic to '{allergen}'")
+
+
+def _medication_filter(m) -> Optional[Tuple]:
+    medication = _plain_slot(m['medication'])
+    if not medication:
+        return None
+    names = MEDICATION_CLASSES.get(medication, [medication])
+    where = ' OR '.join(['med.medication_name LIKE %s'] * len(names))
+    return (f"JOIN Medications med ON med.patient_id = p.patient_id\nWHERE ({where})\n"
+            "  AND (med.end_date IS NULL OR med.end_date >= CURDATE())",
+            [_like(name) for name in names], ", med.medication_name, med.dosage, med.frequency",
+            f"patients currently taking {medication if medication in MEDICATION_CLASSES else repr(medication)}"
+            + (" medications" if medication in MEDICATION_CLASSES else ""))
+
+
+def _blood_type_filter(m) -> Optional[Tuple]:
+    blood_type = _blood_type(m['group'], m['rh'])
+    return ("WHERE p.blood_type = %s", [blood_type], "", f"patients with blood type {blood_type}")
+
+
+def _age_filter(m) -> Optional[Tuple]:
+    age = int(m['age'])
+    if age > 130:
+        return None
+    older = m['direction'] in ('over', 'older than', 'above')
+    operator = '>' if older else '<'
+    return (f"WHERE TIMESTAMPDIFF(YEAR, p.date_of_birth, CURDATE()) {operator} %s",
+            [age], "", f"patients {'over' if older else 'under'} {age} years old")
+
+
+def _known_condition_filter(m) -> Optional[Tuple]:
+    known = m['condition'] in KNOWN_CONDITIONS or m['condition'] in CONDITION_ALIASES
+    return _condition_filter(m) if known else None
+
+
+def _no_allergies_filter(m) -> Optional[Tuple]:
+    return ("LEFT JOIN Allergies a ON a.patient_id = p.patient_id\nWHERE a.allergy_id IS NULL",
+            [], "", "patients with no recorded allergies")
+
+
+def _no_contacts_filter(m) -> Optional[Tuple]:
+    return ("LEFT JOIN Emergency_Contacts ec ON ec.patient_id = p.patient_id\nWHERE ec.contact_id IS NULL",
+            [], "", "patients without emergency contacts")
+
+
+PATIENTS = r"(?:patients?|people|persons?)"
+SLOT = r"(?P<{}>[a-z0-9][a-z0-9 '+\-]*?)"
+
+PATIENT_FILTERS: List[Tuple[str, object]] = [
+    (rf"{PATIENTS} (?:with |having )?(?:no|without|missing) emergency contacts?", _no_contacts_filter),
+    (rf"{PATIENTS} (?:with |having )?(?:no|without) (?:known )?allerg(?:y|ies)", _no_allergies_filter),
+    (rf"{PATIENTS} (?:with |having )?(?P<severity>mild|moderate|severe|life-threatening) allerg(?:y|ies)",
+     _allergy_severity_filter),
+    (rf"{PATIENTS} (?:allergic to|with (?:an? )?allerg(?:y|ies) to) {SLOT.format('allergen')}",
+     _allergen_filter),
+    (rf"{PATIENTS} (?:with|having) {SLOT.format('allergen')} allerg(?:y|ies)", _allergen_filter),
+    (rf"{PATIENTS} (?:on|taking|prescribed) {SLOT.format('medication')}(?: medications?| meds| drugs)?",
+     _medication_filter),
+    (rf"{PATIENTS} (?:with |having )?(?:type |blood type |blood )?(?P<group>ab|a|b|o) ?(?P<rh>\+|-|positive|negative|pos|neg)"
+     r"(?: blood)?(?: type)?", _blood_type_filter),
+    (rf"{PATIENTS} (?:aged |age )?(?P<direction>over|older than|above|under|younger than|below) (?P<age>\d{{1,3}})"
+     r"(?: years?)?(?: old)?(?: age)?", _age_filter),
+    (rf"{PATIENTS} (?:diagnosed with|suffering from) {SLOT.format('condition')}", _condition_filter),
+    (rf"{PATIENTS} (?:with |who )?{SLOT.format('condition')}", _known_condition_filter),
+]
+
+# normalize_question has already dropped filler words such as "of", "have", "are"
+COUNT_PREFIX = re.compile(r"^(?:how many|count|number|total(?: number)?) ")
+
+
+# ==================== MATCHING ====================
+
+def _patient_query(question: str) -> Optional[Dict]:
+    counting = COUNT_PREFIX.match(question)
+    rest = question[counting.end():] if counting else question
+    for pattern, build in PATIENT_FILTERS:
+        m = re.fullmatch(pattern, rest)
+        if not m:
+            continue
+        built = build(m)
+        if built is None:
+            return None
+        body, params, extra_columns, description = built
+        if counting:
+            sql = f"SELECT COUNT(DISTINCT p.patient_id) AS patient_count\nFROM Patients p\n{body}"
+            explanation = f"Counts {description}."
+        else:
+            sql = (f"SELECT {PATIENT_COLUMNS}{extra_columns}\nFROM Patients p\n{body}\n"
+                   f"ORDER BY p.last_name, p.first_name\nLIMIT {LIST_LIMIT}")
+            explanation = f"Lists {description} (first {LIST_LIMIT})."
+        return {'sql': sql, 'params': tuple(params), 'explanation': explanation}
+    return None
+
+
+def _summary_query(question: str) -> Optional[Dict]:
+    if re.fullmatch(r"(?:how many|count|number|total(?: number)?) patients?(?: total| registered)?"
+                    r"|total patients|patient count", question):
+        return {'sql': "SELECT COUNT(*) AS total_patients FROM Patients", 'params': (),
+                'explanation': "Counts all registered patients."}
+
+    m = re.fullmatch(r"(?:count |number |how many )?patients? (?:by|per|grouped by|for each) "
+                     r"(?P<what>blood type|state|age group)s?"
+                     r"|(?P<what2>blood type|state|age group) (?:distribution|breakdown|counts?|statistics|stats)",
+                     question)
+    if m:
+        sql, description = BREAKDOWNS[m['what'] or m['what2']]
+        return {'sql': sql, 'params': (), 'explanation': f"Counts {description}."}
+
+    m = re.fullmatch(r"(?:most common|top(?: (?P<n>\d{1,2}))?|most frequent|common) (?:medical )?"
+                     r"(?P<what>conditions|diseases|diagnoses|allergies|allergens|medications|meds|drugs|vaccines|vaccinations)"
+                     r"|(?P<what2>vaccination|vaccine|condition|allergy|medication) (?:statistics|stats|counts)",
+                     question)
+    if m:
+        what = _singular(m['what']) if m['what'] else {'vaccination': 'vaccines', 'vaccine': 'vaccines',
+                                                        'condition': 'conditions', 'allergy': 'allergies',
+                                                        'medication': 'medications'}[m['what2']]
+        table, column, description = TOP_ITEMS[what]
+        limit = int(m['n']) if m['n'] else 10 if m['what'] else LIST_LIMIT
+        return {'sql': f"""SELECT {column}, COUNT(*) AS record_count, COUNT(DISTINCT patient_id) AS patient_count
+FROM {table}
+GROUP BY {column}
+ORDER BY patient_count DESC
+LIMIT {limit}""", 'params': (), 'explanation': f"Counts patients per {description[:-1]}, most common first."}
+    return None
+
+
+def match_intent(question: str) -> Optional[Dict]:
+    """
+    Answer a question from the templates
+
+    Args:
+        question: Natural language question as typed
+
+    Returns:
+        {'sql', 'params', 'explanation', 'is_safe': True, 'match': 'template'}
+        with %s placeholders in 'sql', or None if no template fits the whole question
+    """
+    normalized = normalize_question(question)
+    result = _summary_query(normalized) or _patient_query(normalized)
+    if result is None:
+        return None
+    return dict(result, is_safe=True, match='template')
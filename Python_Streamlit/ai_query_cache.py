@@ -0,0 +1,239 @@
+"""
+AI Search Question Cache
+License to Live: MIAS - Python/Streamlit Version
+Persistent map from normalized natural-language questions to validated SQL, with a local
+character n-gram TF-IDF index so near-duplicate questions are answered without an LLM call
+
+Entries are tagged with the schema version they were generated against and are dropped
+when the schema changes. The cache file defaults to ai_query_cache.json next to this
+module (override with MIAS_AI_CACHE_PATH).
+"""
+
+import json
+import math
+import os
+import re
+import threading
+from collections import Counter
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+import streamlit as st
+
+CACHE_PATH = os.environ.get('MIAS_AI_CACHE_PATH',
+                            os.path.join(os.path.dirname(os.path.abspath(__file__)), 'ai_query_cache.json'))
+
+# Cosine similarity a cached question needs to answer a new one
+SIMILARITY_THRESHOLD = 0.85
+
+# Character n-gram sizes used by the similarity index
+NGRAM_SIZES = (3, 4, 5)
+
+MAX_ENTRIES = 5000
+
+# Words that change nothing about the SQL ("show me all patients" = "patients")
+FILLER_WORDS = {'a', 'an', 'the', 'me', 'please', 'show', 'list', 'give', 'find', 'display', 'get',
+                'all', 'of', 'in', 'system', 'database', 'can', 'you', 'tell', 'what', 'which', 'are',
+                'is', 'do', 'we', 'have', 'there'}
+
+
+# Words that flip or bound the answer ("with" / "without", "before" / "after 1980");
+# n-gram similarity barely notices them, so a similar match must use the same ones
+QUALIFIER_WORDS = {'not', 'no', 'non', 'none', 'never', 'without', 'except', 'excluding',
+                   'least', 'most', 'before', 'after', 'over', 'under', 'above', 'below',
+                   'more', 'less', 'fewer', 'oldest', 'youngest', 'earliest', 'latest'}
+
+
+def normalize_question(question: str) -> str:
+    """Lowercase, drop punctuation and filler words, collapse whitespace"""
+    words = re.findall(r"[a-z0-9+\-]+", question.lower())
+    kept = [w for w in words if w not in FILLER_WORDS]
+    return ' '.join(kept or words)
+
+
+def question_literals(question: str) -> Tuple[List[str], List[str]]:
+    """
+    Parts of a question that end up as literals or conditions in its SQL
+
+    Returns:
+        Tuple of (sorted numbers, quoted strings and capitalised words after the
+        first, sorted qualifier words); questions differing here need different SQL
+    """
+    quoted = re.findall(r"'([^']+)'|\"([^\"]+)\"", question)
+    words = re.findall(r"[A-Za-z0-9+\-]+", question)
+    values = [w for w in words if any(c.isdigit() for c in w)]
+    values += [w for w in words[1:] if w[0].isupper()]
+    values += [single or double for single, double in quoted]
+    qualifiers = [w.lower() for w in words if w.lower() in QUALIFIER_WORDS]
+    return sorted(values), sorted(qualifiers)
+
+
+# ==================== SIMILARITY INDEX ====================
+
+def _ngrams(text: str) -> Counter:
+    padded = f" {text} "
+    return Counter(padded[i:i + n] for n in NGRAM_SIZES for i in range(len(padded) - n + 1))
+
+
+class SimilarityIndex:
+    """
+    TF-IDF over character n-grams with cosine similarity
+
+    Character n-grams tolerate typos, plurals and word order changes
+    ("patients with diabetes" / "diabetic patients"). The index is small
+    (one document per cached question), so it is rebuilt on every change.
+    """
+
+    def __init__(self):
+        self.keys: List[str] = []
+        self.counts: List[Counter] = []
+        self.idf: Dict[str, float] = {}
+        self.vectors: List[Tuple[Dict[str, float], float]] = []
+
+    def rebuild(self, keys: List[str]):
+        self.keys = list(keys)
+        self.counts = [_ngrams(k) for k in self.keys]
+        document_frequency = Counter(gram for counts in self.counts for gram in counts)
+        total = len(self.keys)
+        self.idf = {gram: math.log((1 + total) / (1 + df)) + 1 for gram, df in document_frequency.items()}
+        self.vectors = [self._vector(counts) for counts in self.counts]
+
+    def _vector(self, counts: Counter) -> Tuple[Dict[str, float], float]:
+        vector = {gram: (1 + math.log(tf)) * self.idf.get(gram, math.log(1 + len(self.keys)) + 1)
+                  for gram, tf in counts.items()}
+        return vector, math.sqrt(sum(v * v for v in vector.values())) or 1.0
+
+    def best_match(self, text: str) -> Tuple[Optional[str], float]:
+        """Most similar indexed key and its cosine similarity"""
+        if not self.keys:
+            return None, 0.0
+        query, query_norm = self._vector(_ngrams(text))
+        best_key, best_score = None, 0.0
+        for key, (vector, norm) in zip(self.keys, self.vectors):
+            dot = sum(weight * vector.get(gram, 0.0) for gram, weight in query.items())
+            score = dot / (query_norm * norm)
+            if score > best_score:
+                best_key, best_score = key, score
+        return best_key, best_score
+
+
+# ==================== CACHE ====================
+
+class QueryCache:
+    """
+    Question -> SQL cache persisted as JSON
+
+    Only SQL that passed the safety check and executed successfully is
+    stored, together with the schema version it was generated for.
+    """
+
+    def __init__(self, path: str = CACHE_PATH):
+        self.path = path
+        self.entries: Dict[str, Dict] = {}
+        self.index = SimilarityIndex()
+        self.lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, encoding='utf-8') as handle:
+                self.entries = json.load(handle).get('entries', {})
+        except (OSError, ValueError):
+            self.entries = {}
+        self.index.rebuild(list(self.entries))
+
+    def _save(self):
+        temporary = f"{self.path}.tmp"
+        try:
+            with open(temporary, 'w', encoding='utf-8') as handle:
+                json.dump({'entries': self.entries}, handle, indent=1)
+            os.replace(temporary, self.path)
+        except OSError:
+            # A read-only deployment still gets the in-memory cache
+            pass
+
+    def invalidate_schema(self, schema_version: str) -> int:
+        """Drop entries generated for another schema version; returns how many were dropped"""
+        with self.lock:
+            stale = [k for k, e in self.entries.items() if e.get('schema_version') != schema_version]
+            for key in stale:
+                del self.entries[key]
+            if stale:
+                self.index.rebuild(list(self.entries))
+                self._save()
+            return len(stale)
+
+    def lookup(self, question: str, schema_version: str) -> Optional[Dict]:
+        """
+        Cached answer for a question (exact after normalization, else nearest neighbour
+        with the same literals and qualifiers, see question_literals)
+
+        Returns:
+            Entry dictionary plus 'match' ('exact' or 'similar') and 'score', or None
+        """
+        key = normalize_question(question)
+        with self.lock:
+            entry = self.entries.get(key)
+            match, score = 'exact', 1.0
+            if entry is None:
+                similar, score = self.index.best_match(key)
+                if similar is None or score < SIMILARITY_THRESHOLD:
+                    return None
+                entry, match = self.entries[similar], 'similar'
+                # "registered in 2024" is close to "registered in 2023" but needs other SQL
+                if question_literals(entry['question']) != question_literals(question):
+                    return None
+            if entry.get('schema_version') != schema_version:
+                return None
+            entry['hits'] = entry.get('hits', 0) + 1
+            return dict(entry, is_safe=True, match=match, score=round(score, 3))
+
+    def store(self, question: str, sql: str, explanation: str, schema_version: str, source: str = 'llm'):
+        """Remember validated SQL for a question"""
+        key = normalize_question(question)
+        with self.lock:
+            self.entries[key] = {
+                'question': question,
+                'sql': sql,
+                'explanation': explanation,
+                'schema_version': schema_version,
+                'source': source,
+                'created_at': datetime.now().isoformat(timespec='seconds'),
+                'hits': self.entries.get(key, {}).get('hits', 0),
+            }
+            if len(self.entries) > MAX_ENTRIES:
+                # Evict the least used entries
+                for old in sorted(self.entries, key=lambda k: self.entries[k].get('hits', 0))[:len(self.entries) - MAX_ENTRIES]:
+                    del self.entries[old]
+            self.index.rebuild(list(self.entries))
+            self._save()
+
+    def warm(self, questions: List[str], schema_version: str,
+             generate: Callable[[str], Dict], validate: Callable[[str], bool]) -> int:
+        """
+        Precompute answers for questions not cached yet (e.g. the page's example queries)
+
+        Args:
+            questions: Questions to precompute
+            schema_version: Current schema version
+            generate: question -> {'sql', 'explanation', 'is_safe'} (the LLM call)
+            validate: sql -> True if the SQL is safe and runs
+
+        Returns:
+            Number of questions generated
+        """
+        generated = 0
+        for question in questions:
+            if normalize_question(question) in self.entries:
+                continue
+            result = generate(question)
+            if result.get('is_safe') and result.get('sql') and validate(result['sql']):
+                self.store(question, result['sql'], result.get('explanation', ''), schema_version, 'precomputed')
+                generated += 1
+        return generated
+
+
+@st.cache_resource
+def get_query_cache() -> QueryCache:
+    """Process-wide cache shared by every session"""
+    return QueryCache()
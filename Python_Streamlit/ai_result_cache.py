@@ -0,0 +1,180 @@
+"""
+AI Search Result Cache
+License to Live: MIAS - Python/Streamlit Version
+In-memory cache of query results for the AI Database Search page, so admins running the
+same SQL within minutes of each other share one execution instead of re-reading the database
+
+Entries are keyed by a hash of the canonicalized SQL and its parameters, and are served
+only while the global data version (database.get_data_version) is unchanged. Results are
+kept as DataFrames with repetitive text columns dictionary-encoded, and the least recently
+used entries are evicted once their total size passes MIAS_AI_RESULT_CACHE_MB.
+"""
+
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+import streamlit as st
+
+import sql_governor
+
+# Total memory for cached results
+MAX_CACHE_BYTES = int(float(os.environ.get('MIAS_AI_RESULT_CACHE_MB', 64)) * 1024 * 1024)
+
+# Largest single result kept, as a share of MAX_CACHE_BYTES (one huge result should not flush the rest)
+MAX_ENTRY_SHARE = 0.25
+
+# Text columns whose distinct values are at most this share of the rows become categoricals
+CATEGORY_RATIO = 0.5
+
+# Keywords written in any case mean the same statement; identifiers are left alone
+# because table names are case-sensitive on most MySQL installs
+SQL_KEYWORDS = {'SELECT', 'DISTINCT', 'FROM', 'WHERE', 'AND', 'OR', 'NOT', 'IN', 'IS', 'NULL', 'LIKE',
+                'BETWEEN', 'EXISTS', 'JOIN', 'INNER', 'LEFT', 'RIGHT', 'OUTER', 'CROSS', 'ON', 'USING',
+                'AS', 'GROUP', 'BY', 'HAVING', 'ORDER', 'ASC', 'DESC', 'LIMIT', 'OFFSET', 'UNION', 'ALL',
+                'WITH', 'CASE', 'WHEN', 'THEN', 'ELSE', 'END', 'COUNT', 'SUM', 'AVG', 'MIN', 'MAX',
+                'TRUE', 'FALSE', 'INTERVAL', 'YEAR', 'MONTH', 'DAY', 'CURDATE', 'NOW', 'TIMESTAMPDIFF',
+                'CONCAT', 'COALESCE', 'IFNULL', 'ROUND', 'OVER', 'PARTITION'}
+
+
+def canonical_sql(sql: str) -> str:
+    """
+    SQL with whitespace, keyword case and a trailing semicolon normalized
+
+    Statements that do not tokenize are returned stripped; they are rejected
+    by the governor before anything is cached.
+    """
+    try:
+        tokens = sql_governor.tokenize(sql)
+    except ValueError:
+        return sql.strip()
+    if tokens and tokens[-1][1] == ';':
+        tokens = tokens[:-1]
+    return ' '.join(text.upper() if kind == 'word' and text.upper() in SQL_KEYWORDS else text
+                    for kind, text, _, _, _ in tokens)
+
+
+def result_key(sql: str, params: Optional[Tuple] = None) -> str:
+    """Cache key for a statement and its parameters"""
+    text = canonical_sql(sql) + '\x00' + json.dumps(list(params or ()), default=str)
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def compact_frame(rows: List[Dict]) -> pd.DataFrame:
+    """DataFrame for result rows with low-cardinality text columns stored as categoricals"""
+    frame = pd.DataFrame(rows)
+    for column in frame.columns:
+        series = frame[column]
+        if series.dtype == object and len(series) and series.nunique(dropna=True) <= len(series) * CATEGORY_RATIO:
+            if series.map(lambda v: v is None or isinstance(v, str)).all():
+                frame[column] = series.astype('category')
+    return frame
+
+
+class CachedResult:
+    """One cached result and its bookkeeping"""
+
+    def __init__(self, frame: pd.DataFrame, data_version: str):
+        self.frame = frame
+        self.data_version = data_version
+        self.stored_at = datetime.now()
+        self.size = int(frame.memory_usage(index=True, deep=True).sum())
+        self.hits = 0
+
+    def age_seconds(self) -> float:
+        return (datetime.now() - self.stored_at).total_seconds()
+
+    def rows(self) -> pd.DataFrame:
+        """The result with categoricals decoded, as a fresh copy the caller may modify"""
+        frame = self.frame.copy()
+        for column in frame.columns:
+            if isinstance(frame[column].dtype, pd.CategoricalDtype):
+                frame[column] = frame[column].astype(object)
+        return frame
+
+
+class ResultCache:
+    """
+    Size-bounded LRU cache of query results tied to a data version
+
+    Args:
+        max_bytes: Total size of cached frames before the least recently used are evicted
+    """
+
+    def __init__(self, max_bytes: int = MAX_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.entries: 'OrderedDict[str, CachedResult]' = OrderedDict()
+        self.size = 0
+        self.hits = self.misses = self.evictions = 0
+        self.lock = threading.Lock()
+
+    def _drop(self, key: str):
+        self.size -= self.entries.pop(key).size
+
+    def get(self, sql: str, params: Optional[Tuple], data_version: str) -> Optional[CachedResult]:
+        """Cached result for a statement, or None if absent or read from older data"""
+        key = result_key(sql, params)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry.data_version != data_version:
+                self._drop(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            entry.hits += 1
+            self.hits += 1
+            return entry
+
+    def put(self, sql: str, params: Optional[Tuple], data_version: str, rows: List[Dict]) -> bool:
+        """
+        Cache the rows a statement returned at a data version
+
+        Returns:
+            True if stored, False if the result is too large to cache
+        """
+        entry = CachedResult(compact_frame(rows), data_version)
+        if entry.size > self.max_bytes * MAX_ENTRY_SHARE:
+            return False
+        key = result_key(sql, params)
+        with self.lock:
+            if key in self.entries:
+                self._drop(key)
+            # Results from older data can never be served again
+            for stale in [k for k, e in self.entries.items() if e.data_version != data_version]:
+                self._drop(stale)
+            self.entries[key] = entry
+            self.size += entry.size
+            while self.size > self.max_bytes:
+                self._drop(next(iter(self.entries)))
+                self.evictions += 1
+        return True
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+    def stats(self) -> Dict:
+        """Entry count, size and hit/miss/eviction counters"""
+        with self.lock:
+            return {
+                'entries': len(self.entries),
+                'size_bytes': self.size,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
+
+
+@st.cache_resource
+def get_result_cache() -> ResultCache:
+    """Process-wide result cache shared by every session"""
+    return ResultCache()
@@ -0,0 +1,369 @@
+"""
+Analytics Snapshot
+License to Live: MIAS - Python/Streamlit Version
+Columnar (Parquet) copy of the MIAS tables for dashboard analytics, queried with DuckDB
+so heavy aggregates never run on the clinical database
+"""
+
+import json
+import os
+import shutil
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+import database as db
+
+# Tables copied into the snapshot: table -> (primary key, change timestamp column)
+SNAPSHOT_TABLES = {
+    table: db.CHANGE_FEED_TABLES[table]
+    for table in ['Patients', 'Medical_Conditions', 'Allergies', 'Medications',
+                  'Vaccinations', 'Insurance', 'Emergency_Contacts']
+}
+
+# Columns not needed for analytics and kept out of the files
+EXCLUDED_COLUMNS = {'emergency_token'}
+
+# Change feed rows fetched per poll, and rows buffered before a Parquet part is written
+FEED_LIMIT = 5000
+ROWS_PER_PART = 50000
+
+# Compact once this many refresh batches have accumulated since the last compaction
+COMPACT_AFTER_BATCHES = 20
+
+TOMBSTONES = '_tombstones'
+STATE_FILE = 'state.json'
+
+
+# ==================== SNAPSHOT FILES ====================
+
+def load_state(snapshot_dir: str) -> Dict:
+    """Read the snapshot state (change feed cursor, batch counters)"""
+    path = os.path.join(snapshot_dir, STATE_FILE)
+    if not os.path.exists(path):
+        return {'cursor': None, 'batches': 0, 'since_compaction': 0, 'refreshed_at': None}
+    with open(path, 'r', encoding='utf-8') as handle:
+        return json.load(handle)
+
+
+def save_state(snapshot_dir: str, state: Dict):
+    """Write the snapshot state atomically"""
+    path = os.path.join(snapshot_dir, STATE_FILE)
+    with open(path + '.tmp', 'w', encoding='utf-8') as handle:
+        json.dump(state, handle, indent=2)
+    os.replace(path + '.tmp', path)
+
+
+def batch_dir(snapshot_dir: str, table: str, batch: int) -> str:
+    """Hive-style partition directory for one refresh batch of a table"""
+    return os.path.join(snapshot_dir, table, f"batch={batch:05d}")
+
+
+def write_part(snapshot_dir: str, table: str, batch: int, rows: List[Dict]):
+    """Write buffered rows as the next Parquet part of a batch partition"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    if not rows:
+        return
+    directory = batch_dir(snapshot_dir, table, batch)
+    os.makedirs(directory, exist_ok=True)
+    part = len([name for name in os.listdir(directory) if name.endswith('.parquet')])
+    pq.write_table(pa.Table.from_pylist(rows), os.path.join(directory, f"part-{part:04d}.parquet"))
+    rows.clear()
+
+
+def refresh_snapshot(snapshot_dir: str) -> Dict:
+    """
+    Bring the snapshot up to date from the change feed
+
+    Only rows changed since the previous refresh are read from MySQL
+    (database.get_changes); they are appended as a new batch partition,
+    and deletes are recorded as tombstones. Readers keep the newest
+    version of each row, so nothing already written has to be rewritten.
+
+    Args:
+        snapshot_dir: Directory holding the snapshot (created if missing)
+
+    Returns:
+        Summary dictionary with rows and deletes written
+    """
+    os.makedirs(snapshot_dir, exist_ok=True)
+    state = load_state(snapshot_dir)
+    batch = state['batches'] + 1
+
+    # Clear leftovers of an interrupted refresh of this batch
+    for table in list(SNAPSHOT_TABLES) + [TOMBSTONES]:
+        shutil.rmtree(batch_dir(snapshot_dir, table, batch), ignore_errors=True)
+
+    pending = {table: [] for table in SNAPSHOT_TABLES}
+    tombstones = []
+    counts = {table: 0 for table in SNAPSHOT_TABLES}
+    cursor = state['cursor']
+
+    while True:
+        changes = db.get_changes(cursor, limit=FEED_LIMIT)
+
+        for table, rows in changes['upserts'].items():
+            if table not in SNAPSHOT_TABLES:
+                continue
+            pending[table].extend(
+                {k: v for k, v in row.items() if k not in EXCLUDED_COLUMNS} for row in rows
+            )
+            counts[table] += len(rows)
+            if len(pending[table]) >= ROWS_PER_PART:
+                write_part(snapshot_dir, table, batch, pending[table])
+
+        tombstones.extend(
+            {'table_name': d['table_name'], 'record_id': d['record_id'], 'deleted_at': d['deleted_at']}
+            for d in changes['deletes'] if d['table_name'] in SNAPSHOT_TABLES
+        )
+
+        cursor = changes['cursor']
+        if not changes['has_more']:
+            break
+
+    deletes = len(tombstones)
+    for table, rows in pending.items():
+        write_part(snapshot_dir, table, batch, rows)
+    write_part(snapshot_dir, TOMBSTONES, batch, tombstones)
+
+    # Batch numbers keep growing across compactions; the live partition count does not
+    state = {
+        'cursor': cursor,
+        'batches': batch,
+        'since_compaction': state.get('since_compaction', state['batches']) + 1,
+        'refreshed_at': datetime.now().isoformat(timespec='seconds'),
+    }
+    save_state(snapshot_dir, state)
+
+    summary = {'batch': batch, 'rows': counts, 'deletes': deletes,
+               'refreshed_at': state['refreshed_at']}
+    if state['since_compaction'] >= COMPACT_AFTER_BATCHES:
+        summary['compacted'] = compact_snapshot(snapshot_dir)
+    return summary
+
+
+def compact_snapshot(snapshot_dir: str) -> int:
+    """
+    Rewrite every table as a single batch holding only current rows
+
+    Superseded row versions and deleted rows are dropped, as are the
+    tombstones themselves.
+
+    Returns:
+        Number of the new, single batch
+    """
+    state = load_state(snapshot_dir)
+    batch = state['batches'] + 1
+    snapshot = SnapshotAnalytics(snapshot_dir)
+
+    for table in snapshot.tables:
+        directory = batch_dir(snapshot_dir, table, batch)
+        os.makedirs(directory, exist_ok=True)
+        target = os.path.join(directory, 'part-0000.parquet').replace("'", "''")
+        snapshot.connection.execute(f"COPY (SELECT * FROM {table}) TO '{target}' (FORMAT PARQUET)")
+
+    for table in list(SNAPSHOT_TABLES) + [TOMBSTONES]:
+        table_dir = os.path.join(snapshot_dir, table)
+        if not os.path.isdir(table_dir):
+            continue
+        for name in os.listdir(table_dir):
+            if name != f"batch={batch:05d}":
+                shutil.rmtree(os.path.join(table_dir, name), ignore_errors=True)
+
+    state['batches'] = batch
+    state['since_compaction'] = 0
+    save_state(snapshot_dir, state)
+    return batch
+
+
+# ==================== QUERY BACKEND ====================
+
+class SnapshotAnalytics:
+    """DuckDB views over the snapshot with the same analytics API as database.py"""
+
+    def __init__(self, snapshot_dir: str):
+        import duckdb
+
+        self.snapshot_dir = snapshot_dir
+        self.connection = duckdb.connect()
+        self.tables = set()
+        self.state = {}
+        self._state_mtime = None
+        self._create_views()
+
+    def _glob(self, table: str) -> Optional[str]:
+        table_dir = os.path.join(self.snapshot_dir, table)
+        if not os.path.isdir(table_dir) or not any(
+                files for _, _, files in os.walk(table_dir) if any(f.endswith('.parquet') for f in files)):
+            return None
+        return os.path.join(table_dir, '*', '*.parquet').replace("'", "''")
+
+    def _create_views(self):
+        """(Re)create one view per table keeping the newest, undeleted version of each row"""
+        state_path = os.path.join(self.snapshot_dir, STATE_FILE)
+        if not os.path.exists(state_path):
+            raise FileNotFoundError(f"No analytics snapshot in {self.snapshot_dir}; run a refresh first")
+        self._state_mtime = os.path.getmtime(state_path)
+        self.state = load_state(self.snapshot_dir)
+
+        tombstone_glob = self._glob(TOMBSTONES)
+        if tombstone_glob:
+            self.connection.execute(f"""
+                CREATE OR REPLACE VIEW {TOMBSTONES} AS
+                SELECT table_name, record_id
+                FROM read_parquet('{tombstone_glob}', hive_partitioning = true, union_by_name = true)
+            """)
+        else:
+            self.connection.execute(f"""
+                CREATE OR REPLACE VIEW {TOMBSTONES} AS
+                SELECT NULL::VARCHAR AS table_name, NULL::BIGINT AS record_id WHERE false
+            """)
+
+        self.tables = set()
+        for table, (primary_key, changed_column) in SNAPSHOT_TABLES.items():
+            glob = self._glob(table)
+            if not glob:
+                continue
+            self.connection.execute(f"""
+                CREATE OR REPLACE VIEW {table} AS
+                SELECT * EXCLUDE (batch, _version)
+                FROM (
+                    SELECT *, row_number() OVER (
+                        PARTITION BY {primary_key}
+                        ORDER BY batch DESC, {changed_column} DESC
+                    ) AS _version
+                    FROM read_parquet('{glob}', hive_partitioning = true, union_by_name = true)
+                )
+                WHERE _version = 1
+                  AND {primary_key} NOT IN (
+                      SELECT record_id FROM {TOMBSTONES} WHERE table_name = '{table}'
+                  )
+            """)
+            self.tables.add(table)
+
+    def query(self, sql: str, *tables: str) -> pd.DataFrame:
+        """Run a query on a fresh DuckDB cursor; empty result if a needed table has no data yet"""
+        if os.path.getmtime(os.path.join(self.snapshot_dir, STATE_FILE)) != self._state_mtime:
+            self._create_views()
+        if any(table not in self.tables for table in tables):
+            return pd.DataFrame()
+        return self.connection.cursor().execute(sql).df()
+
+    def _count(self, sql: str, table: str) -> float:
+        df = self.query(sql, table)
+        value = df.iloc[0, 0] if not df.empty else 0
+        return 0 if pd.isna(value) else value
+
+    def refreshed_at(self) -> Optional[str]:
+        return self.state.get('refreshed_at')
+
+    # ----- Same signatures as the analytics functions in database.py -----
+
+    def get_summary_stats(self) -> Dict:
+        return {
+            'total_patients': int(self._count("SELECT COUNT(*) FROM Patients", 'Patients')),
+            'total_conditions': int(self._count("SELECT COUNT(*) FROM Medical_Conditions", 'Medical_Conditions')),
+            'total_allergies': int(self._count("SELECT COUNT(*) FROM Allergies", 'Allergies')),
+            'active_medications': int(self._count(
+                "SELECT COUNT(*) FROM Medications WHERE end_date IS NULL", 'Medications')),
+            'total_vaccinations': int(self._count("SELECT COUNT(*) FROM Vaccinations", 'Vaccinations')),
+            'active_insurance': int(self._count(
+                "SELECT COUNT(*) FROM Insurance WHERE CAST(is_active AS INTEGER) = 1", 'Insurance')),
+            'emergency_contacts': int(self._count("SELECT COUNT(*) FROM Emergency_Contacts", 'Emergency_Contacts')),
+            'avg_age': float(self._count(
+                "SELECT ROUND(AVG(date_sub('year', date_of_birth, current_date)), 1) FROM Patients", 'Patients')),
+        }
+
+    def get_vaccination_data(self) -> pd.DataFrame:
+        return self.query("""
+            SELECT
+                vaccine_name,
+                COUNT(DISTINCT patient_id) AS patients_vaccinated,
+                COUNT(vaccination_id) AS total_doses,
+                MIN(administration_date) AS first_dose_date,
+                MAX(administration_date) AS last_dose_date
+            FROM Vaccinations
+            GROUP BY vaccine_name
+            ORDER BY patients_vaccinated DESC
+        """, 'Vaccinations')
+
+    def get_patient_demographics(self) -> pd.DataFrame:
+        return self.query("""
+            SELECT
+                patient_id,
+                date_sub('year', date_of_birth, current_date) AS age,
+                state,
+                blood_type
+            FROM Patients
+        """, 'Patients')
+
+    def get_medication_stats(self) -> pd.DataFrame:
+        return self.query("""
+            SELECT
+                medication_name,
+                COUNT(DISTINCT patient_id) AS patient_count,
+                COUNT(medication_id) AS prescription_count
+            FROM Medications
+            GROUP BY medication_name
+            ORDER BY patient_count DESC
+            LIMIT 10
+        """, 'Medications')
+
+    def get_allergy_stats(self) -> pd.DataFrame:
+        return self.query("""
+            SELECT
+                severity,
+                allergy_type,
+                COUNT(*) AS count
+            FROM Allergies
+            WHERE severity IS NOT NULL
+            GROUP BY severity, allergy_type
+            ORDER BY
+                CASE severity
+                    WHEN 'Life-threatening' THEN 1 WHEN 'Severe' THEN 2
+                    WHEN 'Moderate' THEN 3 WHEN 'Mild' THEN 4 ELSE 0
+                END,
+                count DESC
+        """, 'Allergies')
+
+    def get_state_distribution(self) -> pd.DataFrame:
+        return self.query("""
+            SELECT
+                state,
+                COUNT(*) AS patient_count
+            FROM Patients
+            WHERE state IS NOT NULL AND state != ''
+            GROUP BY state
+            ORDER BY patient_count DESC
+        """, 'Patients')
+
+    def get_blood_type_distribution(self) -> pd.DataFrame:
+        return self.query("""
+            SELECT
+                blood_type,
+                COUNT(*) AS count
+            FROM Patients
+            WHERE blood_type IS NOT NULL AND blood_type != ''
+            GROUP BY blood_type
+            ORDER BY count DESC
+        """, 'Patients')
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Maintain the MIAS analytics Parquet snapshot")
+    parser.add_argument("command", choices=["refresh", "compact"])
+    parser.add_argument("snapshot_dir", nargs="?", default=os.environ.get('MIAS_ANALYTICS_SNAPSHOT_DIR'))
+    args = parser.parse_args()
+
+    if not args.snapshot_dir:
+        parser.error("snapshot_dir is required (or set MIAS_ANALYTICS_SNAPSHOT_DIR)")
+
+    if args.command == "refresh":
+        print(json.dumps(refresh_snapshot(args.snapshot_dir), indent=2, default=str))
+    else:
+        print(f"Compacted into batch {compact_snapshot(args.snapshot_dir)}")
@@ -0,0 +1,111 @@
+"""
+Batch Entry Grid
+License to Live: MIAS - Python/Streamlit Version
+Editable grid for entering a whole list of conditions, allergies or medications at once
+and saving it with one database transaction
+"""
+
+from datetime import date
+from typing import Dict, List
+
+import pandas as pd
+import streamlit as st
+
+import database as db
+
+# Section -> (bulk writer, required column, grid columns)
+BATCH_SECTIONS = {
+    'conditions': ('add_conditions_bulk', 'condition_name', {
+        'condition_name': st.column_config.TextColumn("Condition Name*"),
+        'diagnosis_date': st.column_config.DateColumn("Diagnosis Date"),
+        'severity': st.column_config.SelectboxColumn("Severity", options=["Mild", "Moderate", "Severe", "Critical"]),
+        'notes': st.column_config.TextColumn("Notes"),
+    }),
+    'allergies': ('add_allergies_bulk', 'allergen', {
+        'allergen': st.column_config.TextColumn("Allergen*"),
+        'allergy_type': st.column_config.SelectboxColumn("Type", options=["Medication", "Food", "Environmental", "Other"]),
+        'reaction': st.column_config.TextColumn("Reaction"),
+        'severity': st.column_config.SelectboxColumn("Severity", options=["Mild", "Moderate", "Severe", "Life-threatening"]),
+    }),
+    'medications': ('add_medications_bulk', 'medication_name', {
+        'medication_name': st.column_config.TextColumn("Medication Name*"),
+        'dosage': st.column_config.TextColumn("Dosage"),
+        'frequency': st.column_config.TextColumn("Frequency"),
+        'start_date': st.column_config.DateColumn("Start Date"),
+        'end_date': st.column_config.DateColumn("End Date"),
+        'prescribing_doctor': st.column_config.TextColumn("Prescribing Doctor"),
+        'notes': st.column_config.TextColumn("Notes"),
+    }),
+}
+
+# Blank rows shown in a new grid
+EMPTY_ROWS = 5
+
+
+def grid_to_records(grid: pd.DataFrame, required: str) -> List[Dict]:
+    """
+    Turn edited grid rows into dictionaries for the bulk writers
+
+    Rows without the required column are dropped, text is stripped and
+    dates become YYYY-MM-DD strings.
+    """
+    records = []
+    for row in grid.to_dict('records'):
+        record = {}
+        for column, value in row.items():
+            if value is None or (not isinstance(value, str) and pd.isna(value)):
+                continue
+            if isinstance(value, (date, pd.Timestamp)):
+                value = value.strftime('%Y-%m-%d')
+            elif isinstance(value, str):
+                value = value.strip()
+            if value != '':
+                record[column] = value
+        if record.get(required):
+            records.append(record)
+    return records
+
+
+def show_batch_entry(section: str, patient_id: int, key: str) -> bool:
+    """
+    Grid form that saves every filled row of `section` in one transaction
+
+    Rows can be typed in or pasted from a spreadsheet (one row per item, columns
+    in grid order).
+
+    Args:
+        section: 'conditions', 'allergies' or 'medications'
+        patient_id: Patient's ID
+        key: Unique widget key prefix for the page
+
+    Returns:
+        True if rows were saved during this run
+    """
+    writer, required, columns = BATCH_SECTIONS[section]
+    empty = pd.DataFrame([{column: None for column in columns}] * EMPTY_ROWS)
+
+    with st.form(f"{key}_batch_{section}", clear_on_submit=True):
+        grid = st.data_editor(
+            empty,
+            column_config=columns,
+            num_rows="dynamic",
+            use_container_width=True,
+            hide_index=True,
+            key=f"{key}_batch_{section}_grid",
+        )
+        submitted = st.form_submit_button(f"💾 Save All {section.title()}", type="primary")
+
+    if not submitted:
+        return False
+
+    records = grid_to_records(grid, required)
+    if not records:
+        st.error(f"❌ Fill in at least one row with {columns[required].get('label', required).rstrip('*')}")
+        return False
+
+    success, message = getattr(db, writer)(patient_id, records)
+    if success:
+        st.success(f"✅ {message}")
+    else:
+        st.error(f"❌ {message}")
+    return success
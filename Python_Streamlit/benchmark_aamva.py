@@ -0,0 +1,306 @@
+"""
+AAMVA Parser Benchmark and Fuzz Harness
+License to Live: MIAS - Python/Streamlit Version
+Runs AAMVAParser.parse over millions of synthetic and fuzzed barcodes and reports
+throughput, error rates by version/variant/jurisdiction and worst-case latency
+
+Usage:
+    python benchmark_aamva.py --count 1000000 --workers 4 --output aamva_report.json
+    python benchmark_aamva.py --mode fuzz --count 1000000
+"""
+
+import heapq
+import json
+import math
+import platform
+import random
+import string
+import sys
+import time
+from collections import Counter, defaultdict
+from datetime import datetime
+from typing import Dict, List, Tuple
+
+import aamva_corpus as corpus
+from aamva_parser import AAMVAParser
+
+# Latency histogram: bucket i holds parses taking < HISTOGRAM_BASE ** i nanoseconds
+HISTOGRAM_BASE = 1.1
+
+# Slowest inputs kept per run
+WORST_CASES = 10
+
+FUZZ_MUTATIONS = ['flip', 'insert', 'delete', 'duplicate_line', 'swap_lines', 'huge_field',
+                  'control_chars', 'unicode', 'random_bytes']
+
+
+# ==================== FUZZING ====================
+
+def fuzz(barcode: str, rng: random.Random) -> Tuple[str, str]:
+    """Apply one random mutation; returns (mutated barcode, mutation name)"""
+    mutation = rng.choice(FUZZ_MUTATIONS)
+    if not barcode:
+        return ''.join(rng.choice(string.printable) for _ in range(rng.randint(1, 64))), 'random_bytes'
+    position = rng.randrange(len(barcode))
+
+    if mutation == 'flip':
+        chars = list(barcode)
+        for _ in range(rng.randint(1, 8)):
+            i = rng.randrange(len(chars))
+            chars[i] = chr(ord(chars[i]) ^ (1 << rng.randrange(7)))
+        return ''.join(chars), mutation
+    if mutation == 'insert':
+        return barcode[:position] + ''.join(rng.choice(string.printable) for _ in range(rng.randint(1, 32))) \
+            + barcode[position:], mutation
+    if mutation == 'delete':
+        return barcode[:position] + barcode[position + rng.randint(1, 32):], mutation
+    lines = barcode.split('\n')
+    if mutation == 'duplicate_line':
+        line = rng.choice(lines)
+        lines.insert(rng.randrange(len(lines) + 1), line)
+        return '\n'.join(lines), mutation
+    if mutation == 'swap_lines':
+        rng.shuffle(lines)
+        return '\n'.join(lines), mutation
+    if mutation == 'huge_field':
+        code = rng.choice(list(AAMVAParser.FIELD_CODES))
+        return barcode + '\n' + code + rng.choice(string.ascii_uppercase) * rng.randint(1000, 100000), mutation
+    if mutation == 'control_chars':
+        return barcode[:position] + ''.join(chr(rng.randrange(32)) for _ in range(rng.randint(1, 16))) \
+            + barcode[position:], mutation
+    if mutation == 'unicode':
+        return barcode[:position] + ''.join(chr(rng.randrange(0x80, 0x3000)) for _ in range(rng.randint(1, 8))) \
+            + barcode[position:], mutation
+    return ''.join(chr(rng.randrange(256)) for _ in range(rng.randint(1, 1024))), 'random_bytes'
+
+
+# ==================== MEASUREMENT ====================
+
+def _bucket(nanoseconds: int) -> int:
+    return max(0, math.ceil(math.log(max(nanoseconds, 1), HISTOGRAM_BASE)))
+
+
+def _percentile(histogram: Dict[int, int], fraction: float) -> float:
+    """Approximate latency percentile (microseconds) from a bucketed histogram"""
+    total = sum(histogram.values())
+    if not total:
+        return 0.0
+    threshold, seen = fraction * total, 0
+    for bucket in sorted(histogram):
+        seen += histogram[bucket]
+        if seen >= threshold:
+            return round(HISTOGRAM_BASE ** bucket / 1000, 2)
+    return round(HISTOGRAM_BASE ** max(histogram) / 1000, 2)
+
+
+def _new_stats() -> Dict:
+    return {'count': 0, 'parsed': 0, 'correct': 0, 'crashes': 0}
+
+
+def run_shard(args) -> Dict:
+    """
+    Parse one shard of the corpus (runs in a worker process)
+
+    Args:
+        args: (mode, start index, count, seed)
+
+    Returns:
+        Mergeable partial results: counters, latency histogram, slowest inputs
+    """
+    mode, start, count, seed = args
+    parser = AAMVAParser()
+    fuzz_rng = random.Random(seed * 7919 + start)
+
+    by_key = defaultdict(_new_stats)
+    histogram = Counter()
+    worst = []
+    field_misses = Counter()
+    crash_examples = []
+    total_bytes = 0
+    parse_ns = 0
+
+    for sample in corpus.generate_corpus(count, seed, start):
+        barcode = sample['barcode']
+        mutation = None
+        if mode == 'fuzz':
+            barcode, mutation = fuzz(barcode, fuzz_rng)
+        total_bytes += len(barcode)
+
+        crashed = False
+        started = time.perf_counter_ns()
+        try:
+            success, fields, _ = parser.parse(barcode)
+        except Exception as e:
+            # parse() is documented to report errors in its return value, never raise
+            success, fields, crashed = False, {}, True
+            if len(crash_examples) < WORST_CASES:
+                crash_examples.append({'error': repr(e), 'input': barcode[:500]})
+        elapsed = time.perf_counter_ns() - started
+        parse_ns += elapsed
+
+        histogram[_bucket(elapsed)] += 1
+        item = (elapsed, sample['jurisdiction'], sample['version'], mutation or sample['variant'], barcode[:300])
+        if len(worst) < WORST_CASES:
+            heapq.heappush(worst, item)
+        elif elapsed > worst[0][0]:
+            heapq.heapreplace(worst, item)
+
+        correct = success and all(fields.get(k) == v for k, v in sample['expected'].items())
+        if success and not correct and mode == 'corpus':
+            field_misses.update(k for k, v in sample['expected'].items() if fields.get(k) != v)
+
+        keys = [('version', f"{sample['version']:02d}"), ('variant', sample['variant']),
+                ('jurisdiction', sample['jurisdiction'])]
+        if mutation:
+            keys.append(('mutation', mutation))
+        for group, value in keys:
+            stats = by_key[(group, value)]
+            stats['count'] += 1
+            stats['parsed'] += success
+            stats['correct'] += correct
+            stats['crashes'] += crashed
+
+    return {
+        'count': count,
+        'bytes': total_bytes,
+        'parse_ns': parse_ns,
+        'by_key': dict(by_key),
+        'histogram': dict(histogram),
+        'worst': worst,
+        'field_misses': dict(field_misses),
+        'crash_examples': crash_examples,
+    }
+
+
+def merge_shards(shards: List[Dict]) -> Dict:
+    """Combine worker results"""
+    merged = {'count': 0, 'bytes': 0, 'parse_ns': 0, 'by_key': defaultdict(_new_stats),
+              'histogram': Counter(), 'worst': [], 'field_misses': Counter(), 'crash_examples': []}
+    for shard in shards:
+        merged['count'] += shard['count']
+        merged['bytes'] += shard['bytes']
+        merged['parse_ns'] += shard['parse_ns']
+        for key, stats in shard['by_key'].items():
+            for name, value in stats.items():
+                merged['by_key'][key][name] += value
+        merged['histogram'].update(shard['histogram'])
+        merged['worst'].extend(shard['worst'])
+        merged['field_misses'].update(shard['field_misses'])
+        merged['crash_examples'].extend(shard['crash_examples'])
+    merged['worst'] = heapq.nlargest(WORST_CASES, merged['worst'])
+    return merged
+
+
+def _rates(stats: Dict) -> Dict:
+    count = stats['count'] or 1
+    return {
+        'count': stats['count'],
+        'parse_rate': round(stats['parsed'] / count, 4),
+        'accuracy': round(stats['correct'] / count, 4),
+        'crashes': stats['crashes'],
+    }
+
+
+def run_benchmark(count: int, mode: str = 'corpus', seed: int = 0, workers: int = 1,
+                  shard_size: int = 50000) -> Dict:
+    """
+    Benchmark AAMVAParser.parse over `count` generated (or fuzzed) barcodes
+
+    Returns:
+        Report dictionary (throughput, latency percentiles, error rates, worst cases)
+    """
+    shards = [(mode, start, min(shard_size, count - start), seed) for start in range(0, count, shard_size)]
+    started = time.perf_counter()
+    if workers > 1:
+        from multiprocessing import Pool
+        with Pool(workers) as pool:
+            results = []
+            for result in pool.imap_unordered(run_shard, shards):
+                results.append(result)
+                print(f"  {sum(r['count'] for r in results):,}/{count:,}", flush=True)
+    else:
+        results = []
+        for shard in shards:
+            results.append(run_shard(shard))
+            print(f"  {sum(r['count'] for r in results):,}/{count:,}", flush=True)
+    wall_seconds = time.perf_counter() - started
+
+    merged = merge_shards(results)
+    parse_seconds = merged['parse_ns'] / 1e9
+    grouped = defaultdict(dict)
+    for (group, value), stats in sorted(merged['by_key'].items()):
+        grouped[group][value] = _rates(stats)
+    overall = _new_stats()
+    for (group, _), stats in merged['by_key'].items():
+        if group == 'version':
+            for name in overall:
+                overall[name] += stats[name]
+
+    return {
+        'generated_at': datetime.now().isoformat(timespec='seconds'),
+        'mode': mode,
+        'seed': seed,
+        'environment': {'python': sys.version.split()[0], 'platform': platform.platform(), 'workers': workers},
+        'inputs': merged['count'],
+        'throughput': {
+            'wall_seconds': round(wall_seconds, 2),
+            'parse_seconds': round(parse_seconds, 2),
+            'parses_per_second': round(merged['count'] / parse_seconds) if parse_seconds else None,
+            'megabytes_per_second': round(merged['bytes'] / 1e6 / parse_seconds, 2) if parse_seconds else None,
+        },
+        'latency_us': {
+            'p50': _percentile(merged['histogram'], 0.50),
+            'p99': _percentile(merged['histogram'], 0.99),
+            'p999': _percentile(merged['histogram'], 0.999),
+            'max': round(merged['worst'][0][0] / 1000, 2) if merged['worst'] else 0,
+        },
+        'overall': _rates(overall),
+        'by_version': grouped['version'],
+        'by_variant': grouped['variant'],
+        'by_jurisdiction': grouped['jurisdiction'],
+        'by_mutation': grouped.get('mutation', {}),
+        'field_misses': dict(merged['field_misses'].most_common()),
+        'worst_cases': [
+            {'latency_us': round(ns / 1000, 2), 'jurisdiction': jurisdiction, 'version': version,
+             'variant': variant, 'input': barcode}
+            for ns, jurisdiction, version, variant, barcode in merged['worst']
+        ],
+        'crash_examples': merged['crash_examples'][:WORST_CASES],
+    }
+
+
+def print_summary(report: Dict):
+    """Human-readable digest of a report"""
+    throughput = report['throughput']
+    print(f"\n{report['inputs']:,} inputs ({report['mode']}): {throughput['parses_per_second']:,} parses/s, "
+          f"{throughput['megabytes_per_second']} MB/s")
+    latency = report['latency_us']
+    print(f"Latency (us): p50 {latency['p50']}  p99 {latency['p99']}  p99.9 {latency['p999']}  max {latency['max']}")
+    overall = report['overall']
+    print(f"Parsed {overall['parse_rate']:.1%}, correct {overall['accuracy']:.1%}, crashes {overall['crashes']}")
+    for section in ['by_version', 'by_variant', 'by_mutation']:
+        if report[section]:
+            print(f"\n{section.replace('_', ' ').title()}:")
+            for key, stats in report[section].items():
+                print(f"  {key:<20} parsed {stats['parse_rate']:>7.1%}  correct {stats['accuracy']:>7.1%}"
+                      f"  crashes {stats['crashes']}")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark and fuzz AAMVAParser.parse")
+    parser.add_argument("--mode", choices=["corpus", "fuzz"], default="corpus")
+    parser.add_argument("--count", type=int, default=100000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--shard-size", type=int, default=50000)
+    parser.add_argument("--output", default=None, help="Write the JSON report here")
+    args = parser.parse_args()
+
+    benchmark = run_benchmark(args.count, args.mode, args.seed, args.workers, args.shard_size)
+    print_summary(benchmark)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as handle:
+            json.dump(benchmark, handle, indent=2)
+        print(f"\nReport written to {args.output}")
@@ -0,0 +1,330 @@
+"""
+Database Benchmark Suite
+License to Live: MIAS - Python/Streamlit Version
+Times every public database.py function against synthetic populations of several sizes
+and writes a machine-readable (JSON) report
+
+Usage:
+    python benchmark_database.py --scales 10000 100000 1000000 --output benchmark_report.json
+"""
+
+import inspect
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+import synthetic_data as sd
+
+# Plumbing that every benchmarked function already goes through, or that has no
+# meaningful cost of its own
+NOT_BENCHMARKED = {
+    'get_workload_stats': 'reads in-memory counters',
+    'workload': 'context manager selecting a connection class',
+    'get_streaming_connection': 'borrows an export connection, exercised by fhir_export',
+    'execute_query': 'exercised by every query',
+    'query_to_dataframe': 'exercised by every DataFrame query',
+    'execute_batch': 'exercised by bulk_import',
+    'execute_readonly': 'runs ad-hoc AI search SQL',
+    'stream_readonly': 'streams ad-hoc AI search SQL',
+    'get_snapshot_analytics': 'returns None without a snapshot directory',
+    'get_analytics_source': 'returns a label',
+    'get_replica_age': 'reads the local SQLite replica (unset while benchmarking)',
+    'load_replica_record': 'reads the local SQLite replica (unset while benchmarking)',
+    'encode_change_cursor': 'pure function, covered by get_changes',
+    'decode_change_cursor': 'pure function, covered by get_changes',
+    'calculate_age': 'pure function',
+    'emergency_token_digest': 'pure function, no database access',
+    'get_emergency_payload': 'needs emergency_payload_migration.sql, which synthetic_data.py does not apply',
+    'invalidate_patient_record': 'drops memoized records, no database access',
+    'login_patient': 'covered by authenticate_patient',
+    'record_login': 'queues in memory, written by flush_last_logins',
+}
+
+
+# ==================== BENCHMARK CONTEXT ====================
+
+class BenchmarkContext:
+    """Sampled inputs for one population size; generated patients are recomputed, not queried"""
+
+    def __init__(self, patients: int, seed: int, samples: int = 200):
+        self.rng = random.Random(seed + patients)
+        indexes = [self.rng.randrange(patients) for _ in range(samples)]
+        self.patients = [sd.generate_patient(i, seed)['patient'] for i in indexes]
+        self.with_token = [p for p in self.patients if p['emergency_token']] or self.patients
+        self.scratch_licenses: List[str] = []
+        self.scratch_ids: List[int] = []
+        self.counter = 0
+
+    def patient(self) -> Dict:
+        return self.rng.choice(self.patients)
+
+    def patient_id(self) -> int:
+        return self.patient()['patient_id']
+
+    def next_scratch_license(self) -> str:
+        self.counter += 1
+        license_number = f"{sd.SCRATCH_LICENSE_PREFIX}{self.counter:010d}"
+        self.scratch_licenses.append(license_number)
+        return license_number
+
+
+def build_cases(db) -> List[Tuple[str, str, Callable, int]]:
+    """
+    Benchmark cases as (group, function name, call(ctx), repeat)
+
+    Writes target scratch patients or restore the value they change, so the
+    population is left as it was found.
+    """
+    def scratch_patient(ctx):
+        return {
+            'license_number': ctx.next_scratch_license(), 'first_name': 'Bench', 'last_name': 'Mark',
+            'date_of_birth': '1980-01-01', 'state': 'TX', 'blood_type': 'O+', 'pin': '0000',
+        }
+
+    def scratch_id(ctx):
+        return ctx.scratch_ids[ctx.rng.randrange(len(ctx.scratch_ids))] if ctx.scratch_ids else ctx.patient_id()
+
+    def delete_scratch(ctx):
+        return db.delete_patient(ctx.scratch_ids.pop()) if ctx.scratch_ids else None
+
+    return [
+        # Search
+        ('search', 'search_patients', lambda ctx: db.search_patients(''), 20),
+        ('search', 'search_patients:term', lambda ctx: db.search_patients(ctx.patient()['last_name'][:4]), 20),
+        ('search', 'search_patients_by_license', lambda ctx: db.search_patients_by_license(ctx.patient()['license_number']), 50),
+        ('search', 'search_patients_by_name', lambda ctx: db.search_patients_by_name(ctx.patient()['first_name'], 'first'), 20),
+        ('search', 'search_patients_all_fields', lambda ctx: db.search_patients_all_fields(ctx.patient()['last_name']), 20),
+        ('search', 'license_exists', lambda ctx: db.license_exists(ctx.patient()['license_number']), 50),
+        ('search', 'get_patient_ids_by_license',
+         lambda ctx: db.get_patient_ids_by_license([p['license_number'] for p in ctx.patients[:100]]), 20),
+        ('search', 'get_all_patients', lambda ctx: db.get_all_patients(), 3),
+
+        # Patient records
+        ('patient', 'get_patient_details', lambda ctx: db.get_patient_details(ctx.patient_id()), 50),
+        ('patient', 'get_patient_by_id', lambda ctx: db.get_patient_by_id(ctx.patient_id()), 50),
+        ('patient', 'get_conditions', lambda ctx: db.get_conditions(ctx.patient_id()), 50),
+        ('patient', 'get_allergies', lambda ctx: db.get_allergies(ctx.patient_id()), 50),
+        ('patient', 'get_medications', lambda ctx: db.get_medications(ctx.patient_id()), 50),
+        ('patient', 'get_vaccinations', lambda ctx: db.get_vaccinations(ctx.patient_id()), 50),
+        ('patient', 'get_insurance', lambda ctx: db.get_insurance(ctx.patient_id()), 50),
+        ('patient', 'get_emergency_contacts', lambda ctx: db.get_emergency_contacts(ctx.patient_id()), 50),
+        ('patient', 'get_patient_record', lambda ctx: db.get_patient_record(ctx.patient_id()), 50),
+        ('patient', 'get_patient_record:token',
+         lambda ctx: db.get_patient_record(emergency_token=ctx.rng.choice(ctx.with_token)['emergency_token']), 50),
+
+        # Portal authentication
+        ('auth', 'authenticate_patient',
+         lambda ctx: (lambda p: db.authenticate_patient(p['license_number'], p['pin']))(ctx.patient()), 50),
+        ('auth', 'reset_patient_pin',
+         lambda ctx: (lambda p: db.reset_patient_pin(p['patient_id'], p['pin']))(ctx.patient()), 20),
+        ('auth', 'flush_last_logins:50',
+         lambda ctx: ([db.record_login(ctx.patient_id()) for _ in range(50)], db.flush_last_logins()), 20),
+
+        # Emergency access
+        ('emergency', 'get_patient_by_emergency_token',
+         lambda ctx: db.get_patient_by_emergency_token(ctx.rng.choice(ctx.with_token)['emergency_token']), 50),
+        ('emergency', 'get_patient_emergency_summary', lambda ctx: db.get_patient_emergency_summary(ctx.patient_id()), 20),
+        ('emergency', 'save_emergency_token',
+         lambda ctx: (lambda p: db.save_emergency_token(p['patient_id'], p['emergency_token']))(ctx.rng.choice(ctx.with_token)), 20),
+        ('emergency', 'log_emergency_access',
+         lambda ctx: (lambda p: db.log_emergency_access(p['patient_id'], p['emergency_token']))(ctx.rng.choice(ctx.with_token)), 20),
+
+        # Analytics
+        ('analytics', 'get_summary_stats', lambda ctx: db.get_summary_stats(), 5),
+        ('analytics', 'get_vaccination_data', lambda ctx: db.get_vaccination_data(), 5),
+        ('analytics', 'get_patient_demographics', lambda ctx: db.get_patient_demographics(), 3),
+        ('analytics', 'get_medication_stats', lambda ctx: db.get_medication_stats(), 5),
+        ('analytics', 'get_allergy_stats', lambda ctx: db.get_allergy_stats(), 5),
+        ('analytics', 'get_state_distribution', lambda ctx: db.get_state_distribution(), 5),
+        ('analytics', 'get_blood_type_distribution', lambda ctx: db.get_blood_type_distribution(), 5),
+        ('analytics', 'get_changes', lambda ctx: db.get_changes(None, 1000), 10),
+        ('analytics', 'get_data_version', lambda ctx: db.get_data_version(), 50),
+
+        # Writes (on scratch patients, deleted at the end)
+        ('write', 'insert_patient', lambda ctx: db.insert_patient(scratch_patient(ctx)), 50),
+        ('write', 'add_condition', lambda ctx: db.add_condition(scratch_id(ctx), 'Hypertension', '2020-01-01', 'Mild', None), 50),
+        ('write', 'add_allergy', lambda ctx: db.add_allergy(scratch_id(ctx), 'Penicillin', 'Medication', 'Mild', 'Hives'), 50),
+        ('write', 'add_medication',
+         lambda ctx: db.add_medication(scratch_id(ctx), 'Lisinopril', '10mg', 'Once daily',
+                                           'Dr. Bench', '2020-01-01'), 50),
+        ('write', 'add_conditions_bulk',
+         lambda ctx: db.add_conditions_bulk(scratch_id(ctx), [{'condition_name': f'Condition {i}'} for i in range(10)]), 20),
+        ('write', 'add_allergies_bulk',
+         lambda ctx: db.add_allergies_bulk(scratch_id(ctx), [{'allergen': f'Allergen {i}'} for i in range(10)]), 20),
+        ('write', 'add_medications_bulk',
+         lambda ctx: db.add_medications_bulk(scratch_id(ctx), [{'medication_name': f'Medication {i}', 'dosage': '10mg'}
+                                                              for i in range(15)]), 20),
+        ('write', 'add_vaccination', lambda ctx: db.add_vaccination(scratch_id(ctx), 'Influenza', '2024-10-01', None, None, None), 50),
+        ('write', 'add_insurance', lambda ctx: db.add_insurance(scratch_id(ctx), 'Aetna', 'POL000000000', None, None, None, True), 50),
+        ('write', 'add_emergency_contact',
+         lambda ctx: db.add_emergency_contact(scratch_id(ctx), 'Bench Contact', 'Friend', '555-555-0000',
+                                                  None, None, 1), 50),
+        ('write', 'update_patient_medical_info',
+         lambda ctx: db.update_patient_medical_info(scratch_id(ctx), 'blood_type', ctx.rng.choice(['A+', 'B+'])), 50),
+        ('write', 'delete_patient', delete_scratch, 50),
+    ]
+
+
+# ==================== TIMING ====================
+
+def _failed(result) -> bool:
+    """(False, message) tuples are how database.py reports failures"""
+    return isinstance(result, tuple) and len(result) > 0 and result[0] is False
+
+
+def time_case(call: Callable, ctx: BenchmarkContext, repeat: int, warmup: int = 1) -> Dict:
+    """Run one case `repeat` times and summarize latency in milliseconds"""
+    for _ in range(warmup):
+        call(ctx)
+
+    timings, errors = [], 0
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = call(ctx)
+        timings.append((time.perf_counter() - started) * 1000)
+        errors += _failed(result)
+
+    timings.sort()
+    return {
+        'runs': repeat,
+        'errors': errors,
+        'min_ms': round(timings[0], 3),
+        'median_ms': round(statistics.median(timings), 3),
+        'p95_ms': round(timings[min(len(timings) - 1, int(len(timings) * 0.95))], 3),
+        'mean_ms': round(statistics.fmean(timings), 3),
+        'max_ms': round(timings[-1], 3),
+    }
+
+
+def public_functions(db) -> List[str]:
+    """Public functions defined in database.py"""
+    return sorted(name for name, member in inspect.getmembers(db, inspect.isfunction)
+                  if not name.startswith('_') and member.__module__ == db.__name__)
+
+
+def run_scale(db, patients: int, seed: int, repeat_factor: float = 1.0,
+              only: Optional[List[str]] = None) -> Dict:
+    """Benchmark every case against the population currently loaded"""
+    ctx = BenchmarkContext(patients, seed)
+    results = {}
+
+    for group, name, call, repeat in build_cases(db):
+        if only and group not in only:
+            continue
+        # Writes use no warmup so every call is counted and delete_patient can remove every insert
+        warmup = 0 if group == 'write' else 1
+        if name == 'add_condition' and not ctx.scratch_ids:
+            ctx.scratch_ids = list(db.get_patient_ids_by_license(ctx.scratch_licenses).values())
+        results[name] = dict(time_case(call, ctx, max(1, int(repeat * repeat_factor)), warmup), group=group)
+        print(f"  {group:<10} {name:<34} median {results[name]['median_ms']:>9.2f} ms"
+              f"  p95 {results[name]['p95_ms']:>9.2f} ms", flush=True)
+
+    # Remove any scratch patients left over (e.g. when writes were skipped)
+    leftovers = db.get_patient_ids_by_license(ctx.scratch_licenses)
+    for patient_id in leftovers.values():
+        db.delete_patient(patient_id)
+
+    return results
+
+
+def run_benchmark(scales: List[int], seed: int, settings: Dict, reset: bool = False,
+                  repeat_factor: float = 1.0, only: Optional[List[str]] = None) -> Dict:
+    """Load each scale in turn (growing the same population) and benchmark it"""
+    # Point database.py at the benchmark server before it is imported
+    os.environ['MIAS_DB_HOST'] = settings['host']
+    os.environ['MIAS_DB_PORT'] = str(settings['port'])
+    os.environ['MIAS_DB_USER'] = settings['user']
+    os.environ['MIAS_DB_PASSWORD'] = settings['password']
+    os.environ['MIAS_DB_NAME'] = settings['database']
+    os.environ.pop('MIAS_ANALYTICS_SNAPSHOT_DIR', None)
+    import database as db
+
+    loader = sd.connect(settings['host'], settings['port'], settings['user'], settings['password'])
+    if reset:
+        sd.create_database(loader, settings['database'])
+    else:
+        loader.select_db(settings['database'])
+
+    with loader.cursor() as cursor:
+        cursor.execute("SELECT VERSION()")
+        server_version = cursor.fetchone()[0]
+
+    functions = public_functions(db)
+    covered = {name.split(':')[0] for _, name, _, _ in build_cases(db)}
+
+    report = {
+        'generated_at': datetime.now().isoformat(timespec='seconds'),
+        'seed': seed,
+        'environment': {
+            'python': sys.version.split()[0],
+            'platform': platform.platform(),
+            'mysql': server_version,
+            'host': settings['host'],
+            'database': settings['database'],
+        },
+        'coverage': {
+            'public_functions': len(functions),
+            'not_benchmarked': {name: NOT_BENCHMARKED.get(name, 'no benchmark case')
+                                for name in functions if name not in covered},
+        },
+        'scales': [],
+    }
+
+    for patients in sorted(scales):
+        print(f"Scale {patients:,}: loading")
+        load = sd.load_population(loader, patients, seed, progress=False)
+        print(f"  added {load['patients_added']:,} patients in {load['seconds']}s")
+        with loader.cursor() as cursor:
+            rows = {}
+            for table in ['Patients'] + sd.CHILD_TABLES:
+                cursor.execute(f"SELECT COUNT(*) FROM {table}")
+                rows[table] = cursor.fetchone()[0]
+        loader.commit()
+
+        report['scales'].append({
+            'patients': patients,
+            'rows': rows,
+            'load': load,
+            'results': run_scale(db, patients, seed, repeat_factor, only),
+        })
+
+    loader.close()
+    return report
+
+
+if __name__ == "__main__":
+    import argparse
+
+    defaults = sd.connection_settings_from_env()
+    parser = argparse.ArgumentParser(description="Benchmark database.py against synthetic populations")
+    parser.add_argument("--scales", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--seed", type=int, default=sd.DEFAULT_SEED)
+    parser.add_argument("--reset", action="store_true", help="Recreate the benchmark database from the schema first")
+    parser.add_argument("--repeat-factor", type=float, default=1.0, help="Scale the number of runs per case")
+    parser.add_argument("--only", nargs="+", choices=['search', 'patient', 'auth', 'emergency', 'analytics', 'write'])
+    parser.add_argument("--output", default="benchmark_report.json")
+    parser.add_argument("--host", default=defaults['host'])
+    parser.add_argument("--port", type=int, default=defaults['port'])
+    parser.add_argument("--user", default=defaults['user'])
+    parser.add_argument("--password", default=defaults['password'])
+    parser.add_argument("--database", default=defaults['database'])
+    parser.add_argument("--allow-remote", action="store_true")
+    args = parser.parse_args()
+
+    sd.check_target(args.host, args.allow_remote)
+    benchmark = run_benchmark(
+        args.scales, args.seed,
+        {'host': args.host, 'port': args.port, 'user': args.user,
+         'password': args.password, 'database': args.database},
+        reset=args.reset, repeat_factor=args.repeat_factor, only=args.only,
+    )
+
+    with open(args.output, 'w', encoding='utf-8') as handle:
+        json.dump(benchmark, handle, indent=2, default=str)
+    print(f"Report written to {args.output}")
@@ -0,0 +1,136 @@
+"""
+Emergency QR Code Benchmark
+License to Live: MIAS - Python/Streamlit Version
+Compares the legacy emergency QR encoding (URL-safe token, full page URL, fixed High error
+correction) with the compact one (base32 token, short entry URL, optimize_qr) and reports
+QR version, module count, module size on the printed card and render time
+
+Usage:
+    python benchmark_qr.py --samples 200 --output qr_report.json
+"""
+
+import json
+import platform
+import secrets
+import statistics
+import sys
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+import qrcode
+
+import qr_generator
+from offline_qr_payload import PREFIX, base45_encode, qr_fragment
+
+# Encoding used before compact tokens (kept here as the baseline)
+LEGACY_BASE_URL = "https://bryanbarber214.github.io/MIAS-License-to-Live/emergency_access.html"
+
+# Pixels the QR code is printed at on the wallet card (create_printable_qr_card)
+CARD_QR_PIXELS = 350
+
+# Signed offline summary size used for the "+ offline" scenarios (a typical record)
+OFFLINE_PAYLOAD_BYTES = 144
+
+TARGETS = {'H': qrcode.constants.ERROR_CORRECT_H, 'Q': qrcode.constants.ERROR_CORRECT_Q,
+           'M': qrcode.constants.ERROR_CORRECT_M}
+
+
+# ==================== ENCODINGS ====================
+
+def legacy_qr(data_url: str) -> qrcode.QRCode:
+    """QR code as create_emergency_qr_code built it before optimize_qr"""
+    qr = qrcode.QRCode(version=1, error_correction=qrcode.constants.ERROR_CORRECT_H, box_size=10, border=4)
+    qr.add_data(data_url)
+    qr.make(fit=True)
+    return qr
+
+
+def legacy_url(offline: Optional[str]) -> str:
+    url = f"{LEGACY_BASE_URL}?token={secrets.token_urlsafe(32)}"
+    return url + qr_fragment(offline) if offline else url
+
+
+def compact_url(offline: Optional[str]) -> str:
+    return qr_generator.emergency_url(qr_generator.generate_emergency_token(), offline_payload=offline)
+
+
+# ==================== MEASUREMENT ====================
+
+def measure(build_url: Callable[[], str], build_qr: Callable[[str], qrcode.QRCode], samples: int) -> Dict:
+    """
+    Build and render `samples` codes for fresh tokens
+
+    Render time covers fitting, the matrix and the PIL image, which is what a
+    card print costs.
+    """
+    timings: List[float] = []
+    stats = None
+    for _ in range(samples):
+        url = build_url()
+        started = time.perf_counter()
+        qr = build_qr(url)
+        qr.make_image(fill_color="black", back_color="white")
+        timings.append((time.perf_counter() - started) * 1000)
+        current = qr_generator.qr_stats(qr)
+        # Versions can differ between tokens (legacy tokens vary in mode); keep the largest
+        if stats is None or current['version'] > stats['version']:
+            stats = dict(current, characters=len(url))
+
+    return dict(stats,
+                card_module_px=round(CARD_QR_PIXELS / stats['modules_with_border'], 2),
+                render_ms={'median': round(statistics.median(timings), 3),
+                           'p95': round(sorted(timings)[int(len(timings) * 0.95) - 1], 3)})
+
+
+def run_benchmark(samples: int = 200, offline_bytes: int = OFFLINE_PAYLOAD_BYTES) -> Dict:
+    """
+    Measure legacy and compact encodings, with and without an offline summary
+
+    Returns:
+        Report dictionary keyed by scenario
+    """
+    offline = PREFIX + base45_encode(secrets.token_bytes(offline_bytes))
+    scenarios = {}
+    for suffix, payload in [('', None), (' + offline', offline)]:
+        scenarios['legacy H' + suffix] = measure(lambda: legacy_url(payload), legacy_qr, samples)
+        for name, level in TARGETS.items():
+            scenarios[f'compact {name}' + suffix] = measure(
+                lambda: compact_url(payload), lambda url: qr_generator.optimize_qr(url, level), samples)
+
+    return {
+        'generated_at': datetime.now().isoformat(timespec='seconds'),
+        'environment': {'python': sys.version.split()[0], 'platform': platform.platform(),
+                        'qrcode': getattr(qrcode, '__version__', None)},
+        'samples': samples,
+        'offline_payload_characters': len(offline),
+        'scenarios': scenarios,
+    }
+
+
+def print_summary(report: Dict):
+    """Human-readable digest of a report"""
+    print(f"\n{'scenario':<22}{'chars':>6}{'ver':>5}{'ec':>4}{'modules':>9}{'card px':>9}"
+          f"{'render ms':>11}{'p95':>8}")
+    for name, result in report['scenarios'].items():
+        print(f"{name:<22}{result['characters']:>6}{result['version']:>5}{result['error_correction']:>4}"
+              f"{result['modules']:>9}{result['card_module_px']:>9}{result['render_ms']['median']:>11}"
+              f"{result['render_ms']['p95']:>8}")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark emergency QR code size and render time")
+    parser.add_argument("--samples", type=int, default=200, help="Codes built per scenario")
+    parser.add_argument("--offline-bytes", type=int, default=OFFLINE_PAYLOAD_BYTES,
+                        help="Size of the simulated signed offline summary")
+    parser.add_argument("--output", default=None, help="Write the JSON report here")
+    args = parser.parse_args()
+
+    benchmark = run_benchmark(args.samples, args.offline_bytes)
+    print_summary(benchmark)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as handle:
+            json.dump(benchmark, handle, indent=2)
+        print(f"\nReport written to {args.output}")
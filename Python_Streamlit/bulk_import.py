@@ -0,0 +1,568 @@
+"""
+Bulk Medical Record Import
+License to Live: MIAS - Python/Streamlit Version
+Streams CSV spreadsheets and FHIR Bundles into the medical record tables
+"""
+
+import json
+import time
+from datetime import date
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import pandas as pd
+
+import database as db
+
+# Rows validated, resolved and written per transaction
+DEFAULT_CHUNK_SIZE = 1000
+
+# Maximum number of row errors kept in an import report
+MAX_REPORTED_ERRORS = 200
+
+# Import specification for every child table
+# columns: insert order after patient_id, required: must be non-empty,
+# dates: parsed to YYYY-MM-DD, choices: allowed values (matched case-insensitively)
+RECORD_TYPES = {
+    'conditions': {
+        'table': 'Medical_Conditions',
+        'columns': ['condition_name', 'diagnosis_date', 'severity', 'notes'],
+        'required': ['condition_name'],
+        'dates': ['diagnosis_date'],
+        'choices': {'severity': ['Mild', 'Moderate', 'Severe', 'Critical']},
+    },
+    'allergies': {
+        'table': 'Allergies',
+        'columns': ['allergen', 'allergy_type', 'reaction', 'severity'],
+        'required': ['allergen'],
+        'dates': [],
+        'choices': {
+            'allergy_type': ['Medication', 'Food', 'Environmental', 'Other'],
+            'severity': ['Mild', 'Moderate', 'Severe', 'Life-threatening'],
+        },
+    },
+    'medications': {
+        'table': 'Medications',
+        'columns': ['medication_name', 'dosage', 'frequency', 'start_date',
+                    'end_date', 'prescribing_doctor', 'notes'],
+        'required': ['medication_name'],
+        'dates': ['start_date', 'end_date'],
+        'choices': {},
+    },
+    'vaccinations': {
+        'table': 'Vaccinations',
+        'columns': ['vaccine_name', 'administration_date', 'next_due_date',
+                    'lot_number', 'administered_by'],
+        'required': ['vaccine_name', 'administration_date'],
+        'dates': ['administration_date', 'next_due_date'],
+        'choices': {},
+    },
+    'insurance': {
+        'table': 'Insurance',
+        'columns': ['provider_name', 'policy_number', 'group_number',
+                    'effective_date', 'expiration_date', 'is_active'],
+        'required': ['provider_name', 'policy_number'],
+        'dates': ['effective_date', 'expiration_date'],
+        'choices': {},
+    },
+    'emergency_contacts': {
+        'table': 'Emergency_Contacts',
+        'columns': ['contact_name', 'relationship', 'phone_primary',
+                    'phone_secondary', 'email', 'priority_order'],
+        'required': ['contact_name', 'phone_primary'],
+        'dates': [],
+        'choices': {},
+    },
+}
+
+# FHIR resource type handled for each record type
+FHIR_RESOURCE_TYPES = {
+    'Condition': 'conditions',
+    'AllergyIntolerance': 'allergies',
+    'MedicationStatement': 'medications',
+    'Immunization': 'vaccinations',
+    'Coverage': 'insurance',
+    'RelatedPerson': 'emergency_contacts',
+}
+
+# Identifier system used for driver license numbers in FHIR resources
+LICENSE_IDENTIFIER_SYSTEM = 'urn:mias:driver-license'
+
+TRUE_VALUES = {'1', 'true', 'yes', 'y', 't', 'active'}
+
+
+def build_insert_query(record_type: str) -> str:
+    """Build the parameterized INSERT statement for a record type"""
+    spec = RECORD_TYPES[record_type]
+    columns = ['patient_id'] + spec['columns']
+    placeholders = ", ".join(["%s"] * len(columns))
+    return f"INSERT INTO {spec['table']} ({', '.join(columns)}) VALUES ({placeholders})"
+
+
+def new_report(record_type: str) -> Dict:
+    """Create an empty import report"""
+    return {
+        'record_type': record_type,
+        'rows_read': 0,
+        'rows_imported': 0,
+        'rows_rejected': 0,
+        'chunks': 0,
+        'errors': [],
+        'elapsed_seconds': 0.0,
+        'rows_per_second': 0.0,
+    }
+
+
+# ==================== VALIDATION ====================
+
+def normalize_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """Lower-case column headers and replace spaces/dashes with underscores"""
+    df = df.copy()
+    df.columns = [str(c).strip().lower().replace(' ', '_').replace('-', '_') for c in df.columns]
+    return df
+
+
+def validate_chunk(df: pd.DataFrame, record_type: str) -> Tuple[pd.DataFrame, List[Dict]]:
+    """
+    Validate and normalize one chunk of rows with vectorized pandas passes
+
+    Args:
+        df: Chunk with a license_number column plus the record type's columns
+        record_type: Key of RECORD_TYPES
+
+    Returns:
+        Tuple of (valid rows DataFrame, list of row error dicts)
+    """
+    spec = RECORD_TYPES[record_type]
+    df = normalize_columns(df)
+
+    if 'row_number' not in df.columns:
+        df['row_number'] = range(1, len(df) + 1)
+
+    if 'license_number' not in df.columns:
+        return df.iloc[0:0], [{'row': None, 'license_number': None,
+                               'error': "Missing required column: license_number"}]
+
+    # Missing optional columns become NULLs
+    for column in spec['columns']:
+        if column not in df.columns:
+            df[column] = None
+
+    text_columns = ['license_number'] + [c for c in spec['columns'] if c not in spec['dates']]
+    for column in text_columns:
+        df[column] = df[column].astype('string').str.strip().replace('', pd.NA)
+
+    errors = pd.Series('', index=df.index, dtype='object')
+
+    def flag(mask: pd.Series, message: str):
+        mask = mask.fillna(False).astype(bool)
+        errors[mask & (errors == '')] = message
+
+    flag(df['license_number'].isna(), "license_number is required")
+    for column in spec['required']:
+        flag(df[column].isna(), f"{column} is required")
+
+    for column in spec['dates']:
+        # Keep only the date part of ISO timestamps (FHIR dateTime values)
+        raw = df[column].astype('string').str.strip().str.replace(r'T.*$', '', regex=True).replace('', pd.NA)
+        parsed = pd.to_datetime(raw, errors='coerce', format='mixed')
+        flag(raw.notna() & parsed.isna(), f"{column} is not a valid date")
+        df[column] = parsed.dt.strftime('%Y-%m-%d').where(parsed.notna(), None)
+
+    for column, allowed in spec['choices'].items():
+        canonical = {value.lower(): value for value in allowed}
+        mapped = df[column].str.lower().map(canonical)
+        flag(df[column].notna() & mapped.isna(),
+             f"{column} must be one of: {', '.join(allowed)}")
+        df[column] = mapped
+
+    # Record type specific rules
+    if record_type == 'medications':
+        # Same default as add_medication: start today when no date is given
+        df['start_date'] = df['start_date'].fillna(date.today().strftime('%Y-%m-%d'))
+    elif record_type == 'insurance':
+        df['is_active'] = df['is_active'].fillna('1').str.lower().isin(TRUE_VALUES).astype(int)
+    elif record_type == 'emergency_contacts':
+        priority = pd.to_numeric(df['priority_order'], errors='coerce')
+        flag(df['priority_order'].notna() & priority.isna(), "priority_order must be a number")
+        df['priority_order'] = priority
+
+    invalid = errors != ''
+    error_list = [
+        {'row': int(row_number), 'license_number': None if pd.isna(license_number) else license_number,
+         'error': message}
+        for row_number, license_number, message in zip(
+            df.loc[invalid, 'row_number'], df.loc[invalid, 'license_number'], errors[invalid]
+        )
+    ]
+
+    return df.loc[~invalid], error_list
+
+
+def resolve_patient_ids(frames: Dict[str, pd.DataFrame]) -> Tuple[Dict[str, pd.DataFrame], List[Dict]]:
+    """
+    Attach patient_id to every row using one license lookup for the whole chunk
+
+    Args:
+        frames: Validated rows per record type
+
+    Returns:
+        Tuple of (frames with patient_id column, errors for unknown licenses)
+    """
+    licenses = set()
+    for df in frames.values():
+        licenses.update(df['license_number'].dropna().unique().tolist())
+
+    patient_ids = db.get_patient_ids_by_license(sorted(licenses))
+
+    resolved = {}
+    errors = []
+    for record_type, df in frames.items():
+        df = df.copy()
+        df['patient_id'] = df['license_number'].map(patient_ids)
+        unknown = df['patient_id'].isna()
+        errors.extend(
+            {'row': int(row_number), 'license_number': license_number,
+             'error': "License number not found"}
+            for row_number, license_number in zip(df.loc[unknown, 'row_number'],
+                                                  df.loc[unknown, 'license_number'])
+        )
+        resolved[record_type] = df.loc[~unknown]
+
+    return resolved, errors
+
+
+def frame_to_rows(df: pd.DataFrame, record_type: str) -> List[Tuple]:
+    """Convert a resolved DataFrame into INSERT parameter tuples"""
+    columns = ['patient_id'] + RECORD_TYPES[record_type]['columns']
+    values = df[columns].astype(object).where(df[columns].notna(), None)
+    values['patient_id'] = values['patient_id'].astype(int)
+    if record_type == 'emergency_contacts':
+        values['priority_order'] = [int(v) if v is not None else None for v in values['priority_order']]
+    return list(values.itertuples(index=False, name=None))
+
+
+def write_chunk(frames: Dict[str, pd.DataFrame], report: Dict):
+    """Validate, resolve and write one chunk of rows in a single transaction"""
+    report['chunks'] += 1
+
+    valid_frames = {}
+    for record_type, df in frames.items():
+        report['rows_read'] += len(df)
+        valid, errors = validate_chunk(df, record_type)
+        report['rows_rejected'] += len(df) - len(valid)
+        record_errors(report, errors)
+        if not valid.empty:
+            valid_frames[record_type] = valid
+
+    if not valid_frames:
+        return
+
+    resolved, errors = resolve_patient_ids(valid_frames)
+    report['rows_rejected'] += len(errors)
+    record_errors(report, errors)
+
+    statements = [
+        (build_insert_query(record_type), frame_to_rows(df, record_type))
+        for record_type, df in resolved.items() if not df.empty
+    ]
+    if not statements:
+        return
+
+    row_count = sum(len(rows) for _, rows in statements)
+    # Each patient's emergency payload is rebuilt once per chunk, not once per imported row
+    payload_patients = {int(patient_id) for record_type, df in resolved.items()
+                        if RECORD_TYPES[record_type]['table'] in db.EMERGENCY_PAYLOAD_TABLES
+                        for patient_id in df['patient_id']}
+    success, _, message = db.execute_batch(statements, payload_patients=payload_patients)
+
+    if success:
+        report['rows_imported'] += row_count
+    else:
+        report['rows_rejected'] += row_count
+        record_errors(report, [{'row': None, 'license_number': None,
+                                'error': f"Chunk {report['chunks']} rolled back: {message}"}])
+
+
+def record_errors(report: Dict, errors: List[Dict]):
+    """Keep the first MAX_REPORTED_ERRORS error messages of an import"""
+    room = MAX_REPORTED_ERRORS - len(report['errors'])
+    if room > 0:
+        report['errors'].extend(errors[:room])
+
+
+def finish_report(report: Dict, started: float) -> Dict:
+    """Fill in timing fields of a report"""
+    elapsed = time.perf_counter() - started
+    report['elapsed_seconds'] = round(elapsed, 3)
+    report['rows_per_second'] = round(report['rows_imported'] / elapsed, 1) if elapsed > 0 else 0.0
+    return report
+
+
+# ==================== CSV IMPORT ====================
+
+def import_csv(source, record_type: str, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Dict:
+    """
+    Stream a CSV file into one medical record table
+
+    The file needs a license_number column plus any of the record type's
+    columns (e.g. medication_name, dosage, frequency for medications).
+
+    Args:
+        source: File path or file-like object
+        record_type: Key of RECORD_TYPES (e.g. 'medications', 'allergies')
+        chunk_size: Rows per validation/write transaction
+
+    Returns:
+        Import report dictionary
+    """
+    if record_type not in RECORD_TYPES:
+        raise ValueError(f"Unknown record type: {record_type}")
+
+    report = new_report(record_type)
+    started = time.perf_counter()
+
+    reader = pd.read_csv(source, chunksize=chunk_size, dtype=str,
+                         keep_default_na=False, skipinitialspace=True)
+    first_row = 2  # Line 1 is the header
+    for chunk in reader:
+        chunk['row_number'] = range(first_row, first_row + len(chunk))
+        first_row += len(chunk)
+        write_chunk({record_type: chunk}, report)
+
+    return finish_report(report, started)
+
+
+# ==================== FHIR IMPORT ====================
+
+def _text(concept: Optional[Dict]) -> Optional[str]:
+    """Readable text of a FHIR CodeableConcept"""
+    if not concept:
+        return None
+    if concept.get('text'):
+        return concept['text']
+    for coding in concept.get('coding', []):
+        if coding.get('display') or coding.get('code'):
+            return coding.get('display') or coding.get('code')
+    return None
+
+
+def _note(resource: Dict) -> Optional[str]:
+    notes = [n.get('text') for n in resource.get('note', []) if n.get('text')]
+    return "\n".join(notes) if notes else None
+
+
+def _license_from_identifiers(identifiers: List[Dict]) -> Optional[str]:
+    for identifier in identifiers or []:
+        if identifier.get('system') == LICENSE_IDENTIFIER_SYSTEM:
+            return identifier.get('value')
+    return identifiers[0].get('value') if identifiers else None
+
+
+def _patient_license(reference: Optional[Dict], patients: Dict[str, str]) -> Optional[str]:
+    """Resolve a FHIR patient reference to a license number"""
+    if not reference:
+        return None
+    if reference.get('identifier'):
+        return reference['identifier'].get('value')
+    ref = reference.get('reference', '')
+    if ref in patients:
+        return patients[ref]
+    if '?identifier=' in ref:
+        return ref.split('?identifier=', 1)[1].split('|')[-1]
+    return None
+
+
+def fhir_resource_to_row(resource: Dict, patients: Dict[str, str]) -> Optional[Tuple[str, Dict]]:
+    """
+    Map a FHIR R4 resource onto a (record_type, row) pair
+
+    Args:
+        resource: FHIR resource dictionary
+        patients: Map of Patient references (e.g. 'Patient/12') to license numbers
+
+    Returns:
+        (record_type, row dict) or None for unsupported resource types
+    """
+    record_type = FHIR_RESOURCE_TYPES.get(resource.get('resourceType'))
+    if not record_type:
+        return None
+
+    if record_type == 'conditions':
+        row = {
+            'license_number': _patient_license(resource.get('subject'), patients),
+            'condition_name': _text(resource.get('code')),
+            'diagnosis_date': resource.get('onsetDateTime') or resource.get('recordedDate'),
+            'severity': _text(resource.get('severity')),
+            'notes': _note(resource),
+        }
+    elif record_type == 'allergies':
+        reaction = (resource.get('reaction') or [{}])[0]
+        severity = reaction.get('severity')
+        if resource.get('criticality') == 'high' and severity in (None, 'severe'):
+            severity = 'Life-threatening'
+        category = (resource.get('category') or [None])[0]
+        row = {
+            'license_number': _patient_license(resource.get('patient'), patients),
+            'allergen': _text(resource.get('code')),
+            'allergy_type': {'medication': 'Medication', 'food': 'Food',
+                             'environment': 'Environmental'}.get(category, 'Other' if category else None),
+            'reaction': _text((reaction.get('manifestation') or [None])[0]),
+            'severity': severity,
+        }
+    elif record_type == 'medications':
+        period = resource.get('effectivePeriod', {})
+        row = {
+            'license_number': _patient_license(resource.get('subject'), patients),
+            'medication_name': _text(resource.get('medicationCodeableConcept')),
+            'dosage': (resource.get('dosage') or [{}])[0].get('text'),
+            'frequency': ((resource.get('dosage') or [{}])[0].get('timing') or {}).get('code', {}).get('text'),
+            'start_date': period.get('start') or resource.get('effectiveDateTime'),
+            'end_date': period.get('end'),
+            'prescribing_doctor': (resource.get('informationSource') or {}).get('display'),
+            'notes': _note(resource),
+        }
+    elif record_type == 'vaccinations':
+        row = {
+            'license_number': _patient_license(resource.get('patient'), patients),
+            'vaccine_name': _text(resource.get('vaccineCode')),
+            'administration_date': resource.get('occurrenceDateTime'),
+            'next_due_date': None,
+            'lot_number': resource.get('lotNumber'),
+            'administered_by': ((resource.get('performer') or [{}])[0].get('actor') or {}).get('display'),
+        }
+    elif record_type == 'insurance':
+        period = resource.get('period', {})
+        group = next((c.get('value') for c in resource.get('class', [])
+                      if _text(c.get('type')) in ('group', 'Group')), None)
+        row = {
+            'license_number': _patient_license(resource.get('beneficiary'), patients),
+            'provider_name': (resource.get('payor') or [{}])[0].get('display'),
+            'policy_number': resource.get('subscriberId') or _license_from_identifiers(resource.get('identifier')),
+            'group_number': group,
+            'effective_date': period.get('start'),
+            'expiration_date': period.get('end'),
+            'is_active': '1' if resource.get('status', 'active') == 'active' else '0',
+        }
+    else:  # emergency_contacts
+        name = (resource.get('name') or [{}])[0]
+        phone_telecom = [t for t in resource.get('telecom', []) if t.get('system') == 'phone']
+        phones = [t.get('value') for t in phone_telecom]
+        emails = [t.get('value') for t in resource.get('telecom', []) if t.get('system') == 'email']
+        row = {
+            'license_number': _patient_license(resource.get('patient'), patients),
+            'contact_name': name.get('text') or " ".join(name.get('given', []) + [name.get('family', '')]).strip(),
+            'relationship': _text((resource.get('relationship') or [None])[0]),
+            'phone_primary': phones[0] if phones else None,
+            'phone_secondary': phones[1] if len(phones) > 1 else None,
+            'email': emails[0] if emails else None,
+            'priority_order': phone_telecom[0].get('rank') if phone_telecom else None,
+        }
+
+    return record_type, row
+
+
+def iter_fhir_resources(source) -> Iterator[Tuple[Optional[str], Dict]]:
+    """
+    Yield (fullUrl, resource) pairs from a FHIR Bundle or Bulk Data NDJSON file
+
+    NDJSON is streamed line by line; a Bundle is one JSON document and is
+    parsed whole before its entries are yielded.
+
+    Args:
+        source: File path or binary file-like object
+    """
+    handle = open(source, 'rb') if isinstance(source, str) else source
+
+    try:
+        first_line = handle.readline()
+        try:
+            first = json.loads(first_line)
+        except json.JSONDecodeError:
+            first = None
+
+        if isinstance(first, dict) and first.get('resourceType') != 'Bundle':
+            yield None, first
+            for line in handle:
+                if line.strip():
+                    yield None, json.loads(line)
+            return
+
+        handle.seek(0)
+        bundle = json.load(handle)
+        for entry in bundle.get('entry', []):
+            if entry.get('resource'):
+                yield entry.get('fullUrl'), entry['resource']
+    finally:
+        if handle is not source:
+            handle.close()
+
+
+def import_fhir(source, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Dict:
+    """
+    Stream a FHIR Bundle or NDJSON file into the medical record tables
+
+    Patient resources in the input are only used to resolve references;
+    patients must already be registered (matched by license number).
+
+    Args:
+        source: File path or binary file-like object
+        chunk_size: Resources per validation/write transaction
+
+    Returns:
+        Import report dictionary
+    """
+    report = new_report('fhir')
+    started = time.perf_counter()
+
+    patients = {}
+    pending: Dict[str, List[Dict]] = {}
+    pending_count = 0
+    resource_number = 0
+
+    for full_url, resource in iter_fhir_resources(source):
+        resource_number += 1
+
+        if resource.get('resourceType') == 'Patient':
+            license_number = _license_from_identifiers(resource.get('identifier'))
+            if license_number:
+                patients[f"Patient/{resource.get('id')}"] = license_number
+                if full_url:
+                    patients[full_url] = license_number
+            continue
+
+        mapped = fhir_resource_to_row(resource, patients)
+        if not mapped:
+            continue
+
+        record_type, row = mapped
+        row['row_number'] = resource_number
+        pending.setdefault(record_type, []).append(row)
+        pending_count += 1
+
+        if pending_count >= chunk_size:
+            write_chunk({rt: pd.DataFrame(rows) for rt, rows in pending.items()}, report)
+            pending, pending_count = {}, 0
+
+    if pending:
+        write_chunk({rt: pd.DataFrame(rows) for rt, rows in pending.items()}, report)
+
+    return finish_report(report, started)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Bulk import medical records into MIAS")
+    parser.add_argument("path", help="CSV, FHIR Bundle JSON or NDJSON file")
+    parser.add_argument("--type", choices=sorted(RECORD_TYPES), help="Record type (required for CSV)")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    args = parser.parse_args()
+
+    if args.path.lower().endswith('.csv'):
+        if not args.type:
+            parser.error("--type is required for CSV files")
+        result = import_csv(args.path, args.type, args.chunk_size)
+    else:
+        result = import_fhir(args.path, args.chunk_size)
+
+    print(json.dumps(result, indent=2, default=str))
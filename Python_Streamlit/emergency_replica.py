@@ -0,0 +1,180 @@
+"""
+Emergency Replica Sync Agent
+License to Live: MIAS - Python/Streamlit Version
+Keeps a clinic-local SQLite copy of the data an emergency scan needs (patient identity,
+blood type, conditions, allergies, medications and emergency contacts), pulled
+incrementally from the change feed, so token lookups read from local disk and keep
+working while the database is unreachable
+
+database.py reads the file named by MIAS_EMERGENCY_REPLICA before MySQL (see
+PatientRecord.load). Run this agent next to the app:
+
+Usage:
+    python emergency_replica.py sync /var/lib/mias/emergency.sqlite
+    python emergency_replica.py watch /var/lib/mias/emergency.sqlite --interval 30
+"""
+
+import json
+import os
+import sqlite3
+import time
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Dict, List
+
+import database as db
+
+# Table -> columns copied (first column is the primary key). Derived from the record
+# layout, so the replica holds exactly what a PatientRecord is built from.
+REPLICA_TABLES = {'Patients': ['patient_id', 'emergency_token'] + db.PATIENT_RECORD_COLUMNS[1:]}
+REPLICA_TABLES.update({
+    db.PATIENT_RECORD_SECTIONS[name][0]: db.PATIENT_RECORD_SECTIONS[name][1]
+    for name in db.EMERGENCY_REPLICA_SECTIONS
+})
+
+# Change feed rows fetched per table per poll
+FEED_LIMIT = 2000
+
+
+# ==================== REPLICA FILE ====================
+
+def open_replica(path: str) -> sqlite3.Connection:
+    """Open (creating if needed) the replica for writing"""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    connection = sqlite3.connect(path)
+    # WAL lets the app keep reading while a sync is writing
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=NORMAL")
+    connection.execute("CREATE TABLE IF NOT EXISTS Replica_State (key TEXT PRIMARY KEY, value TEXT)")
+    for table, columns in REPLICA_TABLES.items():
+        definitions = ', '.join(f"{column}{' PRIMARY KEY' if i == 0 else ''}" for i, column in enumerate(columns))
+        connection.execute(f"CREATE TABLE IF NOT EXISTS {table} ({definitions})")
+        lookup = 'emergency_token' if table == 'Patients' else 'patient_id'
+        connection.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_{lookup} ON {table} ({lookup})")
+    connection.commit()
+    return connection
+
+
+def load_state(connection: sqlite3.Connection) -> Dict:
+    """Change feed cursor and last completed sync time"""
+    return {key: json.loads(value) for key, value in connection.execute("SELECT key, value FROM Replica_State")}
+
+
+def _save_state(connection: sqlite3.Connection, **values):
+    connection.executemany("INSERT OR REPLACE INTO Replica_State (key, value) VALUES (?, ?)",
+                           [(key, json.dumps(value)) for key, value in values.items()])
+
+
+def _sqlite_value(value):
+    """MySQL values as SQLite stores them (dates as ISO text, as in the JSON record query)"""
+    if isinstance(value, datetime):
+        return value.isoformat(sep=' ')
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    return value
+
+
+def _apply_changes(connection: sqlite3.Connection, changes: Dict) -> Dict[str, int]:
+    counts = {}
+    for table, rows in changes['upserts'].items():
+        columns = REPLICA_TABLES.get(table)
+        if not columns:
+            continue
+        connection.executemany(
+            f"INSERT OR REPLACE INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+            [tuple(_sqlite_value(row.get(column)) for column in columns) for row in rows]
+        )
+        counts[table] = counts.get(table, 0) + len(rows)
+
+    for deleted in changes['deletes']:
+        table = deleted['table_name']
+        if table not in REPLICA_TABLES:
+            continue
+        connection.execute(f"DELETE FROM {table} WHERE {REPLICA_TABLES[table][0]} = ?", (deleted['record_id'],))
+        if table == 'Patients':
+            for child in REPLICA_TABLES:
+                if child != 'Patients':
+                    connection.execute(f"DELETE FROM {child} WHERE patient_id = ?", (deleted['record_id'],))
+        counts['deletes'] = counts.get('deletes', 0) + 1
+    return counts
+
+
+# ==================== SYNC ====================
+
+def sync_replica(path: str) -> Dict:
+    """
+    Bring the replica up to date from the change feed
+
+    Only rows changed since the previous sync are read (database.get_changes,
+    limited to the replicated tables). Each batch is applied together with
+    its cursor in one SQLite transaction, so an interrupted sync resumes
+    where it stopped. synced_at is only advanced once the feed is drained,
+    which is what the app's freshness check relies on.
+
+    Args:
+        path: Replica file (created if missing)
+
+    Returns:
+        Summary dictionary with rows applied per table and the sync time
+
+    Raises:
+        ConnectionError: If the database could not be reached
+    """
+    connection = open_replica(path)
+    try:
+        # Checked up front: get_changes() reads an unreachable database as "no changes"
+        started = time.time()
+        if db.get_data_version() is None:
+            raise ConnectionError("Database unreachable; replica left as it was")
+
+        cursor = load_state(connection).get('cursor')
+        counts: Dict[str, int] = {}
+        while True:
+            changes = db.get_changes(cursor, limit=FEED_LIMIT, tables=list(REPLICA_TABLES))
+            with connection:
+                for key, count in _apply_changes(connection, changes).items():
+                    counts[key] = counts.get(key, 0) + count
+                cursor = changes['cursor']
+                _save_state(connection, cursor=cursor)
+            if not changes['has_more']:
+                break
+
+        with connection:
+            _save_state(connection, synced_at=started)
+        patients = connection.execute("SELECT COUNT(*) FROM Patients").fetchone()[0]
+        return {'rows': counts, 'patients': patients,
+                'synced_at': datetime.fromtimestamp(started).isoformat(timespec='seconds')}
+    finally:
+        connection.close()
+
+
+def watch(path: str, interval: float) -> None:
+    """Sync every interval seconds until interrupted, reporting each pass"""
+    while True:
+        try:
+            print(json.dumps(sync_replica(path), default=str))
+        except ConnectionError as e:
+            print(f"{datetime.now().isoformat(timespec='seconds')} {e}")
+        time.sleep(interval)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Maintain the clinic-local MIAS emergency replica")
+    parser.add_argument("command", choices=["sync", "watch"])
+    parser.add_argument("path", nargs="?", default=os.environ.get('MIAS_EMERGENCY_REPLICA'))
+    parser.add_argument("--interval", type=float, default=30,
+                        help="Seconds between syncs for watch (keep well under MIAS_EMERGENCY_REPLICA_MAX_AGE)")
+    args = parser.parse_args()
+
+    if not args.path:
+        parser.error("path is required (or set MIAS_EMERGENCY_REPLICA)")
+
+    if args.command == "sync":
+        print(json.dumps(sync_replica(args.path), indent=2, default=str))
+    else:
+        watch(args.path, args.interval)
@@ -0,0 +1,103 @@
+"""
+Fake LLM Client
+License to Live: MIAS - Python/Streamlit Version
+Local stand-in for the Anthropic client used by AI Database Search, so the page can be
+run and tested without an API key or network access
+
+Set MIAS_AI_FAKE_LLM=1 to make the page use it. Responses come from the JSON file named by
+MIAS_AI_FAKE_LLM_RESPONSES ({"normalized question": {"sql": ..., "explanation": ..., "is_safe": ...}})
+or, for other questions, a fixed patient count. MIAS_AI_FAKE_LLM_DELAY adds seconds of
+latency per streamed chunk, to watch the page render progressively.
+"""
+
+import json
+import os
+import time
+from typing import Dict, Iterator, List, Optional
+
+from ai_query_cache import normalize_question
+
+DEFAULT_RESPONSE = {
+    'sql': "SELECT COUNT(*) AS patient_count FROM Patients",
+    'explanation': "Fake LLM answer: counts all patients.",
+    'is_safe': True,
+}
+
+# Characters per streamed text chunk
+CHUNK_SIZE = 12
+
+
+class _TextBlock:
+    def __init__(self, text: str):
+        self.type = 'text'
+        self.text = text
+
+
+class _Message:
+    def __init__(self, text: str):
+        self.content = [_TextBlock(text)]
+        self.stop_reason = 'end_turn'
+
+
+class _Stream:
+    """Context manager shaped like anthropic's MessageStream (text_stream, get_final_message)"""
+
+    def __init__(self, text: str, delay: float):
+        self._text = text
+        self._delay = delay
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    @property
+    def text_stream(self) -> Iterator[str]:
+        for start in range(0, len(self._text), CHUNK_SIZE):
+            if self._delay:
+                time.sleep(self._delay)
+            yield self._text[start:start + CHUNK_SIZE]
+
+    def get_final_message(self) -> _Message:
+        return _Message(self._text)
+
+
+class _Messages:
+    def __init__(self, client: 'FakeAnthropic'):
+        self._client = client
+
+    def _reply(self, messages: List[Dict]) -> str:
+        content = messages[-1]['content']
+        question = content.split(':', 1)[1] if content.startswith('Convert this to SQL:') else content
+        self._client.calls.append(question.strip())
+        response = self._client.responses.get(normalize_question(question), DEFAULT_RESPONSE)
+        return json.dumps(response, indent=2)
+
+    def create(self, messages: List[Dict], **kwargs) -> _Message:
+        return _Message(self._reply(messages))
+
+    def stream(self, messages: List[Dict], **kwargs) -> _Stream:
+        return _Stream(self._reply(messages), self._client.delay)
+
+
+class FakeAnthropic:
+    """
+    Drop-in for anthropic.Anthropic covering messages.create and messages.stream
+
+    Args:
+        responses: Normalized question -> response dictionary (default: MIAS_AI_FAKE_LLM_RESPONSES file)
+        delay: Seconds to sleep before each streamed chunk
+    """
+
+    def __init__(self, responses: Optional[Dict[str, Dict]] = None, delay: Optional[float] = None):
+        if responses is None:
+            path = os.environ.get('MIAS_AI_FAKE_LLM_RESPONSES')
+            responses = {}
+            if path:
+                with open(path, encoding='utf-8') as handle:
+                    responses = json.load(handle)
+        self.responses = {normalize_question(question): response for question, response in responses.items()}
+        self.delay = float(os.environ.get('MIAS_AI_FAKE_LLM_DELAY', 0)) if delay is None else delay
+        self.calls: List[str] = []
+        self.messages = _Messages(self)
@@ -0,0 +1,338 @@
+"""
+FHIR Bulk Data Export
+License to Live: MIAS - Python/Streamlit Version
+Streams the whole MIAS population to FHIR R4 NDJSON files (one file per resource type)
+"""
+
+import json
+import os
+import time
+from datetime import date, datetime
+from typing import Dict, Iterator, List, Optional
+
+import database as db
+from bulk_import import LICENSE_IDENTIFIER_SYSTEM
+
+# Patients read per keyset chunk; child rows are fetched per chunk of patients
+DEFAULT_CHUNK_SIZE = 1000
+
+# Extension URL carrying the patient's blood type on Patient resources
+BLOOD_TYPE_EXTENSION = 'urn:mias:blood-type'
+
+PATIENT_COLUMNS = """
+    patient_id, license_number, first_name, last_name, date_of_birth,
+    address, city, state, zip_code, phone, email, blood_type, updated_at
+"""
+
+# Child tables in export order: (table, primary key, FHIR resource type)
+CHILD_TABLES = [
+    ('Medical_Conditions', 'condition_id', 'Condition'),
+    ('Allergies', 'allergy_id', 'AllergyIntolerance'),
+    ('Medications', 'medication_id', 'MedicationStatement'),
+    ('Vaccinations', 'vaccination_id', 'Immunization'),
+    ('Insurance', 'insurance_id', 'Coverage'),
+    ('Emergency_Contacts', 'contact_id', 'RelatedPerson'),
+]
+
+RESOURCE_TYPES = ['Patient'] + [resource_type for _, _, resource_type in CHILD_TABLES]
+
+
+def _iso(value) -> Optional[str]:
+    """ISO-8601 string for dates/datetimes (None stays None)"""
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return str(value) if value is not None else None
+
+
+def _clean(resource: Dict) -> Dict:
+    """Drop empty values so NDJSON lines stay compact"""
+    return {k: v for k, v in resource.items() if v not in (None, '', [], {})}
+
+
+def _meta(row: Dict) -> Optional[Dict]:
+    return {'lastUpdated': _iso(row['updated_at'])} if row.get('updated_at') else None
+
+
+def _patient_reference(patient: Dict) -> Dict:
+    return {
+        'reference': f"Patient/{patient['patient_id']}",
+        'identifier': {'system': LICENSE_IDENTIFIER_SYSTEM, 'value': patient['license_number']},
+    }
+
+
+def _concept(text: Optional[str]) -> Optional[Dict]:
+    return {'text': text} if text else None
+
+
+def _notes(text: Optional[str]) -> Optional[List[Dict]]:
+    return [{'text': text}] if text else None
+
+
+# ==================== RESOURCE MAPPING ====================
+
+def patient_resource(row: Dict) -> Dict:
+    """Map a Patients row to a FHIR Patient resource"""
+    telecom = []
+    if row.get('phone'):
+        telecom.append({'system': 'phone', 'value': row['phone']})
+    if row.get('email'):
+        telecom.append({'system': 'email', 'value': row['email']})
+
+    address = _clean({
+        'line': [row['address']] if row.get('address') else None,
+        'city': row.get('city'),
+        'state': row.get('state'),
+        'postalCode': row.get('zip_code'),
+    })
+
+    return _clean({
+        'resourceType': 'Patient',
+        'id': str(row['patient_id']),
+        'meta': _meta(row),
+        'identifier': [{'system': LICENSE_IDENTIFIER_SYSTEM, 'value': row['license_number']}],
+        'name': [_clean({'family': row.get('last_name'), 'given': [row['first_name']] if row.get('first_name') else None})],
+        'birthDate': _iso(row.get('date_of_birth')),
+        'telecom': telecom,
+        'address': [address] if address else None,
+        'extension': [{'url': BLOOD_TYPE_EXTENSION, 'valueString': row['blood_type']}] if row.get('blood_type') else None,
+    })
+
+
+def condition_resource(row: Dict, patient: Dict) -> Dict:
+    """Map a Medical_Conditions row to a FHIR Condition resource"""
+    return _clean({
+        'resourceType': 'Condition',
+        'id': str(row['condition_id']),
+        'meta': _meta(row),
+        'subject': _patient_reference(patient),
+        'code': _concept(row.get('condition_name')),
+        'onsetDateTime': _iso(row.get('diagnosis_date')),
+        'severity': _concept(row.get('severity')),
+        'note': _notes(row.get('notes')),
+    })
+
+
+def allergy_resource(row: Dict, patient: Dict) -> Dict:
+    """Map an Allergies row to a FHIR AllergyIntolerance resource"""
+    severity = row.get('severity')
+    category = {'Medication': 'medication', 'Food': 'food',
+                'Environmental': 'environment'}.get(row.get('allergy_type'))
+    reaction = _clean({
+        'manifestation': [{'text': row['reaction']}] if row.get('reaction') else None,
+        'severity': severity.lower() if severity in ('Mild', 'Moderate', 'Severe') else None,
+    })
+
+    return _clean({
+        'resourceType': 'AllergyIntolerance',
+        'id': str(row['allergy_id']),
+        'meta': _meta(row),
+        'patient': _patient_reference(patient),
+        'code': _concept(row.get('allergen')),
+        'category': [category] if category else None,
+        'criticality': 'high' if severity == 'Life-threatening' else None,
+        'reaction': [reaction] if reaction else None,
+    })
+
+
+def medication_resource(row: Dict, patient: Dict) -> Dict:
+    """Map a Medications row to a FHIR MedicationStatement resource"""
+    end_date = row.get('end_date')
+    active = end_date is None or (isinstance(end_date, date) and end_date >= date.today())
+    dosage = _clean({
+        'text': row.get('dosage'),
+        'timing': {'code': {'text': row['frequency']}} if row.get('frequency') else None,
+    })
+
+    return _clean({
+        'resourceType': 'MedicationStatement',
+        'id': str(row['medication_id']),
+        'meta': _meta(row),
+        'status': 'active' if active else 'completed',
+        'subject': _patient_reference(patient),
+        'medicationCodeableConcept': _concept(row.get('medication_name')),
+        'effectivePeriod': _clean({'start': _iso(row.get('start_date')), 'end': _iso(end_date)}),
+        'dosage': [dosage] if dosage else None,
+        'informationSource': {'display': row['prescribing_doctor']} if row.get('prescribing_doctor') else None,
+        'note': _notes(row.get('notes')),
+    })
+
+
+def immunization_resource(row: Dict, patient: Dict) -> Dict:
+    """Map a Vaccinations row to a FHIR Immunization resource"""
+    return _clean({
+        'resourceType': 'Immunization',
+        'id': str(row['vaccination_id']),
+        'meta': _meta(row),
+        'status': 'completed',
+        'patient': _patient_reference(patient),
+        'vaccineCode': _concept(row.get('vaccine_name')),
+        'occurrenceDateTime': _iso(row.get('administration_date')),
+        'lotNumber': row.get('lot_number'),
+        'performer': [{'actor': {'display': row['administered_by']}}] if row.get('administered_by') else None,
+    })
+
+
+def coverage_resource(row: Dict, patient: Dict) -> Dict:
+    """Map an Insurance row to a FHIR Coverage resource"""
+    return _clean({
+        'resourceType': 'Coverage',
+        'id': str(row['insurance_id']),
+        'meta': _meta(row),
+        'status': 'active' if row.get('is_active') else 'cancelled',
+        'beneficiary': _patient_reference(patient),
+        'payor': [{'display': row.get('provider_name')}],
+        'subscriberId': row.get('policy_number'),
+        'class': [{'type': {'text': 'group'}, 'value': row['group_number']}] if row.get('group_number') else None,
+        'period': _clean({'start': _iso(row.get('effective_date')), 'end': _iso(row.get('expiration_date'))}),
+    })
+
+
+def related_person_resource(row: Dict, patient: Dict) -> Dict:
+    """Map an Emergency_Contacts row to a FHIR RelatedPerson resource"""
+    rank = row.get('priority_order')
+    telecom = [_clean({'system': 'phone', 'value': row.get('phone_primary'), 'rank': rank})]
+    if row.get('phone_secondary'):
+        telecom.append({'system': 'phone', 'value': row['phone_secondary']})
+    if row.get('email'):
+        telecom.append({'system': 'email', 'value': row['email']})
+
+    return _clean({
+        'resourceType': 'RelatedPerson',
+        'id': str(row['contact_id']),
+        'meta': _meta(row),
+        'patient': _patient_reference(patient),
+        'relationship': [{'text': row['relationship']}] if row.get('relationship') else None,
+        'name': [{'text': row.get('contact_name')}],
+        'telecom': telecom,
+    })
+
+
+RESOURCE_BUILDERS = {
+    'Condition': condition_resource,
+    'AllergyIntolerance': allergy_resource,
+    'MedicationStatement': medication_resource,
+    'Immunization': immunization_resource,
+    'Coverage': coverage_resource,
+    'RelatedPerson': related_person_resource,
+}
+
+
+# ==================== STREAMING READS ====================
+
+def iter_patient_chunks(connection, chunk_size: int) -> Iterator[List[Dict]]:
+    """
+    Read Patients in keyset-ordered chunks (patient_id > last seen)
+
+    Keyset pagination keeps every chunk an index range scan, unlike
+    OFFSET paging which rescans all earlier rows.
+    """
+    last_id = 0
+    while True:
+        with connection.cursor() as cursor:
+            cursor.execute(f"""
+                SELECT {PATIENT_COLUMNS}
+                FROM Patients
+                WHERE patient_id > %s
+                ORDER BY patient_id
+                LIMIT %s
+            """, (last_id, chunk_size))
+            chunk = list(cursor)
+
+        if not chunk:
+            return
+        yield chunk
+        last_id = chunk[-1]['patient_id']
+
+
+def iter_child_rows(connection, table: str, primary_key: str,
+                    first_id: int, last_id: int) -> Iterator[Dict]:
+    """Stream one child table's rows for a patient_id range from a server-side cursor"""
+    with connection.cursor() as cursor:
+        cursor.execute(f"""
+            SELECT *
+            FROM {table}
+            WHERE patient_id BETWEEN %s AND %s
+            ORDER BY patient_id, {primary_key}
+        """, (first_id, last_id))
+        for row in cursor:
+            yield row
+
+
+# ==================== EXPORT ====================
+
+def export_ndjson(output_dir: str, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Dict:
+    """
+    Export every patient and child record as FHIR Bulk Data NDJSON files
+
+    Patients are read in keyset chunks, and each child table is read with one
+    patient_id range query per chunk, joined in memory against that chunk's
+    patients. Only one chunk of patients is held in memory.
+
+    Files are written as <ResourceType>.ndjson plus a manifest.json in the
+    Bulk Data output manifest format. Files are renamed into place only
+    after the export completes.
+
+    Args:
+        output_dir: Directory to write the export into (created if missing)
+        chunk_size: Patients per keyset chunk
+
+    Returns:
+        Manifest dictionary (resource counts, timings)
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    started = time.perf_counter()
+    transaction_time = datetime.now().astimezone().isoformat()
+
+    paths = {rt: os.path.join(output_dir, f"{rt}.ndjson") for rt in RESOURCE_TYPES}
+    files = {rt: open(path + '.part', 'w', encoding='utf-8') for rt, path in paths.items()}
+    counts = {rt: 0 for rt in RESOURCE_TYPES}
+
+    def write(resource_type: str, resource: Dict):
+        files[resource_type].write(json.dumps(resource, separators=(',', ':'), default=str))
+        files[resource_type].write('\n')
+        counts[resource_type] += 1
+
+    try:
+        with db.get_streaming_connection() as connection:
+            for chunk in iter_patient_chunks(connection, chunk_size):
+                patients = {row['patient_id']: row for row in chunk}
+                for row in chunk:
+                    write('Patient', patient_resource(row))
+
+                first_id, last_id = chunk[0]['patient_id'], chunk[-1]['patient_id']
+                for table, primary_key, resource_type in CHILD_TABLES:
+                    build = RESOURCE_BUILDERS[resource_type]
+                    for row in iter_child_rows(connection, table, primary_key, first_id, last_id):
+                        patient = patients.get(row['patient_id'])
+                        if patient:
+                            write(resource_type, build(row, patient))
+    finally:
+        for handle in files.values():
+            handle.close()
+
+    for resource_type, path in paths.items():
+        os.replace(path + '.part', path)
+
+    manifest = {
+        'transactionTime': transaction_time,
+        'requiresAccessToken': False,
+        'output': [{'type': rt, 'url': os.path.basename(paths[rt]), 'count': counts[rt]}
+                   for rt in RESOURCE_TYPES],
+        'error': [],
+        'elapsedSeconds': round(time.perf_counter() - started, 3),
+    }
+    with open(os.path.join(output_dir, 'manifest.json'), 'w', encoding='utf-8') as handle:
+        json.dump(manifest, handle, indent=2)
+
+    return manifest
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Export MIAS records as FHIR Bulk Data NDJSON")
+    parser.add_argument("output_dir", help="Directory to write <ResourceType>.ndjson files into")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    args = parser.parse_args()
+
+    print(json.dumps(export_ndjson(args.output_dir, args.chunk_size), indent=2))
@@ -0,0 +1,346 @@
+"""
+Emergency Access Load Test
+License to Live: MIAS - Python/Streamlit Version
+Replays concurrent QR token scans against the emergency access path (database.py or the
+Emergency API script) on a local MySQL seeded by synthetic_data.py, and reports throughput,
+latency percentiles, error rates and MySQL connection usage per concurrency level
+
+Usage:
+    python loadtest_emergency.py --patients 100000 --concurrency 1 8 32 64 --duration 30
+    python loadtest_emergency.py --target api --concurrency 4 16
+"""
+
+import base64
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+import synthetic_data as sd
+
+API_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Emergency_API', 'api.py')
+
+# MySQL status counters sampled while a stage runs
+CONNECTION_STATUS = ('Threads_connected', 'Threads_running', 'Connections', 'Max_used_connections')
+
+
+# ==================== WORKLOAD ====================
+
+class ScanMix:
+    """
+    Token stream for a mass-casualty event
+
+    Warm scans repeat a small set of patients (the same casualties scanned by
+    several responders, so their rows are hot in the buffer pool); cold scans
+    hit a random patient anywhere in the population; invalid scans are
+    damaged or forged tokens that must be rejected.
+    """
+
+    def __init__(self, patients: int, seed: int, warm_ratio: float, invalid_ratio: float, warm_pool: int = 200):
+        self.patients = patients
+        self.seed = seed
+        self.warm_ratio = warm_ratio
+        self.invalid_ratio = invalid_ratio
+        rng = random.Random(seed)
+        self.warm_tokens = []
+        while len(self.warm_tokens) < min(warm_pool, patients):
+            token = sd.generate_patient(rng.randrange(patients), seed)['patient']['emergency_token']
+            if token:
+                self.warm_tokens.append(token)
+
+    def next_scan(self, rng: random.Random) -> Tuple[str, str]:
+        """Returns (kind, token)"""
+        roll = rng.random()
+        if roll < self.invalid_ratio:
+            return 'invalid', base64.urlsafe_b64encode(rng.getrandbits(256).to_bytes(32, 'big')).rstrip(b'=').decode()
+        if roll < self.invalid_ratio + self.warm_ratio:
+            return 'warm', rng.choice(self.warm_tokens)
+        while True:
+            token = sd.generate_patient(rng.randrange(self.patients), self.seed)['patient']['emergency_token']
+            if token:
+                return 'cold', token
+
+
+# ==================== TARGETS ====================
+
+def make_db_target() -> Callable[[str], bool]:
+    """Emergency path through database.py, in the order Emergency_API/api.py calls it"""
+    import database as db
+
+    def scan(token: str) -> bool:
+        # Prebuilt payload first, as the API does; None without the Emergency_Payloads
+        # migration or while a fresh replica answers, so the record read below runs instead
+        prebuilt = db.get_emergency_payload(token)
+        if prebuilt:
+            db.log_emergency_access(prebuilt[0], token)
+            return True
+        record = db.get_patient_record(emergency_token=token)
+        if not record:
+            return False
+        db.log_emergency_access(record.patient_id, token)
+        return True
+
+    return scan
+
+
+def make_api_target() -> Callable[[str], bool]:
+    """Full Emergency API script run per scan (Streamlit AppTest, in-process)"""
+    from streamlit.testing.v1 import AppTest
+    sys.path.insert(0, os.path.dirname(API_SCRIPT))
+
+    def scan(token: str) -> bool:
+        app = AppTest.from_file(API_SCRIPT, default_timeout=60)
+        app.query_params['token'] = token
+        app.run()
+        if app.exception:
+            raise RuntimeError(app.exception[0].value)
+        response = json.loads(app.markdown[0].value)
+        if not response['success'] and response['error'].startswith('Server error'):
+            raise RuntimeError(response['error'])
+        return response['success']
+
+    return scan
+
+
+# ==================== MEASUREMENT ====================
+
+class ConnectionMonitor(threading.Thread):
+    """Samples MySQL connection counters on its own connection while a stage runs"""
+
+    def __init__(self, settings: Dict, interval: float = 0.5):
+        super().__init__(daemon=True)
+        self.connection = sd.connect(settings['host'], settings['port'], settings['user'], settings['password'])
+        self.interval = interval
+        self.samples: List[Dict] = []
+        self.stopped = threading.Event()
+
+    def sample(self) -> Dict:
+        with self.connection.cursor() as cursor:
+            cursor.execute("SHOW GLOBAL STATUS WHERE Variable_name IN %s", (CONNECTION_STATUS,))
+            return {name: int(value) for name, value in cursor.fetchall()}
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            self.samples.append(self.sample())
+
+    def summary(self, before: Dict) -> Dict:
+        after = self.sample()
+        samples = self.samples or [after]
+        return {
+            'peak_threads_connected': max(s['Threads_connected'] for s in samples),
+            'peak_threads_running': max(s['Threads_running'] for s in samples),
+            'new_connections': after['Connections'] - before['Connections'] - 1,
+            'max_used_connections': after['Max_used_connections'],
+        }
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+
+def _latency_summary(latencies: List[float]) -> Dict:
+    if not latencies:
+        return {'count': 0}
+    ordered = sorted(latencies)
+
+    def pct(fraction):
+        return round(ordered[min(len(ordered) - 1, int(len(ordered) * fraction))], 2)
+
+    return {
+        'count': len(ordered),
+        'p50_ms': pct(0.50),
+        'p95_ms': pct(0.95),
+        'p99_ms': pct(0.99),
+        'max_ms': round(ordered[-1], 2),
+        'mean_ms': round(statistics.fmean(ordered), 2),
+    }
+
+
+def run_stage(scan: Callable[[str], bool], mix: ScanMix, concurrency: int, duration: float,
+              settings: Dict, seed: int, background: Optional[Callable[[], None]] = None,
+              background_workers: int = 0) -> Dict:
+    """
+    Closed-loop load: `concurrency` workers scan back-to-back for `duration` seconds
+
+    `background_workers` threads call `background` in a loop meanwhile (e.g. dashboard
+    aggregates), to check that scans keep their latency under competing workloads.
+    """
+    results = defaultdict(list)
+    outcomes = defaultdict(lambda: defaultdict(int))
+    errors = []
+    lock = threading.Lock()
+    stop_at = time.perf_counter() + duration
+
+    def worker(number: int):
+        rng = random.Random(seed * 1009 + concurrency * 101 + number)
+        local = defaultdict(list)
+        local_outcomes = defaultdict(lambda: defaultdict(int))
+        while time.perf_counter() < stop_at:
+            kind, token = mix.next_scan(rng)
+            started = time.perf_counter()
+            try:
+                found = scan(token)
+                # Valid tokens must resolve and invalid ones must not
+                outcome = 'ok' if found == (kind != 'invalid') else 'wrong_result'
+            except Exception as e:
+                outcome = 'exception'
+                with lock:
+                    if len(errors) < 10:
+                        errors.append(repr(e))
+            local[kind].append((time.perf_counter() - started) * 1000)
+            local_outcomes[kind][outcome] += 1
+        with lock:
+            for kind, values in local.items():
+                results[kind].extend(values)
+            for kind, counts in local_outcomes.items():
+                for outcome, count in counts.items():
+                    outcomes[kind][outcome] += count
+
+    monitor = ConnectionMonitor(settings)
+    before = monitor.sample()
+    monitor.start()
+    started = time.perf_counter()
+
+    def background_worker():
+        while time.perf_counter() < stop_at:
+            try:
+                background()
+            except Exception:
+                pass
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(concurrency)]
+    threads += [threading.Thread(target=background_worker) for _ in range(background_workers if background else 0)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    monitor.stop()
+    connections = monitor.summary(before)
+    monitor.connection.close()
+
+    all_latencies = [value for values in results.values() for value in values]
+    total = len(all_latencies)
+    failed = sum(counts[o] for counts in outcomes.values() for o in ('exception', 'wrong_result'))
+    return {
+        'concurrency': concurrency,
+        'seconds': round(elapsed, 2),
+        'scans': total,
+        'throughput_per_second': round(total / elapsed, 1) if elapsed else 0,
+        'error_rate': round(failed / total, 4) if total else 0,
+        'latency': _latency_summary(all_latencies),
+        'by_kind': {kind: dict(_latency_summary(values), outcomes=dict(outcomes[kind]))
+                    for kind, values in sorted(results.items())},
+        'connections': connections,
+        'error_examples': errors,
+    }
+
+
+def run_load_test(settings: Dict, patients: int, concurrency_levels: List[int], duration: float,
+                  target: str = 'db', warm_ratio: float = 0.6, invalid_ratio: float = 0.05,
+                  seed: int = sd.DEFAULT_SEED, reset: bool = False, analytics_workers: int = 0) -> Dict:
+    """Seed the population if needed, then run one stage per concurrency level"""
+    os.environ['MIAS_DB_HOST'] = settings['host']
+    os.environ['MIAS_DB_PORT'] = str(settings['port'])
+    os.environ['MIAS_DB_USER'] = settings['user']
+    os.environ['MIAS_DB_PASSWORD'] = settings['password']
+    os.environ['MIAS_DB_NAME'] = settings['database']
+
+    loader = sd.connect(settings['host'], settings['port'], settings['user'], settings['password'])
+    if reset:
+        sd.create_database(loader, settings['database'])
+    else:
+        loader.select_db(settings['database'])
+    print(f"Seeding {patients:,} patients")
+    sd.load_population(loader, patients, seed, progress=False)
+    with loader.cursor() as cursor:
+        cursor.execute("SELECT VERSION()")
+        server_version = cursor.fetchone()[0]
+        cursor.execute("SHOW VARIABLES LIKE 'max_connections'")
+        max_connections = int(cursor.fetchone()[1])
+    loader.close()
+
+    scan = make_api_target() if target == 'api' else make_db_target()
+    mix = ScanMix(patients, seed, warm_ratio, invalid_ratio)
+
+    stages = []
+    for concurrency in concurrency_levels:
+        print(f"Concurrency {concurrency}: {duration}s")
+        background = None
+        if analytics_workers:
+            import database as db
+            background = db.get_summary_stats
+        stage = run_stage(scan, mix, concurrency, duration, settings, seed, background, analytics_workers)
+        if target == 'db':
+            import database as db
+            # Cumulative per-class admissions and waits (see database.WORKLOAD_CLASSES)
+            stage['workloads'] = db.get_workload_stats()
+        latency = stage['latency']
+        print(f"  {stage['throughput_per_second']} scans/s  p50 {latency.get('p50_ms')} ms  "
+              f"p95 {latency.get('p95_ms')} ms  p99 {latency.get('p99_ms')} ms  errors {stage['error_rate']:.2%}  "
+              f"connections {stage['connections']['peak_threads_connected']}")
+        stages.append(stage)
+
+    return {
+        'generated_at': datetime.now().isoformat(timespec='seconds'),
+        'target': target,
+        'patients': patients,
+        'mix': {'warm_ratio': warm_ratio, 'invalid_ratio': invalid_ratio,
+                'cold_ratio': round(1 - warm_ratio - invalid_ratio, 4), 'warm_pool': len(mix.warm_tokens)},
+        'duration_per_stage': duration,
+        'analytics_workers': analytics_workers,
+        'environment': {
+            'python': sys.version.split()[0],
+            'platform': platform.platform(),
+            'mysql': server_version,
+            'max_connections': max_connections,
+        },
+        'stages': stages,
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+
+    defaults = sd.connection_settings_from_env()
+    parser = argparse.ArgumentParser(description="Concurrent load test of the emergency QR access path")
+    parser.add_argument("--target", choices=["db", "api"], default="db",
+                        help="database.py emergency path, or the whole Emergency API script")
+    parser.add_argument("--patients", type=int, default=100000)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--duration", type=float, default=20, help="Seconds per concurrency level")
+    parser.add_argument("--warm-ratio", type=float, default=0.6)
+    parser.add_argument("--invalid-ratio", type=float, default=0.05)
+    parser.add_argument("--seed", type=int, default=sd.DEFAULT_SEED)
+    parser.add_argument("--reset", action="store_true")
+    parser.add_argument("--analytics-workers", type=int, default=0,
+                        help="Threads running dashboard aggregates alongside the scans")
+    parser.add_argument("--output", default="loadtest_report.json")
+    parser.add_argument("--host", default=defaults['host'])
+    parser.add_argument("--port", type=int, default=defaults['port'])
+    parser.add_argument("--user", default=defaults['user'])
+    parser.add_argument("--password", default=defaults['password'])
+    parser.add_argument("--database", default=defaults['database'])
+    parser.add_argument("--allow-remote", action="store_true")
+    args = parser.parse_args()
+
+    if args.warm_ratio + args.invalid_ratio > 1:
+        parser.error("--warm-ratio plus --invalid-ratio must not exceed 1")
+    sd.check_target(args.host, args.allow_remote)
+
+    report = run_load_test(
+        {'host': args.host, 'port': args.port, 'user': args.user,
+         'password': args.password, 'database': args.database},
+        args.patients, args.concurrency, args.duration, args.target,
+        args.warm_ratio, args.invalid_ratio, args.seed, args.reset, args.analytics_workers,
+    )
+    with open(args.output, 'w', encoding='utf-8') as handle:
+        json.dump(report, handle, indent=2)
+    print(f"Report written to {args.output}")
@@ -0,0 +1,364 @@
+"""
+Offline QR Payload
+License to Live: MIAS - Python/Streamlit Version
+Compact signed summary of a patient's most critical emergency data, carried inside the
+emergency QR code so a responder without signal can still read it
+
+Layout (modelled on EU Digital COVID Certificate QR codes):
+    "MIAS1:" + base45( zlib( version | key id | TLV fields | Ed25519 signature ) )
+
+TLV fields are tag (1 byte), length (1 byte), value. The signature covers everything before
+it, and a token binding field ties the summary to the card's emergency token, so a signed
+summary cannot be moved onto another patient's card.
+
+Keys: MIAS_QR_SIGNING_KEY holds the base64 Ed25519 private key (32-byte seed) used when
+printing cards; verifiers get the matching public keys (MIAS_QR_VERIFY_KEYS, comma
+separated). Create a pair with:
+    python offline_qr_payload.py keygen
+Decode and verify a scanned code with:
+    python offline_qr_payload.py decode "<scanned text>" --public-key <base64>
+"""
+
+import base64
+import hashlib
+import os
+import struct
+import zlib
+from datetime import date, timedelta
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs, quote, unquote, urlsplit
+
+PREFIX = 'MIAS1:'
+FORMAT_VERSION = 1
+
+# Field tags
+TAG_NAME = 0x01
+TAG_DATE_OF_BIRTH = 0x02
+TAG_BLOOD_TYPE = 0x03
+TAG_ALLERGY = 0x04
+TAG_CONDITION = 0x05
+TAG_ICE_PHONE = 0x06
+TAG_TOKEN_BINDING = 0x07
+TAG_ISSUED = 0x08
+
+# Severity codes stored as the first byte of allergy and condition values. The schema
+# grades the two differently (allergies top out at Life-threatening, conditions at Critical).
+ALLERGY_SEVERITY_CODES = {'Life-threatening': 3, 'Severe': 2, 'Moderate': 1, 'Mild': 0}
+CONDITION_SEVERITY_CODES = {'Critical': 3, 'Severe': 2, 'Moderate': 1, 'Mild': 0}
+SEVERITY_NAMES = {
+    TAG_ALLERGY: {code: name for name, code in ALLERGY_SEVERITY_CODES.items()},
+    TAG_CONDITION: {code: name for name, code in CONDITION_SEVERITY_CODES.items()},
+}
+
+# Code for a missing or unrecognized severity (decodes as None, sorts last)
+SEVERITY_UNKNOWN = 0xFF
+
+# Most entries of each kind carried (the card is not the full record)
+MAX_ALLERGIES = 3
+MAX_CONDITIONS = 3
+
+# Allergies at or above this severity are carried
+MIN_ALLERGY_SEVERITY = ALLERGY_SEVERITY_CODES['Severe']
+
+# Longest text value in bytes
+MAX_TEXT_BYTES = 40
+
+# Dates are stored as days since this day (2 bytes, good until 2079)
+DAY_ZERO = date(1900, 1, 1)
+
+SIGNATURE_BYTES = 64
+KEY_ID_BYTES = 4
+
+BASE45_CHARSET = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ $%*+-./:'
+
+
+# ==================== BASE45 (RFC 9285) ====================
+
+def base45_encode(data: bytes) -> str:
+    """Base45 text (QR alphanumeric mode characters only)"""
+    out = []
+    for i in range(0, len(data), 2):
+        if i + 1 < len(data):
+            value = data[i] * 256 + data[i + 1]
+            value, c = divmod(value, 45)
+            value, d = divmod(value, 45)
+            out.extend((c, d, value))
+        else:
+            value, c = divmod(data[i], 45)
+            out.extend((c, value))
+    return ''.join(BASE45_CHARSET[v] for v in out)
+
+
+def base45_decode(text: str) -> bytes:
+    """
+    Bytes from base45 text
+
+    Raises:
+        ValueError: On characters outside the base45 alphabet or malformed length
+    """
+    try:
+        values = [BASE45_CHARSET.index(ch) for ch in text]
+    except ValueError:
+        raise ValueError("Invalid base45 character")
+    out = bytearray()
+    for i in range(0, len(values), 3):
+        chunk = values[i:i + 3]
+        if len(chunk) == 3:
+            value = chunk[0] + chunk[1] * 45 + chunk[2] * 45 * 45
+            if value > 0xFFFF:
+                raise ValueError("Invalid base45 chunk")
+            out.extend(divmod(value, 256))
+        elif len(chunk) == 2:
+            value = chunk[0] + chunk[1] * 45
+            if value > 0xFF:
+                raise ValueError("Invalid base45 chunk")
+            out.append(value)
+        else:
+            raise ValueError("Invalid base45 length")
+    return bytes(out)
+
+
+# ==================== KEYS ====================
+
+def generate_signing_key() -> Dict[str, str]:
+    """New Ed25519 key pair as base64 (private: 32-byte seed, public: 32 bytes)"""
+    from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey
+
+    private_key = Ed25519PrivateKey.generate()
+    return {'private_key': base64.b64encode(private_key.private_bytes_raw()).decode('ascii'),
+            'public_key': base64.b64encode(private_key.public_key().public_bytes_raw()).decode('ascii')}
+
+
+def load_signing_key(encoded: Optional[str] = None):
+    """Ed25519 private key from base64 (default: MIAS_QR_SIGNING_KEY), or None if not configured"""
+    from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey
+
+    encoded = encoded or os.environ.get('MIAS_QR_SIGNING_KEY')
+    if not encoded:
+        return None
+    return Ed25519PrivateKey.from_private_bytes(base64.b64decode(encoded))
+
+
+def _key_id(public_key_bytes: bytes) -> bytes:
+    return hashlib.sha256(public_key_bytes).digest()[:KEY_ID_BYTES]
+
+
+def token_binding(emergency_token: str) -> bytes:
+    """First 8 bytes of SHA-256 of the emergency token"""
+    return hashlib.sha256(emergency_token.encode('utf-8')).digest()[:8]
+
+
+# ==================== ENCODING ====================
+
+def _text(value: str) -> bytes:
+    data = str(value).strip().encode('utf-8')[:MAX_TEXT_BYTES]
+    # Don't leave half a multi-byte character at the cut
+    return data.decode('utf-8', 'ignore').encode('utf-8')
+
+
+def _field(tag: int, value: bytes) -> bytes:
+    return bytes((tag, len(value))) + value
+
+
+def _days(value) -> bytes:
+    if isinstance(value, str):
+        value = date.fromisoformat(value[:10])
+    return struct.pack('>H', (value - DAY_ZERO).days)
+
+
+def build_fields(patient: Dict, allergies: List[Dict], conditions: List[Dict],
+                 contacts: List[Dict], emergency_token: str) -> bytes:
+    """
+    TLV body for a patient
+
+    Args:
+        patient: Patient row (first_name, last_name, date_of_birth, blood_type)
+        allergies: Allergy rows (allergen, severity); only life-threatening and
+            severe ones are carried, most severe first
+        conditions: Condition rows (condition_name, severity), most severe first
+        contacts: Emergency contact rows (phone_primary, priority_order); the
+            first by priority is the ICE phone
+        emergency_token: Card's emergency token (bound, not stored)
+    """
+    body = bytearray()
+    body += _field(TAG_NAME, _text(f"{patient.get('first_name', '')} {patient.get('last_name', '')}"))
+    if patient.get('date_of_birth'):
+        body += _field(TAG_DATE_OF_BIRTH, _days(patient['date_of_birth']))
+    if patient.get('blood_type'):
+        body += _field(TAG_BLOOD_TYPE, _text(patient['blood_type']))
+
+    def rank(codes: Dict[str, int]):
+        return lambda row: codes.get(row.get('severity'), -1)
+
+    def code(codes: Dict[str, int], row: Dict) -> bytes:
+        return bytes((codes.get(row.get('severity'), SEVERITY_UNKNOWN),))
+
+    allergy_rank = rank(ALLERGY_SEVERITY_CODES)
+    critical_allergies = [a for a in allergies if allergy_rank(a) >= MIN_ALLERGY_SEVERITY and a.get('allergen')]
+    for allergy in sorted(critical_allergies, key=allergy_rank, reverse=True)[:MAX_ALLERGIES]:
+        body += _field(TAG_ALLERGY, code(ALLERGY_SEVERITY_CODES, allergy) + _text(allergy['allergen']))
+    named_conditions = [c for c in conditions if c.get('condition_name')]
+    for condition in sorted(named_conditions, key=rank(CONDITION_SEVERITY_CODES), reverse=True)[:MAX_CONDITIONS]:
+        body += _field(TAG_CONDITION, code(CONDITION_SEVERITY_CODES, condition) + _text(condition['condition_name']))
+
+    phones = [c for c in contacts if c.get('phone_primary')]
+    if phones:
+        first = min(phones, key=lambda c: (c.get('priority_order') is None, c.get('priority_order') or 0))
+        body += _field(TAG_ICE_PHONE, _text(first['phone_primary']))
+
+    body += _field(TAG_TOKEN_BINDING, token_binding(emergency_token))
+    body += _field(TAG_ISSUED, _days(date.today()))
+    return bytes(body)
+
+
+def encode_payload(fields: bytes, signing_key) -> str:
+    """Sign, compress and base45-encode a TLV body into QR text ("MIAS1:...")"""
+    public_key = signing_key.public_key().public_bytes_raw()
+    signed = bytes((FORMAT_VERSION,)) + _key_id(public_key) + fields
+    blob = signed + signing_key.sign(signed)
+    return PREFIX + base45_encode(zlib.compress(blob, 9))
+
+
+def encode_for_patient(patient_id: int, emergency_token: str, signing_key=None) -> Optional[str]:
+    """
+    Offline payload for a patient from the database
+
+    Returns:
+        QR text, or None if no signing key is configured or the patient does not exist
+    """
+    import database as db
+
+    signing_key = signing_key or load_signing_key()
+    if signing_key is None:
+        return None
+    record = db.get_patient_record(patient_id)
+    if record is None:
+        return None
+    fields = build_fields(record.patient, record.allergies.to_dict('records'),
+                          record.conditions.to_dict('records'), record.contacts.to_dict('records'),
+                          emergency_token)
+    return encode_payload(fields, signing_key)
+
+
+def qr_fragment(payload: str) -> str:
+    """
+    Payload as a URL fragment (#...) for the emergency URL
+
+    Only base45's space and '%' need escaping, and the escapes themselves are
+    QR alphanumeric characters, so the fragment stays in the compact mode.
+    """
+    return '#' + quote(payload, safe="$*+-./:")
+
+
+# ==================== DECODING ====================
+
+def _parse_fields(body: bytes) -> Dict:
+    result = {'allergies': [], 'conditions': []}
+    position = 0
+    while position < len(body):
+        if position + 2 > len(body):
+            raise ValueError("Truncated field")
+        tag, length = body[position], body[position + 1]
+        value = body[position + 2:position + 2 + length]
+        if len(value) != length:
+            raise ValueError("Truncated field")
+        position += 2 + length
+
+        if tag == TAG_NAME:
+            result['name'] = value.decode('utf-8')
+        elif tag == TAG_DATE_OF_BIRTH:
+            result['date_of_birth'] = DAY_ZERO + timedelta(days=struct.unpack('>H', value)[0])
+        elif tag == TAG_BLOOD_TYPE:
+            result['blood_type'] = value.decode('utf-8')
+        elif tag in (TAG_ALLERGY, TAG_CONDITION):
+            entry = {'name': value[1:].decode('utf-8'), 'severity': SEVERITY_NAMES[tag].get(value[0])}
+            result['allergies' if tag == TAG_ALLERGY else 'conditions'].append(entry)
+        elif tag == TAG_ICE_PHONE:
+            result['ice_phone'] = value.decode('utf-8')
+        elif tag == TAG_TOKEN_BINDING:
+            result['token_binding'] = value
+        elif tag == TAG_ISSUED:
+            result['issued'] = DAY_ZERO + timedelta(days=struct.unpack('>H', value)[0])
+        # Unknown tags are skipped so newer cards still decode
+    return result
+
+
+def decode(qr_text: str, public_keys: Optional[List[str]] = None) -> Dict:
+    """
+    Decode and verify a scanned QR code without any network access
+
+    Args:
+        qr_text: Full scanned text (emergency URL with the payload fragment) or bare "MIAS1:..." text
+        public_keys: Base64 Ed25519 public keys trusted to sign cards (default: MIAS_QR_VERIFY_KEYS)
+
+    Returns:
+        Dictionary with name, date_of_birth, blood_type, allergies, conditions,
+        ice_phone, issued, token (if the text carried one) and verified (True
+        if the signature checked out with a trusted key and the summary is
+        bound to the card's token)
+
+    Raises:
+        ValueError: If the text carries no readable offline payload
+    """
+    from cryptography.exceptions import InvalidSignature
+    from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PublicKey
+
+    token = None
+    payload = qr_text.strip()
+    if not payload.startswith(PREFIX):
+        parts = urlsplit(payload)
+        query = parse_qs(parts.query)
+        # Cards printed since compact tokens use ?t=; older ones use ?token=
+        token = (query.get('t') or query.get('token') or [None])[0]
+        payload = unquote(parts.fragment)
+    if not payload.startswith(PREFIX):
+        raise ValueError("No offline emergency payload in this code")
+
+    try:
+        blob = zlib.decompress(base45_decode(payload[len(PREFIX):]))
+    except zlib.error as e:
+        raise ValueError(f"Corrupt offline payload: {e}")
+    header = 1 + KEY_ID_BYTES
+    if len(blob) < header + SIGNATURE_BYTES or blob[0] != FORMAT_VERSION:
+        raise ValueError("Unsupported offline payload")
+    signed, signature = blob[:-SIGNATURE_BYTES], blob[-SIGNATURE_BYTES:]
+    result = _parse_fields(signed[header:])
+
+    verified = False
+    if public_keys is None:
+        public_keys = [k for k in os.environ.get('MIAS_QR_VERIFY_KEYS', '').split(',') if k.strip()]
+    for encoded in public_keys:
+        key_bytes = base64.b64decode(encoded.strip())
+        if _key_id(key_bytes) != signed[1:header]:
+            continue
+        try:
+            Ed25519PublicKey.from_public_bytes(key_bytes).verify(signature, signed)
+            verified = True
+        except InvalidSignature:
+            pass
+        break
+
+    binding = result.pop('token_binding', None)
+    if token is not None:
+        result['token'] = token
+        verified = verified and binding == token_binding(token)
+    result['verified'] = verified
+    return result
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="MIAS offline QR payload keys and decoder")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("keygen", help="Create an Ed25519 signing key pair")
+    decode_parser = subparsers.add_parser("decode", help="Decode and verify scanned QR text")
+    decode_parser.add_argument("text")
+    decode_parser.add_argument("--public-key", action="append", help="Trusted public key (base64); repeatable")
+    args = parser.parse_args()
+
+    if args.command == "keygen":
+        print(json.dumps(generate_signing_key(), indent=2))
+    else:
+        print(json.dumps(decode(args.text, args.public_key), indent=2, default=str))
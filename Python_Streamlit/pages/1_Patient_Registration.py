@@ -13,6 +13,7 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from aamva_parser import AAMVAParser
 import database as db
+import query_profiler
 from admin_auth import admin_login_page, show_logout_button
 from qr_generator import (
     generate_emergency_token, 
@@ -553,3 +554,6 @@ if st.session_state.show_qr_code and st.session_state.qr_image_data:
         st.session_state.qr_card_data = None
         st.success("✅ Registration completed! Ready for next patient.")
         st.rerun()
+
+# Developer mode: database calls made during this rerun
+query_profiler.show_query_panel()
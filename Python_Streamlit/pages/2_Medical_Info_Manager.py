@@ -13,6 +13,8 @@ from datetime import date
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 import database as db
+import query_profiler
+import batch_entry
 from admin_auth import admin_login_page, show_logout_button
 
 # Page configuration
@@ -179,14 +181,309 @@ else:
     else:
         st.info("ℹ️ Enter a search term to find patients.")
 
+# ==================== SECTIONS ====================
+
+# Streamlit releases with fragments rerun only the section when its form is submitted;
+# on older ones the page reruns, which still loads nothing but the selected section.
+# Each section lists its table after its form and the add_* call invalidates only that
+# table, so a new row shows up without another rerun.
+fragment = getattr(st, 'fragment', None) or getattr(st, 'experimental_fragment', None) or (lambda func: func)
+
+
+@fragment
+def show_conditions(patient_id):
+    """Medical Conditions: add form and list"""
+    st.subheader("Medical Conditions")
+
+    col1, col2 = st.columns([1, 1])
+
+    with col1:
+        st.markdown("#### Add New Condition")
+        with st.form("add_condition", clear_on_submit=True):
+            condition_name = st.text_input("Condition Name*:", placeholder="e.g., Hypertension")
+            diagnosis_date = st.date_input("Diagnosis Date:", value=date.today())
+            severity = st.selectbox("Severity:", ["", "Mild", "Moderate", "Severe", "Critical"])
+            notes = st.text_area("Notes:", placeholder="Additional details...")
+
+            submitted = st.form_submit_button("➕ Add Condition", type="primary")
+            if submitted:
+                if condition_name:
+                    success, msg = db.add_condition(
+                        patient_id,
+                        condition_name,
+                        str(diagnosis_date),
+                        severity if severity else None,
+                        notes if notes else None
+                    )
+                    if success:
+                        st.success(msg)
+                    else:
+                        st.error(msg)
+                else:
+                    st.error("❌ Condition name is required!")
+
+        with st.expander("📋 Batch Entry (several at once)"):
+            batch_entry.show_batch_entry('conditions', patient_id, 'manager')
+
+    with col2:
+        st.markdown("#### Existing Conditions")
+        conditions_df = db.get_patient_record(patient_id).conditions
+        if not conditions_df.empty:
+            st.dataframe(conditions_df, use_container_width=True, hide_index=True)
+        else:
+            st.info("No conditions recorded yet.")
+
+
+@fragment
+def show_allergies(patient_id):
+    """Allergies: add form and list"""
+    st.subheader("Allergies")
+
+    col1, col2 = st.columns([1, 1])
+
+    with col1:
+        st.markdown("#### Add New Allergy")
+        with st.form("add_allergy", clear_on_submit=True):
+            allergen = st.text_input("Allergen*:", placeholder="e.g., Penicillin")
+            allergy_type = st.selectbox("Type:", ["", "Medication", "Food", "Environmental", "Other"])
+            reaction = st.text_input("Reaction:", placeholder="e.g., Anaphylaxis")
+            severity = st.selectbox("Severity:", ["", "Mild", "Moderate", "Severe", "Life-threatening"])
+
+            submitted = st.form_submit_button("➕ Add Allergy", type="primary")
+            if submitted:
+                if allergen:
+                    success, msg = db.add_allergy(
+                        patient_id,
+                        allergen,
+                        allergy_type if allergy_type else None,
+                        reaction if reaction else None,
+                        severity if severity else None
+                    )
+                    if success:
+                        st.success(msg)
+                    else:
+                        st.error(msg)
+                else:
+                    st.error("❌ Allergen name is required!")
+
+        with st.expander("📋 Batch Entry (several at once)"):
+            batch_entry.show_batch_entry('allergies', patient_id, 'manager')
+
+    with col2:
+        st.markdown("#### Known Allergies")
+        allergies_df = db.get_patient_record(patient_id).allergies
+        if not allergies_df.empty:
+            st.dataframe(allergies_df, use_container_width=True, hide_index=True)
+        else:
+            st.info("No allergies recorded yet.")
+
+
+@fragment
+def show_medications(patient_id):
+    """Medications: add form and list"""
+    st.subheader("Medications")
+
+    col1, col2 = st.columns([1, 1])
+
+    with col1:
+        st.markdown("#### Add New Medication")
+        with st.form("add_medication", clear_on_submit=True):
+            medication_name = st.text_input("Medication Name*:", placeholder="e.g., Lisinopril")
+            dosage = st.text_input("Dosage:", placeholder="e.g., 10mg")
+            frequency = st.text_input("Frequency:", placeholder="e.g., Once daily")
+            start_date = st.date_input("Start Date:", value=date.today())
+            end_date = st.date_input("End Date (leave blank if current):", value=None)
+            prescribing_doctor = st.text_input("Prescribing Doctor:", placeholder="e.g., Dr. Smith")
+            notes = st.text_area("Notes:")
+
+            submitted = st.form_submit_button("➕ Add Medication", type="primary")
+            if submitted:
+                if medication_name:
+                    success, msg = db.add_medication(
+                        patient_id,
+                        medication_name,
+                        dosage if dosage else None,
+                        frequency if frequency else None,
+                        str(start_date),
+                        str(end_date) if end_date else None,
+                        prescribing_doctor if prescribing_doctor else None,
+                        notes if notes else None
+                    )
+                    if success:
+                        st.success(msg)
+                    else:
+                        st.error(msg)
+                else:
+                    st.error("❌ Medication name is required!")
+
+        with st.expander("📋 Batch Entry (several at once)"):
+            batch_entry.show_batch_entry('medications', patient_id, 'manager')
+
+    with col2:
+        st.markdown("#### Current & Past Medications")
+        medications_df = db.get_patient_record(patient_id).medications
+        if not medications_df.empty:
+            st.dataframe(medications_df, use_container_width=True, hide_index=True)
+        else:
+            st.info("No medications recorded yet.")
+
+
+@fragment
+def show_vaccinations(patient_id):
+    """Vaccinations: add form and list"""
+    st.subheader("Vaccinations")
+
+    col1, col2 = st.columns([1, 1])
+
+    with col1:
+        st.markdown("#### Add New Vaccination")
+        with st.form("add_vaccination", clear_on_submit=True):
+            vaccine_name = st.text_input("Vaccine Name*:", placeholder="e.g., COVID-19 Booster")
+            administration_date = st.date_input("Administration Date:", value=date.today())
+            next_due_date = st.date_input("Next Due Date (if applicable):", value=None)
+            lot_number = st.text_input("Lot Number:", placeholder="e.g., LOT12345")
+            administered_by = st.text_input("Administered By:", placeholder="e.g., CVS Pharmacy")
+
+            submitted = st.form_submit_button("➕ Add Vaccination", type="primary")
+            if submitted:
+                if vaccine_name:
+                    success, msg = db.add_vaccination(
+                        patient_id,
+                        vaccine_name,
+                        str(administration_date),
+                        str(next_due_date) if next_due_date else None,
+                        lot_number if lot_number else None,
+                        administered_by if administered_by else None
+                    )
+                    if success:
+                        st.success(msg)
+                    else:
+                        st.error(msg)
+                else:
+                    st.error("❌ Vaccine name is required!")
+
+    with col2:
+        st.markdown("#### Immunization History")
+        vaccinations_df = db.get_patient_record(patient_id).vaccinations
+        if not vaccinations_df.empty:
+            st.dataframe(vaccinations_df, use_container_width=True, hide_index=True)
+        else:
+            st.info("No vaccinations recorded yet.")
+
+
+@fragment
+def show_insurance(patient_id):
+    """Insurance: add form and list"""
+    st.subheader("Insurance")
+
+    col1, col2 = st.columns([1, 1])
+
+    with col1:
+        st.markdown("#### Add New Insurance Policy")
+        with st.form("add_insurance", clear_on_submit=True):
+            provider_name = st.text_input("Provider Name*:", placeholder="e.g., Blue Cross Blue Shield")
+            policy_number = st.text_input("Policy Number*:", placeholder="e.g., BCBS123456789")
+            group_number = st.text_input("Group Number:", placeholder="e.g., GRP987654")
+            effective_date = st.date_input("Effective Date:", value=None)
+            expiration_date = st.date_input("Expiration Date:", value=None)
+            is_active = st.checkbox("Currently Active", value=True)
+
+            submitted = st.form_submit_button("➕ Add Insurance", type="primary")
+            if submitted:
+                if provider_name and policy_number:
+                    success, msg = db.add_insurance(
+                        patient_id,
+                        provider_name,
+                        policy_number,
+                        group_number if group_number else None,
+                        str(effective_date) if effective_date else None,
+                        str(expiration_date) if expiration_date else None,
+                        is_active
+                    )
+                    if success:
+                        st.success(msg)
+                    else:
+                        st.error(msg)
+                else:
+                    st.error("❌ Provider name and policy number are required!")
+
+    with col2:
+        st.markdown("#### Insurance Policies")
+        insurance_df = db.get_patient_record(patient_id).insurance
+        if not insurance_df.empty:
+            st.dataframe(insurance_df, use_container_width=True, hide_index=True)
+        else:
+            st.info("No insurance policies recorded yet.")
+
+
+@fragment
+def show_contacts(patient_id):
+    """Emergency Contacts: add form and list"""
+    st.subheader("Emergency Contacts")
+
+    col1, col2 = st.columns([1, 1])
+
+    with col1:
+        st.markdown("#### Add New Emergency Contact")
+        with st.form("add_contact", clear_on_submit=True):
+            contact_name = st.text_input("Contact Name*:", placeholder="e.g., Jane Barber")
+            relationship = st.selectbox("Relationship:", ["", "Spouse", "Parent", "Sibling", "Child", "Friend", "Other"])
+            phone_primary = st.text_input("Primary Phone*:", placeholder="e.g., 214-555-0123")
+            phone_secondary = st.text_input("Secondary Phone:", placeholder="e.g., 214-555-0124")
+            email = st.text_input("Email:", placeholder="e.g., contact@email.com")
+            priority_order = st.number_input("Priority Order (1-10):", min_value=1, max_value=10, value=1)
+
+            submitted = st.form_submit_button("➕ Add Contact", type="primary")
+            if submitted:
+                if contact_name and phone_primary:
+                    success, msg = db.add_emergency_contact(
+                        patient_id,
+                        contact_name,
+                        relationship if relationship else None,
+                        phone_primary,
+                        phone_secondary if phone_secondary else None,
+                        email if email else None,
+                        priority_order
+                    )
+                    if success:
+                        st.success(msg)
+                    else:
+                        st.error(msg)
+                else:
+                    st.error("❌ Contact name and primary phone are required!")
+
+    with col2:
+        st.markdown("#### Emergency Contacts List")
+        contacts_df = db.get_patient_record(patient_id).contacts
+        if not contacts_df.empty:
+            st.dataframe(contacts_df, use_container_width=True, hide_index=True)
+        else:
+            st.info("No emergency contacts recorded yet.")
+
+
+SECTIONS = {
+    "🩺 Medical Conditions": ('conditions', show_conditions),
+    "⚠️ Allergies": ('allergies', show_allergies),
+    "💊 Medications": ('medications', show_medications),
+    "💉 Vaccinations": ('vaccinations', show_vaccinations),
+    "🏥 Insurance": ('insurance', show_insurance),
+    "📞 Emergency Contacts": ('contacts', show_contacts),
+}
+
+
 # Display selected patient
 if st.session_state.selected_patient:
     st.markdown("---")
     
+    # Only the selected section is shown, so only it is fetched with the patient
+    section_label = st.session_state.get('manager_section', next(iter(SECTIONS)))
+    section, show_section = SECTIONS[section_label]
+    
     # Get patient details
-    patient = db.get_patient_details(st.session_state.selected_patient)
+    record = db.get_patient_record(st.session_state.selected_patient, sections=[section])
     
-    if patient:
+    if record:
+        patient = record.patient
         # Patient card
         st.markdown(f"""
         <div class="patient-card">
@@ -196,271 +493,10 @@ if st.session_state.selected_patient:
         </div>
         """, unsafe_allow_html=True)
         
-        # Tabs for medical information
-        tab1, tab2, tab3, tab4, tab5, tab6 = st.tabs([
-            "🩺 Medical Conditions",
-            "⚠️ Allergies",
-            "💊 Medications",
-            "💉 Vaccinations",
-            "🏥 Insurance",
-            "📞 Emergency Contacts"
-        ])
-        
-        # TAB 1: Medical Conditions
-        with tab1:
-            st.subheader("Medical Conditions")
-            
-            col1, col2 = st.columns([1, 1])
-            
-            with col1:
-                st.markdown("#### Add New Condition")
-                with st.form("add_condition", clear_on_submit=True):
-                    condition_name = st.text_input("Condition Name*:", placeholder="e.g., Hypertension")
-                    diagnosis_date = st.date_input("Diagnosis Date:", value=date.today())
-                    severity = st.selectbox("Severity:", ["", "Mild", "Moderate", "Severe", "Critical"])
-                    notes = st.text_area("Notes:", placeholder="Additional details...")
-                    
-                    submitted = st.form_submit_button("➕ Add Condition", type="primary")
-                    if submitted:
-                        if condition_name:
-                            success, msg = db.add_condition(
-                                st.session_state.selected_patient,
-                                condition_name,
-                                str(diagnosis_date),
-                                severity if severity else None,
-                                notes if notes else None
-                            )
-                            if success:
-                                st.success(msg)
-                                st.rerun()
-                            else:
-                                st.error(msg)
-                        else:
-                            st.error("❌ Condition name is required!")
-            
-            with col2:
-                st.markdown("#### Existing Conditions")
-                conditions_df = db.get_conditions(st.session_state.selected_patient)
-                if not conditions_df.empty:
-                    st.dataframe(conditions_df, use_container_width=True, hide_index=True)
-                else:
-                    st.info("No conditions recorded yet.")
-        
-        # TAB 2: Allergies
-        with tab2:
-            st.subheader("Allergies")
-            
-            col1, col2 = st.columns([1, 1])
-            
-            with col1:
-                st.markdown("#### Add New Allergy")
-                with st.form("add_allergy", clear_on_submit=True):
-                    allergen = st.text_input("Allergen*:", placeholder="e.g., Penicillin")
-                    allergy_type = st.selectbox("Type:", ["", "Medication", "Food", "Environmental", "Other"])
-                    reaction = st.text_input("Reaction:", placeholder="e.g., Anaphylaxis")
-                    severity = st.selectbox("Severity:", ["", "Mild", "Moderate", "Severe", "Life-threatening"])
-                    
-                    submitted = st.form_submit_button("➕ Add Allergy", type="primary")
-                    if submitted:
-                        if allergen:
-                            success, msg = db.add_allergy(
-                                st.session_state.selected_patient,
-                                allergen,
-                                allergy_type if allergy_type else None,
-                                reaction if reaction else None,
-                                severity if severity else None
-                            )
-                            if success:
-                                st.success(msg)
-                                st.rerun()
-                            else:
-                                st.error(msg)
-                        else:
-                            st.error("❌ Allergen name is required!")
-            
-            with col2:
-                st.markdown("#### Known Allergies")
-                allergies_df = db.get_allergies(st.session_state.selected_patient)
-                if not allergies_df.empty:
-                    st.dataframe(allergies_df, use_container_width=True, hide_index=True)
-                else:
-                    st.info("No allergies recorded yet.")
-        
-        # TAB 3: Medications
-        with tab3:
-            st.subheader("Medications")
-            
-            col1, col2 = st.columns([1, 1])
-            
-            with col1:
-                st.markdown("#### Add New Medication")
-                with st.form("add_medication", clear_on_submit=True):
-                    medication_name = st.text_input("Medication Name*:", placeholder="e.g., Lisinopril")
-                    dosage = st.text_input("Dosage:", placeholder="e.g., 10mg")
-                    frequency = st.text_input("Frequency:", placeholder="e.g., Once daily")
-                    start_date = st.date_input("Start Date:", value=date.today())
-                    end_date = st.date_input("End Date (leave blank if current):", value=None)
-                    prescribing_doctor = st.text_input("Prescribing Doctor:", placeholder="e.g., Dr. Smith")
-                    notes = st.text_area("Notes:")
-                    
-                    submitted = st.form_submit_button("➕ Add Medication", type="primary")
-                    if submitted:
-                        if medication_name:
-                            success, msg = db.add_medication(
-                                st.session_state.selected_patient,
-                                medication_name,
-                                dosage if dosage else None,
-                                frequency if frequency else None,
-                                str(start_date),
-                                str(end_date) if end_date else None,
-                                prescribing_doctor if prescribing_doctor else None,
-                                notes if notes else None
-                            )
-                            if success:
-                                st.success(msg)
-                                st.rerun()
-                            else:
-                                st.error(msg)
-                        else:
-                            st.error("❌ Medication name is required!")
-            
-            with col2:
-                st.markdown("#### Current & Past Medications")
-                medications_df = db.get_medications(st.session_state.selected_patient)
-                if not medications_df.empty:
-                    st.dataframe(medications_df, use_container_width=True, hide_index=True)
-                else:
-                    st.info("No medications recorded yet.")
-        
-        # TAB 4: Vaccinations
-        with tab4:
-            st.subheader("Vaccinations")
-            
-            col1, col2 = st.columns([1, 1])
-            
-            with col1:
-                st.markdown("#### Add New Vaccination")
-                with st.form("add_vaccination", clear_on_submit=True):
-                    vaccine_name = st.text_input("Vaccine Name*:", placeholder="e.g., COVID-19 Booster")
-                    administration_date = st.date_input("Administration Date:", value=date.today())
-                    next_due_date = st.date_input("Next Due Date (if applicable):", value=None)
-                    lot_number = st.text_input("Lot Number:", placeholder="e.g., LOT12345")
-                    administered_by = st.text_input("Administered By:", placeholder="e.g., CVS Pharmacy")
-                    
-                    submitted = st.form_submit_button("➕ Add Vaccination", type="primary")
-                    if submitted:
-                        if vaccine_name:
-                            success, msg = db.add_vaccination(
-                                st.session_state.selected_patient,
-                                vaccine_name,
-                                str(administration_date),
-                                str(next_due_date) if next_due_date else None,
-                                lot_number if lot_number else None,
-                                administered_by if administered_by else None
-                            )
-                            if success:
-                                st.success(msg)
-                                st.rerun()
-                            else:
-                                st.error(msg)
-                        else:
-                            st.error("❌ Vaccine name is required!")
-            
-            with col2:
-                st.markdown("#### Immunization History")
-                vaccinations_df = db.get_vaccinations(st.session_state.selected_patient)
-                if not vaccinations_df.empty:
-                    st.dataframe(vaccinations_df, use_container_width=True, hide_index=True)
-                else:
-                    st.info("No vaccinations recorded yet.")
-        
-        # TAB 5: Insurance
-        with tab5:
-            st.subheader("Insurance")
-            
-            col1, col2 = st.columns([1, 1])
-            
-            with col1:
-                st.markdown("#### Add New Insurance Policy")
-                with st.form("add_insurance", clear_on_submit=True):
-                    provider_name = st.text_input("Provider Name*:", placeholder="e.g., Blue Cross Blue Shield")
-                    policy_number = st.text_input("Policy Number*:", placeholder="e.g., BCBS123456789")
-                    group_number = st.text_input("Group Number:", placeholder="e.g., GRP987654")
-                    effective_date = st.date_input("Effective Date:", value=None)
-                    expiration_date = st.date_input("Expiration Date:", value=None)
-                    is_active = st.checkbox("Currently Active", value=True)
-                    
-                    submitted = st.form_submit_button("➕ Add Insurance", type="primary")
-                    if submitted:
-                        if provider_name and policy_number:
-                            success, msg = db.add_insurance(
-                                st.session_state.selected_patient,
-                                provider_name,
-                                policy_number,
-                                group_number if group_number else None,
-                                str(effective_date) if effective_date else None,
-                                str(expiration_date) if expiration_date else None,
-                                is_active
-                            )
-                            if success:
-                                st.success(msg)
-                                st.rerun()
-                            else:
-                                st.error(msg)
-                        else:
-                            st.error("❌ Provider name and policy number are required!")
-            
-            with col2:
-                st.markdown("#### Insurance Policies")
-                insurance_df = db.get_insurance(st.session_state.selected_patient)
-                if not insurance_df.empty:
-                    st.dataframe(insurance_df, use_container_width=True, hide_index=True)
-                else:
-                    st.info("No insurance policies recorded yet.")
-        
-        # TAB 6: Emergency Contacts
-        with tab6:
-            st.subheader("Emergency Contacts")
-            
-            col1, col2 = st.columns([1, 1])
-            
-            with col1:
-                st.markdown("#### Add New Emergency Contact")
-                with st.form("add_contact", clear_on_submit=True):
-                    contact_name = st.text_input("Contact Name*:", placeholder="e.g., Jane Barber")
-                    relationship = st.selectbox("Relationship:", ["", "Spouse", "Parent", "Sibling", "Child", "Friend", "Other"])
-                    phone_primary = st.text_input("Primary Phone*:", placeholder="e.g., 214-555-0123")
-                    phone_secondary = st.text_input("Secondary Phone:", placeholder="e.g., 214-555-0124")
-                    email = st.text_input("Email:", placeholder="e.g., contact@email.com")
-                    priority_order = st.number_input("Priority Order (1-10):", min_value=1, max_value=10, value=1)
-                    
-                    submitted = st.form_submit_button("➕ Add Contact", type="primary")
-                    if submitted:
-                        if contact_name and phone_primary:
-                            success, msg = db.add_emergency_contact(
-                                st.session_state.selected_patient,
-                                contact_name,
-                                relationship if relationship else None,
-                                phone_primary,
-                                phone_secondary if phone_secondary else None,
-                                email if email else None,
-                                priority_order
-                            )
-                            if success:
-                                st.success(msg)
-                                st.rerun()
-                            else:
-                                st.error(msg)
-                        else:
-                            st.error("❌ Contact name and primary phone are required!")
-            
-            with col2:
-                st.markdown("#### Emergency Contacts List")
-                contacts_df = db.get_emergency_contacts(st.session_state.selected_patient)
-                if not contacts_df.empty:
-                    st.dataframe(contacts_df, use_container_width=True, hide_index=True)
-                else:
-                    st.info("No emergency contacts recorded yet.")
+        # Section selector (replaces tabs, which run every tab's queries on each rerun)
+        st.radio("Section", list(SECTIONS), key='manager_section', horizontal=True,
+                 label_visibility="collapsed")
+        show_section(st.session_state.selected_patient)
     
     # Clear selection button
     st.markdown("---")
@@ -487,3 +523,6 @@ with st.sidebar:
         st.success(f"✅ Patient Selected: ID {st.session_state.selected_patient}")
     else:
         st.warning("⚠️ No patient selected")
+
+# Developer mode: database calls made during this rerun
+query_profiler.show_query_panel()
@@ -15,6 +15,7 @@ from plotly.subplots import make_subplots
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 import database as db
+import query_profiler
 from admin_auth import admin_login_page, show_logout_button
 
 # Page configuration
@@ -86,6 +87,7 @@ st.markdown("""
 # Title
 st.title("📊 Analytics Dashboard")
 st.markdown("### Real-time Data Visualization & Insights")
+st.caption(f"Data source: {db.get_analytics_source()}")
 
 # Refresh button
 col1, col2, col3 = st.columns([4, 1, 1])
@@ -365,11 +367,11 @@ with tab5:
     st.subheader("Comprehensive Analytics Report")
     st.markdown("All visualizations in one view for presentations and reporting")
     
-    # Check if we have data
-    has_vacc = not db.get_vaccination_data().empty
-    has_demo = not db.get_patient_demographics().empty
-    has_meds = not db.get_medication_stats().empty
-    has_allergy = not db.get_allergy_stats().empty
+    # Check if we have data (reusing the frames the other tabs loaded this rerun)
+    has_vacc = not vacc_df.empty
+    has_demo = not demo_df.empty
+    has_meds = not med_df.empty
+    has_allergy = not allergy_df.empty
     
     if has_vacc or has_demo or has_meds or has_allergy:
         # Create 2x2 grid of charts
@@ -377,7 +379,6 @@ with tab5:
         
         with col1:
             if has_vacc:
-                vacc_df = db.get_vaccination_data()
                 fig_v = px.bar(
                     vacc_df,
                     x='vaccine_name',
@@ -389,7 +390,6 @@ with tab5:
                 st.plotly_chart(fig_v, use_container_width=True)
             
             if has_demo:
-                demo_df = db.get_patient_demographics()
                 fig_d = px.histogram(
                     demo_df,
                     x='age',
@@ -402,7 +402,6 @@ with tab5:
         
         with col2:
             if has_meds:
-                med_df = db.get_medication_stats()
                 fig_m = px.bar(
                     med_df.head(5),
                     x='patient_count',
@@ -415,7 +414,6 @@ with tab5:
                 st.plotly_chart(fig_m, use_container_width=True)
             
             if has_allergy:
-                allergy_df = db.get_allergy_stats()
                 fig_a = px.bar(
                     allergy_df,
                     x='allergy_type',
@@ -465,7 +463,10 @@ with st.sidebar:
     """)
     
     st.markdown("### 🔄 Data Refresh")
-    st.success("✅ Data updates in real-time")
+    if db.ANALYTICS_SNAPSHOT_DIR:
+        st.info("📦 Figures come from the analytics snapshot, refreshed by `python analytics_snapshot.py refresh`")
+    else:
+        st.success("✅ Data updates in real-time")
     
     st.markdown("### 💡 Tips")
     st.markdown("""
@@ -474,3 +475,6 @@ with st.sidebar:
     - Right-click charts to export
     - Use 'Refresh Data' button to update
     """)
+
+# Developer mode: database calls made during this rerun
+query_profiler.show_query_panel()
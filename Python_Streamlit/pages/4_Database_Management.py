@@ -12,6 +12,8 @@ import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 import database as db
+import query_profiler
+import bulk_import
 from admin_auth import admin_login_page, show_logout_button
 
 # Page configuration
@@ -264,6 +266,58 @@ if patients:
 else:
     st.info("No patients in database. Use Patient Registration to add patients.")
 
+# Bulk Import Section
+st.markdown("---")
+st.markdown("### 📥 Bulk Import Medical Records")
+
+with st.expander("Import from CSV or FHIR", expanded=False):
+    st.markdown("""
+    **CSV:** one record type per file, with a `license_number` column plus that table's columns
+    (e.g. `medication_name, dosage, frequency, start_date`).  
+    **FHIR:** a Bundle (`.json`) or Bulk Data export (`.ndjson`) of Condition, AllergyIntolerance,
+    MedicationStatement, Immunization, Coverage and RelatedPerson resources.
+    Patients must already be registered; rows are matched by license number.
+    """)
+    
+    import_file = st.file_uploader(
+        "Upload file:",
+        type=["csv", "json", "ndjson"],
+        help="Rows are validated and written in chunks of 1,000"
+    )
+    
+    record_type = st.selectbox(
+        "Record type (CSV only):",
+        options=list(bulk_import.RECORD_TYPES.keys()),
+        format_func=lambda rt: rt.replace('_', ' ').title()
+    )
+    
+    if import_file and st.button("📥 Import Records", type="primary"):
+        with st.spinner("Importing records..."):
+            if import_file.name.lower().endswith('.csv'):
+                report = bulk_import.import_csv(import_file, record_type)
+            else:
+                report = bulk_import.import_fhir(import_file)
+        
+        col1, col2, col3 = st.columns(3)
+        col1.metric("Rows Imported", report['rows_imported'])
+        col2.metric("Rows Rejected", report['rows_rejected'])
+        col3.metric("Rows / Second", report['rows_per_second'])
+        
+        if report['errors']:
+            import pandas as pd
+            st.warning(f"⚠️ {report['rows_rejected']} row(s) were not imported")
+            st.dataframe(pd.DataFrame(report['errors']), use_container_width=True, hide_index=True)
+        else:
+            st.success(f"✅ Imported {report['rows_imported']} records in {report['elapsed_seconds']}s")
+
+st.markdown("---")
+st.markdown("### 🚦 Database Workloads")
+
+with st.expander("Connection use and waits per workload class", expanded=False):
+    st.caption("Emergency reads are admitted first; analytics and AI search queries queue "
+               "or are turned away when the database is busy. Counters are since the server started.")
+    st.dataframe(db.get_workload_stats(), use_container_width=True, hide_index=True)
+
 # Sidebar
 with st.sidebar:
     st.markdown("### 🗄️ Database Management")
@@ -275,6 +329,7 @@ with st.sidebar:
     - Search by name or license
     - View patient details
     - Delete patient records
+    - Bulk import medical records
     """)
     
     st.markdown("### ⚠️ Important")
@@ -288,3 +343,6 @@ with st.sidebar:
     st.markdown("### 📊 Database Stats")
     total_patients = len(patients) if patients else 0
     st.metric("Total Patients", total_patients)
+
+# Developer mode: database calls made during this rerun
+query_profiler.show_query_panel()
@@ -12,6 +12,9 @@ import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 import database as db
+import query_profiler
+import pin_security
+import session_tokens
 
 # Page configuration
 st.set_page_config(
@@ -72,13 +75,11 @@ if 'patient_name' not in st.session_state:
 
 # Logout function
 def logout():
-    st.session_state.authenticated = False
-    st.session_state.patient_id = None
-    st.session_state.patient_name = None
+    session_tokens.end_session()
     st.rerun()
 
-# If already authenticated, redirect to dashboard
-if st.session_state.authenticated:
+# If already authenticated (valid session token), redirect to dashboard
+if session_tokens.current_session():
     st.switch_page("pages/6_Patient_Dashboard.py")
 
 # Login Page
@@ -132,24 +133,17 @@ with col2:
                 st.error("❌ PIN must be exactly 4 digits")
             else:
                 # Authenticate
-                success, patient_id, message = db.authenticate_patient(license_number, pin)
+                success, patient_data, message = db.login_patient(license_number, pin, pin_security.client_key())
                 
                 if success:
-                    # Get patient name
-                    patient_data = db.get_patient_by_id(patient_id)
+                    # The signed session token carries the profile, so no further lookup is needed
+                    session_tokens.start_session(patient_data['patient_id'], patient_data)
                     
-                    if patient_data:
-                        st.session_state.authenticated = True
-                        st.session_state.patient_id = patient_id
-                        st.session_state.patient_name = f"{patient_data['first_name']} {patient_data['last_name']}"
-                        
-                        st.success(f"✅ {message}")
-                        st.balloons()
-                        
-                        # Redirect to dashboard
-                        st.switch_page("pages/6_Patient_Dashboard.py")
-                    else:
-                        st.error("❌ Error loading patient data")
+                    st.success(f"✅ {message}")
+                    st.balloons()
+                    
+                    # Redirect to dashboard
+                    st.switch_page("pages/6_Patient_Dashboard.py")
                 else:
                     st.error(f"❌ {message}")
 
@@ -235,3 +229,6 @@ with st.sidebar:
     **For Technical Support:**
     Contact your healthcare facility
     """)
+
+# Developer mode: database calls made during this rerun
+query_profiler.show_query_panel()
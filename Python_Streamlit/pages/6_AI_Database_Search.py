@@ -15,6 +15,12 @@ from datetime import datetime
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 import database as db
+import query_profiler
+import ai_query_cache
+import ai_result_cache
+import ai_intents
+import sql_governor
+import schema_prompt
 from admin_auth import admin_login_page, show_logout_button
 
 # Page configuration
@@ -114,18 +120,22 @@ st.markdown("""
 </div>
 """, unsafe_allow_html=True)
 
+# Local fake client for development and tests (no API key or network needed)
+USE_FAKE_LLM = bool(os.environ.get('MIAS_AI_FAKE_LLM'))
+
 # API KEY DETECTION
-api_key_available = False
+api_key_available = USE_FAKE_LLM
 api_key = None
 
 # Try multiple methods to find the API key
 # Method 1: Root level
-try:
-    if hasattr(st.secrets, 'ANTHROPIC_API_KEY'):
-        api_key = st.secrets.ANTHROPIC_API_KEY
-        api_key_available = True
-except:
-    pass
+if not api_key_available:
+    try:
+        if hasattr(st.secrets, 'ANTHROPIC_API_KEY'):
+            api_key = st.secrets.ANTHROPIC_API_KEY
+            api_key_available = True
+    except:
+        pass
 
 # Method 2: Dictionary access
 if not api_key_available:
@@ -174,14 +184,18 @@ if not api_key_available:
 
 # Import Anthropic library
 try:
-    import anthropic
-    
-    # Clean the API key (remove any whitespace or newlines)
-    if api_key:
-        api_key = api_key.strip().replace('\n', '').replace('\r', '')
-    
-    # Initialize Anthropic client
-    client = anthropic.Anthropic(api_key=api_key)
+    if USE_FAKE_LLM:
+        import fake_llm
+        client = fake_llm.FakeAnthropic()
+    else:
+        import anthropic
+        
+        # Clean the API key (remove any whitespace or newlines)
+        if api_key:
+            api_key = api_key.strip().replace('\n', '').replace('\r', '')
+        
+        # Initialize Anthropic client
+        client = anthropic.Anthropic(api_key=api_key)
     
 except ImportError:
     st.error("""
@@ -200,80 +214,8 @@ if 'chat_history' not in st.session_state:
 if 'last_sql' not in st.session_state:
     st.session_state.last_sql = None
 
-# Database schema information for Claude
-SCHEMA_INFO = """
-DATABASE SCHEMA FOR MIAS (Medical Information Access System):
-
-Tables:
-1. Patients
-   - patient_id (INT, PRIMARY KEY, AUTO_INCREMENT)
-   - license_number (VARCHAR, UNIQUE)
-   - first_name (VARCHAR)
-   - last_name (VARCHAR)
-   - date_of_birth (DATE)
-   - address (TEXT)
-   - city (VARCHAR)
-   - state (VARCHAR)
-   - zip_code (VARCHAR)
-   - phone (VARCHAR)
-   - email (VARCHAR)
-   - blood_type (VARCHAR) - e.g., 'A+', 'O-', etc.
-   - emergency_token (VARCHAR)
-   - created_at (DATETIME)
-   - updated_at (DATETIME)
-
-2. Medical_Conditions
-   - condition_id (INT, PRIMARY KEY)
-   - patient_id (INT, FOREIGN KEY → Patients)
-   - condition_name (VARCHAR) - e.g., 'Diabetes Type 2', 'Hypertension'
-   - diagnosis_date (DATE)
-   - severity (VARCHAR) - 'Mild', 'Moderate', 'Severe'
-   - notes (TEXT)
-
-3. Allergies
-   - allergy_id (INT, PRIMARY KEY)
-   - patient_id (INT, FOREIGN KEY → Patients)
-   - allergen (VARCHAR) - e.g., 'Peanuts', 'Penicillin'
-   - allergy_type (VARCHAR) - 'Food', 'Medication', 'Environmental'
-   - severity (VARCHAR) - 'Mild', 'Moderate', 'Severe', 'Life-threatening'
-   - reaction (TEXT)
-   - diagnosed_date (DATE)
-
-4. Medications
-   - medication_id (INT, PRIMARY KEY)
-   - patient_id (INT, FOREIGN KEY → Patients)
-   - medication_name (VARCHAR) - e.g., 'Metformin', 'Lisinopril'
-   - dosage (VARCHAR) - e.g., '500mg', '10mg'
-   - frequency (VARCHAR) - e.g., 'Twice daily', 'Once daily'
-   - prescribing_doctor (VARCHAR)
-   - start_date (DATE)
-   - notes (TEXT)
-
-5. Vaccinations
-   - vaccination_id (INT, PRIMARY KEY)
-   - patient_id (INT, FOREIGN KEY → Patients)
-   - vaccine_name (VARCHAR) - e.g., 'COVID-19', 'Influenza'
-   - date_administered (DATE)
-   - administering_provider (VARCHAR)
-   - lot_number (VARCHAR)
-
-6. Emergency_Contacts
-   - contact_id (INT, PRIMARY KEY)
-   - patient_id (INT, FOREIGN KEY → Patients)
-   - contact_name (VARCHAR)
-   - relationship (VARCHAR) - e.g., 'Spouse', 'Parent'
-   - phone_number (VARCHAR)
-   - is_primary (BOOLEAN)
-
-7. Insurance
-   - insurance_id (INT, PRIMARY KEY)
-   - patient_id (INT, FOREIGN KEY → Patients)
-   - provider_name (VARCHAR)
-   - policy_number (VARCHAR)
-   - group_number (VARCHAR)
-   - coverage_type (VARCHAR)
-
-IMPORTANT SQL RULES:
+# Query conventions sent with the schema (the schema itself is read from the database)
+SQL_RULES = """IMPORTANT SQL RULES:
 - Use MySQL syntax
 - Always use proper JOINs when querying multiple tables
 - For age calculations, use: TIMESTAMPDIFF(YEAR, date_of_birth, CURDATE())
@@ -296,17 +238,45 @@ EXAMPLE_QUERIES = [
     "Count patients by blood type"
 ]
 
-def generate_sql_from_natural_language(user_query: str) -> dict:
+# Live schema for Claude; cached answers are tied to the version of it they were generated from
+SCHEMA_PROMPT, SCHEMA_VERSION = schema_prompt.get_schema_prompt() or (None, 'unavailable')
+
+def partial_sql(response_text: str) -> str:
+    """The part of the "sql" value received so far in a streaming JSON response"""
+    match = re.search(r'"sql"\s*:\s*"((?:[^"\\]|\\.)*)', response_text)
+    if not match:
+        return ""
+    fragment = match.group(1).rstrip('\\')
+    try:
+        return json.loads(f'"{fragment}"')
+    except ValueError:
+        return fragment
+
+def generate_sql_from_natural_language(user_query: str, on_text=None) -> dict:
     """
     Use Claude to convert natural language to SQL
     
+    The response is streamed; on_text(response_so_far) is called as text
+    arrives, so the page can show the SQL while it is being written.
+    
     Returns:
         dict with 'sql' and 'explanation' keys
     """
     
+    if SCHEMA_PROMPT is None:
+        return {
+            "sql": None,
+            "explanation": "Database schema unavailable - check the database connection and try again",
+            "is_safe": False
+        }
+    
     system_prompt = f"""You are a SQL expert for a medical database. Convert natural language queries to MySQL queries.
 
-{SCHEMA_INFO}
+DATABASE SCHEMA FOR MIAS (one line per table: Table(column, ...); PK = primary key,
+col>Table = foreign key, col:type where not text, "..." = column notes):
+{SCHEMA_PROMPT}
+
+{SQL_RULES}
 
 CRITICAL SAFETY RULES:
 1. ONLY generate SELECT queries - NEVER INSERT, UPDATE, DELETE, DROP, ALTER, etc.
@@ -325,21 +295,24 @@ Return your response as valid JSON with this exact structure:
 If the query asks for something dangerous or inappropriate, set is_safe to false and explain why in the explanation field."""
 
     try:
-        response = client.messages.create(
+        response_text = ""
+        with client.messages.stream(
             model="claude-sonnet-4-20250514",
             max_tokens=1000,
             temperature=0,
-            system=system_prompt,
+            # Same text for every question, so it is marked for prompt caching
+            system=[{"type": "text", "text": system_prompt, "cache_control": {"type": "ephemeral"}}],
             messages=[
                 {
                     "role": "user",
                     "content": f"Convert this to SQL: {user_query}"
                 }
             ]
-        )
-        
-        # Parse response
-        response_text = response.content[0].text
+        ) as stream:
+            for text in stream.text_stream:
+                response_text += text
+                if on_text:
+                    on_text(response_text)
         
         # Extract JSON from response (handle markdown code blocks)
         json_match = re.search(r'\{.*\}', response_text, re.DOTALL)
@@ -357,37 +330,147 @@ If the query asks for something dangerous or inappropriate, set is_safe to false
             "is_safe": False
         }
 
-def execute_safe_query(sql: str) -> tuple:
+def execute_safe_query(sql: str, params: tuple = None, on_page=None) -> tuple:
     """
-    Execute SQL query with safety checks
+    Execute SQL query through the query governor (read-only check, LIMIT,
+    EXPLAIN row budget and statement time limit)
     
-    Returns:
-        (success: bool, result: DataFrame or error message)
-    """
-    # Safety check: only allow SELECT queries
-    sql_upper = sql.strip().upper()
+    Results are shared through the result cache while the data they were read
+    from is unchanged. Otherwise rows are streamed from an unbuffered cursor;
+    on_page(rows_so_far) is called after each page so the first rows can be
+    shown right away.
     
-    dangerous_keywords = ['INSERT', 'UPDATE', 'DELETE', 'DROP', 'ALTER', 'CREATE', 'TRUNCATE', 'REPLACE']
+    Args:
+        sql: SELECT statement (may contain %s placeholders)
+        params: Values for the placeholders (template answers)
+        on_page: Optional callback receiving the list of rows received so far
     
-    if not sql_upper.startswith('SELECT'):
-        return False, "Only SELECT queries are allowed"
+    Returns:
+        (success: bool, result: DataFrame or error message, notes: list of adjustments made,
+         cached: CachedResult the answer came from, or None if it was executed)
+    """
+    # Read before executing, so a write during the query makes the stored result stale
+    data_version = db.get_data_version()
+    if data_version:
+        cached = result_cache.get(sql, params, data_version['version'])
+        if cached is not None:
+            if len(cached.frame):
+                return True, cached.rows(), [], cached
+            return True, "Query executed successfully but returned no results", [], cached
     
-    for keyword in dangerous_keywords:
-        if keyword in sql_upper:
-            return False, f"Dangerous keyword detected: {keyword}"
+    allowed, pages, message, notes = sql_governor.stream(sql, params)
+    if not allowed:
+        return False, message, notes, None
     
+    rows = []
     try:
-        result = db.execute_query(sql, fetch=True)
-        
-        if result:
-            import pandas as pd
-            df = pd.DataFrame(result)
-            return True, df
-        else:
-            return True, "Query executed successfully but returned no results"
-            
+        for page in pages:
+            rows.extend(page)
+            if on_page:
+                on_page(rows)
     except Exception as e:
-        return False, f"Query execution error: {str(e)}"
+        return False, sql_governor.describe_error(e), notes, None
+    
+    if data_version and data_version['settled']:
+        result_cache.put(sql, params, data_version['version'], rows)
+    
+    if rows:
+        import pandas as pd
+        return True, pd.DataFrame(rows), notes, None
+    return True, "Query executed successfully but returned no results", notes, None
+
+def format_age(seconds: float) -> str:
+    """Short age for cache captions ("45s", "3 min", "2 h")"""
+    if seconds < 60:
+        return f"{seconds:.0f}s"
+    if seconds < 3600:
+        return f"{seconds / 60:.0f} min"
+    return f"{seconds / 3600:.0f} h"
+
+def show_result(ai_result: dict):
+    """Generated SQL, explanation and a paged results table for the last search"""
+    result = ai_result['result']
+    
+    # Display SQL
+    st.markdown("### 📝 Generated SQL")
+    st.markdown(f"""
+    <div class="sql-display">
+    {result['sql']}
+    </div>
+    """, unsafe_allow_html=True)
+    
+    st.info(f"**Explanation:** {result['explanation']}")
+    if result.get('match') == 'template':
+        st.caption(f"⚡ Answered by a built-in query template (no AI call) · parameters: {result['params']}")
+    elif result.get('match') == 'exact':
+        st.caption("⚡ Answered from cache (no AI call)")
+    elif result.get('match') == 'similar':
+        st.caption(f"⚡ Answered from cache: matched \"{result['question']}\" "
+                   f"(similarity {result['score']:.0%}, no AI call)")
+    
+    st.markdown("### 📊 Results")
+    if ai_result['notes']:
+        st.caption("🛡️ " + " · ".join(ai_result['notes']))
+    if ai_result.get('cached') is not None:
+        cached = ai_result['cached']
+        st.caption(f"♻️ Cached result from {format_age(cached.age_seconds())} ago "
+                   f"(data unchanged since; served {cached.hits}×, not re-run on the database)")
+    
+    query_result = ai_result['data']
+    if not ai_result['success']:
+        st.error(f"❌ **Query Failed**\n\n{query_result}")
+        return
+    
+    import pandas as pd
+    if not isinstance(query_result, pd.DataFrame):
+        st.warning(str(query_result))
+        return
+    
+    st.success(f"✅ Query executed successfully! Found {len(query_result)} results.")
+    
+    # Page through large results instead of rendering them all at once
+    page_size = sql_governor.PAGE_SIZE
+    page_count = (len(query_result) - 1) // page_size + 1
+    page = 1
+    if page_count > 1:
+        page = st.number_input(f"Page (of {page_count})", min_value=1, max_value=page_count, value=1,
+                               key=f"ai_result_page_{ai_result['id']}")
+    
+    # Display results with better formatting
+    st.dataframe(
+        query_result.iloc[(page - 1) * page_size:page * page_size], 
+        use_container_width=True,
+        height=400,  # Fixed height to prevent jumping
+        hide_index=True  # Hide row index numbers
+    )
+    
+    # Download button
+    csv = query_result.to_csv(index=False)
+    st.download_button(
+        label="📥 Download Results as CSV",
+        data=csv,
+        file_name=f"query_results_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
+        mime="text/csv"
+    )
+
+def validate_sql(sql: str) -> bool:
+    """True if generated SQL passes the governor and its plan fits the budget (checked with EXPLAIN, not run)"""
+    allowed, governed, _ = sql_governor.prepare(sql)
+    return allowed and sql_governor.check_plan(governed)[0]
+
+@st.cache_resource(show_spinner="🤖 Precomputing example queries...")
+def warm_example_answers(schema_version: str) -> int:
+    """Generate and cache SQL for EXAMPLE_QUERIES once per server process (and schema version)"""
+    query_cache.invalidate_schema(schema_version)
+    # Examples answered by the built-in templates never need the LLM
+    remaining = [q for q in EXAMPLE_QUERIES if ai_intents.match_intent(q) is None]
+    return query_cache.warm(remaining, schema_version, generate_sql_from_natural_language, validate_sql)
+
+# Answers from earlier sessions; examples are precomputed on first load
+query_cache = ai_query_cache.get_query_cache()
+result_cache = ai_result_cache.get_result_cache()
+if SCHEMA_PROMPT is not None:
+    warm_example_answers(SCHEMA_VERSION)
 
 # Main interface
 st.markdown("---")
@@ -414,6 +497,7 @@ with col1:
     if clear_button:
         st.session_state.chat_history = []
         st.session_state.last_sql = None
+        st.session_state.ai_result = None
         st.rerun()
 
 with col2:
@@ -427,62 +511,64 @@ with col2:
 
 # Process query
 if search_button and user_query:
-    with st.spinner("🤖 Claude is thinking..."):
-        # Generate SQL
-        result = generate_sql_from_natural_language(user_query)
+    # Common question shapes are answered by vetted templates, and repeat or near-duplicate
+    # questions from the cache; only the rest go to Claude
+    result = ai_intents.match_intent(user_query) or query_cache.lookup(user_query, SCHEMA_VERSION)
+    st.session_state.ai_result = None
+    
+    # Generate SQL, showing it as Claude writes it
+    if result is None:
+        live_sql = st.empty()
+        live_sql.info("🤖 Claude is thinking...")
+        result = generate_sql_from_natural_language(
+            user_query,
+            on_text=lambda text: live_sql.code(partial_sql(text) or "...", language='sql')
+        )
+        live_sql.empty()
+    
+    if not result.get('is_safe', False):
+        st.error(f"❌ **Query Safety Check Failed**\n\n{result.get('explanation', 'Query deemed unsafe')}")
+    else:
+        # Show the first page as soon as it arrives, then a running row count
+        live_rows = st.empty()
         
-        if not result.get('is_safe', False):
-            st.error(f"❌ **Query Safety Check Failed**\n\n{result.get('explanation', 'Query deemed unsafe')}")
-        else:
-            # Display SQL
-            st.markdown("### 📝 Generated SQL")
-            st.markdown(f"""
-            <div class="sql-display">
-            {result['sql']}
-            </div>
-            """, unsafe_allow_html=True)
-            
-            st.info(f"**Explanation:** {result['explanation']}")
-            
-            # Execute query
-            st.markdown("### 📊 Results")
-            
-            success, query_result = execute_safe_query(result['sql'])
-            
-            if success:
-                import pandas as pd
-                if isinstance(query_result, pd.DataFrame):
-                    st.success(f"✅ Query executed successfully! Found {len(query_result)} results.")
-                    
-                    # Display results with better formatting
-                    st.dataframe(
-                        query_result, 
-                        use_container_width=True,
-                        height=400,  # Fixed height to prevent jumping
-                        hide_index=True  # Hide row index numbers
-                    )
-                    
-                    # Download button
-                    csv = query_result.to_csv(index=False)
-                    st.download_button(
-                        label="📥 Download Results as CSV",
-                        data=csv,
-                        file_name=f"query_results_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
-                        mime="text/csv"
-                    )
-                    
-                    # Add to history
-                    st.session_state.chat_history.append({
-                        'query': user_query,
-                        'sql': result['sql'],
-                        'result_count': len(query_result),
-                        'timestamp': datetime.now()
-                    })
-                    
-                else:
-                    st.warning(str(query_result))
-            else:
-                st.error(f"❌ **Query Failed**\n\n{query_result}")
+        def show_progress(rows):
+            import pandas as pd
+            with live_rows.container():
+                st.caption(f"⏳ {len(rows)} rows received...")
+                st.dataframe(pd.DataFrame(rows[:sql_governor.PAGE_SIZE]), use_container_width=True,
+                             height=400, hide_index=True)
+        
+        success, query_result, notes, cached = execute_safe_query(result['sql'], result.get('params'),
+                                                                  show_progress)
+        live_rows.empty()
+        
+        if success and result.get('match') is None:
+            query_cache.store(user_query, result['sql'], result['explanation'], SCHEMA_VERSION)
+        
+        # Kept in session state so result pages can be browsed after this run
+        st.session_state.ai_result = {
+            'id': datetime.now().strftime('%H%M%S%f'),
+            'query': user_query,
+            'result': result,
+            'success': success,
+            'data': query_result,
+            'notes': notes,
+            'cached': cached,
+        }
+        
+        import pandas as pd
+        if success and isinstance(query_result, pd.DataFrame):
+            # Add to history
+            st.session_state.chat_history.append({
+                'query': user_query,
+                'sql': result['sql'],
+                'result_count': len(query_result),
+                'timestamp': datetime.now()
+            })
+
+if st.session_state.get('ai_result'):
+    show_result(st.session_state.ai_result)
 
 # Display chat history
 if st.session_state.chat_history:
@@ -517,6 +603,7 @@ with st.sidebar:
     ✅ Read-only queries  
     ✅ SQL injection prevention  
     ✅ Automatic result limiting  
+    ✅ Query cost and time limits  
     ✅ Sensitive data masking
     """)
     
@@ -535,3 +622,11 @@ with st.sidebar:
             st.metric("Total Patients", total_patients[0]['count'])
     except:
         pass
+    st.metric("Cached Answers", len(query_cache.entries))
+    result_stats = result_cache.stats()
+    st.metric("Cached Results", result_stats['entries'],
+              help=f"{result_stats['size_bytes'] / 1024 / 1024:.1f} of {result_stats['max_bytes'] / 1024 / 1024:.0f} MB · "
+                   f"{result_stats['hits']} hits, {result_stats['misses']} misses, {result_stats['evictions']} evicted")
+
+# Developer mode: database calls made during this rerun
+query_profiler.show_query_panel()
@@ -12,6 +12,9 @@ import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 import database as db
+import query_profiler
+import batch_entry
+import session_tokens
 import pandas as pd
 
 # Page configuration
@@ -67,8 +70,9 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-# Check authentication
-if 'authenticated' not in st.session_state or not st.session_state.authenticated:
+# Check authentication (signed session token from the portal login)
+session = session_tokens.current_session()
+if not session:
     st.warning("⚠️ Please log in to access the Patient Portal")
     if st.button("Go to Login Page"):
         st.switch_page("pages/5_Patient_Portal.py")
@@ -76,16 +80,18 @@ if 'authenticated' not in st.session_state or not st.session_state.authenticated
 
 # Logout function
 def logout():
-    st.session_state.authenticated = False
-    st.session_state.patient_id = None
-    st.session_state.patient_name = None
+    session_tokens.end_session()
     st.switch_page("pages/5_Patient_Portal.py")
 
-# Get patient data
-patient_id = st.session_state.patient_id
-patient_data = db.get_patient_by_id(patient_id)
+# Identity and profile come from the session token; only the medical sections are queried
+patient_id = session['sub']
+patient_data = session['profile']
 
-if not patient_data:
+# Medical sections, in one query (no record means the patient has been removed)
+record = db.get_patient_record(patient_id)
+
+if not record:
+    session_tokens.end_session()
     st.error("❌ Error loading patient data")
     st.stop()
 
@@ -142,7 +148,7 @@ with tab2:
     st.markdown("### 🏥 Medical Conditions")
     
     # Get existing conditions
-    conditions = db.get_conditions(patient_id)
+    conditions = record.conditions
     
     if not conditions.empty:
         st.dataframe(conditions, use_container_width=True, hide_index=True)
@@ -174,13 +180,17 @@ with tab2:
                     st.rerun()
                 else:
                     st.error(f"❌ {message}")
+    
+    with st.expander("📋 Add Several at Once"):
+        if batch_entry.show_batch_entry('conditions', patient_id, 'dashboard'):
+            st.rerun()
 
 # TAB 3: Allergies
 with tab3:
     st.markdown("### ⚠️ Allergies")
     
     # Get existing allergies
-    allergies = db.get_allergies(patient_id)
+    allergies = record.allergies
     
     if not allergies.empty:
         st.dataframe(allergies, use_container_width=True, hide_index=True)
@@ -212,13 +222,17 @@ with tab3:
                     st.rerun()
                 else:
                     st.error(f"❌ {message}")
+    
+    with st.expander("📋 Add Several at Once"):
+        if batch_entry.show_batch_entry('allergies', patient_id, 'dashboard'):
+            st.rerun()
 
 # TAB 4: Medications
 with tab4:
     st.markdown("### 💊 Current Medications")
     
     # Get existing medications
-    medications = db.get_medications(patient_id)
+    medications = record.medications
     
     if not medications.empty:
         st.dataframe(medications, use_container_width=True, hide_index=True)
@@ -250,13 +264,17 @@ with tab4:
                     st.rerun()
                 else:
                     st.error(f"❌ {message}")
+    
+    with st.expander("📋 Add Several at Once"):
+        if batch_entry.show_batch_entry('medications', patient_id, 'dashboard'):
+            st.rerun()
 
 # TAB 5: Emergency Contacts
 with tab5:
     st.markdown("### 📞 Emergency Contacts")
     
     # Get existing contacts
-    contacts = db.get_emergency_contacts(patient_id)
+    contacts = record.contacts
     
     if not contacts.empty:
         st.dataframe(contacts, use_container_width=True, hide_index=True)
@@ -304,6 +322,7 @@ with tab6:
             if new_phone and new_phone != patient_data.get('phone'):
                 success, message = db.update_patient_medical_info(patient_id, 'phone', new_phone)
                 if success:
+                    session_tokens.update_profile(phone=new_phone)
                     st.success(f"✅ Phone updated")
                     updated = True
                 else:
@@ -312,6 +331,7 @@ with tab6:
             if new_email and new_email != patient_data.get('email'):
                 success, message = db.update_patient_medical_info(patient_id, 'email', new_email)
                 if success:
+                    session_tokens.update_profile(email=new_email)
                     st.success(f"✅ Email updated")
                     updated = True
                 else:
@@ -336,6 +356,7 @@ with tab6:
             if new_blood_type:
                 success, message = db.update_patient_medical_info(patient_id, 'blood_type', new_blood_type)
                 if success:
+                    session_tokens.update_profile(blood_type=new_blood_type)
                     st.success(f"✅ {message}")
                     st.rerun()
                 else:
@@ -352,10 +373,11 @@ with st.sidebar:
     st.markdown("---")
     
     st.markdown("### 📋 Quick Stats")
-    conditions_count = len(db.get_conditions(patient_id))
-    allergies_count = len(db.get_allergies(patient_id))
-    medications_count = len(db.get_medications(patient_id))
-    contacts_count = len(db.get_emergency_contacts(patient_id))
+    # Reuse the records already loaded for the tabs
+    conditions_count = len(conditions)
+    allergies_count = len(allergies)
+    medications_count = len(medications)
+    contacts_count = len(contacts)
     
     st.metric("Medical Conditions", conditions_count)
     st.metric("Allergies", allergies_count)
@@ -366,3 +388,6 @@ with st.sidebar:
     
     if st.button("🚪 Logout", use_container_width=True, key="sidebar_logout"):
         logout()
+
+# Developer mode: database calls made during this rerun
+query_profiler.show_query_panel()
@@ -14,6 +14,7 @@ from datetime import datetime
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 import database as db
+import query_profiler
 from global_styles import apply_global_styles
 
 # Page configuration
@@ -99,13 +100,15 @@ if not emergency_token:
     st.stop()
 
 # Fetch patient data using emergency token
-patient_data = db.get_patient_by_emergency_token(emergency_token)
+record = db.get_patient_record(emergency_token=emergency_token)
 
-if not patient_data:
+if not record:
     st.error("❌ Invalid or expired emergency access token")
     st.warning("This QR code may be invalid or the patient record may have been removed.")
     st.stop()
 
+patient_data = record.patient
+
 # Log the emergency access
 db.log_emergency_access(patient_data['patient_id'], emergency_token)
 
@@ -135,7 +138,7 @@ st.markdown("---")
 
 # CRITICAL ALLERGIES
 st.markdown("### ⚠️ CRITICAL ALLERGIES")
-allergies = db.get_allergies(patient_data['patient_id'])
+allergies = record.allergies
 
 if not allergies.empty:
     # Separate life-threatening allergies
@@ -164,7 +167,7 @@ st.markdown("---")
 
 # CURRENT MEDICATIONS
 st.markdown("### 💊 Current Medications")
-medications = db.get_medications(patient_data['patient_id'])
+medications = record.medications
 
 if not medications.empty:
     for _, med in medications.iterrows():
@@ -178,7 +181,7 @@ st.markdown("---")
 
 # MEDICAL CONDITIONS
 st.markdown("### 🏥 Medical Conditions")
-conditions = db.get_conditions(patient_data['patient_id'])
+conditions = record.conditions
 
 if not conditions.empty:
     for _, condition in conditions.iterrows():
@@ -194,7 +197,7 @@ st.markdown("---")
 
 # EMERGENCY CONTACTS
 st.markdown("### 📞 Emergency Contacts")
-emergency_contacts = db.get_emergency_contacts(patient_data['patient_id'])
+emergency_contacts = record.contacts
 
 if not emergency_contacts.empty:
     for _, contact in emergency_contacts.iterrows():
@@ -285,3 +288,6 @@ with st.sidebar:
     **For medical emergencies:**
     Call 911
     """)
+
+# Developer mode: database calls made during this rerun
+query_profiler.show_query_panel()
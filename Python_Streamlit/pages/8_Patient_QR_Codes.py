@@ -13,8 +13,10 @@ from io import BytesIO
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 import database as db
+import query_profiler
 from admin_auth import admin_login_page, show_logout_button
 import qr_generator
+import offline_qr_payload
 
 # Page configuration
 st.set_page_config(
@@ -112,6 +114,17 @@ elif search_method == "Patient ID":
 else:  # License Number
     search_query = st.text_input("Enter license number:", placeholder="e.g., TX12345678")
 
+# Signed offline summary in the QR (readable with no signal); needs MIAS_QR_SIGNING_KEY
+signing_key = offline_qr_payload.load_signing_key()
+embed_offline = st.checkbox(
+    "📴 Embed offline emergency summary (signed)",
+    value=False,
+    disabled=signing_key is None,
+    help="Adds blood type, life-threatening allergies, critical conditions and an ICE phone to the "
+         "QR code so responders can read them without network access. "
+         + ("" if signing_key else "Set MIAS_QR_SIGNING_KEY to enable (python offline_qr_payload.py keygen).")
+)
+
 search_button = st.button("🔍 Search", type="primary")
 
 # Search and display results
@@ -188,10 +201,18 @@ if search_button and search_query:
                         st.markdown("#### Emergency QR Code")
                         
                         # Generate QR code from emergency token
+                        offline_payload = None
+                        if embed_offline:
+                            offline_payload = offline_qr_payload.encode_for_patient(
+                                patient['patient_id'], patient['emergency_token'], signing_key
+                            )
                         qr_image = qr_generator.create_emergency_qr_code(
                             patient_id=patient['patient_id'],
-                            emergency_token=patient['emergency_token']
+                            emergency_token=patient['emergency_token'],
+                            offline_payload=offline_payload
                         )
+                        if offline_payload:
+                            st.caption(f"📴 Offline summary embedded ({len(offline_payload)} characters, signed)")
                         
                         # Convert to bytes for reliable display
                         qr_buffer = BytesIO()
@@ -247,7 +268,7 @@ if search_button and search_query:
                         )
                     
                     # Emergency URL
-                    emergency_url = f"https://bryanbarber214.github.io/MIAS-License-to-Live/emergency_access.html?token={patient['emergency_token']}"
+                    emergency_url = qr_generator.emergency_url(patient['emergency_token'])
                     
                     st.markdown("---")
                     st.markdown("#### 🔗 Emergency Access URL")
@@ -320,3 +341,6 @@ if st.button("📋 Show All Patients"):
             st.caption(f"Showing {len(all_patients)} patients. Use search above to find specific patient QR codes.")
         else:
             st.warning("No patients found in database.")
+
+# Developer mode: database calls made during this rerun
+query_profiler.show_query_panel()
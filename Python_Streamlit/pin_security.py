@@ -0,0 +1,316 @@
+"""
+Patient PIN Security
+License to Live: MIAS - Python/Streamlit Version
+Salted PBKDF2 PIN hashing, verification on a bounded worker pool with a short-lived
+result cache, and an in-process login throttle (token buckets per license number and
+per client, plus lockout) that rejects abusive attempts before they reach MySQL
+
+Hash PINs still stored in plaintext (they are also rehashed on each successful login):
+    python pin_security.py --migrate
+"""
+
+import base64
+import hashlib
+import hmac
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple
+
+# ==================== HASHING ====================
+
+HASH_ALGORITHM = 'pbkdf2_sha256'
+
+# A 4-digit PIN has only 10,000 values, so the work factor is what makes an offline
+# guess expensive; raise it as hardware gets faster (old hashes are upgraded on login)
+PBKDF2_ITERATIONS = int(os.environ.get('MIAS_PIN_HASH_ITERATIONS', 600000))
+
+SALT_BYTES = 16
+
+
+def hash_pin(pin: str, iterations: int = PBKDF2_ITERATIONS) -> str:
+    """
+    Hash a PIN for storage
+
+    Returns:
+        'pbkdf2_sha256$<iterations>$<salt>$<hash>' (base64 salt and hash, fits VARCHAR(255))
+    """
+    salt = secrets.token_bytes(SALT_BYTES)
+    digest = hashlib.pbkdf2_hmac('sha256', pin.encode('utf-8'), salt, iterations)
+    return '$'.join([HASH_ALGORITHM, str(iterations),
+                     base64.b64encode(salt).decode('ascii'), base64.b64encode(digest).decode('ascii')])
+
+
+def is_hashed(stored: Optional[str]) -> bool:
+    """True if a stored PIN is a hash produced by hash_pin (not a legacy plaintext PIN)"""
+    return bool(stored) and stored.startswith(HASH_ALGORITHM + '$')
+
+
+def _verify(pin: str, stored: str) -> Tuple[bool, bool]:
+    if not stored:
+        return False, False
+    if not is_hashed(stored):
+        # Legacy plaintext PIN: compare in constant time and ask for a rehash
+        matches = hmac.compare_digest(pin.encode('utf-8'), stored.encode('utf-8'))
+        return matches, matches
+
+    try:
+        _, iterations, salt, expected = stored.split('$')
+        iterations = int(iterations)
+        digest = hashlib.pbkdf2_hmac('sha256', pin.encode('utf-8'), base64.b64decode(salt), iterations)
+    except (ValueError, TypeError):
+        return False, False
+    matches = hmac.compare_digest(digest, base64.b64decode(expected))
+    return matches, matches and iterations < PBKDF2_ITERATIONS
+
+
+# PBKDF2 in hashlib releases the GIL, so verifications run in parallel on this pool;
+# its size caps how much CPU concurrent logins can take from page rendering
+_verifier = ThreadPoolExecutor(max_workers=min(4, os.cpu_count() or 1), thread_name_prefix='pin-verify')
+
+# Recent verification results: keyed digest of (stored hash, PIN) -> (result, expires at)
+VERIFY_CACHE_SECONDS = 300
+VERIFY_CACHE_SIZE = 10000
+_cache_key = secrets.token_bytes(32)
+_verify_cache: "OrderedDict[bytes, Tuple[Tuple[bool, bool], float]]" = OrderedDict()
+_verify_cache_lock = threading.Lock()
+
+
+def verify_pin(pin: str, stored: Optional[str], timeout: float = 10) -> Tuple[bool, bool]:
+    """
+    Check a PIN against its stored value
+
+    Runs the slow hash on the verifier pool and remembers the result for a few
+    minutes, so a patient moving between sessions does not pay for it again.
+
+    Args:
+        pin: PIN entered by the user
+        stored: Value of Patients.pin (hash, or legacy plaintext)
+        timeout: Seconds to wait for a verifier thread
+
+    Returns:
+        Tuple of (matches: bool, needs_rehash: bool)
+    """
+    if not stored:
+        return False, False
+
+    key = hmac.new(_cache_key, f"{stored}\0{pin}".encode('utf-8'), hashlib.sha256).digest()
+    now = time.monotonic()
+    with _verify_cache_lock:
+        cached = _verify_cache.get(key)
+        if cached and cached[1] > now:
+            _verify_cache.move_to_end(key)
+            return cached[0]
+
+    result = _verifier.submit(_verify, pin, stored).result(timeout=timeout)
+
+    with _verify_cache_lock:
+        _verify_cache[key] = (result, now + VERIFY_CACHE_SECONDS)
+        _verify_cache.move_to_end(key)
+        while len(_verify_cache) > VERIFY_CACHE_SIZE:
+            _verify_cache.popitem(last=False)
+    return result
+
+
+# ==================== LOGIN THROTTLE ====================
+
+class TokenBucket:
+    """Classic token bucket: `capacity` attempts at once, refilled at `rate` per second"""
+
+    def __init__(self, capacity: float, rate: float):
+        self.capacity = capacity
+        self.rate = rate
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def take(self, now: float) -> bool:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+
+class LoginThrottle:
+    """
+    In-process limits on PIN attempts
+
+    Each license number and each client gets a token bucket, and a license is
+    locked out after too many consecutive failures. Everything is checked
+    in memory, so rejected attempts never touch the database. State is per
+    server process and bounded in size (idle entries are evicted first).
+    """
+
+    def __init__(self, license_capacity: int = 5, license_per_minute: float = 1,
+                 client_capacity: int = 20, client_per_minute: float = 10,
+                 lockout_failures: int = 10, lockout_seconds: int = 900, max_entries: int = 100000):
+        self.license_capacity = license_capacity
+        self.license_rate = license_per_minute / 60
+        self.client_capacity = client_capacity
+        self.client_rate = client_per_minute / 60
+        self.lockout_failures = lockout_failures
+        self.lockout_seconds = lockout_seconds
+        self.max_entries = max_entries
+        self._buckets: "OrderedDict[Tuple[str, str], TokenBucket]" = OrderedDict()
+        self._failures: "OrderedDict[str, int]" = OrderedDict()
+        self._locked_until: "OrderedDict[str, float]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _bucket(self, kind: str, key: str) -> TokenBucket:
+        bucket = self._buckets.get((kind, key))
+        if bucket is None:
+            if kind == 'license':
+                bucket = TokenBucket(self.license_capacity, self.license_rate)
+            else:
+                bucket = TokenBucket(self.client_capacity, self.client_rate)
+            self._buckets[(kind, key)] = bucket
+            while len(self._buckets) > self.max_entries:
+                self._buckets.popitem(last=False)
+        self._buckets.move_to_end((kind, key))
+        return bucket
+
+    def check(self, license_number: str, client: Optional[str] = None) -> Tuple[bool, str]:
+        """
+        Take one attempt from the license's (and client's) budget
+
+        Returns:
+            Tuple of (allowed: bool, message: str)
+        """
+        license_key = license_number.strip().upper()
+        now = time.monotonic()
+        with self._lock:
+            locked_until = self._locked_until.get(license_key)
+            if locked_until:
+                if locked_until > now:
+                    minutes = int((locked_until - now) // 60) + 1
+                    return False, f"Too many failed attempts. Try again in {minutes} minute(s)"
+                del self._locked_until[license_key]
+
+            if client and not self._bucket('client', client).take(now):
+                return False, "Too many login attempts from this device. Please wait a minute"
+            if not self._bucket('license', license_key).take(now):
+                return False, "Too many login attempts for this license. Please wait a minute"
+        return True, ""
+
+    def record_failure(self, license_number: str):
+        """Count a wrong PIN (or unknown license); locks the license at the threshold"""
+        license_key = license_number.strip().upper()
+        with self._lock:
+            failures = self._failures.get(license_key, 0) + 1
+            self._failures[license_key] = failures
+            self._failures.move_to_end(license_key)
+            if failures >= self.lockout_failures:
+                self._locked_until[license_key] = time.monotonic() + self.lockout_seconds
+                self._failures.pop(license_key)
+            while len(self._failures) > self.max_entries:
+                self._failures.popitem(last=False)
+            while len(self._locked_until) > self.max_entries:
+                self._locked_until.popitem(last=False)
+
+    def record_success(self, license_number: str):
+        """Clear the failure count after a correct PIN"""
+        with self._lock:
+            self._failures.pop(license_number.strip().upper(), None)
+
+
+throttle = LoginThrottle()
+
+
+# Reverse proxies in front of the app that each append the address they received from to
+# X-Forwarded-For; entries to the left of theirs are whatever the client chose to send.
+# 0 ignores the header (the app is reached directly, so it cannot be trusted)
+TRUSTED_PROXY_HOPS = int(os.environ.get('MIAS_TRUSTED_PROXY_HOPS', 1))
+
+
+def forwarded_client(forwarded_for: Optional[str], hops: int = TRUSTED_PROXY_HOPS) -> Optional[str]:
+    """
+    Client address recorded by the outermost trusted proxy in an X-Forwarded-For header
+
+    Counts `hops` entries from the right, so a client cannot pick its own key by
+    prepending addresses. Returns None without a header or trusted proxies.
+    """
+    if not forwarded_for or hops < 1:
+        return None
+    addresses = [address.strip() for address in forwarded_for.split(',') if address.strip()]
+    if not addresses:
+        return None
+    return addresses[-min(hops, len(addresses))]
+
+
+def client_key() -> Optional[str]:
+    """
+    Identify the client of the current Streamlit session
+
+    Uses the address the trusted proxy put in X-Forwarded-For (see forwarded_client),
+    falling back to the session id (which only limits one browser tab) when no proxy
+    is present. Returns None outside a script run.
+    """
+    try:
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+        # Private and deprecated after Streamlit 1.31 (requirements.txt pins 1.31.0);
+        # st.context.headers replaces it from 1.37
+        from streamlit.web.server.websocket_headers import _get_websocket_headers
+    except ImportError:
+        return None
+
+    ctx = get_script_run_ctx()
+    if ctx is None:
+        return None
+    headers = _get_websocket_headers() or {}
+    address = forwarded_client(headers.get('X-Forwarded-For'))
+    if address:
+        return address
+    return f"session:{ctx.session_id}"
+
+
+# ==================== MIGRATION ====================
+
+def migrate_plaintext_pins(batch_size: int = 500) -> int:
+    """
+    Replace every plaintext PIN in Patients with its hash
+
+    Requires pin to be VARCHAR(255) (see pin_hash_migration.sql).
+
+    Returns:
+        Number of PINs hashed
+    """
+    import database as db
+
+    migrated = 0
+    last_id = 0
+    while True:
+        rows = db.execute_query("""
+            SELECT patient_id, pin FROM Patients
+            WHERE patient_id > %s AND pin IS NOT NULL AND pin NOT LIKE %s
+            ORDER BY patient_id
+            LIMIT %s
+        """, (last_id, HASH_ALGORITHM + '$%', batch_size))
+        if not rows:
+            return migrated
+        updates = [(hash_pin(row['pin']), row['patient_id'], row['pin']) for row in rows]
+        # The pin = old value guard skips rows changed since they were read
+        success, _, message = db.execute_batch([
+            ("UPDATE Patients SET pin = %s WHERE patient_id = %s AND pin = %s", updates)
+        ])
+        if not success:
+            raise RuntimeError(message)
+        migrated += len(updates)
+        last_id = rows[-1]['patient_id']
+        print(f"  {migrated:,} PINs hashed")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Patient PIN hashing tools")
+    parser.add_argument("--migrate", action="store_true", help="Hash all plaintext PINs in Patients")
+    args = parser.parse_args()
+
+    if args.migrate:
+        print(f"Hashed {migrate_plaintext_pins():,} PINs")
+    else:
+        parser.print_help()
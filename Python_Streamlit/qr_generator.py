@@ -7,43 +7,145 @@ CORRECTED: Uses correct page name for Streamlit Cloud
 
 import qrcode
 import io
+import os
 import secrets
+from qrcode import util
 from PIL import Image, ImageDraw, ImageFont
 import base64
 
+# Short entry page (q.html forwards to emergency_access.html). Scheme and host are
+# case-insensitive, so they are upper case to stay in QR alphanumeric mode; the path
+# is case-sensitive on GitHub Pages and is kept as is.
+EMERGENCY_BASE_URL = os.environ.get('MIAS_QR_BASE_URL', "HTTPS://BRYANBARBER214.GITHUB.IO/MIAS-License-to-Live/q?t=")
+
+# Random bytes per token (160 bits -> 32 base32 characters)
+TOKEN_BYTES = 20
+
+# Error correction levels from weakest to strongest (the qrcode constants are not ordered)
+ERROR_CORRECTION_LEVELS = [
+    qrcode.constants.ERROR_CORRECT_L,
+    qrcode.constants.ERROR_CORRECT_M,
+    qrcode.constants.ERROR_CORRECT_Q,
+    qrcode.constants.ERROR_CORRECT_H,
+]
+
+# Minimum run of digits/upper case before switching segment mode; each is tried (0 = one segment)
+SEGMENT_THRESHOLDS = (0, 4, 8, 12, 20)
+
+
 def generate_emergency_token() -> str:
     """
     Generate a secure random token for emergency access
-    Returns a 32-character alphanumeric token
+    Returns a 32-character upper case base32 token (A-Z, 2-7), which QR codes
+    store in alphanumeric mode. Tokens issued in the older URL-safe format
+    stay valid; lookups compare the stored string.
+    """
+    return base64.b32encode(secrets.token_bytes(TOKEN_BYTES)).decode('ascii').rstrip('=')
+
+
+def emergency_url(emergency_token: str, base_url: str = EMERGENCY_BASE_URL, offline_payload: str = None) -> str:
+    """
+    Emergency access URL encoded in a patient's QR code
+
+    Args:
+        emergency_token: Unique emergency access token
+        base_url: URL the token is appended to
+        offline_payload: Signed offline summary (offline_qr_payload.encode_for_patient) to
+            carry in the URL fragment, readable without network access
+
+    Returns:
+        URL string
+    """
+    url = f"{base_url}{emergency_token}"
+    if offline_payload:
+        # The fragment never reaches a server; the page ignores it
+        from offline_qr_payload import qr_fragment
+        url += qr_fragment(offline_payload)
+    return url
+
+
+# ==================== QR OPTIMIZER ====================
+
+def _data_bits(qr: qrcode.QRCode) -> int:
+    """Encoded size of a fitted code's segments (headers included)"""
+    mode_sizes = util.mode_sizes_for_version(qr.version)
+    buffer = util.BitBuffer()
+    for chunk in qr.data_list:
+        buffer.put(chunk.mode, 4)
+        buffer.put(len(chunk), mode_sizes[chunk.mode])
+        chunk.write(buffer)
+    return len(buffer)
+
+
+def optimize_qr(data: str, error_correction: int = qrcode.constants.ERROR_CORRECT_H,
+                box_size: int = 10, border: int = 4) -> qrcode.QRCode:
+    """
+    Build the smallest QR code for data that meets an error correction target
+
+    Each segmentation threshold is fitted and the lowest version wins (ties go
+    to the fewest bits). Capacity left over at that version is spent on the
+    strongest error correction level that still fits, so the code is never
+    larger than needed and never weaker than asked.
+
+    Args:
+        data: Text to encode
+        error_correction: Minimum level (qrcode.constants.ERROR_CORRECT_*)
+        box_size: Pixels per module
+        border: Quiet zone in modules
+
+    Returns:
+        qrcode.QRCode with its matrix made
+
+    Raises:
+        qrcode.exceptions.DataOverflowError: If data does not fit version 40
     """
-    return secrets.token_urlsafe(32)
+    best, best_bits = None, None
+    for threshold in SEGMENT_THRESHOLDS:
+        qr = qrcode.QRCode(error_correction=error_correction, box_size=box_size, border=border)
+        qr.add_data(data, optimize=threshold)
+        qr.best_fit()
+        bits = _data_bits(qr)
+        if best is None or (qr.version, bits) < (best.version, best_bits):
+            best, best_bits = qr, bits
+
+    for level in ERROR_CORRECTION_LEVELS[ERROR_CORRECTION_LEVELS.index(error_correction) + 1:]:
+        if best_bits <= util.BIT_LIMIT_TABLE[level][best.version]:
+            best.error_correction = level
+    best.make(fit=False)
+    return best
 
 
-def create_emergency_qr_code(patient_id: int, emergency_token: str, base_url: str = "https://bryanbarber214.github.io/MIAS-License-to-Live/emergency_access.html") -> Image:
+def qr_stats(qr: qrcode.QRCode) -> dict:
+    """Version, error correction and size of a made QR code"""
+    modules = qr.modules_count
+    return {
+        'version': qr.version,
+        'error_correction': 'LMQH'[ERROR_CORRECTION_LEVELS.index(qr.error_correction)],
+        'modules': modules,
+        'modules_with_border': modules + 2 * qr.border,
+        'data_bits': _data_bits(qr),
+    }
+
+
+def create_emergency_qr_code(patient_id: int, emergency_token: str, base_url: str = EMERGENCY_BASE_URL,
+                             offline_payload: str = None,
+                             error_correction: int = qrcode.constants.ERROR_CORRECT_H) -> Image:
     """
     Create QR code for emergency medical access
     
     Args:
         patient_id: Patient's database ID
         emergency_token: Unique emergency access token
-        base_url: Base URL of the application
+        base_url: URL the token is appended to (default: short entry page)
+        offline_payload: Signed offline summary (offline_qr_payload.encode_for_patient) to
+            carry in the URL fragment, readable without network access
+        error_correction: Minimum error correction level (High by default, for worn cards)
         
     Returns:
         PIL Image object containing the QR code
     """
-    # Create emergency access URL - CORRECTED to match page name
-    emergency_url = f"{base_url}?token={emergency_token}"
-    
-    # Generate QR code
-    qr = qrcode.QRCode(
-        version=1,
-        error_correction=qrcode.constants.ERROR_CORRECT_H,  # High error correction
-        box_size=10,
-        border=4,
-    )
-    
-    qr.add_data(emergency_url)
-    qr.make(fit=True)
+    # Smallest version at the target error correction (see optimize_qr)
+    qr = optimize_qr(emergency_url(emergency_token, base_url, offline_payload), error_correction)
     
     # Create image
     qr_image = qr.make_image(fill_color="black", back_color="white")
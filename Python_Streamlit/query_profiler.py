@@ -0,0 +1,253 @@
+"""
+Query Profiler (Developer Mode)
+License to Live: MIAS - Python/Streamlit Version
+Records every database.py call made during a Streamlit rerun, shows the count, time and
+duplicate/N+1 calls in a sidebar panel, and lets tests assert a per-page query budget
+
+Enable with the MIAS_DEV_MODE environment variable:
+    MIAS_DEV_MODE=1 streamlit run app.py
+"""
+
+import functools
+import inspect
+import os
+import threading
+import time
+from collections import Counter, OrderedDict
+from typing import Callable, Dict, List, Optional
+
+import streamlit as st
+
+import session_tokens
+
+DEV_MODE = bool(os.environ.get('MIAS_DEV_MODE'))
+
+# Functions that issue SQL round trips themselves; everything else is counted as an API call
+SQL_FUNCTIONS = {'execute_query', 'execute_batch', 'execute_readonly', 'stream_readonly', 'delete_patient', 'get_streaming_connection'}
+
+# Not worth recording (no database access, or cached resources)
+SKIPPED_FUNCTIONS = {'get_workload_stats', 'workload', 'get_snapshot_analytics', 'calculate_age',
+                     'encode_change_cursor', 'decode_change_cursor', 'invalidate_patient_record',
+                     'record_login'}
+
+# Same function called with this many different arguments in one rerun looks like N+1
+N_PLUS_ONE_THRESHOLD = 5
+
+# Reruns of this many sessions are kept
+MAX_SESSIONS = 100
+
+_logs: "OrderedDict[str, Dict]" = OrderedDict()
+_logs_lock = threading.Lock()
+_last_log: Optional[Dict] = None
+
+
+# ==================== RECORDING ====================
+
+def _current_log() -> Optional[Dict]:
+    """
+    Call log of the rerun executing on this thread, or None outside a Streamlit script run
+
+    A ScriptRunContext is reused across reruns of a session, but reset()
+    gives it a new `cursors` dict at the start of every run, so that dict's
+    identity marks the rerun.
+    """
+    global _last_log
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+    ctx = get_script_run_ctx()
+    if ctx is None:
+        return None
+
+    with _logs_lock:
+        log = _logs.get(ctx.session_id)
+        if log is None or log['run_marker'] is not ctx.cursors:
+            log = {'run_marker': ctx.cursors, 'page': ctx.page_script_hash, 'calls': [], 'depth': 0}
+            _logs[ctx.session_id] = log
+            _logs.move_to_end(ctx.session_id)
+            while len(_logs) > MAX_SESSIONS:
+                _logs.popitem(last=False)
+        _last_log = log
+        return log
+
+
+def _describe_args(args: tuple, kwargs: dict) -> str:
+    """Short, hashable rendering of call arguments (long SQL is trimmed)"""
+    parts = [' '.join(str(a).split())[:60] for a in args]
+    parts += [f"{k}={' '.join(str(v).split())[:40]}" for k, v in kwargs.items()]
+    return ', '.join(parts)
+
+
+def _wrap(name: str, func: Callable) -> Callable:
+    @functools.wraps(func)
+    def profiled(*args, **kwargs):
+        log = _current_log()
+        if log is None:
+            return func(*args, **kwargs)
+
+        entry = {'function': name, 'args': _describe_args(args, kwargs), 'depth': log['depth'], 'ms': 0.0}
+        log['calls'].append(entry)
+        log['depth'] += 1
+        started = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            entry['ms'] = (time.perf_counter() - started) * 1000
+            log['depth'] -= 1
+
+    profiled.__wrapped_by_query_profiler__ = True
+    return profiled
+
+
+def install(module):
+    """Wrap every public function of `module` (database.py) so calls are recorded"""
+    for name, member in list(vars(module).items()):
+        if (inspect.isfunction(member) and member.__module__ == module.__name__
+                and not name.startswith('_') and name not in SKIPPED_FUNCTIONS
+                and not getattr(member, '__wrapped_by_query_profiler__', False)):
+            setattr(module, name, _wrap(name, member))
+
+
+# ==================== ANALYSIS ====================
+
+def summarize(log: Optional[Dict]) -> Dict:
+    """
+    Digest a rerun's call log
+
+    Returns:
+        Dictionary with call/query counts, total time, duplicates and N+1 suspects
+    """
+    calls = log['calls'] if log else []
+    top_level = [c for c in calls if c['depth'] == 0]
+
+    repeated = Counter((c['function'], c['args']) for c in top_level)
+    duplicates = [{'function': f, 'args': a, 'times': n} for (f, a), n in repeated.items() if n > 1]
+
+    distinct_args = {}
+    for c in top_level:
+        distinct_args.setdefault(c['function'], set()).add(c['args'])
+    n_plus_one = {f: len(a) for f, a in distinct_args.items() if len(a) >= N_PLUS_ONE_THRESHOLD}
+
+    return {
+        'calls': len(top_level),
+        'queries': sum(1 for c in calls if c['function'] in SQL_FUNCTIONS),
+        'total_ms': round(sum(c['ms'] for c in top_level), 2),
+        'duplicates': duplicates,
+        'duplicate_calls': sum(d['times'] - 1 for d in duplicates),
+        'n_plus_one': n_plus_one,
+        'log': top_level,
+    }
+
+
+def last_run_summary() -> Dict:
+    """Summary of the most recently recorded rerun (any session)"""
+    return summarize(_last_log)
+
+
+# ==================== SIDEBAR PANEL ====================
+
+def show_query_panel():
+    """Sidebar panel with this rerun's database calls; call at the end of a page (no-op unless dev mode)"""
+    if not DEV_MODE:
+        return
+
+    summary = summarize(_current_log())
+    flagged = summary['duplicate_calls'] > 0 or summary['n_plus_one']
+
+    with st.sidebar.expander(f"🧪 Queries this rerun: {summary['queries']}", expanded=bool(flagged)):
+        col1, col2, col3 = st.columns(3)
+        col1.metric("Calls", summary['calls'])
+        col2.metric("SQL", summary['queries'])
+        col3.metric("ms", f"{summary['total_ms']:.0f}")
+
+        if summary['duplicates']:
+            st.warning(f"⚠️ {summary['duplicate_calls']} duplicate call(s)")
+            for duplicate in summary['duplicates']:
+                st.caption(f"{duplicate['function']}({duplicate['args']}) × {duplicate['times']}")
+        for function, count in summary['n_plus_one'].items():
+            st.warning(f"⚠️ Possible N+1: {function} called with {count} different arguments")
+
+        if summary['log']:
+            st.dataframe(
+                [{'function': c['function'], 'args': c['args'], 'ms': round(c['ms'], 1)} for c in summary['log']],
+                use_container_width=True,
+                hide_index=True,
+            )
+
+
+# ==================== TEST HELPER ====================
+
+def assert_query_budget(page: str, max_queries: int, max_duplicates: int = 0,
+                        session_state: Optional[Dict] = None, query_params: Optional[Dict] = None,
+                        timeout: float = 30) -> Dict:
+    """
+    Run a page once and fail if it exceeds its database budget
+
+    Args:
+        page: Page script path (relative to Python_Streamlit/ or absolute)
+        max_queries: Maximum SQL round trips allowed for one rerun
+        max_duplicates: Maximum repeated identical calls allowed
+        session_state: Values to preload (e.g. a logged-in patient)
+        query_params: URL query parameters for the run
+
+    Returns:
+        The rerun summary (see summarize)
+
+    Raises:
+        AssertionError: Budget exceeded or the page raised
+    """
+    import database
+    from streamlit.testing.v1 import AppTest
+
+    install(database)
+    path = page if os.path.isabs(page) else os.path.join(os.path.dirname(os.path.abspath(__file__)), page)
+    app = AppTest.from_file(path, default_timeout=timeout)
+    for key, value in (session_state or {}).items():
+        app.session_state[key] = value
+    for key, value in (query_params or {}).items():
+        app.query_params[key] = value
+    app.run()
+
+    if app.exception:
+        raise AssertionError(f"{page} raised: {app.exception[0].value}")
+
+    summary = last_run_summary()
+    problems = []
+    if summary['queries'] > max_queries:
+        problems.append(f"{summary['queries']} SQL queries (budget {max_queries})")
+    if summary['duplicate_calls'] > max_duplicates:
+        problems.append(f"{summary['duplicate_calls']} duplicate calls (allowed {max_duplicates}): "
+                        + '; '.join(f"{d['function']}({d['args']}) x{d['times']}" for d in summary['duplicates']))
+    if problems:
+        calls = '\n'.join(f"  {c['function']}({c['args']})  {c['ms']:.1f} ms" for c in summary['log'])
+        raise AssertionError(f"{page} exceeded its query budget: {'; '.join(problems)}\n{calls}")
+    return summary
+
+
+# Per-page budgets, checked by tests/test_query_budget.py on a stubbed execute_query and by
+# `python query_profiler.py` against a local database loaded by synthetic_data.py
+# (patient PATIENT_ID_OFFSET is the first synthetic patient)
+PAGE_BUDGETS: List[Dict] = [
+    {'page': 'pages/6_Patient_Dashboard.py', 'max_queries': 1,
+     'session_state': {'session_token': session_tokens.issue(1000, {'first_name': 'Synthetic', 'last_name': 'Patient'})}},
+    {'page': 'pages/3_Analytics_Dashboard.py', 'max_queries': 20,
+     'session_state': {'admin_authenticated': True}},
+    {'page': 'pages/2_Medical_Info_Manager.py', 'max_queries': 2,
+     'session_state': {'admin_authenticated': True}},
+    {'page': 'pages/2_Medical_Info_Manager.py', 'max_queries': 2,
+     'session_state': {'admin_authenticated': True, 'selected_patient': 1000}},
+    {'page': 'pages/4_Database_Management.py', 'max_queries': 2,
+     'session_state': {'admin_authenticated': True}},
+]
+
+
+if __name__ == "__main__":
+    failures = 0
+    for budget in PAGE_BUDGETS:
+        try:
+            result = assert_query_budget(budget['page'], budget['max_queries'],
+                                         budget.get('max_duplicates', 0), budget.get('session_state'))
+            print(f"✅ {budget['page']}: {result['queries']} queries, {result['total_ms']:.0f} ms")
+        except AssertionError as e:
+            failures += 1
+            print(f"❌ {e}")
+    raise SystemExit(1 if failures else 0)
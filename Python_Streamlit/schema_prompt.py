@@ -0,0 +1,137 @@
+"""
+AI Search Schema Prompt
+License to Live: MIAS - Python/Streamlit Version
+Builds the schema description given to Claude from INFORMATION_SCHEMA instead of a
+hand-maintained copy, in a compact one-line-per-table form, versioned by its hash
+
+Format (one line per table, types only where they are not plain text):
+    Medications(medication_id PK, patient_id>Patients, medication_name, start_date:date,
+                end_date:date "NULL if currently active", ...)
+"""
+
+import hashlib
+from typing import Dict, List, Optional, Tuple
+
+import streamlit as st
+
+import database as db
+
+# Internal tables the search page has no business querying
+EXCLUDED_TABLES = {'Change_Tombstones'}
+
+# Columns never described to the model (sql_governor also rejects them)
+EXCLUDED_COLUMNS = {'pin', 'emergency_token'}
+
+# Short type names; anything not listed (varchar, char, text...) is left untyped
+TYPE_NAMES = {
+    'int': 'int', 'bigint': 'int', 'smallint': 'int', 'mediumint': 'int',
+    'tinyint': 'bool', 'decimal': 'num', 'float': 'num', 'double': 'num',
+    'date': 'date', 'datetime': 'ts', 'timestamp': 'ts', 'time': 'time', 'year': 'int',
+    'json': 'json', 'enum': 'enum', 'set': 'set',
+}
+
+# Longest column comment kept (they carry value lists like 'Mild, Moderate, Severe')
+MAX_COMMENT_LENGTH = 60
+
+# Bump to invalidate prompts when the format below changes
+FORMAT_VERSION = '1'
+
+# Seconds before INFORMATION_SCHEMA is read again to pick up migrations
+REFRESH_SECONDS = 600
+
+
+def _describe_column(column: Dict, foreign_keys: Dict[Tuple[str, str], str]) -> str:
+    name = column['column_name']
+    parts = [name]
+    if column['column_key'] == 'PRI':
+        parts.append(' PK')
+    elif (column['table_name'], name) in foreign_keys:
+        parts.append(f">{foreign_keys[(column['table_name'], name)]}")
+    else:
+        short_type = TYPE_NAMES.get(column['data_type'].lower())
+        if short_type == 'bool' and not column['column_type'].lower().startswith('tinyint(1)'):
+            short_type = 'int'
+        if short_type:
+            parts.append(f":{short_type}")
+        if column['column_key'] == 'UNI':
+            parts.append(' unique')
+    comment = (column.get('column_comment') or '').strip()
+    if comment:
+        if len(comment) > MAX_COMMENT_LENGTH:
+            comment = comment[:MAX_COMMENT_LENGTH - 3].rstrip(' ,') + '...'
+        parts.append(f' "{comment}"')
+    return ''.join(parts)
+
+
+def build_schema_prompt(columns: List[Dict], foreign_keys: List[Dict]) -> str:
+    """
+    Compact schema text from INFORMATION_SCHEMA rows
+
+    Args:
+        columns: COLUMNS rows (table_name, column_name, data_type, column_type, column_key,
+            column_comment), in ordinal order
+        foreign_keys: KEY_COLUMN_USAGE rows (table_name, column_name, referenced_table_name)
+
+    Returns:
+        One line per table
+    """
+    references = {(fk['table_name'], fk['column_name']): fk['referenced_table_name'] for fk in foreign_keys}
+    tables: Dict[str, List[str]] = {}
+    for column in columns:
+        if column['table_name'] in EXCLUDED_TABLES or column['column_name'] in EXCLUDED_COLUMNS:
+            continue
+        tables.setdefault(column['table_name'], []).append(_describe_column(column, references))
+    return '\n'.join(f"{table}({', '.join(described)})" for table, described in sorted(tables.items()))
+
+
+def schema_version(prompt: str) -> str:
+    """Short hash identifying a schema prompt (and so the answers generated from it)"""
+    return hashlib.sha256(f"{FORMAT_VERSION}\n{prompt}".encode('utf-8')).hexdigest()[:16]
+
+
+def introspect() -> Optional[Tuple[str, str]]:
+    """
+    Read the live schema and build its prompt
+
+    Returns:
+        (prompt, version), or None if INFORMATION_SCHEMA could not be read
+    """
+    columns = db.execute_query("""
+        SELECT TABLE_NAME AS table_name, COLUMN_NAME AS column_name, DATA_TYPE AS data_type,
+               COLUMN_TYPE AS column_type, COLUMN_KEY AS column_key, COLUMN_COMMENT AS column_comment
+        FROM INFORMATION_SCHEMA.COLUMNS
+        WHERE TABLE_SCHEMA = DATABASE()
+        ORDER BY TABLE_NAME, ORDINAL_POSITION
+    """)
+    if not columns:
+        return None
+    foreign_keys = db.execute_query("""
+        SELECT TABLE_NAME AS table_name, COLUMN_NAME AS column_name,
+               REFERENCED_TABLE_NAME AS referenced_table_name
+        FROM INFORMATION_SCHEMA.KEY_COLUMN_USAGE
+        WHERE TABLE_SCHEMA = DATABASE() AND REFERENCED_TABLE_NAME IS NOT NULL
+    """) or []
+    prompt = build_schema_prompt(columns, foreign_keys)
+    return prompt, schema_version(prompt)
+
+
+@st.cache_data(ttl=REFRESH_SECONDS, show_spinner=False)
+def _cached_schema_prompt() -> Tuple[str, str]:
+    result = introspect()
+    if result is None:
+        # Raising keeps the failure out of the cache, so the next request retries
+        raise RuntimeError("Database schema unavailable")
+    return result
+
+
+def get_schema_prompt() -> Optional[Tuple[str, str]]:
+    """
+    Schema prompt and version shared by every session, re-read every REFRESH_SECONDS
+
+    Returns:
+        (prompt, version), or None while the database is unreachable
+    """
+    try:
+        return _cached_schema_prompt()
+    except RuntimeError:
+        return None
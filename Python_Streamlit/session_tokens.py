@@ -0,0 +1,130 @@
+"""
+Patient Portal Session Tokens
+License to Live: MIAS - Python/Streamlit Version
+Signed, expiring tokens that carry the logged-in patient's identity and profile fields,
+so portal pages can trust the session without re-reading Patients on every rerun
+
+Set MIAS_SESSION_SECRET to share tokens between server processes (and keep them valid
+across restarts); without it each process signs with its own random key.
+"""
+
+import base64
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import time
+from typing import Dict, Optional
+
+import streamlit as st
+
+SECRET = (os.environ.get('MIAS_SESSION_SECRET') or secrets.token_hex(32)).encode('utf-8')
+
+# Idle sessions end after this long; active ones are re-signed past the halfway point
+TOKEN_TTL_SECONDS = int(os.environ.get('MIAS_SESSION_TTL_SECONDS', 1800))
+
+# Patient columns cached in the token (what the portal pages display)
+PROFILE_FIELDS = ('first_name', 'last_name', 'license_number', 'date_of_birth', 'address', 'city',
+                  'state', 'zip_code', 'phone', 'email', 'blood_type', 'last_login')
+
+
+# ==================== SIGNING ====================
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode('ascii')
+
+
+def _b64decode(text: str) -> bytes:
+    return base64.urlsafe_b64decode(text + '=' * (-len(text) % 4))
+
+
+def _sign(body: str) -> str:
+    return _b64encode(hmac.new(SECRET, body.encode('ascii'), hashlib.sha256).digest())
+
+
+def issue(patient_id: int, profile: Dict, ttl: int = TOKEN_TTL_SECONDS) -> str:
+    """
+    Sign a session token
+
+    Args:
+        patient_id: Patient's ID
+        profile: Patient fields to carry (only PROFILE_FIELDS are kept)
+        ttl: Seconds until the token expires
+
+    Returns:
+        '<payload>.<signature>' (URL-safe base64)
+    """
+    now = int(time.time())
+    payload = {
+        'sub': int(patient_id),
+        'iat': now,
+        'exp': now + ttl,
+        'profile': {field: profile.get(field) for field in PROFILE_FIELDS},
+    }
+    body = _b64encode(json.dumps(payload, default=str, separators=(',', ':')).encode('utf-8'))
+    return f"{body}.{_sign(body)}"
+
+
+def verify(token: Optional[str]) -> Optional[Dict]:
+    """
+    Check a token's signature and expiry
+
+    Returns:
+        The payload ('sub', 'iat', 'exp', 'profile'), or None if invalid or expired
+    """
+    if not token or token.count('.') != 1:
+        return None
+    body, signature = token.split('.')
+    if not hmac.compare_digest(signature, _sign(body)):
+        return None
+    try:
+        payload = json.loads(_b64decode(body))
+    except ValueError:
+        return None
+    if payload.get('exp', 0) < time.time():
+        return None
+    return payload
+
+
+# ==================== STREAMLIT SESSION ====================
+
+def start_session(patient_id: int, profile: Dict):
+    """Store a fresh token for the logged-in patient in session state"""
+    st.session_state.session_token = issue(patient_id, profile)
+    st.session_state.authenticated = True
+    st.session_state.patient_id = int(patient_id)
+    st.session_state.patient_name = f"{profile.get('first_name')} {profile.get('last_name')}"
+
+
+def current_session() -> Optional[Dict]:
+    """
+    Payload of this session's token, or None if not logged in (or expired)
+
+    Re-signs the token once more than half its lifetime has passed, so an
+    active patient is not logged out mid-visit.
+    """
+    payload = verify(st.session_state.get('session_token'))
+    if payload is None:
+        if st.session_state.get('session_token'):
+            end_session()
+        return None
+    if payload['exp'] - time.time() < TOKEN_TTL_SECONDS / 2:
+        st.session_state.session_token = issue(payload['sub'], payload['profile'])
+    return payload
+
+
+def update_profile(**fields):
+    """Re-sign the token after the patient changed cached fields (phone, email, blood type)"""
+    payload = current_session()
+    if payload:
+        profile = dict(payload['profile'], **{k: v for k, v in fields.items() if k in PROFILE_FIELDS})
+        st.session_state.session_token = issue(payload['sub'], profile)
+
+
+def end_session():
+    """Log out"""
+    st.session_state.session_token = None
+    st.session_state.authenticated = False
+    st.session_state.patient_id = None
+    st.session_state.patient_name = None
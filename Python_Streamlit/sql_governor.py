@@ -0,0 +1,288 @@
+"""
+AI Search Query Governor
+License to Live: MIAS - Python/Streamlit Version
+Cost guard for SQL written by the AI Database Search page: tokenizes the statement and
+rejects anything but a single read-only SELECT, adds or clamps LIMIT, checks the EXPLAIN
+plan against a row-examination budget and runs the statement with MAX_EXECUTION_TIME
+
+Limits can be tuned with MIAS_AI_MAX_ROWS, MIAS_AI_MAX_EXAMINED_ROWS and MIAS_AI_TIMEOUT_MS.
+"""
+
+import os
+import re
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import database as db
+
+# Rows returned to the page at most (LIMIT is added or lowered to this)
+MAX_RESULT_ROWS = int(os.environ.get('MIAS_AI_MAX_ROWS', 1000))
+
+# Estimated rows examined (from EXPLAIN) above which a statement is not run
+MAX_EXAMINED_ROWS = int(os.environ.get('MIAS_AI_MAX_EXAMINED_ROWS', 2000000))
+
+# Per-statement time limit enforced by MySQL
+STATEMENT_TIMEOUT_MS = int(os.environ.get('MIAS_AI_TIMEOUT_MS', 5000))
+
+# Keywords that make a statement write, lock, leave the database or stall the server
+FORBIDDEN_KEYWORDS = {'INSERT', 'UPDATE', 'DELETE', 'DROP', 'ALTER', 'CREATE', 'TRUNCATE', 'REPLACE',
+                      'GRANT', 'REVOKE', 'RENAME', 'LOCK', 'UNLOCK', 'CALL', 'LOAD', 'HANDLER', 'SET',
+                      'INTO', 'OUTFILE', 'DUMPFILE', 'SHARE', 'SLEEP', 'BENCHMARK', 'GET_LOCK',
+                      'LOAD_FILE', 'DO', 'PREPARE', 'EXECUTE', 'DEALLOCATE'}
+
+# Columns and schemas that must never be queried from the search page
+FORBIDDEN_IDENTIFIERS = {'pin', 'emergency_token', 'information_schema', 'mysql', 'performance_schema', 'sys'}
+
+# Tables holding FORBIDDEN_IDENTIFIERS columns; `*` would select them without naming them
+SECRET_TABLES = {'patients'}
+
+# Tokens after which `*` is a select-list item rather than a multiplication or COUNT(*)
+STAR_ITEM_PREFIXES = {'SELECT', 'DISTINCT', 'DISTINCTROW', 'ALL', ',', '.'}
+
+TOKEN_PATTERN = re.compile(r"""
+      (?P<space>\s+)
+    | (?P<comment>--[^\n]*|\#[^\n]*|/\*.*?\*/)
+    | (?P<string>'(?:[^'\\]|\\.|'')*'|"(?:[^"\\]|\\.|"")*")
+    | (?P<ident>`(?:[^`]|``)+`)
+    | (?P<number>\d+(?:\.\d+)?(?:[eE][+-]?\d+)?)
+    | (?P<param>%s)
+    | (?P<word>[A-Za-z_$][A-Za-z0-9_$]*)
+    | (?P<punct><=>|<=|>=|<>|!=|\|\||&&|[(),.;=<>+\-*/%!~^&|:@?])
+""", re.VERBOSE | re.DOTALL)
+
+
+# ==================== PARSING ====================
+
+def tokenize(sql: str) -> List[Tuple[str, str, int, int, int]]:
+    """
+    Split SQL into tokens
+
+    Returns:
+        List of (kind, text, start, end, depth) where depth is the parenthesis
+        nesting level; whitespace is dropped
+
+    Raises:
+        ValueError: On characters or quotes that do not form a token
+    """
+    tokens = []
+    position = depth = 0
+    while position < len(sql):
+        m = TOKEN_PATTERN.match(sql, position)
+        if not m:
+            raise ValueError(f"Unexpected character {sql[position]!r} at position {position}")
+        kind, text = m.lastgroup, m.group()
+        if kind == 'punct' and text == ')':
+            depth -= 1
+            if depth < 0:
+                raise ValueError("Unbalanced parentheses")
+        if kind != 'space':
+            tokens.append((kind, text, m.start(), m.end(), depth))
+        if kind == 'punct' and text == '(':
+            depth += 1
+        position = m.end()
+    if depth:
+        raise ValueError("Unbalanced parentheses")
+    return tokens
+
+
+def _star_over_secret_table(tokens: List[Tuple[str, str, int, int, int]]) -> Optional[str]:
+    """
+    Rejection reason if `*` or `alias.*` could return a SECRET_TABLES row, else None
+
+    A bare `*` is refused whenever such a table is read anywhere in the statement
+    (UNION and derived tables carry its columns under other names); `name.*` only
+    when name is the table or the word after it (its alias).
+    """
+    names = set()
+    for i, (kind, text, _, _, _) in enumerate(tokens):
+        if kind in ('word', 'ident') and text.strip('`').lower() in SECRET_TABLES:
+            names.add(text.strip('`').lower())
+            following = tokens[i + 1:i + 3]
+            if following and following[0][1].upper() == 'AS':
+                following = following[1:]
+            if following and following[0][0] in ('word', 'ident'):
+                names.add(following[0][1].strip('`').lower())
+    if not names:
+        return None
+
+    for i, (kind, text, _, _, _) in enumerate(tokens):
+        if text != '*' or i == 0 or tokens[i - 1][1].upper() not in STAR_ITEM_PREFIXES:
+            continue
+        if tokens[i - 1][1] != '.':
+            return "SELECT * is not allowed on Patients; name the columns instead"
+        qualifier = tokens[i - 2][1].strip('`').lower() if i >= 2 else ''
+        if qualifier in names:
+            return f"{tokens[i - 2][1]}.* is not allowed on Patients; name the columns instead"
+    return None
+
+
+def prepare(sql: str, max_rows: int = MAX_RESULT_ROWS,
+            timeout_ms: int = STATEMENT_TIMEOUT_MS) -> Tuple[bool, str, List[str]]:
+    """
+    Check that SQL is a single read-only SELECT and bound its result size and run time
+
+    Args:
+        sql: Statement from the LLM or a template (may contain %s placeholders)
+        max_rows: Largest LIMIT allowed
+        timeout_ms: MAX_EXECUTION_TIME hint added to the statement (0 = none)
+
+    Returns:
+        Tuple of (allowed, governed SQL or rejection reason, notes on what was changed)
+    """
+    try:
+        tokens = tokenize(sql)
+    except ValueError as e:
+        return False, f"Could not parse the SQL: {e}", []
+
+    if tokens and tokens[-1][1] == ';':
+        tokens = tokens[:-1]
+    if not tokens:
+        return False, "Empty query", []
+
+    for kind, text, _, _, _ in tokens:
+        if kind == 'comment':
+            return False, "Comments are not allowed in generated SQL", []
+        if text == ';':
+            return False, "Only a single statement is allowed", []
+        if kind == 'word' and text.upper() in FORBIDDEN_KEYWORDS:
+            return False, f"{text.upper()} is not allowed (read-only SELECT queries only)", []
+        if kind in ('word', 'ident') and text.strip('`').lower() in FORBIDDEN_IDENTIFIERS:
+            return False, f"Access to {text.strip('`')} is not allowed", []
+
+    reason = _star_over_secret_table(tokens)
+    if reason:
+        return False, reason, []
+
+    first = tokens[0][1].upper()
+    if first not in ('SELECT', 'WITH'):
+        return False, "Only SELECT queries are allowed", []
+    top_level_select = next((t for t in tokens if t[4] == 0 and t[1].upper() == 'SELECT'), None)
+    if top_level_select is None:
+        return False, "Only SELECT queries are allowed", []
+
+    notes = []
+    body = sql[:tokens[-1][3]]
+    limits = [i for i, t in enumerate(tokens) if t[4] == 0 and t[0] == 'word' and t[1].upper() == 'LIMIT']
+    if not limits:
+        body = f"{body}\nLIMIT {max_rows}"
+        notes.append(f"LIMIT {max_rows} added")
+    else:
+        # LIMIT n | LIMIT offset, n | LIMIT n OFFSET offset
+        after = tokens[limits[-1] + 1:]
+        count_index = 2 if len(after) > 2 and after[1][1] == ',' else 0
+        if count_index >= len(after) or after[count_index][0] != 'number' or '.' in after[count_index][1]:
+            return False, "LIMIT must be a whole number", []
+        count = after[count_index]
+        if int(count[1]) > max_rows:
+            body = f"{body[:count[2]]}{max_rows}{body[count[3]:]}"
+            notes.append(f"LIMIT {count[1]} lowered to {max_rows}")
+
+    if timeout_ms:
+        position = top_level_select[3]
+        body = f"{body[:position]} /*+ MAX_EXECUTION_TIME({int(timeout_ms)}) */{body[position:]}"
+    return True, body, notes
+
+
+# ==================== PLAN CHECK ====================
+
+def estimate_examined_rows(plan: List[Dict]) -> int:
+    """
+    Rows a plan is expected to examine, from EXPLAIN output
+
+    Tables sharing a select id are nested-loop joined: each one is read once
+    per row surviving the tables before it (rows x filtered%), so the
+    estimates multiply. Separate select ids (subqueries, unions) add up.
+    """
+    total = 0
+    by_select: Dict[object, List[Dict]] = {}
+    for row in plan:
+        by_select.setdefault(row.get('id'), []).append(row)
+    for rows in by_select.values():
+        driving = 1.0
+        for row in rows:
+            estimate = float(row.get('rows') or 1)
+            total += driving * estimate
+            driving *= max(estimate * float(row.get('filtered') or 100) / 100, 1.0)
+    return int(total)
+
+
+def check_plan(sql: str, params: Optional[Tuple] = None,
+               budget: int = MAX_EXAMINED_ROWS) -> Tuple[bool, int, str]:
+    """
+    EXPLAIN a prepared statement and compare its row estimate with the budget
+
+    Returns:
+        Tuple of (within budget, estimated rows examined, message)
+    """
+    success, plan, message = db.execute_readonly(f"EXPLAIN {sql}", params)
+    if not success:
+        return False, 0, f"MySQL rejected the query: {message}"
+    estimate = estimate_examined_rows(plan)
+    if estimate > budget:
+        return False, estimate, (f"Query would examine about {estimate:,} rows (limit {budget:,}); "
+                                 "add filters or ask a narrower question")
+    return True, estimate, f"about {estimate:,} rows examined"
+
+
+# ==================== EXECUTION ====================
+
+# Rows per page when streaming results to the page
+PAGE_SIZE = 100
+
+
+def describe_error(error: Exception) -> str:
+    """User-facing reason for a failed statement (MySQL error, time limit or busy workload)"""
+    if isinstance(error, db.WorkloadBusy):
+        return str(error)
+    code = error.args[0] if error.args else None
+    if code == 3024:
+        return f"Query stopped after the {STATEMENT_TIMEOUT_MS / 1000:g}s time limit; ask a narrower question"
+    message = error.args[1] if len(error.args) > 1 else str(error)
+    return f"MySQL error {code}: {message}"
+
+
+def _govern(sql: str, params: Optional[Tuple]) -> Tuple[bool, str, List[str]]:
+    allowed, governed, notes = prepare(sql)
+    if not allowed:
+        return False, f"Query rejected: {governed}", notes
+    within_budget, _, plan_message = check_plan(governed, params)
+    if not within_budget:
+        return False, f"Query rejected: {plan_message}", notes
+    notes.append(plan_message)
+    return True, governed, notes
+
+
+def run(sql: str, params: Optional[Tuple] = None) -> Tuple[bool, Optional[List[Dict]], str, List[str]]:
+    """
+    Govern and execute a statement from the AI Database Search page
+
+    Returns:
+        Tuple of (success, rows, message, notes); on rejection or failure rows
+        is None and message gives the reason
+    """
+    allowed, governed, notes = _govern(sql, params)
+    if not allowed:
+        return False, None, governed, notes
+
+    success, rows, message = db.execute_readonly(governed, params)
+    if not success:
+        if message.startswith('MySQL error 3024'):
+            message = f"Query stopped after the {STATEMENT_TIMEOUT_MS / 1000:g}s time limit; ask a narrower question"
+        return False, None, message, notes
+    return True, rows, message, notes
+
+
+def stream(sql: str, params: Optional[Tuple] = None,
+           page_size: int = PAGE_SIZE) -> Tuple[bool, Optional[Iterator[List[Dict]]], str, List[str]]:
+    """
+    Govern a statement and return its rows as a page iterator (see database.stream_readonly)
+
+    The checks run up front; errors while iterating are raised to the caller,
+    which can turn them into a message with describe_error().
+
+    Returns:
+        Tuple of (allowed, pages or None, rejection reason, notes)
+    """
+    allowed, governed, notes = _govern(sql, params)
+    if not allowed:
+        return False, None, governed, notes
+    return True, db.stream_readonly(governed, params, page_size), "", notes
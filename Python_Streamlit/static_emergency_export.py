@@ -0,0 +1,198 @@
+"""
+Static Emergency Export
+License to Live: MIAS - Python/Streamlit Version
+Publishes each patient's emergency record as an encrypted file next to emergency_access.html,
+so scans are served by the static host (GitHub Pages / CDN) with no database or app involved
+
+Each file is named by a hash of the patient's emergency token and encrypted with AES-256-GCM
+under a key derived from the token (HKDF-SHA256); only someone holding the QR code can find
+and read it. The page derives both in the browser with WebCrypto and falls back to the live
+API when there is no file. Content comes from Emergency_Payloads (see
+emergency_payload_migration.sql), and a publish only rewrites patients whose payload changed.
+
+Usage:
+    python static_emergency_export.py ../e
+"""
+
+import base64
+import hashlib
+import json
+import os
+from datetime import datetime
+from typing import Dict, Optional
+
+import database as db
+
+FORMAT_VERSION = 1
+
+# Domain labels keep the file name and the key independent of each other
+FILE_ID_LABEL = b'mias-static-id:'
+KEY_INFO = b'mias-static-key'
+
+# Hex characters of the file name (128 bits)
+FILE_ID_LENGTH = 32
+
+# Payloads fetched per query when publishing
+FETCH_BATCH = 500
+
+
+# ==================== ENCRYPTION ====================
+
+def file_id(emergency_token: str) -> str:
+    """Public file name for a token (SHA-256 of a labelled token; does not reveal the key)"""
+    return hashlib.sha256(FILE_ID_LABEL + emergency_token.encode('utf-8')).hexdigest()[:FILE_ID_LENGTH]
+
+
+def _derive_key(emergency_token: str, salt: bytes) -> bytes:
+    from cryptography.hazmat.primitives import hashes
+    from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+
+    return HKDF(algorithm=hashes.SHA256(), length=32, salt=salt, info=KEY_INFO).derive(
+        emergency_token.encode('utf-8'))
+
+
+def _b64(data: bytes) -> str:
+    return base64.b64encode(data).decode('ascii')
+
+
+def encrypt_payload(emergency_token: str, payload: bytes) -> Dict:
+    """
+    Encrypt an emergency payload for static hosting
+
+    The file id is bound as associated data, so a blob copied to another
+    patient's file name fails to decrypt.
+
+    Returns:
+        JSON-serializable blob: {v, alg, salt, iv, ct} (binary fields base64)
+    """
+    from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+
+    salt, iv = os.urandom(16), os.urandom(12)
+    ciphertext = AESGCM(_derive_key(emergency_token, salt)).encrypt(
+        iv, payload, file_id(emergency_token).encode('ascii'))
+    return {'v': FORMAT_VERSION, 'alg': 'HKDF-SHA256/A256GCM',
+            'salt': _b64(salt), 'iv': _b64(iv), 'ct': _b64(ciphertext)}
+
+
+def decrypt_payload(emergency_token: str, blob: Dict) -> bytes:
+    """
+    Decrypt a blob written by encrypt_payload (the page does the same with WebCrypto)
+
+    Raises:
+        ValueError: Unsupported format version
+        cryptography.exceptions.InvalidTag: Wrong token or tampered blob
+    """
+    from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+
+    if blob.get('v') != FORMAT_VERSION:
+        raise ValueError(f"Unsupported static payload version: {blob.get('v')}")
+    key = _derive_key(emergency_token, base64.b64decode(blob['salt']))
+    return AESGCM(key).decrypt(base64.b64decode(blob['iv']), base64.b64decode(blob['ct']),
+                               file_id(emergency_token).encode('ascii'))
+
+
+# ==================== PUBLISHING ====================
+
+def default_state_path(output_dir: str) -> str:
+    """Publish state lives beside, not inside, the public directory (it maps patients to files)"""
+    return os.path.abspath(output_dir).rstrip(os.sep) + '.state.json'
+
+
+def _load_state(path: str) -> Dict:
+    if not os.path.exists(path):
+        return {'patients': {}, 'published_at': None}
+    with open(path, 'r', encoding='utf-8') as handle:
+        return json.load(handle)
+
+
+def _write_atomic(path: str, text: str):
+    with open(path + '.tmp', 'w', encoding='utf-8') as handle:
+        handle.write(text)
+    os.replace(path + '.tmp', path)
+
+
+def _remove(output_dir: str, name: str):
+    try:
+        os.remove(os.path.join(output_dir, f"{name}.json"))
+    except FileNotFoundError:
+        pass
+
+
+def publish(output_dir: str, state_path: Optional[str] = None, full: bool = False) -> Dict:
+    """
+    Write encrypted files for patients whose emergency payload changed since the last publish
+
+    A payload is rebuilt (new built_at) whenever the patient's emergency data
+    or token changes, so comparing built_at against the state file finds the
+    work. Files of deleted patients (no payload, or no Patients row) and of
+    rotated tokens are removed, which is what revokes an old QR code on the
+    static host.
+
+    Args:
+        output_dir: Public directory served next to emergency_access.html
+        state_path: Private state file (default: <output_dir>.state.json)
+        full: Re-encrypt every patient regardless of the state file
+
+    Returns:
+        Summary dictionary with files written, removed and unchanged
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    state_path = state_path or default_state_path(output_dir)
+    state = _load_state(state_path)
+    published = state['patients']
+
+    # Joined to Patients so a payload row orphaned by a delete is revoked rather than kept
+    versions = db.execute_query("""
+        SELECT e.patient_id, e.built_at
+        FROM Emergency_Payloads e
+        JOIN Patients p ON p.patient_id = e.patient_id
+    """)
+    if versions is None:
+        raise ConnectionError("Could not read Emergency_Payloads (database unreachable or migration not applied)")
+    current = {str(row['patient_id']): str(row['built_at']) for row in versions}
+    changed = [pid for pid, built_at in current.items()
+               if full or published.get(pid, {}).get('built_at') != built_at]
+
+    written = 0
+    for start in range(0, len(changed), FETCH_BATCH):
+        batch = changed[start:start + FETCH_BATCH]
+        rows = db.execute_query(f"""
+            SELECT e.patient_id, e.payload, e.built_at, p.emergency_token
+            FROM Emergency_Payloads e
+            JOIN Patients p ON p.patient_id = e.patient_id
+            WHERE e.patient_id IN ({', '.join(['%s'] * len(batch))})
+        """, tuple(int(pid) for pid in batch)) or []
+        for row in rows:
+            pid, token = str(row['patient_id']), row['emergency_token']
+            if not token:
+                continue
+            name = file_id(token)
+            _write_atomic(os.path.join(output_dir, f"{name}.json"),
+                          json.dumps(encrypt_payload(token, bytes(row['payload'])), separators=(',', ':')))
+            previous = published.get(pid, {}).get('file')
+            if previous and previous != name:
+                _remove(output_dir, previous)
+            published[pid] = {'file': name, 'built_at': str(row['built_at'])}
+            written += 1
+
+    removed = 0
+    for pid in [pid for pid in published if pid not in current]:
+        _remove(output_dir, published.pop(pid)['file'])
+        removed += 1
+
+    state = {'patients': published, 'published_at': datetime.now().isoformat(timespec='seconds')}
+    _write_atomic(state_path, json.dumps(state, indent=1))
+    return {'written': written, 'removed': removed, 'unchanged': len(current) - len(changed),
+            'published_at': state['published_at']}
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Publish encrypted static emergency records")
+    parser.add_argument("output_dir", help="Directory served next to emergency_access.html (e.g. ../e)")
+    parser.add_argument("--state", help="Private publish state file (default: <output_dir>.state.json)")
+    parser.add_argument("--full", action="store_true", help="Re-encrypt every patient")
+    args = parser.parse_args()
+
+    print(json.dumps(publish(args.output_dir, args.state, args.full), indent=2))
@@ -0,0 +1,480 @@
+"""
+Synthetic Population Generator
+License to Live: MIAS - Python/Streamlit Version
+Deterministically generates and loads realistic synthetic patients into a local MySQL
+database built from mias_database_schema.sql (for benchmarking, never for production)
+"""
+
+import base64
+import os
+import random
+import time
+from datetime import date, timedelta
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import pymysql
+
+SCHEMA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'mias_database_schema.sql')
+
+# Columns the application uses that predate the schema script
+APP_COLUMNS = [
+    "ALTER TABLE Patients ADD COLUMN pin VARCHAR(255)",
+    "ALTER TABLE Patients ADD COLUMN emergency_token VARCHAR(255)",
+    "ALTER TABLE Patients ADD COLUMN last_login DATETIME",
+    "ALTER TABLE Patients ADD COLUMN last_emergency_access DATETIME",
+    "ALTER TABLE Patients ADD INDEX idx_emergency_token (emergency_token)",
+]
+
+# Synthetic patient i is stored as patient_id PATIENT_ID_OFFSET + i (ids below are left
+# for the schema's sample rows), so a population of N is always a prefix of a larger one
+PATIENT_ID_OFFSET = 1000
+
+# All dates are relative to a fixed day so output never depends on when it is run
+REFERENCE_DATE = date(2025, 1, 1)
+
+DEFAULT_SEED = 20250101
+
+# License prefix reserved for rows that benchmarks insert and delete again
+SCRATCH_LICENSE_PREFIX = 'BENCH'
+
+
+# ==================== DISTRIBUTIONS ====================
+
+FIRST_NAMES = [
+    'James', 'Mary', 'Robert', 'Patricia', 'John', 'Jennifer', 'Michael', 'Linda', 'David',
+    'Elizabeth', 'William', 'Barbara', 'Richard', 'Susan', 'Joseph', 'Jessica', 'Thomas',
+    'Sarah', 'Carlos', 'Karen', 'Daniel', 'Maria', 'Matthew', 'Nancy', 'Anthony', 'Lisa',
+    'Mark', 'Betty', 'Jose', 'Sandra', 'Kevin', 'Ashley', 'Brian', 'Emily', 'Wei', 'Aisha',
+    'Nguyen', 'Priya', 'Luis', 'Fatima',
+]
+
+LAST_NAMES = [
+    'Smith', 'Johnson', 'Williams', 'Brown', 'Jones', 'Garcia', 'Miller', 'Davis',
+    'Rodriguez', 'Martinez', 'Hernandez', 'Lopez', 'Gonzalez', 'Wilson', 'Anderson',
+    'Thomas', 'Taylor', 'Moore', 'Jackson', 'Martin', 'Lee', 'Perez', 'Thompson', 'White',
+    'Harris', 'Sanchez', 'Clark', 'Ramirez', 'Lewis', 'Robinson', 'Walker', 'Young', 'Allen',
+    'King', 'Wright', 'Scott', 'Torres', 'Nguyen', 'Hill', 'Patel',
+]
+
+STREETS = ['Main St', 'Oak Ave', 'Elm St', 'Park Blvd', 'Maple Dr', 'Cedar Ln', 'Pine St',
+           'Lakeview Dr', 'Washington Ave', 'Sunset Blvd']
+
+# (state, weight ~ population share, cities)
+STATES = [
+    ('CA', 11.7, ['Los Angeles', 'San Diego', 'San Jose', 'Sacramento']),
+    ('TX', 9.1, ['Houston', 'Dallas', 'Austin', 'Carrollton', 'San Antonio']),
+    ('FL', 6.7, ['Miami', 'Orlando', 'Tampa', 'Jacksonville']),
+    ('NY', 5.9, ['New York', 'Buffalo', 'Rochester']),
+    ('PA', 3.9, ['Philadelphia', 'Pittsburgh']),
+    ('IL', 3.8, ['Chicago', 'Springfield']),
+    ('OH', 3.5, ['Columbus', 'Cleveland', 'Cincinnati']),
+    ('GA', 3.3, ['Atlanta', 'Savannah']),
+    ('NC', 3.2, ['Charlotte', 'Raleigh']),
+    ('MI', 3.0, ['Detroit', 'Grand Rapids']),
+    ('NJ', 2.8, ['Newark', 'Jersey City']),
+    ('VA', 2.6, ['Virginia Beach', 'Richmond']),
+    ('WA', 2.3, ['Seattle', 'Spokane']),
+    ('AZ', 2.2, ['Phoenix', 'Tucson']),
+    ('OK', 1.2, ['Oklahoma City', 'Tulsa']),
+    ('OR', 1.3, ['Portland', 'Eugene']),
+    ('CO', 1.8, ['Denver', 'Colorado Springs']),
+]
+
+# US blood type distribution (percent)
+BLOOD_TYPES = [('O+', 37.4), ('A+', 35.7), ('B+', 8.5), ('O-', 6.6), ('A-', 6.3),
+               ('AB+', 3.4), ('B-', 1.5), ('AB-', 0.6)]
+
+# Adult age bands: (min age, max age, weight)
+AGE_BANDS = [(16, 24, 13), (25, 34, 18), (35, 44, 17), (45, 54, 16), (55, 64, 16),
+             (65, 74, 12), (75, 95, 8)]
+
+# (condition, prevalence at age 45, growth per decade of age, medications treating it)
+CONDITIONS = [
+    ('Hypertension', 0.30, 1.35, [('Lisinopril', '10mg', 'Once daily'), ('Amlodipine', '5mg', 'Once daily')]),
+    ('Hyperlipidemia', 0.25, 1.30, [('Atorvastatin', '20mg', 'Once daily at bedtime')]),
+    ('Diabetes Type 2', 0.11, 1.35, [('Metformin', '500mg', 'Twice daily')]),
+    ('Asthma', 0.08, 0.95, [('Albuterol Inhaler', '90mcg', 'Every 4-6 hours as needed')]),
+    ('Hypothyroidism', 0.06, 1.20, [('Levothyroxine', '50mcg', 'Once daily')]),
+    ('Depression', 0.08, 0.95, [('Sertraline', '50mg', 'Once daily')]),
+    ('GERD', 0.10, 1.10, [('Omeprazole', '20mg', 'Once daily before breakfast')]),
+    ('Coronary Artery Disease', 0.04, 1.60, [('Aspirin', '81mg', 'Once daily'), ('Metoprolol', '25mg', 'Twice daily')]),
+    ('Atrial Fibrillation', 0.02, 1.70, [('Apixaban', '5mg', 'Twice daily')]),
+    ('COPD', 0.03, 1.55, [('Tiotropium', '18mcg', 'Once daily')]),
+    ('Epilepsy', 0.01, 1.00, [('Levetiracetam', '500mg', 'Twice daily')]),
+    ('Diabetes Type 1', 0.005, 1.00, [('Insulin Glargine', '20 units', 'Once daily at bedtime')]),
+]
+CONDITION_SEVERITIES = [('Mild', 45), ('Moderate', 38), ('Severe', 14), ('Critical', 3)]
+
+# (allergen, type, prevalence, reactions, severity weights Mild/Moderate/Severe/Life-threatening)
+ALLERGIES = [
+    ('Penicillin', 'Medication', 0.08, ['Hives', 'Rash', 'Anaphylaxis'], (40, 35, 17, 8)),
+    ('Sulfa Drugs', 'Medication', 0.03, ['Rash', 'Hives'], (50, 35, 12, 3)),
+    ('Codeine', 'Medication', 0.02, ['Nausea', 'Itching'], (60, 30, 9, 1)),
+    ('Aspirin', 'Medication', 0.01, ['Hives', 'Difficulty breathing'], (35, 40, 20, 5)),
+    ('Peanuts', 'Food', 0.02, ['Hives', 'Swelling', 'Anaphylaxis'], (20, 30, 25, 25)),
+    ('Shellfish', 'Food', 0.02, ['Hives', 'Swelling', 'Anaphylaxis'], (25, 35, 25, 15)),
+    ('Eggs', 'Food', 0.01, ['Rash', 'Stomach upset'], (55, 35, 8, 2)),
+    ('Latex', 'Environmental', 0.01, ['Contact dermatitis', 'Hives'], (45, 35, 15, 5)),
+    ('Bee Stings', 'Environmental', 0.01, ['Swelling', 'Anaphylaxis'], (30, 30, 20, 20)),
+    ('Pollen', 'Environmental', 0.10, ['Sneezing', 'Itchy eyes'], (70, 25, 5, 0)),
+]
+ALLERGY_SEVERITIES = ['Mild', 'Moderate', 'Severe', 'Life-threatening']
+
+# (vaccine, minimum age, uptake, doses (min, max), years between doses, booster interval years)
+VACCINES = [
+    ('Influenza', 16, 0.45, (1, 4), 1, 1),
+    ('COVID-19', 16, 0.70, (1, 4), 1, None),
+    ('Tetanus (Tdap)', 16, 0.60, (1, 1), 10, 10),
+    ('Hepatitis B', 16, 0.40, (3, 3), 0, None),
+    ('Shingles', 50, 0.35, (2, 2), 0, None),
+    ('Pneumococcal', 65, 0.60, (1, 2), 1, None),
+]
+VACCINE_SITES = ['CVS Pharmacy', 'Walgreens', 'County Health Department', 'Primary Care Clinic']
+
+INSURERS = [('Blue Cross Blue Shield', 30), ('UnitedHealthcare', 25), ('Aetna', 14), ('Cigna', 12),
+            ('Humana', 8), ('Kaiser Permanente', 6), ('Medicaid', 5)]
+
+RELATIONSHIPS = [('Spouse', 40), ('Parent', 25), ('Sibling', 15), ('Child', 10), ('Friend', 8), ('Other', 2)]
+
+DOCTORS = ['Dr. Patel', 'Dr. Nguyen', 'Dr. Garcia', 'Dr. Smith', 'Dr. Okafor', 'Dr. Chen', 'Dr. Rossi']
+
+
+# ==================== GENERATION ====================
+
+def _choice(rng: random.Random, weighted: List[Tuple]) -> Tuple:
+    """Pick one (value, weight, ...) entry by weight"""
+    return rng.choices(weighted, weights=[entry[1] for entry in weighted])[0]
+
+
+def _date_between(rng: random.Random, start: date, end: date) -> date:
+    if end <= start:
+        return start
+    return start + timedelta(days=rng.randrange((end - start).days))
+
+
+def _phone(rng: random.Random) -> str:
+    return f"{rng.randint(201, 989)}-555-{rng.randint(0, 9999):04d}"
+
+
+def generate_patient(index: int, seed: int = DEFAULT_SEED) -> Dict:
+    """
+    Generate synthetic patient number `index` with all of its medical records
+
+    Every patient is generated from its own seeded RNG, so the same
+    (seed, index) always yields the same patient regardless of population
+    size or chunking, and benchmarks can recompute credentials directly.
+
+    Returns:
+        Dictionary with 'patient' row and lists of child rows per table
+    """
+    rng = random.Random(seed * 10_000_019 + index)
+    patient_id = PATIENT_ID_OFFSET + index
+
+    low, high, _ = rng.choices(AGE_BANDS, weights=[band[2] for band in AGE_BANDS])[0]
+    age = rng.randint(low, high)
+    date_of_birth = REFERENCE_DATE - timedelta(days=age * 365 + rng.randrange(365))
+    state, _, cities = _choice(rng, STATES)
+    first_name = rng.choice(FIRST_NAMES)
+    last_name = rng.choice(LAST_NAMES)
+
+    patient = {
+        'patient_id': patient_id,
+        'license_number': f"{state}{index:010d}",
+        'first_name': first_name,
+        'last_name': last_name,
+        'date_of_birth': date_of_birth,
+        'address': f"{rng.randint(100, 9999)} {rng.choice(STREETS)}",
+        'city': rng.choice(cities),
+        'state': state,
+        'zip_code': f"{rng.randint(10000, 99999)}",
+        'phone': _phone(rng),
+        'email': f"{first_name.lower()}.{last_name.lower()}{index}@example.com" if rng.random() < 0.8 else None,
+        'blood_type': _choice(rng, BLOOD_TYPES)[0] if rng.random() < 0.85 else None,
+        'pin': f"{rng.randrange(10000):04d}",
+        # About two thirds of patients have generated an emergency QR code
+        'emergency_token': (base64.urlsafe_b64encode(rng.getrandbits(256).to_bytes(32, 'big')).rstrip(b'=').decode()
+                            if rng.random() < 0.65 else None),
+    }
+
+    adult_since = date_of_birth + timedelta(days=18 * 365)
+    age_factor = (age - 45) / 10
+
+    conditions, medications = [], []
+    for name, prevalence, growth, treatments in CONDITIONS:
+        if rng.random() >= min(0.9, prevalence * growth ** age_factor):
+            continue
+        diagnosed = _date_between(rng, adult_since, REFERENCE_DATE)
+        conditions.append({
+            'patient_id': patient_id,
+            'condition_name': name,
+            'diagnosis_date': diagnosed,
+            'severity': _choice(rng, CONDITION_SEVERITIES)[0],
+            'notes': None,
+        })
+        for medication_name, dosage, frequency in treatments:
+            if rng.random() >= 0.8:
+                continue
+            start = _date_between(rng, diagnosed, REFERENCE_DATE)
+            # About a quarter of prescriptions have since been stopped
+            end = _date_between(rng, start, REFERENCE_DATE) if rng.random() < 0.25 else None
+            medications.append({
+                'patient_id': patient_id,
+                'medication_name': medication_name,
+                'dosage': dosage,
+                'frequency': frequency,
+                'start_date': start,
+                'end_date': end,
+                'prescribing_doctor': rng.choice(DOCTORS),
+                'notes': None,
+            })
+
+    allergies = []
+    for allergen, allergy_type, prevalence, reactions, severity_weights in ALLERGIES:
+        if rng.random() < prevalence:
+            allergies.append({
+                'patient_id': patient_id,
+                'allergen': allergen,
+                'allergy_type': allergy_type,
+                'reaction': rng.choice(reactions),
+                'severity': rng.choices(ALLERGY_SEVERITIES, weights=severity_weights)[0],
+            })
+
+    vaccinations = []
+    for vaccine, min_age, uptake, (min_doses, max_doses), spacing, booster in VACCINES:
+        if age < min_age or rng.random() >= uptake:
+            continue
+        doses = rng.randint(min_doses, max_doses)
+        given = _date_between(rng, REFERENCE_DATE - timedelta(days=365 * (spacing * doses + 1)),
+                              REFERENCE_DATE - timedelta(days=30))
+        for _ in range(doses):
+            if given >= REFERENCE_DATE:
+                break
+            vaccinations.append({
+                'patient_id': patient_id,
+                'vaccine_name': vaccine,
+                'administration_date': given,
+                'next_due_date': given + timedelta(days=365 * booster) if booster else None,
+                'lot_number': f"{vaccine[:2].upper()}{rng.randint(100000, 999999)}",
+                'administered_by': rng.choice(VACCINE_SITES),
+            })
+            given += timedelta(days=max(28, 365 * spacing + rng.randint(-20, 20)))
+
+    insurance = []
+    if rng.random() < 0.92:
+        provider = 'Medicare' if age >= 65 else _choice(rng, INSURERS)[0]
+        effective = _date_between(rng, REFERENCE_DATE - timedelta(days=3 * 365), REFERENCE_DATE)
+        if rng.random() < 0.15:
+            # A lapsed previous policy
+            insurance.append({
+                'patient_id': patient_id,
+                'provider_name': _choice(rng, INSURERS)[0],
+                'policy_number': f"POL{rng.randint(10 ** 8, 10 ** 9 - 1)}",
+                'group_number': f"GRP{rng.randint(1000, 9999)}",
+                'effective_date': effective - timedelta(days=2 * 365),
+                'expiration_date': effective - timedelta(days=1),
+                'is_active': False,
+            })
+        insurance.append({
+            'patient_id': patient_id,
+            'provider_name': provider,
+            'policy_number': f"POL{rng.randint(10 ** 8, 10 ** 9 - 1)}",
+            'group_number': f"GRP{rng.randint(1000, 9999)}" if provider != 'Medicare' else None,
+            'effective_date': effective,
+            'expiration_date': None,
+            'is_active': True,
+        })
+
+    contacts = []
+    for priority in range(1, rng.choices([0, 1, 2, 3], weights=[10, 50, 30, 10])[0] + 1):
+        contacts.append({
+            'patient_id': patient_id,
+            'contact_name': f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+            'relationship': _choice(rng, RELATIONSHIPS)[0],
+            'phone_primary': _phone(rng),
+            'phone_secondary': _phone(rng) if rng.random() < 0.3 else None,
+            'email': None,
+            'priority_order': priority,
+        })
+
+    return {
+        'patient': patient,
+        'Medical_Conditions': conditions,
+        'Allergies': allergies,
+        'Medications': medications,
+        'Vaccinations': vaccinations,
+        'Insurance': insurance,
+        'Emergency_Contacts': contacts,
+    }
+
+
+def iter_population(start: int, stop: int, seed: int = DEFAULT_SEED) -> Iterator[Dict]:
+    """Generate patients start..stop-1"""
+    for index in range(start, stop):
+        yield generate_patient(index, seed)
+
+
+# ==================== LOADING ====================
+
+CHILD_TABLES = ['Medical_Conditions', 'Allergies', 'Medications', 'Vaccinations',
+                'Insurance', 'Emergency_Contacts']
+
+
+def connect(host: str, port: int, user: str, password: str, database: Optional[str] = None):
+    """Open a loader connection (autocommit off, plain tuples)"""
+    return pymysql.connect(host=host, port=port, user=user, password=password, database=database,
+                           charset='utf8mb4', autocommit=False)
+
+
+def split_sql_script(script: str) -> List[str]:
+    """Split a mysql client script into statements, honouring DELIMITER blocks"""
+    statements, buffer, delimiter = [], [], ';'
+    for line in script.splitlines():
+        stripped = line.strip()
+        if not buffer and (not stripped or stripped.startswith('--')):
+            continue
+        if stripped.upper().startswith('DELIMITER '):
+            delimiter = stripped.split()[1]
+            continue
+        buffer.append(line)
+        if stripped.endswith(delimiter):
+            statement = '\n'.join(buffer).rstrip()[:-len(delimiter)].strip()
+            buffer = []
+            if statement:
+                statements.append(statement)
+    return statements
+
+
+def create_database(connection, database: str, schema_path: str = SCHEMA_PATH):
+    """Drop and recreate `database` from the schema script plus the application columns"""
+    with open(schema_path, 'r', encoding='utf-8') as handle:
+        statements = split_sql_script(handle.read())
+
+    with connection.cursor() as cursor:
+        cursor.execute(f"DROP DATABASE IF EXISTS `{database}`")
+        cursor.execute(f"CREATE DATABASE `{database}` CHARACTER SET utf8mb4")
+        cursor.execute(f"USE `{database}`")
+        for statement in statements:
+            # The script targets mias_db; stay in the benchmark database
+            if statement.upper().startswith('USE '):
+                continue
+            cursor.execute(statement)
+            cursor.fetchall()
+        for statement in APP_COLUMNS:
+            cursor.execute(statement)
+    connection.commit()
+
+
+def count_patients(connection) -> int:
+    """Number of synthetic patients already loaded"""
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT COUNT(*) FROM Patients WHERE patient_id >= %s AND license_number NOT LIKE %s",
+                       (PATIENT_ID_OFFSET, SCRATCH_LICENSE_PREFIX + '%'))
+        return cursor.fetchone()[0]
+
+
+def _insert_sql(table: str, columns: List[str]) -> str:
+    return (f"INSERT INTO {table} ({', '.join(columns)}) "
+            f"VALUES ({', '.join(['%s'] * len(columns))})")
+
+
+def load_population(connection, patients: int, seed: int = DEFAULT_SEED,
+                    chunk_size: int = 5000, progress: bool = True) -> Dict:
+    """
+    Grow the synthetic population to `patients`
+
+    Patients already present are kept (a population is a prefix of any
+    larger one with the same seed), so scaling 10k -> 100k -> 1M only
+    generates the difference. Rows are written with executemany in one
+    transaction per chunk.
+
+    Returns:
+        Dictionary with patients added, rows per table and elapsed seconds
+    """
+    started = time.perf_counter()
+    existing = count_patients(connection)
+    rows_written = {'Patients': 0, **{table: 0 for table in CHILD_TABLES}}
+
+    with connection.cursor() as cursor:
+        cursor.execute("SET SESSION foreign_key_checks = 0")
+        cursor.execute("SET SESSION unique_checks = 0")
+
+        for chunk_start in range(existing, patients, chunk_size):
+            chunk_stop = min(chunk_start + chunk_size, patients)
+            batches = {'Patients': [], **{table: [] for table in CHILD_TABLES}}
+            for generated in iter_population(chunk_start, chunk_stop, seed):
+                batches['Patients'].append(generated['patient'])
+                for table in CHILD_TABLES:
+                    batches[table].extend(generated[table])
+
+            for table, rows in batches.items():
+                if not rows:
+                    continue
+                columns = list(rows[0].keys())
+                cursor.executemany(_insert_sql(table, columns), [tuple(row[c] for c in columns) for row in rows])
+                rows_written[table] += len(rows)
+            connection.commit()
+
+            if progress:
+                rate = (chunk_stop - existing) / max(time.perf_counter() - started, 1e-9)
+                print(f"  {chunk_stop:,}/{patients:,} patients ({rate:,.0f}/s)", flush=True)
+
+        cursor.execute("SET SESSION foreign_key_checks = 1")
+        cursor.execute("SET SESSION unique_checks = 1")
+
+    with connection.cursor() as cursor:
+        cursor.execute("ANALYZE TABLE Patients, " + ", ".join(CHILD_TABLES))
+        cursor.fetchall()
+
+    return {
+        'patients_added': max(patients - existing, 0),
+        'rows': rows_written,
+        'seconds': round(time.perf_counter() - started, 2),
+    }
+
+
+def connection_settings_from_env() -> Dict:
+    """Loader connection settings; defaults to a local server, never the hosted database"""
+    return {
+        'host': os.environ.get('MIAS_DB_HOST', 'localhost'),
+        'port': int(os.environ.get('MIAS_DB_PORT', 3306)),
+        'user': os.environ.get('MIAS_DB_USER', 'root'),
+        'password': os.environ.get('MIAS_DB_PASSWORD', ''),
+        'database': os.environ.get('MIAS_DB_NAME', 'mias_bench'),
+    }
+
+
+def check_target(host: str, allow_remote: bool):
+    """Refuse to load synthetic data into the hosted (RDS) database by accident"""
+    if 'rds.amazonaws.com' in host and not allow_remote:
+        raise SystemExit(f"Refusing to load synthetic data into {host}; pass --allow-remote to override")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    defaults = connection_settings_from_env()
+    parser = argparse.ArgumentParser(description="Load a deterministic synthetic MIAS population into MySQL")
+    parser.add_argument("--patients", type=int, default=10000, help="Population size (10k-5M)")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    parser.add_argument("--chunk-size", type=int, default=5000)
+    parser.add_argument("--reset", action="store_true", help="Drop and recreate the database from the schema first")
+    parser.add_argument("--host", default=defaults['host'])
+    parser.add_argument("--port", type=int, default=defaults['port'])
+    parser.add_argument("--user", default=defaults['user'])
+    parser.add_argument("--password", default=defaults['password'])
+    parser.add_argument("--database", default=defaults['database'])
+    parser.add_argument("--allow-remote", action="store_true")
+    args = parser.parse_args()
+
+    check_target(args.host, args.allow_remote)
+    conn = connect(args.host, args.port, args.user, args.password)
+    if args.reset:
+        print(f"Creating {args.database} from {SCHEMA_PATH}")
+        create_database(conn, args.database)
+    else:
+        conn.select_db(args.database)
+
+    print(f"Loading {args.patients:,} patients (seed {args.seed})")
+    summary = load_population(conn, args.patients, args.seed, args.chunk_size)
+    print(f"Added {summary['patients_added']:,} patients in {summary['seconds']}s: {summary['rows']}")
+    conn.close()
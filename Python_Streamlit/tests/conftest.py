@@ -0,0 +1,63 @@
+"""
+Shared test fixtures
+License to Live: MIAS - Python/Streamlit Version
+Tests never reach MySQL: connections are refused, and tests that need query
+results install a FakeDatabase in place of database.execute_query
+"""
+
+import os
+import re
+import sys
+
+import pymysql
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def no_mysql(monkeypatch):
+    """Any real connection attempt fails fast instead of reaching the configured server"""
+    def refuse(*args, **kwargs):
+        raise pymysql.err.OperationalError(2003, "Tests do not connect to MySQL")
+    monkeypatch.setattr(pymysql, 'connect', refuse)
+
+
+class FakeDatabase:
+    """
+    Stand-in for database.execute_query
+
+    Answers are looked up by the first registered pattern found in the SQL;
+    anything else returns an empty result. Every call is kept in `calls`.
+
+    Args:
+        answers: [(regex, rows or callable(query, params) -> rows)]
+    """
+
+    def __init__(self, answers=None):
+        self.answers = list(answers or [])
+        self.calls = []
+
+    def __call__(self, query, params=None, fetch=True):
+        self.calls.append((' '.join(query.split()), params))
+        for pattern, answer in self.answers:
+            if re.search(pattern, query):
+                rows = answer(query, params) if callable(answer) else answer
+                return [dict(row) for row in rows] if rows is not None else None
+        return [] if fetch else True
+
+
+@pytest.fixture
+def fake_db(monkeypatch):
+    """FakeDatabase installed as database.execute_query (counted as SQL by query_profiler)"""
+    fake = FakeDatabase()
+
+    def execute_query(query, params=None, fetch=True):
+        return fake(query, params, fetch)
+
+    # query_profiler only wraps functions defined in database.py
+    execute_query.__module__ = database.__name__
+    monkeypatch.setattr(database, 'execute_query', execute_query)
+    return fake
@@ -0,0 +1,55 @@
+"""
+AI Search Intent Template Tests
+License to Live: MIAS - Python/Streamlit Version
+Templates answer only the questions they fully understand; everything else must reach the LLM
+"""
+
+import pytest
+
+import ai_intents
+
+
+@pytest.mark.parametrize("question", [
+    "patients with allergies",
+    "Patients with emergency contacts",
+    "patients with the flu vaccine",
+    "how many patients with active medications",
+    "Patients with A positive blood",
+    "patients on medications",
+    "patients who take aspirin",
+    "patients with migraine",
+    "patients diagnosed with flu vaccine",
+    "patients with diabetes and asthma",
+    "patients with diabetes over 65",
+    "patients allergic to penicillin or latex",
+    "patients born after 1980",
+])
+def test_questions_outside_the_templates_go_to_the_llm(question):
+    assert ai_intents.match_intent(question) is None
+
+
+@pytest.mark.parametrize("question, params", [
+    ("Show me all patients with diabetes", ('%diabetes%',)),
+    ("Which patients have asthma?", ('%asthma%',)),
+    ("patients with high blood pressure", ('%hypertension%',)),
+    ("patients diagnosed with migraine", ('%migraine%',)),
+    ("patients with peanut allergy", ('%peanut%',)),
+    ("patients allergic to penicillin", ('%penicillin%',)),
+    ("List patients with life-threatening allergies", ('Life-threatening',)),
+    ("Which patients have Type O- blood?", ('O-',)),
+    ("patients with AB negative blood type", ('AB-',)),
+    ("patients taking blood thinner", ('%Apixaban%', '%Warfarin%', '%Rivaroxaban%', '%Clopidogrel%')),
+    ("List patients over 65 years old", (65,)),
+    ("Which patients have no emergency contacts?", ()),
+])
+def test_template_questions_get_parameterized_sql(question, params):
+    result = ai_intents.match_intent(question)
+    assert result['match'] == 'template' and result['is_safe']
+    assert result['params'] == params
+    assert result['sql'].count('%s') == len(params)
+
+
+def test_count_prefix_counts_distinct_patients():
+    result = ai_intents.match_intent("How many patients have diabetes?")
+    assert result['sql'].startswith("SELECT COUNT(DISTINCT p.patient_id)")
+    assert result['params'] == ('%diabetes%',)
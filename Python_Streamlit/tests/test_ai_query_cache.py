@@ -0,0 +1,49 @@
+"""
+AI Search Question Cache Tests
+License to Live: MIAS - Python/Streamlit Version
+Similar questions may share cached SQL only when their literals and qualifiers agree
+"""
+
+import pytest
+
+import ai_query_cache
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    # Any indexed question counts as similar, so the literal check alone decides
+    monkeypatch.setattr(ai_query_cache, 'SIMILARITY_THRESHOLD', 0.0)
+    return ai_query_cache.QueryCache(str(tmp_path / 'cache.json'))
+
+
+@pytest.mark.parametrize("cached, asked", [
+    ("Show patients registered in 2023", "Show patients registered in 2024"),
+    ("Show the 10 most recent emergency accesses", "Show the 20 most recent emergency accesses"),
+    ("Patients born after 1990", "Patients born after 1980"),
+    ("Patients in zip code 90210", "Patients in zip code 90211"),
+    ("Patients born after 1980", "Patients born before 1980"),
+    ("Patients with allergies", "Patients without allergies"),
+    ("Patients with the most medications", "Patients with the least medications"),
+    ("Patients living in Austin", "Patients living in Dallas"),
+    ("Patients allergic to 'peanuts'", "Patients allergic to 'shellfish'"),
+])
+def test_near_miss_questions_do_not_share_sql(cache, cached, asked):
+    cache.store(cached, "SELECT 1", "", 'v1')
+    assert cache.lookup(asked, 'v1') is None
+
+
+def test_similar_question_with_the_same_literals_is_served(cache):
+    cache.store("Show patients registered in 2023", "SELECT 1", "", 'v1')
+    result = cache.lookup("patients who registered during 2023?", 'v1')
+    assert result['match'] == 'similar' and result['sql'] == "SELECT 1"
+
+
+def test_exact_match_ignores_case_and_filler_words(cache):
+    cache.store("Show me all patients with diabetes", "SELECT 1", "", 'v1')
+    assert cache.lookup("patients with diabetes", 'v1')['match'] == 'exact'
+    assert cache.lookup("patients with diabetes", 'v2') is None
+
+
+def test_question_literals_ignore_the_leading_capital():
+    assert ai_query_cache.question_literals("Patients in Texas") == (['Texas'], [])
+    assert ai_query_cache.question_literals("patients in Texas") == (['Texas'], [])
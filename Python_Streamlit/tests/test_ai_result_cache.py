@@ -0,0 +1,25 @@
+"""
+AI Search Result Cache Tests
+License to Live: MIAS - Python/Streamlit Version
+Results are keyed by canonical SQL and only served for the data version they were read at
+"""
+
+import ai_result_cache
+
+
+def test_canonical_sql_normalizes_keywords_and_whitespace():
+    a = ai_result_cache.canonical_sql("select  first_name\nfrom Patients where state = 'TX';")
+    b = ai_result_cache.canonical_sql("SELECT first_name FROM Patients WHERE state = 'TX'")
+    assert a == b
+
+
+def test_canonical_sql_keeps_identifier_and_literal_case():
+    assert ai_result_cache.canonical_sql("SELECT * FROM Patients WHERE state = 'tx'") != \
+        ai_result_cache.canonical_sql("SELECT * FROM patients WHERE state = 'TX'")
+
+
+def test_result_cache_serves_only_the_same_data_version():
+    cache = ai_result_cache.ResultCache(max_bytes=10 * 1024 * 1024)
+    cache.put("SELECT 1", None, 'v1', [{'a': 1}])
+    assert cache.get("select 1;", None, 'v1').rows().to_dict('records') == [{'a': 1}]
+    assert cache.get("SELECT 1", None, 'v2') is None
@@ -0,0 +1,32 @@
+"""
+Analytics Snapshot Tests
+License to Live: MIAS - Python/Streamlit Version
+Refreshes append batches and compaction runs every COMPACT_AFTER_BATCHES refreshes
+"""
+
+from datetime import datetime
+
+import pytest
+
+pytest.importorskip('duckdb')
+pytest.importorskip('pyarrow')
+
+import analytics_snapshot  # noqa: E402
+import database as db  # noqa: E402
+
+
+def test_compaction_runs_once_per_interval(tmp_path, monkeypatch):
+    polls = []
+
+    def get_changes(cursor=None, limit=1000, tables=None):
+        polls.append(cursor)
+        row = {'patient_id': len(polls), 'first_name': 'P', 'updated_at': datetime(2024, 1, 1, 0, 0, len(polls) % 60)}
+        return {'upserts': {'Patients': [row]}, 'deletes': [], 'cursor': str(len(polls)), 'has_more': False}
+
+    monkeypatch.setattr(db, 'get_changes', get_changes)
+    interval = analytics_snapshot.COMPACT_AFTER_BATCHES
+    compacted = [i for i in range(2 * interval + 5)
+                 if 'compacted' in analytics_snapshot.refresh_snapshot(str(tmp_path))]
+
+    assert compacted == [interval - 1, 2 * interval - 1]
+    assert analytics_snapshot.load_state(str(tmp_path))['since_compaction'] == 5
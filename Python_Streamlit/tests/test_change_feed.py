@@ -0,0 +1,146 @@
+"""
+Change Feed and Emergency Replica Tests
+License to Live: MIAS - Python/Streamlit Version
+Round-trips rows and cursors through database.get_changes and emergency_replica.sync_replica
+on a stubbed execute_query that honours the feed's (timestamp, primary key) positions
+"""
+
+import re
+import sqlite3
+import threading
+
+import pytest
+
+import database as db
+import emergency_replica
+
+TABLE_SCAN = re.compile(r"FROM (\w+)\s+WHERE \((\w+) > %s")
+
+
+class ChangeFeedTables:
+    """In-memory tables answering the queries get_changes and get_data_version issue"""
+
+    def __init__(self):
+        self.rows = {table: [] for table in db.CHANGE_FEED_TABLES}
+        self.tombstones = []
+
+    def add(self, table, **row):
+        self.rows[table].append(row)
+
+    def delete(self, table, record_id, patient_id, deleted_at='2024-01-05 00:00:00'):
+        primary_key = db.CHANGE_FEED_TABLES[table][0]
+        self.rows[table] = [r for r in self.rows[table] if r[primary_key] != record_id]
+        self.tombstones.append({'tombstone_id': len(self.tombstones) + 1, 'table_name': table,
+                                'record_id': record_id, 'patient_id': patient_id, 'deleted_at': deleted_at})
+
+    def scan(self, query, params):
+        table, changed_column = TABLE_SCAN.search(query).groups()
+        primary_key = db.CHANGE_FEED_TABLES[table][0]
+        since, _, last_pk, _, limit = params
+        rows = sorted((r for r in self.rows[table] if (r[changed_column], r[primary_key]) > (since, last_pk)),
+                      key=lambda r: (r[changed_column], r[primary_key]))
+        return rows[:limit]
+
+    def tombstone_scan(self, query, params):
+        after, _, limit = params
+        return [t for t in self.tombstones if t['tombstone_id'] > after][:limit]
+
+    def answers(self):
+        return [
+            (TABLE_SCAN.pattern, self.scan),
+            (r"FROM Change_Tombstones\s+WHERE tombstone_id > %s", self.tombstone_scan),
+            (r"GREATEST\(", [{'changed_at': '2024-01-05 00:00:00', 'tombstone': len(self.tombstones),
+                              'settled_before': '2024-01-06 00:00:00'}]),
+        ]
+
+
+def _patient(patient_id, token, updated_at='2024-01-01 00:00:00'):
+    row = {column: None for column in emergency_replica.REPLICA_TABLES['Patients']}
+    row.update(patient_id=patient_id, emergency_token=token, first_name=f"P{patient_id}", last_name='Test',
+               date_of_birth='1980-01-01', blood_type='A+', updated_at=updated_at, pin='1234')
+    return row
+
+
+@pytest.fixture
+def feed(fake_db):
+    tables = ChangeFeedTables()
+    fake_db.answers = tables.answers()
+    return tables
+
+
+def test_get_changes_returns_upserts_and_resumes_from_cursor(feed):
+    feed.add('Patients', **_patient(1, 'TOKEN1'))
+    feed.add('Patients', **_patient(2, 'TOKEN2'))
+    feed.add('Allergies', allergy_id=10, patient_id=1, allergen='Latex', updated_at='2024-01-02 00:00:00')
+
+    first = db.get_changes(None, limit=1)
+    assert [r['patient_id'] for r in first['upserts']['Patients']] == [1]
+    assert [r['allergy_id'] for r in first['upserts']['Allergies']] == [10]
+    assert 'pin' not in first['upserts']['Patients'][0]
+    assert first['has_more']
+
+    second = db.get_changes(first['cursor'], limit=1)
+    assert [r['patient_id'] for r in second['upserts']['Patients']] == [2]
+    assert 'Allergies' not in second['upserts']
+
+    third = db.get_changes(second['cursor'], limit=1)
+    assert third['upserts'] == {} and not third['has_more']
+
+    feed.delete('Allergies', 10, 1)
+    fourth = db.get_changes(third['cursor'])
+    assert [d['record_id'] for d in fourth['deletes']] == [10]
+    assert db.get_changes(fourth['cursor'])['deletes'] == []
+
+
+def test_get_changes_scans_only_requested_tables_and_keeps_other_positions(feed):
+    feed.add('Patients', **_patient(1, 'TOKEN1'))
+    feed.add('Allergies', allergy_id=10, patient_id=1, allergen='Latex', updated_at='2024-01-02 00:00:00')
+
+    only_patients = db.get_changes(None, tables=['Patients'])
+    assert list(only_patients['upserts']) == ['Patients']
+
+    rest = db.get_changes(only_patients['cursor'])
+    assert list(rest['upserts']) == ['Allergies']
+    assert db.decode_change_cursor(rest['cursor'])['tables']['Patients'] == ['2024-01-01 00:00:00', 1]
+
+
+def test_sync_replica_copies_changes_and_serves_token_scans(feed, fake_db, tmp_path, monkeypatch):
+    path = str(tmp_path / 'emergency.sqlite')
+    feed.add('Patients', **_patient(1, 'TOKEN1'))
+    feed.add('Patients', **_patient(2, 'TOKEN2'))
+    feed.add('Allergies', allergy_id=10, patient_id=1, allergen='Latex', severity='Severe',
+             updated_at='2024-01-02 00:00:00')
+    feed.add('Vaccinations', vaccination_id=5, patient_id=1, vaccine_name='Flu', updated_at='2024-01-02 00:00:00')
+
+    summary = emergency_replica.sync_replica(path)
+    assert summary['patients'] == 2
+    assert summary['rows'] == {'Patients': 2, 'Allergies': 1}
+
+    # Incremental: only the new change is applied, and a deleted patient leaves with its rows
+    feed.add('Patients', **_patient(3, 'TOKEN3', updated_at='2024-01-03 00:00:00'))
+    feed.delete('Patients', 2, 2)
+    summary = emergency_replica.sync_replica(path)
+    assert summary['rows'] == {'Patients': 1, 'deletes': 1}
+    assert summary['patients'] == 2
+
+    connection = sqlite3.connect(path)
+    assert [r[0] for r in connection.execute("SELECT patient_id FROM Patients ORDER BY 1")] == [1, 3]
+    connection.close()
+
+    monkeypatch.setattr(db, 'EMERGENCY_REPLICA_PATH', path)
+    monkeypatch.setattr(db, '_replica_local', threading.local())
+    queries = len(fake_db.calls)
+    record = db.PatientRecord.load(emergency_token='TOKEN1')
+    assert record.patient['first_name'] == 'P1'
+    assert record.allergies['allergen'].tolist() == ['Latex']
+    assert len(fake_db.calls) == queries
+    assert db.PatientRecord.load(emergency_token='TOKEN2') is None
+
+
+def test_sync_replica_refuses_to_stamp_when_database_is_down(fake_db, tmp_path):
+    fake_db.answers = [(r"GREATEST\(", None)]
+    with pytest.raises(ConnectionError):
+        emergency_replica.sync_replica(str(tmp_path / 'emergency.sqlite'))
+    connection = sqlite3.connect(str(tmp_path / 'emergency.sqlite'))
+    assert connection.execute("SELECT COUNT(*) FROM Replica_State WHERE key = 'synced_at'").fetchone()[0] == 0
+    connection.close()
@@ -0,0 +1,137 @@
+"""
+Emergency Payload Tests
+License to Live: MIAS - Python/Streamlit Version
+Prebuilt emergency responses (Emergency_Payloads): removed with their patient, rebuilt once per
+patient after batch writes, and skipped while a fresh replica answers
+"""
+
+from contextlib import contextmanager
+
+import pymysql
+import pytest
+
+import database as db
+
+
+class RecordingConnection:
+    """Connection double that records statements and finds one patient"""
+
+    def __init__(self):
+        self.statements = []
+        self.committed = False
+
+    @contextmanager
+    def cursor(self):
+        yield self
+
+    def execute(self, query, params=None):
+        self.statements.append(' '.join(query.split()))
+        self.rowcount = 1
+
+    def executemany(self, query, rows):
+        for row in rows:
+            self.execute(query, row)
+        return len(rows)
+
+    def fetchone(self):
+        return {'first_name': 'Ana', 'last_name': 'Diaz', 'license_number': 'D1'}
+
+    def commit(self):
+        self.committed = True
+
+    def rollback(self):
+        pass
+
+
+@pytest.fixture
+def connection(monkeypatch):
+    recording = RecordingConnection()
+
+    @contextmanager
+    def checkout(name=None):
+        yield recording
+
+    monkeypatch.setattr(db, '_checkout', checkout)
+    return recording
+
+
+def test_delete_patient_removes_the_prebuilt_payload_after_its_sections(connection):
+    success, _ = db.delete_patient(7)
+    assert success and connection.committed
+
+    deletes = [s for s in connection.statements if s.startswith('DELETE FROM')]
+    tables = [s.split()[2] for s in deletes]
+    payload = tables.index('Emergency_Payloads')
+    # Section delete triggers could rebuild the payload, so it has to go after them, before the patient
+    for section in ('Medical_Conditions', 'Allergies', 'Medications', 'Emergency_Contacts'):
+        assert tables.index(section) < payload
+    assert tables[-1] == 'Patients'
+    # ...but they are deferred for the delete, and re-enabled afterwards
+    assert connection.statements[1] == "SET FOREIGN_KEY_CHECKS = 0, @defer_emergency_payloads = 1"
+    assert connection.statements[-1] == "SET FOREIGN_KEY_CHECKS = 1, @defer_emergency_payloads = NULL"
+
+
+def test_batch_write_rebuilds_each_payload_once(connection):
+    rows = [(7, 'Latex'), (7, 'Peanuts'), (9, 'Dust'), (7, 'Penicillin')]
+    success, affected, _ = db.execute_batch([("INSERT INTO Allergies (patient_id, allergen) VALUES (%s, %s)", rows)],
+                                            payload_patients=[row[0] for row in rows])
+    assert success and affected == 4 and connection.committed
+
+    statements = connection.statements
+    assert statements[0] == "SET @defer_emergency_payloads = 1"
+    assert [s for s in statements if s.startswith('CALL')] == ["CALL Refresh_Emergency_Payload(%s)"] * 2
+    # Rebuilt after the rows are written, inside the transaction; the flag never outlives the checkout
+    assert statements.index("CALL Refresh_Emergency_Payload(%s)") > max(
+        i for i, s in enumerate(statements) if s.startswith('INSERT'))
+    assert statements[-1] == "SET @defer_emergency_payloads = NULL"
+
+
+def test_batch_write_without_payload_patients_leaves_triggers_alone(connection):
+    success, _, _ = db.execute_batch([("UPDATE Patients SET pin = %s WHERE patient_id = %s", [('h', 7)])])
+    assert success
+    assert connection.statements == ["UPDATE Patients SET pin = %s WHERE patient_id = %s"]
+
+
+def test_batch_write_skips_rebuilds_without_the_migration(connection, monkeypatch):
+    def execute(query, params=None):
+        connection.statements.append(' '.join(query.split()))
+        if query.startswith('CALL'):
+            raise pymysql.err.OperationalError(1305, "PROCEDURE mias_db.Refresh_Emergency_Payload does not exist")
+
+    monkeypatch.setattr(connection, 'execute', execute)
+    success, _, _ = db.execute_batch([("INSERT INTO Allergies (patient_id, allergen) VALUES (%s, %s)",
+                                       [(7, 'Latex'), (9, 'Dust')])], payload_patients=[7, 9])
+    assert success and connection.committed
+    assert len([s for s in connection.statements if s.startswith('CALL')]) == 1
+
+
+def test_section_bulk_add_rebuilds_the_patients_payload(connection):
+    success, _ = db.add_allergies_bulk(7, [{'allergen': 'Latex'}, {'allergen': 'Dust'}])
+    assert success
+    assert connection.statements.count("CALL Refresh_Emergency_Payload(%s)") == 1
+
+
+def test_emergency_payload_defers_to_a_fresh_replica(monkeypatch):
+    @contextmanager
+    def unreachable(name=None):
+        raise AssertionError("MySQL must not be tried while the replica is fresh")
+        yield
+
+    monkeypatch.setattr(db, '_checkout', unreachable)
+    monkeypatch.setattr(db, 'get_replica_age', lambda: 5.0)
+    assert db.get_emergency_payload('TOKEN1') is None
+
+
+def test_emergency_payload_reads_mysql_when_the_replica_is_stale(monkeypatch):
+    class PayloadConnection(RecordingConnection):
+        def fetchone(self):
+            return {'patient_id': 7, 'payload': b'{"success": true}'}
+
+    @contextmanager
+    def checkout(name=None):
+        assert name == 'emergency'
+        yield PayloadConnection()
+
+    monkeypatch.setattr(db, '_checkout', checkout)
+    monkeypatch.setattr(db, 'get_replica_age', lambda: db.EMERGENCY_REPLICA_MAX_AGE + 1.0)
+    assert db.get_emergency_payload('TOKEN1') == (7, b'{"success": true}')
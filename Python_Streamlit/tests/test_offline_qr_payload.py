@@ -0,0 +1,77 @@
+"""
+Offline QR Payload Tests
+License to Live: MIAS - Python/Streamlit Version
+Signed offline summaries: base45, round trip through the card URL, token binding and severity ranking
+"""
+
+from datetime import date
+
+import offline_qr_payload as offline
+import qr_generator
+
+
+def _patient_fields(token, conditions=None):
+    patient = {'first_name': 'Ana', 'last_name': 'Diaz', 'date_of_birth': '1984-03-09', 'blood_type': 'O-'}
+    allergies = [{'allergen': 'Penicillin', 'severity': 'Life-threatening'},
+                 {'allergen': 'Dust', 'severity': 'Mild'}]
+    contacts = [{'phone_primary': '555-0100', 'priority_order': 2},
+                {'phone_primary': '555-0199', 'priority_order': 1}]
+    return offline.build_fields(patient, allergies, conditions or [], contacts, token)
+
+
+def test_base45_round_trip():
+    assert offline.base45_encode(b"AB") == "BB8"
+    data = bytes(range(256))
+    assert offline.base45_decode(offline.base45_encode(data)) == data
+
+
+def test_offline_payload_round_trip_through_the_emergency_url():
+    keys = offline.generate_signing_key()
+    token = qr_generator.generate_emergency_token()
+    payload = offline.encode_payload(_patient_fields(token), offline.load_signing_key(keys['private_key']))
+
+    result = offline.decode(qr_generator.emergency_url(token, offline_payload=payload), [keys['public_key']])
+    assert result['verified']
+    assert result['token'] == token
+    assert result['name'] == 'Ana Diaz'
+    assert result['date_of_birth'] == date(1984, 3, 9)
+    assert result['blood_type'] == 'O-'
+    assert result['allergies'] == [{'name': 'Penicillin', 'severity': 'Life-threatening'}]
+    assert result['ice_phone'] == '555-0199'
+
+
+def test_offline_payload_is_bound_to_its_token():
+    keys = offline.generate_signing_key()
+    payload = offline.encode_payload(_patient_fields('CARD-A'), offline.load_signing_key(keys['private_key']))
+    result = offline.decode(qr_generator.emergency_url('CARD-B', offline_payload=payload), [keys['public_key']])
+    assert not result['verified']
+
+
+def test_offline_payload_rejects_unknown_key():
+    signing = offline.generate_signing_key()
+    other = offline.generate_signing_key()
+    payload = offline.encode_payload(_patient_fields('T'), offline.load_signing_key(signing['private_key']))
+    assert not offline.decode(payload, [other['public_key']])['verified']
+
+
+def test_offline_payload_keeps_the_most_severe_conditions():
+    keys = offline.generate_signing_key()
+    conditions = [{'condition_name': 'Eczema', 'severity': 'Mild'},
+                  {'condition_name': 'Hypertension', 'severity': 'Moderate'},
+                  {'condition_name': 'Asthma', 'severity': 'Severe'},
+                  {'condition_name': 'Epilepsy', 'severity': 'Critical'},
+                  {'condition_name': 'Migraine', 'severity': None}]
+    fields = _patient_fields('T', conditions)
+    result = offline.decode(offline.encode_payload(fields, offline.load_signing_key(keys['private_key'])),
+                            [keys['public_key']])
+    assert result['conditions'] == [{'name': 'Epilepsy', 'severity': 'Critical'},
+                                    {'name': 'Asthma', 'severity': 'Severe'},
+                                    {'name': 'Hypertension', 'severity': 'Moderate'}]
+
+
+def test_offline_payload_marks_unknown_severity_as_unknown():
+    keys = offline.generate_signing_key()
+    fields = _patient_fields('T', [{'condition_name': 'Migraine', 'severity': ''}])
+    result = offline.decode(offline.encode_payload(fields, offline.load_signing_key(keys['private_key'])),
+                            [keys['public_key']])
+    assert result['conditions'] == [{'name': 'Migraine', 'severity': None}]
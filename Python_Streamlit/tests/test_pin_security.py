@@ -0,0 +1,53 @@
+"""
+PIN Security Tests
+License to Live: MIAS - Python/Streamlit Version
+Login throttling and the client identity it is keyed on (no database needed)
+"""
+
+import pytest
+
+import pin_security
+
+
+def test_login_throttle_limits_attempts_per_license():
+    throttle = pin_security.LoginThrottle(license_capacity=3, license_per_minute=0.0001)
+    assert [throttle.check('d1234567')[0] for _ in range(4)] == [True, True, True, False]
+    # License numbers are compared case-insensitively; other licenses are unaffected
+    assert not throttle.check('D1234567 ')[0]
+    assert throttle.check('D7654321')[0]
+
+
+def test_login_throttle_locks_out_after_failures():
+    throttle = pin_security.LoginThrottle(license_capacity=100, lockout_failures=3)
+    for _ in range(3):
+        throttle.record_failure('D1')
+    allowed, message = throttle.check('D1')
+    assert not allowed and 'failed attempts' in message
+
+
+def test_login_throttle_success_clears_failures():
+    throttle = pin_security.LoginThrottle(license_capacity=100, lockout_failures=3)
+    throttle.record_failure('D1')
+    throttle.record_failure('D1')
+    throttle.record_success('D1')
+    throttle.record_failure('D1')
+    assert throttle.check('D1')[0]
+
+
+@pytest.mark.parametrize("header, hops, expected", [
+    ("203.0.113.7", 1, "203.0.113.7"),
+    ("198.51.100.1, 203.0.113.7", 1, "203.0.113.7"),
+    ("198.51.100.1, 203.0.113.7, 10.0.0.2", 2, "203.0.113.7"),
+    ("203.0.113.7", 3, "203.0.113.7"),
+    ("203.0.113.7", 0, None),
+    ("", 1, None),
+    (None, 1, None),
+])
+def test_forwarded_client_takes_the_trusted_proxy_hop(header, hops, expected):
+    assert pin_security.forwarded_client(header, hops) == expected
+
+
+def test_rotating_forwarded_for_does_not_reset_the_client_bucket():
+    throttle = pin_security.LoginThrottle(client_capacity=2, client_per_minute=0.0001)
+    clients = [pin_security.forwarded_client(f"198.51.100.{n}, 203.0.113.7", 1) for n in range(3)]
+    assert [throttle.check(f"D{n}", client)[0] for n, client in enumerate(clients)] == [True, True, False]
@@ -0,0 +1,46 @@
+"""
+Page Query Budget Tests
+License to Live: MIAS - Python/Streamlit Version
+Runs each page in query_profiler.PAGE_BUDGETS once against a stubbed execute_query and
+fails if it issues more SQL round trips (or duplicate calls) than its budget allows
+"""
+
+import re
+
+import pytest
+
+import query_profiler
+
+PATIENT = {
+    'patient_id': 1000, 'license_number': 'D1000000', 'first_name': 'Synthetic', 'last_name': 'Patient',
+    'date_of_birth': '1980-01-01', 'address': '1 Main St', 'city': 'Austin', 'state': 'TX',
+    'zip_code': '78701', 'phone': '555-0100', 'email': None, 'blood_type': 'O+',
+    'created_at': None, 'updated_at': None, 'last_login': None,
+}
+
+
+def _patient_rows(query, params):
+    """Patient row plus an empty JSON array for every section the query joins"""
+    row = dict(PATIENT)
+    row.update({alias: '[]' for alias in re.findall(r'AS (\w+_json)', query)})
+    return [row]
+
+
+@pytest.fixture
+def page_db(fake_db):
+    fake_db.answers = [(r'FROM Patients p\s+WHERE', _patient_rows)]
+    return fake_db
+
+
+@pytest.mark.parametrize('budget', query_profiler.PAGE_BUDGETS,
+                         ids=lambda b: f"{b['page']}{'+patient' if 'selected_patient' in b['session_state'] else ''}")
+def test_page_stays_within_query_budget(page_db, budget):
+    summary = query_profiler.assert_query_budget(budget['page'], budget['max_queries'],
+                                                 budget.get('max_duplicates', 0), budget.get('session_state'))
+    assert summary['queries'] == len(page_db.calls)
+
+
+def test_budget_check_reports_overruns(page_db):
+    budget = query_profiler.PAGE_BUDGETS[0]
+    with pytest.raises(AssertionError, match='exceeded its query budget'):
+        query_profiler.assert_query_budget(budget['page'], 0, 0, budget['session_state'])
@@ -0,0 +1,37 @@
+"""
+Portal Session Tests
+License to Live: MIAS - Python/Streamlit Version
+Signed portal session tokens and the batched last_login writes that replace per-login updates
+"""
+
+import database as db
+import session_tokens
+
+
+def test_session_token_round_trip():
+    token = session_tokens.issue(42, {'first_name': 'Ana', 'pin': '1234'})
+    payload = session_tokens.verify(token)
+    assert payload['sub'] == 42
+    assert payload['profile']['first_name'] == 'Ana'
+    assert 'pin' not in payload['profile']
+
+
+def test_session_token_rejects_tampering_and_expiry():
+    token = session_tokens.issue(42, {})
+    body, signature = token.split('.')
+    forged = session_tokens._b64encode(session_tokens._b64decode(body).replace(b'42', b'43'))
+    assert session_tokens.verify(f"{forged}.{signature}") is None
+    assert session_tokens.verify(session_tokens.issue(42, {}, ttl=-1)) is None
+    assert session_tokens.verify('not-a-token') is None
+    assert session_tokens.verify(None) is None
+
+
+def test_last_logins_flush_in_one_update_in_the_session_time_zone(fake_db, monkeypatch):
+    monkeypatch.setattr(db, '_pending_logins', {7: '2024-03-01 12:00:00', 9: '2024-03-01 12:00:05'})
+    assert db.flush_last_logins() == 2
+
+    [(query, params)] = fake_db.calls
+    # Queued values are UTC; stored timestamps follow NOW(), i.e. the session time zone
+    assert query.count("CONVERT_TZ(%s, '+00:00', @@session.time_zone)") == 2
+    assert params == (7, '2024-03-01 12:00:00', 9, '2024-03-01 12:00:05', 7, 9)
+    assert db.flush_last_logins() == 0
@@ -0,0 +1,86 @@
+"""
+AI Search Query Governor Tests
+License to Live: MIAS - Python/Streamlit Version
+What prepare() lets through, how it bounds result size, and the EXPLAIN row estimate
+"""
+
+import pytest
+
+import sql_governor
+
+
+def test_prepare_adds_limit_and_timeout():
+    allowed, sql, notes = sql_governor.prepare("SELECT first_name FROM Patients", max_rows=50, timeout_ms=2000)
+    assert allowed
+    assert sql.endswith("LIMIT 50")
+    assert "/*+ MAX_EXECUTION_TIME(2000) */" in sql
+    assert notes == ["LIMIT 50 added"]
+
+
+def test_prepare_lowers_large_limit():
+    allowed, sql, notes = sql_governor.prepare("SELECT * FROM Allergies LIMIT 10, 5000", max_rows=100, timeout_ms=0)
+    assert allowed
+    assert sql == "SELECT * FROM Allergies LIMIT 10, 100"
+    assert notes == ["LIMIT 5000 lowered to 100"]
+
+
+@pytest.mark.parametrize("sql", [
+    "DELETE FROM Patients",
+    "SELECT 1; DROP TABLE Patients",
+    "SELECT pin FROM Patients",
+    "SELECT * FROM Patients -- everything",
+    "SHOW TABLES",
+    "SELECT * FROM Patients LIMIT 1.5",
+])
+def test_prepare_rejects_unsafe_sql(sql):
+    allowed, reason, _ = sql_governor.prepare(sql)
+    assert not allowed
+    assert reason
+
+
+@pytest.mark.parametrize("sql", [
+    "SELECT * FROM Patients",
+    "SELECT DISTINCT * FROM patients WHERE state = 'TX'",
+    "SELECT p.* FROM Patients p",
+    "SELECT p.*, a.allergen FROM Patients AS p JOIN Allergies a ON a.patient_id = p.patient_id",
+    "SELECT `p`.* FROM `Patients` `p`",
+    "SELECT Patients.* FROM Patients",
+    "SELECT allergen, reaction FROM Allergies UNION SELECT * FROM Patients",
+    "SELECT t.first_name FROM (SELECT * FROM Patients) t",
+])
+def test_prepare_rejects_star_over_patients(sql):
+    # * would return pin and emergency_token without naming them
+    allowed, reason, _ = sql_governor.prepare(sql)
+    assert not allowed
+    assert 'Patients' in reason
+
+
+@pytest.mark.parametrize("sql", [
+    "SELECT COUNT(*) FROM Patients",
+    "SELECT * FROM Allergies",
+    "SELECT a.* FROM Allergies a JOIN Patients p ON p.patient_id = a.patient_id",
+    "SELECT d.* FROM (SELECT first_name FROM Patients) d",
+    "SELECT first_name, 2 * 3 AS six FROM Patients",
+])
+def test_prepare_allows_star_elsewhere(sql):
+    assert sql_governor.prepare(sql)[0]
+
+
+def test_run_rejects_star_over_patients_before_reaching_mysql(monkeypatch):
+    statements = []
+    monkeypatch.setattr(sql_governor.db, 'execute_readonly',
+                        lambda sql, params=None: statements.append(sql) or (True, [], ""))
+    success, rows, message, _ = sql_governor.run("SELECT * FROM Patients")
+    assert not success and rows is None
+    assert message.startswith("Query rejected")
+    assert statements == []
+
+
+def test_estimate_examined_rows_multiplies_joins_and_adds_selects():
+    plan = [
+        {'id': 1, 'rows': 1000, 'filtered': 10},
+        {'id': 1, 'rows': 5, 'filtered': 100},
+        {'id': 2, 'rows': 200, 'filtered': 100},
+    ]
+    # 1000 + (1000 x 10%) x 5 for the join, plus 200 for the subquery
+    assert sql_governor.estimate_examined_rows(plan) == 1000 + 500 + 200
@@ -0,0 +1,93 @@
+"""
+Static Emergency Export Tests
+License to Live: MIAS - Python/Streamlit Version
+Per-token encryption of published records, and publish() writing only changed records and
+revoking files of deleted patients and rotated tokens
+"""
+
+import json
+import os
+
+import pytest
+from cryptography.exceptions import InvalidTag
+
+import static_emergency_export as static_export
+
+
+def test_static_payload_round_trip():
+    blob = static_export.encrypt_payload('TOKEN-1', b'{"patient": 1}')
+    assert static_export.decrypt_payload('TOKEN-1', blob) == b'{"patient": 1}'
+
+
+def test_static_payload_needs_the_right_token():
+    blob = static_export.encrypt_payload('TOKEN-1', b'secret')
+    with pytest.raises(InvalidTag):
+        static_export.decrypt_payload('TOKEN-2', blob)
+
+
+def test_static_file_id_does_not_reveal_the_token():
+    name = static_export.file_id('TOKEN-1')
+    assert len(name) == static_export.FILE_ID_LENGTH
+    assert 'TOKEN' not in name and name != static_export.file_id('TOKEN-2')
+
+
+class PayloadTable:
+    """Emergency_Payloads joined to Patients, as publish() reads it"""
+
+    def __init__(self):
+        self.rows = {}
+
+    def set(self, patient_id, token, built_at, payload=b'{"success": true}'):
+        self.rows[patient_id] = {'patient_id': patient_id, 'emergency_token': token,
+                                 'built_at': built_at, 'payload': payload}
+
+    def versions(self, query, params):
+        return [{'patient_id': r['patient_id'], 'built_at': r['built_at']} for r in self.rows.values()]
+
+    def batch(self, query, params):
+        return [self.rows[patient_id] for patient_id in params if patient_id in self.rows]
+
+
+@pytest.fixture
+def payloads(fake_db):
+    table = PayloadTable()
+    fake_db.answers = [
+        (r"SELECT e\.patient_id, e\.built_at\s", table.versions),
+        (r"WHERE e\.patient_id IN", table.batch),
+    ]
+    return table
+
+
+def _published(output_dir):
+    return sorted(name[:-len('.json')] for name in os.listdir(output_dir))
+
+
+def test_publish_writes_changed_records_only(payloads, tmp_path):
+    output = str(tmp_path / 'e')
+    payloads.set(1, 'TOKEN1', '2024-01-01 00:00:00', b'{"patient": 1}')
+    payloads.set(2, 'TOKEN2', '2024-01-01 00:00:00')
+
+    assert static_export.publish(output)['written'] == 2
+    with open(os.path.join(output, f"{static_export.file_id('TOKEN1')}.json")) as handle:
+        assert static_export.decrypt_payload('TOKEN1', json.load(handle)) == b'{"patient": 1}'
+
+    payloads.set(2, 'TOKEN2', '2024-01-02 00:00:00')
+    summary = static_export.publish(output)
+    assert (summary['written'], summary['unchanged'], summary['removed']) == (1, 1, 0)
+
+
+def test_publish_removes_deleted_patients_and_rotated_tokens(payloads, tmp_path):
+    output = str(tmp_path / 'e')
+    payloads.set(1, 'TOKEN1', '2024-01-01 00:00:00')
+    payloads.set(2, 'TOKEN2', '2024-01-01 00:00:00')
+    static_export.publish(output)
+
+    # Patient 2 deleted (its payload row goes with it); patient 1 gets a new card
+    del payloads.rows[2]
+    payloads.set(1, 'TOKEN1B', '2024-01-02 00:00:00')
+    summary = static_export.publish(output)
+
+    assert summary['removed'] == 1
+    assert _published(output) == [static_export.file_id('TOKEN1B')]
+    with open(static_export.default_state_path(output)) as handle:
+        assert list(json.load(handle)['patients']) == ['1']
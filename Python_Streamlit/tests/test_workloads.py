@@ -0,0 +1,71 @@
+"""
+Workload Class Tests
+License to Live: MIAS - Python/Streamlit Version
+Pooled connections keep their class's statement time limit, and streaming exports are admitted by the gate
+"""
+
+import pymysql
+import pytest
+
+import database as db
+
+
+class PooledConnection:
+    """Connection double that remembers how it was opened"""
+
+    def __init__(self, **kwargs):
+        self.kwargs = kwargs
+        self.cursorclass = kwargs['cursorclass']
+        self.pings = 0
+
+    def ping(self, reconnect=True):
+        self.pings += 1
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def gate(monkeypatch):
+    opened = []
+
+    def connect(**kwargs):
+        opened.append(PooledConnection(**kwargs))
+        return opened[-1]
+
+    monkeypatch.setattr(pymysql, 'connect', connect)
+    gate = db.WorkloadGate(db.WORKLOAD_CLASSES, db.MAX_ACTIVE_STATEMENTS)
+    monkeypatch.setattr(db, 'workload_gate', gate)
+    gate.opened = opened
+    return gate
+
+
+@pytest.mark.parametrize('name', list(db.WORKLOAD_CLASSES))
+def test_time_limit_is_the_init_command_so_reconnects_keep_it(gate, name):
+    with db._checkout(name):
+        pass
+    [connection] = gate.opened
+    # PyMySQL re-runs init_command on every (re)connect, including ping(reconnect=True)
+    timeout_ms = db.WORKLOAD_CLASSES[name][2]
+    assert connection.kwargs['init_command'] == f"SET SESSION max_execution_time = {timeout_ms}"
+
+
+def test_streaming_connection_is_an_export_workload(gate):
+    with db.get_streaming_connection() as connection:
+        assert connection.cursorclass is pymysql.cursors.SSDictCursor
+        export = next(row for row in gate.stats() if row['workload'] == 'export')
+        assert export['active'] == 1
+
+    # Back in the pool with the default cursor for the next borrower
+    assert connection.cursorclass is db.DB_CONFIG['cursorclass']
+    with db._checkout('export') as again:
+        assert again is connection
+    assert len(gate.opened) == 1
+
+
+def test_second_export_is_turned_away_while_one_runs(gate, monkeypatch):
+    monkeypatch.setitem(gate.classes, 'export', (4, 1, 60000, 1, 0.01))
+    with db.get_streaming_connection():
+        with pytest.raises(db.WorkloadBusy):
+            with db.get_streaming_connection():
+                pass
@@ -0,0 +1,163 @@
+-- =====================================================
+-- License to Live: MIAS
+-- Change Feed Migration - SQL DDL Script
+-- Adds updated_at indexes and the tombstone log used by
+-- database.get_changes() to an existing mias_db.
+-- Fresh installs get the same objects from mias_database_schema.sql.
+-- =====================================================
+
+USE mias_db;
+
+-- =====================================================
+-- STEP 1: updated_at indexes (keyset scans for changed rows)
+-- =====================================================
+ALTER TABLE Patients ADD INDEX idx_updated_at (updated_at);
+ALTER TABLE Medical_Conditions ADD INDEX idx_updated_at (updated_at);
+ALTER TABLE Allergies ADD INDEX idx_updated_at (updated_at);
+ALTER TABLE Medications ADD INDEX idx_updated_at (updated_at);
+ALTER TABLE Vaccinations ADD INDEX idx_updated_at (updated_at);
+ALTER TABLE Insurance ADD INDEX idx_updated_at (updated_at);
+ALTER TABLE Emergency_Contacts ADD INDEX idx_updated_at (updated_at);
+ALTER TABLE Healthcare_Providers ADD INDEX idx_updated_at (updated_at);
+ALTER TABLE Provider_Access ADD INDEX idx_updated_at (updated_at);
+
+-- =====================================================
+-- STEP 2: Tombstone log
+-- =====================================================
+CREATE TABLE IF NOT EXISTS Change_Tombstones (
+    tombstone_id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    table_name VARCHAR(64) NOT NULL,
+    record_id INT NOT NULL COMMENT 'Primary key of the deleted row',
+    patient_id INT COMMENT 'Owning patient, for per-patient consumers',
+    deleted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    INDEX idx_deleted_at (deleted_at),
+    INDEX idx_table_record (table_name, record_id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+COMMENT='Delete log written by triggers so incremental sync consumers can see removed rows';
+
+-- =====================================================
+-- STEP 3: CHANGE FEED TRIGGERS
+-- Every DELETE leaves a tombstone for incremental sync consumers.
+-- Note: ON DELETE CASCADE does not fire triggers; delete_patient()
+-- removes child rows explicitly so each one is logged.
+-- =====================================================
+
+DROP TRIGGER IF EXISTS trg_patients_tombstone;
+DELIMITER //
+CREATE TRIGGER trg_patients_tombstone
+AFTER DELETE ON Patients
+FOR EACH ROW
+BEGIN
+    INSERT INTO Change_Tombstones (table_name, record_id, patient_id)
+    VALUES ('Patients', OLD.patient_id, OLD.patient_id);
+END //
+DELIMITER ;
+
+DROP TRIGGER IF EXISTS trg_medical_conditions_tombstone;
+DELIMITER //
+CREATE TRIGGER trg_medical_conditions_tombstone
+AFTER DELETE ON Medical_Conditions
+FOR EACH ROW
+BEGIN
+    INSERT INTO Change_Tombstones (table_name, record_id, patient_id)
+    VALUES ('Medical_Conditions', OLD.condition_id, OLD.patient_id);
+END //
+DELIMITER ;
+
+DROP TRIGGER IF EXISTS trg_allergies_tombstone;
+DELIMITER //
+CREATE TRIGGER trg_allergies_tombstone
+AFTER DELETE ON Allergies
+FOR EACH ROW
+BEGIN
+    INSERT INTO Change_Tombstones (table_name, record_id, patient_id)
+    VALUES ('Allergies', OLD.allergy_id, OLD.patient_id);
+END //
+DELIMITER ;
+
+DROP TRIGGER IF EXISTS trg_medications_tombstone;
+DELIMITER //
+CREATE TRIGGER trg_medications_tombstone
+AFTER DELETE ON Medications
+FOR EACH ROW
+BEGIN
+    INSERT INTO Change_Tombstones (table_name, record_id, patient_id)
+    VALUES ('Medications', OLD.medication_id, OLD.patient_id);
+END //
+DELIMITER ;
+
+DROP TRIGGER IF EXISTS trg_vaccinations_tombstone;
+DELIMITER //
+CREATE TRIGGER trg_vaccinations_tombstone
+AFTER DELETE ON Vaccinations
+FOR EACH ROW
+BEGIN
+    INSERT INTO Change_Tombstones (table_name, record_id, patient_id)
+    VALUES ('Vaccinations', OLD.vaccination_id, OLD.patient_id);
+END //
+DELIMITER ;
+
+DROP TRIGGER IF EXISTS trg_insurance_tombstone;
+DELIMITER //
+CREATE TRIGGER trg_insurance_tombstone
+AFTER DELETE ON Insurance
+FOR EACH ROW
+BEGIN
+    INSERT INTO Change_Tombstones (table_name, record_id, patient_id)
+    VALUES ('Insurance', OLD.insurance_id, OLD.patient_id);
+END //
+DELIMITER ;
+
+DROP TRIGGER IF EXISTS trg_emergency_contacts_tombstone;
+DELIMITER //
+CREATE TRIGGER trg_emergency_contacts_tombstone
+AFTER DELETE ON Emergency_Contacts
+FOR EACH ROW
+BEGIN
+    INSERT INTO Change_Tombstones (table_name, record_id, patient_id)
+    VALUES ('Emergency_Contacts', OLD.contact_id, OLD.patient_id);
+END //
+DELIMITER ;
+
+DROP TRIGGER IF EXISTS trg_healthcare_providers_tombstone;
+DELIMITER //
+CREATE TRIGGER trg_healthcare_providers_tombstone
+AFTER DELETE ON Healthcare_Providers
+FOR EACH ROW
+BEGIN
+    INSERT INTO Change_Tombstones (table_name, record_id, patient_id)
+    VALUES ('Healthcare_Providers', OLD.provider_id, NULL);
+END //
+DELIMITER ;
+
+DROP TRIGGER IF EXISTS trg_provider_access_tombstone;
+DELIMITER //
+CREATE TRIGGER trg_provider_access_tombstone
+AFTER DELETE ON Provider_Access
+FOR EACH ROW
+BEGIN
+    INSERT INTO Change_Tombstones (table_name, record_id, patient_id)
+    VALUES ('Provider_Access', OLD.access_id, OLD.patient_id);
+END //
+DELIMITER ;
+
+DROP TRIGGER IF EXISTS trg_access_log_tombstone;
+DELIMITER //
+CREATE TRIGGER trg_access_log_tombstone
+AFTER DELETE ON Access_Log
+FOR EACH ROW
+BEGIN
+    INSERT INTO Change_Tombstones (table_name, record_id, patient_id)
+    VALUES ('Access_Log', OLD.log_id, OLD.patient_id);
+END //
+DELIMITER ;
+
+-- =====================================================
+-- VERIFICATION
+-- =====================================================
+SHOW TRIGGERS;
+SELECT COUNT(*) AS tombstones FROM Change_Tombstones;
+
+-- =====================================================
+-- END OF CHANGE FEED MIGRATION
+-- =====================================================
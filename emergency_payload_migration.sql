@@ -0,0 +1,354 @@
+-- =====================================================
+-- License to Live: MIAS
+-- Emergency Payload Migration - SQL DDL Script
+-- Adds Emergency_Payloads: the emergency API response for each
+-- patient, prebuilt as JSON and keyed by the SHA-256 digest of the
+-- emergency token, so a scan is answered with a single-row fetch
+-- (database.get_emergency_payload()).
+-- Triggers rebuild a patient's payload whenever the patient's
+-- identity, blood type, token, conditions, allergies, medications
+-- or emergency contacts change, whichever program made the change.
+-- Batch writers set @defer_emergency_payloads to skip the per-row
+-- rebuilds and CALL Refresh_Emergency_Payload once per patient
+-- (database.execute_batch(payload_patients=...)).
+-- Requires the emergency_token column on Patients.
+-- =====================================================
+
+USE mias_db;
+
+-- =====================================================
+-- STEP 1: Payload table
+-- =====================================================
+CREATE TABLE IF NOT EXISTS Emergency_Payloads (
+    patient_id INT PRIMARY KEY,
+    token_digest BINARY(32) NOT NULL COMMENT 'UNHEX(SHA2(emergency_token, 256))',
+    payload MEDIUMBLOB NOT NULL COMMENT 'UTF-8 JSON, sent as-is by the emergency API',
+    built_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    UNIQUE INDEX idx_token_digest (token_digest),
+    FOREIGN KEY (patient_id) REFERENCES Patients(patient_id) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+COMMENT='Prebuilt emergency API responses, maintained by triggers';
+
+-- =====================================================
+-- STEP 2: Payload builder
+-- Same document the API used to assemble per scan: the patient
+-- header plus the four sections in the order database.py sorts
+-- them. Timestamps are formatted like Python's str(datetime).
+-- =====================================================
+DROP PROCEDURE IF EXISTS Refresh_Emergency_Payload;
+DELIMITER //
+CREATE PROCEDURE Refresh_Emergency_Payload(IN p_patient_id INT)
+BEGIN
+    DECLARE v_token VARCHAR(255) DEFAULT NULL;
+    -- The caller's session may be a pooled connection: its setting is put back
+    DECLARE v_group_concat_max_len BIGINT UNSIGNED DEFAULT @@SESSION.group_concat_max_len;
+    DECLARE EXIT HANDLER FOR SQLEXCEPTION
+    BEGIN
+        SET SESSION group_concat_max_len = v_group_concat_max_len;
+        RESIGNAL;
+    END;
+
+    SELECT emergency_token INTO v_token FROM Patients WHERE patient_id = p_patient_id;
+
+    IF v_token IS NULL OR v_token = '' THEN
+        DELETE FROM Emergency_Payloads WHERE patient_id = p_patient_id;
+    ELSE
+        -- Sections are concatenated as text; the default 1 KB limit is too small
+        SET SESSION group_concat_max_len = 16777216;
+
+        REPLACE INTO Emergency_Payloads (patient_id, token_digest, payload)
+        SELECT
+            p.patient_id,
+            UNHEX(SHA2(p.emergency_token, 256)),
+            CONVERT(CAST(JSON_OBJECT(
+                'success', TRUE,
+                'patient', JSON_OBJECT(
+                    'patient_id', p.patient_id,
+                    'first_name', p.first_name,
+                    'last_name', p.last_name,
+                    'date_of_birth', DATE_FORMAT(p.date_of_birth, '%Y-%m-%d'),
+                    'license_number', p.license_number,
+                    'blood_type', p.blood_type,
+                    'updated_at', DATE_FORMAT(NOW(), '%Y-%m-%d %H:%i:%s')
+                ),
+                'allergies', (
+                    SELECT CAST(CONCAT('[', COALESCE(GROUP_CONCAT(JSON_OBJECT(
+                        'allergy_id', a.allergy_id, 'patient_id', a.patient_id,
+                        'allergen', a.allergen, 'allergy_type', a.allergy_type,
+                        'reaction', a.reaction, 'severity', a.severity,
+                        'created_at', DATE_FORMAT(a.created_at, '%Y-%m-%d %H:%i:%s'),
+                        'updated_at', DATE_FORMAT(a.updated_at, '%Y-%m-%d %H:%i:%s')
+                    ) ORDER BY a.allergy_id SEPARATOR ','), ''), ']') AS JSON)
+                    FROM Allergies a WHERE a.patient_id = p.patient_id
+                ),
+                'medications', (
+                    SELECT CAST(CONCAT('[', COALESCE(GROUP_CONCAT(JSON_OBJECT(
+                        'medication_id', m.medication_id, 'patient_id', m.patient_id,
+                        'medication_name', m.medication_name, 'dosage', m.dosage,
+                        'frequency', m.frequency,
+                        'start_date', DATE_FORMAT(m.start_date, '%Y-%m-%d'),
+                        'end_date', DATE_FORMAT(m.end_date, '%Y-%m-%d'),
+                        'prescribing_doctor', m.prescribing_doctor, 'notes', m.notes,
+                        'created_at', DATE_FORMAT(m.created_at, '%Y-%m-%d %H:%i:%s'),
+                        'updated_at', DATE_FORMAT(m.updated_at, '%Y-%m-%d %H:%i:%s')
+                    ) ORDER BY m.start_date IS NULL, m.start_date DESC, m.medication_id SEPARATOR ','), ''), ']') AS JSON)
+                    FROM Medications m WHERE m.patient_id = p.patient_id
+                ),
+                'conditions', (
+                    SELECT CAST(CONCAT('[', COALESCE(GROUP_CONCAT(JSON_OBJECT(
+                        'condition_id', c.condition_id, 'patient_id', c.patient_id,
+                        'condition_name', c.condition_name,
+                        'diagnosis_date', DATE_FORMAT(c.diagnosis_date, '%Y-%m-%d'),
+                        'severity', c.severity, 'notes', c.notes,
+                        'created_at', DATE_FORMAT(c.created_at, '%Y-%m-%d %H:%i:%s'),
+                        'updated_at', DATE_FORMAT(c.updated_at, '%Y-%m-%d %H:%i:%s')
+                    ) ORDER BY c.diagnosis_date IS NULL, c.diagnosis_date DESC, c.condition_id SEPARATOR ','), ''), ']') AS JSON)
+                    FROM Medical_Conditions c WHERE c.patient_id = p.patient_id
+                ),
+                'contacts', (
+                    SELECT CAST(CONCAT('[', COALESCE(GROUP_CONCAT(JSON_OBJECT(
+                        'contact_id', e.contact_id, 'patient_id', e.patient_id,
+                        'contact_name', e.contact_name, 'relationship', e.relationship,
+                        'phone_primary', e.phone_primary, 'phone_secondary', e.phone_secondary,
+                        'email', e.email, 'priority_order', e.priority_order,
+                        'created_at', DATE_FORMAT(e.created_at, '%Y-%m-%d %H:%i:%s'),
+                        'updated_at', DATE_FORMAT(e.updated_at, '%Y-%m-%d %H:%i:%s')
+                    ) ORDER BY e.priority_order IS NOT NULL, e.priority_order, e.contact_id SEPARATOR ','), ''), ']') AS JSON)
+                    FROM Emergency_Contacts e WHERE e.patient_id = p.patient_id
+                )
+            ) AS CHAR) USING utf8mb4)
+        FROM Patients p
+        WHERE p.patient_id = p_patient_id;
+
+        SET SESSION group_concat_max_len = v_group_concat_max_len;
+    END IF;
+END //
+DELIMITER ;
+
+-- =====================================================
+-- STEP 3: Rebuild triggers
+-- Patients updates only rebuild when a column in the payload
+-- changes, so logging a scan (last_emergency_access) does not.
+-- While @defer_emergency_payloads is set on the session the
+-- rebuilds are skipped; the writer rebuilds each patient once
+-- before it commits.
+-- Deleting a patient removes the payload with its own trigger
+-- (never deferred): database.delete_patient() runs with
+-- FOREIGN_KEY_CHECKS = 0, so the ON DELETE CASCADE above does not
+-- fire, and it defers the section delete triggers, which would
+-- otherwise rebuild the payload while the Patients row still exists.
+-- =====================================================
+
+DROP TRIGGER IF EXISTS trg_patients_payload_insert;
+DELIMITER //
+CREATE TRIGGER trg_patients_payload_insert
+AFTER INSERT ON Patients
+FOR EACH ROW
+BEGIN
+    IF @defer_emergency_payloads IS NULL THEN
+        CALL Refresh_Emergency_Payload(NEW.patient_id);
+    END IF;
+END //
+DELIMITER ;
+
+DROP TRIGGER IF EXISTS trg_patients_payload_update;
+DELIMITER //
+CREATE TRIGGER trg_patients_payload_update
+AFTER UPDATE ON Patients
+FOR EACH ROW
+BEGIN
+    IF @defer_emergency_payloads IS NULL
+       AND NOT (NEW.emergency_token <=> OLD.emergency_token
+                AND NEW.first_name <=> OLD.first_name
+                AND NEW.last_name <=> OLD.last_name
+                AND NEW.date_of_birth <=> OLD.date_of_birth
+                AND NEW.license_number <=> OLD.license_number
+                AND NEW.blood_type <=> OLD.blood_type) THEN
+        CALL Refresh_Emergency_Payload(NEW.patient_id);
+    END IF;
+END //
+DELIMITER ;
+
+DROP TRIGGER IF EXISTS trg_patients_payload_delete;
+DELIMITER //
+CREATE TRIGGER trg_patients_payload_delete
+AFTER DELETE ON Patients
+FOR EACH ROW
+BEGIN
+    DELETE FROM Emergency_Payloads WHERE patient_id = OLD.patient_id;
+END //
+DELIMITER ;
+
+DROP TRIGGER IF EXISTS trg_medical_conditions_payload_insert;
+DELIMITER //
+CREATE TRIGGER trg_medical_conditions_payload_insert
+AFTER INSERT ON Medical_Conditions
+FOR EACH ROW
+BEGIN
+    IF @defer_emergency_payloads IS NULL THEN
+        CALL Refresh_Emergency_Payload(NEW.patient_id);
+    END IF;
+END //
+DELIMITER ;
+
+DROP TRIGGER IF EXISTS trg_medical_conditions_payload_update;
+DELIMITER //
+CREATE TRIGGER trg_medical_conditions_payload_update
+AFTER UPDATE ON Medical_Conditions
+FOR EACH ROW
+BEGIN
+    IF @defer_emergency_payloads IS NULL THEN
+        CALL Refresh_Emergency_Payload(NEW.patient_id);
+    END IF;
+END //
+DELIMITER ;
+
+DROP TRIGGER IF EXISTS trg_medical_conditions_payload_delete;
+DELIMITER //
+CREATE TRIGGER trg_medical_conditions_payload_delete
+AFTER DELETE ON Medical_Conditions
+FOR EACH ROW
+BEGIN
+    IF @defer_emergency_payloads IS NULL THEN
+        CALL Refresh_Emergency_Payload(OLD.patient_id);
+    END IF;
+END //
+DELIMITER ;
+
+DROP TRIGGER IF EXISTS trg_allergies_payload_insert;
+DELIMITER //
+CREATE TRIGGER trg_allergies_payload_insert
+AFTER INSERT ON Allergies
+FOR EACH ROW
+BEGIN
+    IF @defer_emergency_payloads IS NULL THEN
+        CALL Refresh_Emergency_Payload(NEW.patient_id);
+    END IF;
+END //
+DELIMITER ;
+
+DROP TRIGGER IF EXISTS trg_allergies_payload_update;
+DELIMITER //
+CREATE TRIGGER trg_allergies_payload_update
+AFTER UPDATE ON Allergies
+FOR EACH ROW
+BEGIN
+    IF @defer_emergency_payloads IS NULL THEN
+        CALL Refresh_Emergency_Payload(NEW.patient_id);
+    END IF;
+END //
+DELIMITER ;
+
+DROP TRIGGER IF EXISTS trg_allergies_payload_delete;
+DELIMITER //
+CREATE TRIGGER trg_allergies_payload_delete
+AFTER DELETE ON Allergies
+FOR EACH ROW
+BEGIN
+    IF @defer_emergency_payloads IS NULL THEN
+        CALL Refresh_Emergency_Payload(OLD.patient_id);
+    END IF;
+END //
+DELIMITER ;
+
+DROP TRIGGER IF EXISTS trg_medications_payload_insert;
+DELIMITER //
+CREATE TRIGGER trg_medications_payload_insert
+AFTER INSERT ON Medications
+FOR EACH ROW
+BEGIN
+    IF @defer_emergency_payloads IS NULL THEN
+        CALL Refresh_Emergency_Payload(NEW.patient_id);
+    END IF;
+END //
+DELIMITER ;
+
+DROP TRIGGER IF EXISTS trg_medications_payload_update;
+DELIMITER //
+CREATE TRIGGER trg_medications_payload_update
+AFTER UPDATE ON Medications
+FOR EACH ROW
+BEGIN
+    IF @defer_emergency_payloads IS NULL THEN
+        CALL Refresh_Emergency_Payload(NEW.patient_id);
+    END IF;
+END //
+DELIMITER ;
+
+DROP TRIGGER IF EXISTS trg_medications_payload_delete;
+DELIMITER //
+CREATE TRIGGER trg_medications_payload_delete
+AFTER DELETE ON Medications
+FOR EACH ROW
+BEGIN
+    IF @defer_emergency_payloads IS NULL THEN
+        CALL Refresh_Emergency_Payload(OLD.patient_id);
+    END IF;
+END //
+DELIMITER ;
+
+DROP TRIGGER IF EXISTS trg_emergency_contacts_payload_insert;
+DELIMITER //
+CREATE TRIGGER trg_emergency_contacts_payload_insert
+AFTER INSERT ON Emergency_Contacts
+FOR EACH ROW
+BEGIN
+    IF @defer_emergency_payloads IS NULL THEN
+        CALL Refresh_Emergency_Payload(NEW.patient_id);
+    END IF;
+END //
+DELIMITER ;
+
+DROP TRIGGER IF EXISTS trg_emergency_contacts_payload_update;
+DELIMITER //
+CREATE TRIGGER trg_emergency_contacts_payload_update
+AFTER UPDATE ON Emergency_Contacts
+FOR EACH ROW
+BEGIN
+    IF @defer_emergency_payloads IS NULL THEN
+        CALL Refresh_Emergency_Payload(NEW.patient_id);
+    END IF;
+END //
+DELIMITER ;
+
+DROP TRIGGER IF EXISTS trg_emergency_contacts_payload_delete;
+DELIMITER //
+CREATE TRIGGER trg_emergency_contacts_payload_delete
+AFTER DELETE ON Emergency_Contacts
+FOR EACH ROW
+BEGIN
+    IF @defer_emergency_payloads IS NULL THEN
+        CALL Refresh_Emergency_Payload(OLD.patient_id);
+    END IF;
+END //
+DELIMITER ;
+
+-- =====================================================
+-- STEP 4: Build payloads for existing patients
+-- =====================================================
+DROP PROCEDURE IF EXISTS Rebuild_Emergency_Payloads;
+DELIMITER //
+CREATE PROCEDURE Rebuild_Emergency_Payloads()
+BEGIN
+    DECLARE v_done BOOLEAN DEFAULT FALSE;
+    DECLARE v_patient_id INT;
+    DECLARE patients CURSOR FOR
+        SELECT patient_id FROM Patients WHERE emergency_token IS NOT NULL AND emergency_token <> '';
+    DECLARE CONTINUE HANDLER FOR NOT FOUND SET v_done = TRUE;
+
+    OPEN patients;
+    rebuild: LOOP
+        FETCH patients INTO v_patient_id;
+        IF v_done THEN
+            LEAVE rebuild;
+        END IF;
+        CALL Refresh_Emergency_Payload(v_patient_id);
+    END LOOP;
+    CLOSE patients;
+END //
+DELIMITER ;
+
+CALL Rebuild_Emergency_Payloads();
+
+-- Verify
+SELECT COUNT(*) AS payloads, MAX(built_at) AS last_built FROM Emergency_Payloads;
@@ -9,6 +9,7 @@
 USE mias_db;
 
 -- Drop existing tables if they exist (in reverse order of dependencies)
+DROP TABLE IF EXISTS Change_Tombstones;
 DROP TABLE IF EXISTS Access_Log;
 DROP TABLE IF EXISTS Provider_Access;
 DROP TABLE IF EXISTS Healthcare_Providers;
@@ -40,7 +41,8 @@ CREATE TABLE Patients (
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
     INDEX idx_license_number (license_number),
     INDEX idx_last_name (last_name),
-    INDEX idx_dob (date_of_birth)
+    INDEX idx_dob (date_of_birth),
+    INDEX idx_updated_at (updated_at)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
 COMMENT='Central patient table containing driver license and personal identification data';
 
@@ -58,7 +60,8 @@ CREATE TABLE Medical_Conditions (
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
     FOREIGN KEY (patient_id) REFERENCES Patients(patient_id) ON DELETE CASCADE,
     INDEX idx_patient_id (patient_id),
-    INDEX idx_condition_name (condition_name)
+    INDEX idx_condition_name (condition_name),
+    INDEX idx_updated_at (updated_at)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
 COMMENT='Stores chronic medical conditions and diagnoses for each patient';
 
@@ -77,7 +80,8 @@ CREATE TABLE Allergies (
     FOREIGN KEY (patient_id) REFERENCES Patients(patient_id) ON DELETE CASCADE,
     INDEX idx_patient_id (patient_id),
     INDEX idx_allergen (allergen),
-    INDEX idx_severity (severity)
+    INDEX idx_severity (severity),
+    INDEX idx_updated_at (updated_at)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
 COMMENT='Records all known allergies including medication, food, and environmental allergies';
 
@@ -99,7 +103,8 @@ CREATE TABLE Medications (
     FOREIGN KEY (patient_id) REFERENCES Patients(patient_id) ON DELETE CASCADE,
     INDEX idx_patient_id (patient_id),
     INDEX idx_medication_name (medication_name),
-    INDEX idx_active_medications (patient_id, end_date)
+    INDEX idx_active_medications (patient_id, end_date),
+    INDEX idx_updated_at (updated_at)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
 COMMENT='Tracks current and historical medications prescribed to patients';
 
@@ -119,7 +124,8 @@ CREATE TABLE Vaccinations (
     FOREIGN KEY (patient_id) REFERENCES Patients(patient_id) ON DELETE CASCADE,
     INDEX idx_patient_id (patient_id),
     INDEX idx_vaccine_name (vaccine_name),
-    INDEX idx_administration_date (administration_date)
+    INDEX idx_administration_date (administration_date),
+    INDEX idx_updated_at (updated_at)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
 COMMENT='Records vaccination history for immunization tracking and compliance';
 
@@ -140,7 +146,8 @@ CREATE TABLE Insurance (
     FOREIGN KEY (patient_id) REFERENCES Patients(patient_id) ON DELETE CASCADE,
     INDEX idx_patient_id (patient_id),
     INDEX idx_policy_number (policy_number),
-    INDEX idx_active_insurance (patient_id, is_active)
+    INDEX idx_active_insurance (patient_id, is_active),
+    INDEX idx_updated_at (updated_at)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
 COMMENT='Stores healthcare insurance information for billing and coverage verification';
 
@@ -160,7 +167,8 @@ CREATE TABLE Emergency_Contacts (
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
     FOREIGN KEY (patient_id) REFERENCES Patients(patient_id) ON DELETE CASCADE,
     INDEX idx_patient_id (patient_id),
-    INDEX idx_priority (patient_id, priority_order)
+    INDEX idx_priority (patient_id, priority_order),
+    INDEX idx_updated_at (updated_at)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
 COMMENT='Maintains emergency contact information for patient notification in critical situations';
 
@@ -181,7 +189,8 @@ CREATE TABLE Healthcare_Providers (
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
     INDEX idx_license_number (license_number),
     INDEX idx_last_name (last_name),
-    INDEX idx_specialty (specialty)
+    INDEX idx_specialty (specialty),
+    INDEX idx_updated_at (updated_at)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
 COMMENT='Records authorized medical professionals who can access patient data';
 
@@ -202,7 +211,8 @@ CREATE TABLE Provider_Access (
     UNIQUE KEY unique_active_access (patient_id, provider_id, revoked_date),
     INDEX idx_patient_provider (patient_id, provider_id),
     INDEX idx_provider_patient (provider_id, patient_id),
-    INDEX idx_active_access (revoked_date)
+    INDEX idx_active_access (revoked_date),
+    INDEX idx_updated_at (updated_at)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
 COMMENT='Links healthcare providers to patients they are authorized to access (Many-to-Many relationship)';
 
@@ -226,6 +236,20 @@ CREATE TABLE Access_Log (
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
 COMMENT='Tracks all access to patient records for security, compliance, and audit purposes (HIPAA requirement)';
 
+-- =====================================================
+-- TABLE 11: Change_Tombstones (Change Feed Deletes)
+-- =====================================================
+CREATE TABLE Change_Tombstones (
+    tombstone_id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    table_name VARCHAR(64) NOT NULL,
+    record_id INT NOT NULL COMMENT 'Primary key of the deleted row',
+    patient_id INT COMMENT 'Owning patient, for per-patient consumers',
+    deleted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    INDEX idx_deleted_at (deleted_at),
+    INDEX idx_table_record (table_name, record_id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+COMMENT='Delete log written by triggers so incremental sync consumers can see removed rows';
+
 -- =====================================================
 -- VIEWS FOR COMMON QUERIES
 -- =====================================================
@@ -396,6 +420,113 @@ BEGIN
 END //
 DELIMITER ;
 
+-- =====================================================
+-- CHANGE FEED TRIGGERS
+-- Every DELETE leaves a tombstone for incremental sync consumers.
+-- Note: ON DELETE CASCADE does not fire triggers; delete_patient()
+-- removes child rows explicitly so each one is logged.
+-- =====================================================
+
+DELIMITER //
+CREATE TRIGGER trg_patients_tombstone
+AFTER DELETE ON Patients
+FOR EACH ROW
+BEGIN
+    INSERT INTO Change_Tombstones (table_name, record_id, patient_id)
+    VALUES ('Patients', OLD.patient_id, OLD.patient_id);
+END //
+DELIMITER ;
+
+DELIMITER //
+CREATE TRIGGER trg_medical_conditions_tombstone
+AFTER DELETE ON Medical_Conditions
+FOR EACH ROW
+BEGIN
+    INSERT INTO Change_Tombstones (table_name, record_id, patient_id)
+    VALUES ('Medical_Conditions', OLD.condition_id, OLD.patient_id);
+END //
+DELIMITER ;
+
+DELIMITER //
+CREATE TRIGGER trg_allergies_tombstone
+AFTER DELETE ON Allergies
+FOR EACH ROW
+BEGIN
+    INSERT INTO Change_Tombstones (table_name, record_id, patient_id)
+    VALUES ('Allergies', OLD.allergy_id, OLD.patient_id);
+END //
+DELIMITER ;
+
+DELIMITER //
+CREATE TRIGGER trg_medications_tombstone
+AFTER DELETE ON Medications
+FOR EACH ROW
+BEGIN
+    INSERT INTO Change_Tombstones (table_name, record_id, patient_id)
+    VALUES ('Medications', OLD.medication_id, OLD.patient_id);
+END //
+DELIMITER ;
+
+DELIMITER //
+CREATE TRIGGER trg_vaccinations_tombstone
+AFTER DELETE ON Vaccinations
+FOR EACH ROW
+BEGIN
+    INSERT INTO Change_Tombstones (table_name, record_id, patient_id)
+    VALUES ('Vaccinations', OLD.vaccination_id, OLD.patient_id);
+END //
+DELIMITER ;
+
+DELIMITER //
+CREATE TRIGGER trg_insurance_tombstone
+AFTER DELETE ON Insurance
+FOR EACH ROW
+BEGIN
+    INSERT INTO Change_Tombstones (table_name, record_id, patient_id)
+    VALUES ('Insurance', OLD.insurance_id, OLD.patient_id);
+END //
+DELIMITER ;
+
+DELIMITER //
+CREATE TRIGGER trg_emergency_contacts_tombstone
+AFTER DELETE ON Emergency_Contacts
+FOR EACH ROW
+BEGIN
+    INSERT INTO Change_Tombstones (table_name, record_id, patient_id)
+    VALUES ('Emergency_Contacts', OLD.contact_id, OLD.patient_id);
+END //
+DELIMITER ;
+
+DELIMITER //
+CREATE TRIGGER trg_healthcare_providers_tombstone
+AFTER DELETE ON Healthcare_Providers
+FOR EACH ROW
+BEGIN
+    INSERT INTO Change_Tombstones (table_name, record_id, patient_id)
+    VALUES ('Healthcare_Providers', OLD.provider_id, NULL);
+END //
+DELIMITER ;
+
+DELIMITER //
+CREATE TRIGGER trg_provider_access_tombstone
+AFTER DELETE ON Provider_Access
+FOR EACH ROW
+BEGIN
+    INSERT INTO Change_Tombstones (table_name, record_id, patient_id)
+    VALUES ('Provider_Access', OLD.access_id, OLD.patient_id);
+END //
+DELIMITER ;
+
+DELIMITER //
+CREATE TRIGGER trg_access_log_tombstone
+AFTER DELETE ON Access_Log
+FOR EACH ROW
+BEGIN
+    INSERT INTO Change_Tombstones (table_name, record_id, patient_id)
+    VALUES ('Access_Log', OLD.log_id, OLD.patient_id);
+END //
+DELIMITER ;
+
 -- =====================================================
 -- SAMPLE DATA INSERTION (Optional - for testing)
 -- =====================================================
@@ -426,6 +557,7 @@ SHOW TABLES;
 -- DESCRIBE Healthcare_Providers;
 -- DESCRIBE Provider_Access;
 -- DESCRIBE Access_Log;
+-- DESCRIBE Change_Tombstones;
 
 -- =====================================================
 -- END OF SCHEMA CREATION SCRIPT
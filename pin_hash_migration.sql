@@ -0,0 +1,14 @@
+-- =====================================================
+-- License to Live: MIAS
+-- PIN Hash Migration - SQL DDL Script
+-- Widens Patients.pin so it can hold the salted PBKDF2 hashes
+-- written by pin_security.hash_pin() (about 100 characters).
+-- Existing plaintext PINs keep working and are rehashed on the
+-- next successful login; hash them all at once afterwards with:
+--     python pin_security.py --migrate
+-- =====================================================
+
+USE mias_db;
+
+ALTER TABLE Patients MODIFY COLUMN pin VARCHAR(255) NULL
+    COMMENT 'pbkdf2_sha256$iterations$salt$hash (legacy rows: plaintext 4-digit PIN)';